@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from django.utils.translation import gettext_lazy
+from utils.admin import TrigramSearchAdminMixin
 from .models import User, RoleApproval, IndividualGroup
 
 class CustomUserChangeForm(UserChangeForm):
@@ -15,7 +16,7 @@ class CustomUserCreationForm(UserCreationForm):
     fields = ('email', 'screen_name', 'role',)
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(TrigramSearchAdminMixin, UserAdmin):
   fieldsets = (
     (None, {'fields': ('email', 'screen_name', 'password', 'role')}),
     (gettext_lazy('Permissions'), {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
@@ -34,6 +35,7 @@ class CustomUserAdmin(UserAdmin):
   list_filter = ('is_staff', 'is_superuser', 'is_active', 'groups')
   search_fields = ('email', 'code', 'screen_name', 'role')
   ordering = ('code', 'screen_name', 'email')
+  trigram_search_field = 'screen_name'
 
 @admin.register(RoleApproval)
 class RoleApprovalAdmin(admin.ModelAdmin):
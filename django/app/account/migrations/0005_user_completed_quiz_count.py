@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_alter_individualgroup_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='completed_quiz_count',
+            field=models.IntegerField(default=0, editable=False, help_text='The number of completed quizzes created by this user.', verbose_name='Completed quiz count'),
+        ),
+    ]
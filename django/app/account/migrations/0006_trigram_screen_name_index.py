@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:50
+
+from django.db import migrations
+from utils.search import create_trigram_indexes, drop_trigram_indexes
+
+TARGETS = [
+    ('account_user_screen_name_trgm_idx', 'account_user', 'screen_name'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    create_trigram_indexes(schema_editor, TARGETS)
+
+def drop_indexes(apps, schema_editor):
+    drop_trigram_indexes(schema_editor, TARGETS)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_user_completed_quiz_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, reverse_code=drop_indexes),
+    ]
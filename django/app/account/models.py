@@ -48,9 +48,9 @@ class CustomUserQuerySet(models.QuerySet):
   ##
   # @brief Get creators who have at least one quiz
   # @return Queryset which consists of creator's role
+  # @note The maintained counter is used instead of counting quizzes.
   def collect_valid_creators(self):
-    return self.annotate(quiz_counts=models.Count('quizzes', filter=models.Q(quizzes__is_completed=True))) \
-               .filter(is_active=True, is_staff=False, role=RoleType.CREATOR, quiz_counts__gt=0)
+    return self.filter(is_active=True, is_staff=False, role=RoleType.CREATOR, completed_quiz_count__gt=0)
 
 class CustomUserManager(BaseUserManager):
   use_in_migrations = True
@@ -190,6 +190,12 @@ class User(AbstractBaseUser, PermissionsMixin, BaseModel):
     verbose_name=gettext_lazy('My friends'),
     symmetrical=False,
   )
+  completed_quiz_count = models.IntegerField(
+    gettext_lazy('Completed quiz count'),
+    default=0,
+    editable=False,
+    help_text=gettext_lazy('The number of completed quizzes created by this user.'),
+  )
   created_at = models.DateTimeField(
     gettext_lazy('Created time'),
     default=get_current_time,
@@ -737,6 +737,15 @@ class TestFriendForm:
     assert len(options) == len(exacts_items)
     assert g_compare_options(options, exacts_items)
 
+  def test_number_of_queries_to_get_options(self, django_assert_num_queries, get_friends):
+    friends = get_friends
+    _ = factories.UserFactory.create_batch(10, is_active=True)
+    user = factories.UserFactory(friends=friends)
+    form = forms.FriendForm(user=user)
+
+    with django_assert_num_queries(2):
+      _ = form.get_options
+
 # =======================
 # = IndividualGroupForm =
 # =======================
@@ -837,6 +846,15 @@ class TestIndividualGroupForm:
     assert len(options) == len(exacts_items)
     assert g_compare_options(options, exacts_items)
 
+  def test_number_of_queries_to_get_options(self, django_assert_num_queries, get_friends):
+    friends = get_friends
+    user = factories.UserFactory(friends=friends)
+    instance = factories.IndividualGroupFactory(owner=user, members=friends[:1])
+    form = forms.IndividualGroupForm(user=user, instance=instance)
+
+    with django_assert_num_queries(2):
+      _ = form.get_options
+
   def test_check_clean_members_method(self, get_guest):
     user = factories.UserFactory()
     other = get_guest
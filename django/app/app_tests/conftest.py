@@ -1,4 +1,5 @@
 import pytest
+from utils.search import g_trigram_search
 
 @pytest.fixture(scope='session', autouse=True)
 def django_db_setup(django_db_setup):
@@ -13,9 +14,18 @@ def setup_django(settings):
   settings.SESSION_COOKIE_SECURE = False
   settings.CSRF_COOKIE_SECURE = False
   settings.SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+  # Use the dedicated key prefix so that the cached quiz index of other environments is never read
+  settings.QUIZ_INDEX = dict(settings.QUIZ_INDEX, prefix='quiz-index-test')
+  # Disable the cached choices because the changes in each test are rolled back without invalidation
+  settings.QUIZ_SEARCH_CHOICES = dict(settings.QUIZ_SEARCH_CHOICES, timeout=0)
 
 @pytest.fixture
 def csrf_exempt_django_app(django_app_factory):
   app = django_app_factory(csrf_checks=False)
 
-  return app
\ No newline at end of file
+  return app
+
+@pytest.fixture
+def require_trigram_search(db):
+  if not g_trigram_search.is_available():
+    pytest.skip('pg_trgm extension is not available')
\ No newline at end of file
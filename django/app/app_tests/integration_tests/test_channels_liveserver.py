@@ -10,6 +10,7 @@ from channels.routing import get_default_application
 from daphne.testing import DaphneProcess
 from daphne.server import Server as DaphneServer
 from daphne.endpoints import build_endpoint_description_strings
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
@@ -24,6 +25,7 @@ from contextlib import AsyncExitStack
 from app_tests import factories
 from account.models import RoleType
 from quiz import models
+from quiz.backends import get_state_backend
 
 def get_open_port():
   import socket
@@ -174,6 +176,9 @@ class Common:
   def aget_score_detail(self, score):
     return score.detail
 
+  async def aget_room_fields(self, room):
+    return await get_state_backend().get_fields(f'quiz-{room.pk}')
+
   @pytest.fixture(scope='session')
   def channels_live_server(self, request):
     server = ChannelsLiveServer()
@@ -227,7 +232,10 @@ class TestQuizRoomWithLiveServer(Common):
 
     assert 'did not receive a valid HTTP response' in ex.value.args[0]
 
-  async def remove_all_messages(self, ws_users):
+  async def remove_all_messages(self, ws_users, delay=0):
+    # Wait until the pending messages (e.g., join messages) are sent
+    await asyncio.sleep(delay)
+
     for ws_conn in ws_users.values():
       msg_exists = True
       # Call recv method
@@ -257,7 +265,7 @@ class TestQuizRoomWithLiveServer(Common):
           ws_users[key] = await astack.enter_async_context(websockets.connect(url, additional_headers=headers))
           user_pks[key] = str(user.pk)
         # Delete old message
-        await self.remove_all_messages(ws_users)
+        await self.remove_all_messages(ws_users, delay=settings.QUIZ_PRESENCE_DEBOUNCE_TIME)
         # Call callback function
         responses = await acallback(ws_users=ws_users, user_pks=user_pks, room=room, server=channels_live_server)
 
@@ -291,8 +299,11 @@ class TestQuizRoomWithLiveServer(Common):
 
   @pytest.mark.asyncio
   async def test_get_next_quiz_command(self, exec_common_connect_process):
+    @database_sync_to_async
+    def apreproess(room):
+      room.reset()
+
     async def acallback(ws_users, room, **kwargs):
-      await database_sync_to_async(room.reset)()
       # Send message
       await ws_users['owner'].send(json.dumps({'command': 'getNextQuiz'}))
       # Call recv method
@@ -303,13 +314,14 @@ class TestQuizRoomWithLiveServer(Common):
         responses = [res_owner, res_creator, res_guest]
       except TimeoutError as ex:
         pytest.fail(f'Unexpected Error: {ex}')
+      fields = await self.aget_room_fields(room)
 
-      return responses, room
+      return responses, room, fields
     # Get result
-    responses, room = await exec_common_connect_process(acallback)
+    responses, room, fields = await exec_common_connect_process(acallback, apreproess=apreproess)
     score = await self.aget_score(room)
-    status = await self.aget_score_status(score)
-    idx = await self.aget_score_index(score)
+    status = fields['status']
+    idx = fields['index']
     seq = await self.aget_score_sequence(score)
     quiz = await self.aget_quiz(seq[str(idx)])
     question = await self.aget_quiz_question(quiz)
@@ -372,12 +384,12 @@ class TestQuizRoomWithLiveServer(Common):
         responses = [res_owner, res_creator, res_guest]
       except TimeoutError as ex:
         pytest.fail(f'Unexpected Error: {ex}')
+      fields = await self.aget_room_fields(room)
 
-      return responses, room
+      return responses, fields
     # Get result
-    responses, room = await exec_common_connect_process(acallback)
-    score = await self.aget_score(room)
-    status = await self.aget_score_status(score)
+    responses, fields = await exec_common_connect_process(acallback)
+    status = fields['status']
 
     assert status == models.QuizStatusType.ANSWERING.value
     assert all([res['type'] == 'startedAnswering' for res in responses])
@@ -385,6 +397,9 @@ class TestQuizRoomWithLiveServer(Common):
   @pytest.mark.asyncio
   async def test_stop_answer_command(self, exec_common_connect_process):
     async def acallback(ws_users, room, **kwargs):
+      # Because only the open answering phase is closed, the phase is started first
+      await ws_users['owner'].send(json.dumps({'command': 'startAnswer'}))
+      await self.remove_all_messages(ws_users)
       # Send message
       await ws_users['owner'].send(json.dumps({'command': 'stopAnswer'}))
       # Call recv method
@@ -395,12 +410,12 @@ class TestQuizRoomWithLiveServer(Common):
         responses = [res_owner, res_creator, res_guest]
       except TimeoutError as ex:
         pytest.fail(f'Unexpected Error: {ex}')
+      fields = await self.aget_room_fields(room)
 
-      return responses, room
+      return responses, fields
     # Get result
-    responses, room = await exec_common_connect_process(acallback)
-    score = await self.aget_score(room)
-    status = await self.aget_score_status(score)
+    responses, fields = await exec_common_connect_process(acallback)
+    status = fields['status']
 
     assert status == models.QuizStatusType.RECEIVED_ANSWERS.value
     assert all([res['type'] == 'stoppedAnswering' for res in responses])
@@ -408,8 +423,11 @@ class TestQuizRoomWithLiveServer(Common):
 
   @pytest.mark.asyncio
   async def test_get_answers_command(self, exec_common_connect_process):
+    @database_sync_to_async
+    def apreproess(room):
+      room.reset()
+
     async def acallback(ws_users, room, **kwargs):
-      await database_sync_to_async(room.reset)()
       # Send message
       await ws_users['owner'].send(json.dumps({'command': 'getNextQuiz'}))
       await self.remove_all_messages(ws_users)
@@ -422,13 +440,14 @@ class TestQuizRoomWithLiveServer(Common):
         responses = [res_owner, res_creator, res_guest]
       except TimeoutError as ex:
         pytest.fail(f'Unexpected Error: {ex}')
+      fields = await self.aget_room_fields(room)
 
-      return responses, room
+      return responses, room, fields
     # Get result
-    responses, room = await exec_common_connect_process(acallback)
+    responses, room, fields = await exec_common_connect_process(acallback, apreproess=apreproess)
     score = await self.aget_score(room)
-    status = await self.aget_score_status(score)
-    idx = await self.aget_score_index(score)
+    status = fields['status']
+    idx = fields['index']
     seq = await self.aget_score_sequence(score)
     quiz = await self.aget_quiz(seq[str(idx)])
     answer = await self.aget_quiz_answer(quiz)
@@ -565,7 +584,7 @@ class TestQuizRoomWithLiveServer(Common):
         headers = channels_live_server.get_headers()
         ws_users[key] = await astack.enter_async_context(websockets.connect(url, additional_headers=headers))
         user_pks[key] = str(user.pk)
-      await self.remove_all_messages(ws_users)
+      await self.remove_all_messages(ws_users, delay=settings.QUIZ_PRESENCE_DEBOUNCE_TIME)
 
       for loop_count in range(max_question):
         # Step2: Get next quiz and reply
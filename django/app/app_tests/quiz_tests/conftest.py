@@ -2,7 +2,9 @@ import pytest
 from django.utils import timezone, dateformat
 from app_tests import factories
 from account.models import RoleType
+from quiz.caches import g_search_choice_cache
 from quiz.models import Genre
+import uuid
 
 @pytest.fixture(scope='module')
 def get_genres(django_db_blocker):
@@ -118,4 +120,13 @@ def get_members_with_owner(get_superuser, get_manager, get_creator, get_guest, r
 
     return key, user
 
-  return inner
\ No newline at end of file
+  return inner
+
+@pytest.fixture
+def get_search_choice_cache(settings):
+  settings.QUIZ_SEARCH_CHOICES = dict(settings.QUIZ_SEARCH_CHOICES, prefix=f'quiz-search-choices-test-{uuid.uuid4().hex[:8]}', timeout=60)
+
+  yield g_search_choice_cache
+
+  # The entries expire by themselves
+  g_search_choice_cache.get_cache().delete(g_search_choice_cache.get_key('version'))
\ No newline at end of file
@@ -0,0 +1,203 @@
+import pytest
+import pytest_asyncio
+import uuid
+from django.conf import settings
+from quiz import backends
+from quiz.models import QuizStatusType
+
+@pytest_asyncio.fixture(params=['in-memory', 'redis'])
+async def get_backend(request):
+  if request.param == 'in-memory':
+    backend = backends.InMemoryStateBackend()
+  else:
+    config = settings.QUIZ_STATE_BACKEND['CONFIG']
+    backend = backends.RedisStateBackend(hosts=config['hosts'], prefix='quiz-state-test')
+  name = f'quiz-{uuid.uuid4()}'
+
+  yield backend, name
+
+  await backend.delete_room(name)
+
+@pytest.mark.quiz
+@pytest.mark.consumer
+class TestStateBackend:
+  @pytest.mark.asyncio
+  async def test_create_room(self, get_backend):
+    backend, name = get_backend
+    is_created = await backend.create_room(name, ['foo', 'bar'], {'status': QuizStatusType.START, 'index': 1})
+    players = await backend.get_players(name)
+    fields = await backend.get_fields(name)
+
+    assert is_created
+    assert await backend.exists(name)
+    assert players == {'foo': False, 'bar': False}
+    assert fields == {'status': QuizStatusType.START.value, 'index': 1}
+
+  @pytest.mark.asyncio
+  async def test_create_existing_room(self, get_backend):
+    backend, name = get_backend
+    await backend.create_room(name, ['foo'], {'status': QuizStatusType.ANSWERING, 'index': 3})
+    await backend.update_player(name, 'foo', True)
+    is_created = await backend.create_room(name, ['foo', 'bar'], {'status': QuizStatusType.START, 'index': 1})
+    players = await backend.get_players(name)
+    fields = await backend.get_fields(name)
+
+    assert not is_created
+    assert players == {'foo': True, 'bar': False}
+    assert fields == {'status': QuizStatusType.ANSWERING.value, 'index': 3}
+
+  @pytest.mark.asyncio
+  async def test_delete_room(self, get_backend):
+    backend, name = get_backend
+    await backend.create_room(name, ['foo'], {'index': 1})
+    await backend.delete_room(name)
+
+    assert not await backend.exists(name)
+
+  @pytest.mark.asyncio
+  async def test_update_player(self, get_backend):
+    backend, name = get_backend
+    await backend.create_room(name, ['foo', 'bar'], {'index': 1})
+    await backend.update_player(name, 'bar', True)
+    players = await backend.get_players(name)
+
+    assert players == {'foo': False, 'bar': True}
+
+  @pytest.mark.asyncio
+  async def test_answers(self, get_backend):
+    backend, name = get_backend
+    await backend.create_room(name, ['foo', 'bar', 'hoge'], {'index': 1})
+    await backend.reset_answers(name, {'foo': {'answer': '', 'time': 0}})
+    num_answers, num_players = await backend.add_answer(name, 'bar', None)
+    answers = await backend.get_answers(name)
+
+    assert num_answers == 2
+    assert num_players == 3
+    assert answers == {'foo': {'answer': '', 'time': 0}, 'bar': None}
+
+  @pytest.mark.asyncio
+  async def test_reset_answers_with_empty_data(self, get_backend):
+    backend, name = get_backend
+    await backend.create_room(name, ['foo'], {'index': 1})
+    await backend.add_answer(name, 'foo', None)
+    await backend.reset_answers(name, {})
+    answers = await backend.get_answers(name)
+
+    assert len(answers) == 0
+
+  @pytest.mark.parametrize([
+    'status',
+    'expected',
+  ], [
+    (QuizStatusType.ANSWERING, True),
+    (QuizStatusType.RECEIVED_ANSWERS, False),
+  ], ids=[
+    'can-update',
+    'cannot-update',
+  ])
+  @pytest.mark.asyncio
+  async def test_update_answer(self, get_backend, status, expected):
+    backend, name = get_backend
+    await backend.create_room(name, ['foo'], {'status': status, 'current_time': 100.0})
+    is_updated = await backend.update_answer(name, 'foo', 'hoge', 101.5, QuizStatusType.ANSWERING)
+    answers = await backend.get_answers(name)
+
+    assert is_updated == expected
+    assert (answers.get('foo') == {'answer': 'hoge', 'time': 1.5}) == expected
+
+  @pytest.mark.asyncio
+  async def test_update_fields(self, get_backend):
+    backend, name = get_backend
+    await backend.create_room(name, ['foo'], {'status': QuizStatusType.START, 'index': 1, 'quiz': None})
+    await backend.update_fields(name, status=QuizStatusType.SENT_QUESTION, quiz='abc')
+    fields = await backend.get_fields(name)
+
+    assert fields == {'status': QuizStatusType.SENT_QUESTION.value, 'index': 1, 'quiz': 'abc'}
+
+  @pytest.mark.parametrize([
+    'expected',
+    'is_updated',
+  ], [
+    ({'status': QuizStatusType.ANSWERING, 'current_time': 1.5}, True),
+    ({'status': QuizStatusType.ANSWERING}, True),
+    ({'status': QuizStatusType.ANSWERING, 'current_time': 2.5}, False),
+    ({'status': QuizStatusType.JUDGING}, False),
+    ({'unknown': 1}, False),
+  ], ids=[
+    'all-values-match',
+    'partial-values-match',
+    'time-does-not-match',
+    'status-does-not-match',
+    'field-does-not-exist',
+  ])
+  @pytest.mark.asyncio
+  async def test_compare_and_update_fields(self, get_backend, expected, is_updated):
+    backend, name = get_backend
+    await backend.create_room(name, ['foo'], {'status': QuizStatusType.ANSWERING, 'current_time': 1.5})
+    output = await backend.compare_and_update_fields(name, expected, status=QuizStatusType.RECEIVED_ANSWERS)
+    fields = await backend.get_fields(name)
+    exact_status = QuizStatusType.RECEIVED_ANSWERS if is_updated else QuizStatusType.ANSWERING
+
+    assert output == is_updated
+    assert fields == {'status': exact_status.value, 'current_time': 1.5}
+
+  @pytest.mark.asyncio
+  async def test_increment_field(self, get_backend):
+    backend, name = get_backend
+    await backend.create_room(name, ['foo'], {'version': 0})
+    first = await backend.increment_field(name, 'version')
+    second = await backend.increment_field(name, 'version', amount=2)
+    other = await backend.increment_field(name, 'unknown')
+    fields = await backend.get_fields(name)
+
+    assert (first, second, other) == (1, 3, 1)
+    assert fields == {'version': 3, 'unknown': 1}
+
+  @pytest.mark.asyncio
+  async def test_update_spectators(self, get_backend):
+    backend, name = get_backend
+    before = await backend.get_num_spectators(name)
+    counts = [
+      await backend.update_spectators(name, 1),
+      await backend.update_spectators(name, 1),
+      await backend.update_spectators(name, -1),
+    ]
+    # The counter is kept after the room state is deleted
+    await backend.delete_room(name)
+    after_deletion = await backend.get_num_spectators(name)
+    last = await backend.update_spectators(name, -1)
+    # The counter never becomes negative
+    extra = await backend.update_spectators(name, -1)
+    after = await backend.get_num_spectators(name)
+
+    assert before == 0
+    assert counts == [1, 2, 1]
+    assert after_deletion == 1
+    assert (last, extra, after) == (0, 0, 0)
+    assert not await backend.exists(name)
+
+  @pytest.mark.asyncio
+  async def test_get_specific_fields(self, get_backend):
+    backend, name = get_backend
+    await backend.create_room(name, ['foo'], {'status': QuizStatusType.START, 'index': 1, 'questions': [['abc', 'hoge', 'foo']]})
+    fields = await backend.get_fields(name, 'index', 'questions', 'unknown')
+
+    assert fields == {'index': 1, 'questions': [['abc', 'hoge', 'foo']]}
+
+@pytest.mark.quiz
+@pytest.mark.consumer
+@pytest.mark.parametrize([
+  'config',
+  'expected_class',
+], [
+  ({}, backends.InMemoryStateBackend),
+  ({'BACKEND': 'quiz.backends.RedisStateBackend', 'CONFIG': {'hosts': ['redis://localhost:6379']}}, backends.RedisStateBackend),
+], ids=[
+  'default-backend',
+  'redis-backend',
+])
+def test_get_state_backend(settings, config, expected_class):
+  settings.QUIZ_STATE_BACKEND = config
+  backend = backends.get_state_backend()
+
+  assert isinstance(backend, expected_class)
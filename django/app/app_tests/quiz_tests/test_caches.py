@@ -0,0 +1,183 @@
+import pytest
+from django.contrib.auth.models import update_last_login
+from redis.exceptions import RedisError
+from app_tests import factories
+from account.models import RoleType
+from quiz import forms
+from quiz.caches import SearchChoiceCache
+
+@pytest.mark.quiz
+def test_default_config(settings):
+  settings.QUIZ_SEARCH_CHOICES = {'alias': 'default', 'prefix': 'foo', 'timeout': 10}
+  instance = SearchChoiceCache()
+
+  assert instance.get_config() == {'alias': 'default', 'prefix': 'foo', 'timeout': 10}
+  assert instance.get_key('version') == 'foo:version'
+
+@pytest.mark.quiz
+def test_custom_config():
+  instance = SearchChoiceCache(alias='other', prefix='bar', timeout=0)
+
+  assert instance.get_config() == {'alias': 'other', 'prefix': 'bar', 'timeout': 0}
+
+@pytest.mark.quiz
+@pytest.mark.django_db
+class TestSearchChoiceCache:
+  @pytest.fixture
+  def get_quizzes(self):
+    creators = factories.UserFactory.create_batch(2, is_active=True, role=RoleType.CREATOR)
+    genres = factories.GenreFactory.create_batch(2, is_enabled=True)
+    _ = factories.GenreFactory(is_enabled=False)
+    _ = factories.QuizFactory.create_batch(2, creator=creators[0], genre=genres[0])
+    _ = factories.QuizFactory(creator=creators[1], genre=genres[0])
+    _ = factories.QuizFactory(creator=creators[1], genre=genres[1])
+
+    return creators, genres
+
+  def test_build_for_manager(self, get_manager, get_quizzes):
+    creators, genres = get_quizzes
+    choices = SearchChoiceCache().build(get_manager)
+    genre_counts = {pk: count for pk, _, count in choices['genres']}
+    creator_counts = {pk: (name, count, code) for pk, name, count, code in choices['creators']}
+
+    assert (genre_counts[str(genres[0].pk)], genre_counts[str(genres[1].pk)]) == (3, 1)
+    assert creator_counts[str(creators[0].pk)] == (str(creators[0]), 2, creators[0].code)
+    assert creator_counts[str(creators[1].pk)] == (str(creators[1]), 2, creators[1].code)
+
+  def test_build_for_creator(self, django_assert_num_queries, get_quizzes):
+    creators, genres = get_quizzes
+
+    with django_assert_num_queries(2):
+      choices = SearchChoiceCache().build(creators[1])
+    genre_counts = {pk: count for pk, _, count in choices['genres']}
+
+    assert (genre_counts[str(genres[0].pk)], genre_counts[str(genres[1].pk)]) == (1, 1)
+    assert choices['creators'] == [(str(creators[1].pk), str(creators[1]), 2, creators[1].code)]
+
+  def test_cache_for_each_scope(self, django_assert_num_queries, get_search_choice_cache, get_manager, get_quizzes):
+    instance = get_search_choice_cache
+    creators, _ = get_quizzes
+    expected = {user.pk: instance.get(user) for user in [get_manager] + creators}
+
+    with django_assert_num_queries(0):
+      outputs = {user.pk: instance.get(user) for user in [get_manager] + creators}
+
+    assert outputs == expected
+    assert outputs[creators[0].pk] != outputs[creators[1].pk]
+
+  def test_invalidate(self, django_assert_num_queries, get_search_choice_cache, get_quizzes):
+    instance = get_search_choice_cache
+    creators, genres = get_quizzes
+    version = instance.get_version()
+    _ = instance.get(creators[0])
+    instance.invalidate()
+
+    with django_assert_num_queries(2):
+      _ = instance.get(creators[0])
+
+    assert instance.get_version() == version + 1
+
+  def test_invalidate_without_version(self, get_search_choice_cache):
+    instance = get_search_choice_cache
+    instance.invalidate()
+
+    assert instance.get_version() is not None
+
+  @pytest.mark.parametrize('target', ['quiz', 'genre'])
+  def test_invalidate_by_signals(self, django_capture_on_commit_callbacks, get_search_choice_cache, get_quizzes, target):
+    instance = get_search_choice_cache
+    creators, genres = get_quizzes
+    before = instance.get(creators[0])
+
+    with django_capture_on_commit_callbacks(execute=True):
+      if target == 'quiz':
+        factories.QuizFactory(creator=creators[0], genre=genres[1])
+      else:
+        genres[1].name = f'{genres[1].name}-renamed'
+        genres[1].save()
+    after = instance.get(creators[0])
+
+    assert before != after
+
+  @pytest.mark.parametrize([
+    'operation',
+  ], [
+    ('create', ),
+    ('change-role', ),
+    ('deactivate', ),
+    ('rename', ),
+    ('delete', ),
+  ], ids=lambda xs: str(xs))
+  def test_invalidate_by_user_signals(self, django_capture_on_commit_callbacks, get_search_choice_cache, get_manager, get_quizzes, operation):
+    instance = get_search_choice_cache
+    creators, _ = get_quizzes
+    before = instance.get(get_manager)
+    version = instance.get_version()
+
+    with django_capture_on_commit_callbacks(execute=True):
+      if operation == 'create':
+        factories.UserFactory(is_active=True, role=RoleType.CREATOR)
+      elif operation == 'change-role':
+        creators[0].role = RoleType.GUEST
+        creators[0].save(update_fields=['role'])
+      elif operation == 'deactivate':
+        creators[0].is_active = False
+        creators[0].save()
+      elif operation == 'rename':
+        creators[0].screen_name = 'renamed-creator'
+        creators[0].save(update_fields=['screen_name'])
+      else:
+        creators[1].delete()
+
+    assert instance.get_version() > version
+
+    if operation != 'create':
+      assert instance.get(get_manager) != before
+
+  def test_login_does_not_invalidate(self, django_capture_on_commit_callbacks, get_search_choice_cache, get_quizzes):
+    instance = get_search_choice_cache
+    creators, _ = get_quizzes
+    version = instance.get_version()
+
+    with django_capture_on_commit_callbacks(execute=True):
+      update_last_login(None, creators[0])
+
+    assert instance.get_version() == version
+
+  def test_rollback_is_not_reflected(self, django_capture_on_commit_callbacks, get_search_choice_cache, get_quizzes):
+    instance = get_search_choice_cache
+    creators, genres = get_quizzes
+    version = instance.get_version()
+
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+      factories.QuizFactory(creator=creators[0], genre=genres[1])
+
+    assert len(callbacks) > 0
+    assert instance.get_version() == version
+
+  def test_disabled_cache(self, mocker, settings, get_quizzes):
+    settings.QUIZ_SEARCH_CHOICES = dict(settings.QUIZ_SEARCH_CHOICES, timeout=0)
+    creators, _ = get_quizzes
+    instance = SearchChoiceCache()
+    mocked_get_cache = mocker.patch.object(instance, 'get_cache')
+    _ = instance.get(creators[0])
+
+    assert mocked_get_cache.call_count == 0
+
+  def test_redis_error(self, mocker, get_search_choice_cache, get_quizzes):
+    instance = get_search_choice_cache
+    creators, _ = get_quizzes
+    mocker.patch.object(instance, 'get_version', side_effect=RedisError('error'))
+    choices = instance.get(creators[0])
+    mocker.stopall()
+
+    assert choices == instance.build(creators[0])
+
+  def test_form_uses_cached_choices(self, mocker, get_search_choice_cache, get_quizzes):
+    instance = get_search_choice_cache
+    creators, _ = get_quizzes
+    spy = mocker.spy(instance, 'build')
+    _ = forms.QuizSearchForm(user=creators[0])
+    _ = forms.QuizSearchForm(user=creators[0])
+
+    assert spy.call_count == 1
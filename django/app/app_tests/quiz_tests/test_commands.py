@@ -0,0 +1,256 @@
+import pytest
+import argparse
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError
+from django.contrib.auth import get_user_model
+from quiz import models
+from quiz.loadtest import get_percentile, LatencyRecorder, LoadTestRunner
+from quiz.indexes import g_quiz_index
+from quiz.management.commands import quiz_loadtest, rebuild_quiz_index, reconcile_quiz_counts
+from app_tests import factories
+import uuid
+
+UserModel = get_user_model()
+
+# =============
+# = Load test =
+# =============
+@pytest.mark.quiz
+@pytest.mark.parametrize([
+  'values',
+  'percent',
+  'expected',
+], [
+  ([], 50, 0),
+  ([3], 99, 3),
+  ([5, 1, 4, 2, 3], 50, 3),
+  (list(range(1, 101)), 95, 95),
+  (list(range(1, 101)), 99, 99),
+], ids=[
+  'empty',
+  'only-one-value',
+  'median',
+  'p95',
+  'p99',
+])
+def test_get_percentile(values, percent, expected):
+  assert get_percentile(values, percent) == expected
+
+@pytest.mark.quiz
+def test_latency_recorder():
+  recorder = LatencyRecorder()
+
+  for val in [0.1, 0.3, 0.2]:
+    recorder.record('getNextQuiz', val)
+  recorder.record('sendResult', 0.5)
+  summary = recorder.summarize()
+
+  assert summary['getNextQuiz'] == {'count': 3, 'p50': 0.2, 'p95': 0.3, 'p99': 0.3}
+  assert summary['sendResult']['count'] == 1
+
+@pytest.mark.quiz
+def test_add_arguments():
+  inputs = ['--rooms', '3', '--players', '4', '--rounds', '2', '--layer', 'redis', '--timeout', '5']
+  command = quiz_loadtest.Command()
+  parser = argparse.ArgumentParser()
+  command.add_arguments(parser)
+  args = parser.parse_args(inputs)
+  defaults = parser.parse_args([])
+
+  assert (args.rooms, args.players, args.rounds, args.layer, args.timeout) == (3, 4, 2, 'redis', 5)
+  assert (defaults.rooms, defaults.players, defaults.rounds, defaults.layer) == (10, 5, 3, 'memory')
+
+@pytest.mark.quiz
+@pytest.mark.parametrize([
+  'options',
+], [
+  ({'rooms': 0, 'players': 1, 'rounds': 1}, ),
+  ({'rooms': 1, 'players': 0, 'rounds': 1}, ),
+  ({'rooms': 1, 'players': 1, 'rounds': 0}, ),
+], ids=[
+  'no-rooms',
+  'no-players',
+  'no-rounds',
+])
+def test_invalid_args(options):
+  command = quiz_loadtest.Command()
+
+  with pytest.raises(CommandError) as ex:
+    command.handle(layer='memory', timeout=1, **options)
+
+  assert '--rooms, --players and --rounds must be positive integers' == str(ex.value)
+
+@pytest.mark.quiz
+@pytest.mark.django_db
+def test_setup_and_cleanup():
+  runner = LoadTestRunner(2, 3, 2)
+  runner.setup()
+  rooms = [room for room, _, _ in runner.rooms]
+  sequences = [len(room.score.sequence) for room in rooms]
+  num_members = [room.members.count() for room in rooms]
+  runner.cleanup()
+
+  assert sequences == [2, 2]
+  assert num_members == [2, 2]
+  assert not UserModel.objects.filter(email__startswith=f'{runner.prefix}-').exists()
+  assert not models.QuizRoom.objects.filter(name__startswith=runner.prefix).exists()
+  assert not models.Genre.objects.filter(name=runner.prefix).exists()
+
+@pytest.mark.quiz
+@pytest.mark.loadtest
+@pytest.mark.django_db(transaction=True)
+def test_run_load_test():
+  runner = LoadTestRunner(2, 3, 2, timeout=5)
+  runner.setup()
+
+  try:
+    report = async_to_sync(runner.execute)()
+  finally:
+    runner.cleanup()
+  commands = report['commands']
+
+  assert report['connections'] == 6
+  assert report['messages'] > 0
+  assert report['messages_per_second'] > 0
+  assert report['memory_per_connection'] > 0
+  assert commands['resetQuiz']['count'] == 2
+  assert all([commands[name]['count'] == 4 for name in ['getNextQuiz', 'receivedQuiz', 'startAnswer', 'answerQuiz', 'getAnswers', 'sendResult']])
+  assert all([0 < summary['p50'] <= summary['p95'] <= summary['p99'] for summary in commands.values()])
+
+@pytest.mark.quiz
+@pytest.mark.loadtest
+@pytest.mark.django_db(transaction=True)
+def test_loadtest_command(capsys):
+  command = quiz_loadtest.Command()
+  command.handle(rooms=1, players=2, rounds=1, layer='memory', timeout=5)
+  output = capsys.readouterr().out
+
+  assert 'rooms: 1, players: 2, rounds: 1, connections: 2' in output
+  assert 'messages/s:' in output
+  assert 'memory/connection:' in output
+  assert all([name in output for name in ['resetQuiz', 'getNextQuiz', 'sendResult']])
+
+# ==============
+# = Quiz index =
+# ==============
+@pytest.fixture
+def get_index(settings):
+  settings.QUIZ_INDEX = dict(settings.QUIZ_INDEX, prefix=f'quiz-index-test-{uuid.uuid4().hex[:8]}')
+
+  yield g_quiz_index
+
+  g_quiz_index.clear()
+
+@pytest.mark.quiz
+def test_add_arguments_of_rebuild_quiz_index():
+  command = rebuild_quiz_index.Command()
+  parser = argparse.ArgumentParser()
+  command.add_arguments(parser)
+  args = parser.parse_args(['--check', '--batch-size', '10'])
+  defaults = parser.parse_args([])
+
+  assert (args.check, args.batch_size) == (True, 10)
+  assert (defaults.check, defaults.batch_size) == (False, 1000)
+
+@pytest.mark.quiz
+@pytest.mark.django_db
+def test_rebuild_quiz_index_command(capsys, get_index):
+  index = get_index
+  quizzes = factories.QuizFactory.create_batch(3, is_completed=True)
+  command = rebuild_quiz_index.Command()
+  command.handle(check=False, batch_size=2)
+  output = capsys.readouterr().out
+  ids = index.collect(genres=[quizzes[0].genre_id])
+
+  assert f'Registered {models.Quiz.objects.filter(is_completed=True).count()} quizzes' in output
+  assert 'The index is consistent with the database' in output
+  assert str(quizzes[0].pk) in ids
+
+@pytest.mark.quiz
+@pytest.mark.django_db
+def test_setup_of_load_test_with_quiz_index(django_capture_on_commit_callbacks, get_search_choice_cache, get_index):
+  index = get_index
+  cache = get_search_choice_cache
+  index.rebuild(models.Quiz.objects.filter(is_completed=True))
+  version = cache.get_version()
+  runner = LoadTestRunner(2, 3, 2)
+
+  with django_capture_on_commit_callbacks(execute=True):
+    runner.setup()
+  rooms = [room for room, _, _ in runner.rooms]
+  sequences = [len(room.score.sequence) for room in rooms]
+  ids = index.collect(creators=[owner.pk for _, owner, _ in runner.rooms])
+  runner.cleanup()
+
+  assert index.is_ready()
+  assert sequences == [2, 2]
+  assert len(ids) == 4
+  assert cache.get_version() > version
+
+@pytest.mark.quiz
+@pytest.mark.django_db
+def test_check_quiz_index_command(capsys, get_index):
+  index = get_index
+  quiz = factories.QuizFactory(is_completed=True)
+  index.rebuild(models.Quiz.objects.filter(is_completed=True))
+  index.get_client().srem(index.get_key('genre', quiz.genre_id), str(quiz.pk))
+  command = rebuild_quiz_index.Command()
+
+  with pytest.raises(CommandError) as ex:
+    command.handle(check=True, batch_size=1000)
+  output = capsys.readouterr().out
+
+  assert f'genre:{quiz.genre_id}: missing 1, unexpected 0' in output
+  assert 'The index is inconsistent with the database (1 sets)' in str(ex.value)
+
+@pytest.mark.quiz
+def test_invalid_batch_size_of_rebuild_quiz_index():
+  command = rebuild_quiz_index.Command()
+
+  with pytest.raises(CommandError) as ex:
+    command.handle(check=False, batch_size=0)
+
+  assert '--batch-size must be a positive integer' in str(ex.value)
+
+# ========================
+# = Completed quiz count =
+# ========================
+@pytest.mark.quiz
+def test_add_arguments_of_reconcile_quiz_counts():
+  command = reconcile_quiz_counts.Command()
+  parser = argparse.ArgumentParser()
+  command.add_arguments(parser)
+
+  assert parser.parse_args(['--check']).check
+  assert not parser.parse_args([]).check
+
+@pytest.mark.quiz
+@pytest.mark.django_db
+def test_reconcile_quiz_counts_command(capsys):
+  quiz = factories.QuizFactory(is_completed=True)
+  models.Genre.objects.filter(pk=quiz.genre_id).update(completed_quiz_count=5)
+  UserModel.objects.filter(pk=quiz.creator_id).update(completed_quiz_count=0)
+  command = reconcile_quiz_counts.Command()
+  command.handle(check=False)
+  output = capsys.readouterr().out
+  genre = models.Genre.objects.get(pk=quiz.genre_id)
+  creator = UserModel.objects.get(pk=quiz.creator_id)
+
+  assert f'genre:{genre.pk}: stored 5, actual 1' in output
+  assert f'creator:{creator.pk}: stored 0, actual 1' in output
+  assert (genre.completed_quiz_count, creator.completed_quiz_count) == (1, 1)
+
+@pytest.mark.quiz
+@pytest.mark.django_db
+def test_check_quiz_counts_command(capsys):
+  quiz = factories.QuizFactory(is_completed=True)
+  models.Genre.objects.filter(pk=quiz.genre_id).update(completed_quiz_count=0)
+  command = reconcile_quiz_counts.Command()
+
+  with pytest.raises(CommandError) as ex:
+    command.handle(check=True)
+  output = capsys.readouterr().out
+
+  assert f'genre:{quiz.genre_id}: stored 0, actual 1' in output
+  assert 'The counters are inconsistent with the database' in str(ex.value)
+  assert models.Genre.objects.get(pk=quiz.genre_id).completed_quiz_count == 0
@@ -1,5 +1,9 @@
 import pytest
 import pytest_asyncio
+import asyncio
+import json
+import time
+import uuid
 from datetime import datetime
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -14,40 +18,51 @@ UserModel = get_user_model()
 class DummyBaseQuizState:
   def __init__(self, player_ids):
     self.score = None
-    self.quiz = None
+    self.questions = None
     self.players = {key: False for key in player_ids}
     self.answers = {}
-    self.current_time = None
-  def update_score(self, score):
+  async def update_score(self, score):
     self.score = score
-  def get_players(self):
+  async def get_players(self):
     return self.players
-  def update_player(self, pk, do_delete=False):
+  async def update_player(self, pk, do_delete=False):
     pass
-  def has_player(self):
+  async def has_player(self):
     return False
+  async def clear(self):
+    pass
+  async def flush_score(self, detail=None):
+    pass
   @database_sync_to_async
   def get_quiz(self, max_question):
     return 'hoge', 2
-  def update_member_status(self, pk):
+  async def update_member_status(self, pk):
     return True
-  @database_sync_to_async
-  def answering_phase(self):
+  async def answering_phase(self, time_limit=0):
     pass
-  @database_sync_to_async
-  def can_answer(self):
+  async def get_answer_deadline(self):
+    return None
+  async def can_answer(self):
     return True
-  def update_answer(self, pk, answer):
+  async def update_answer(self, pk, answer):
     pass
-  @database_sync_to_async
-  def received_all_answers_phase(self):
+  async def has_all_answers(self):
+    return False
+  async def close_answering_phase(self, started_at=None):
+    return True
+  async def received_all_answers_phase(self):
     pass
-  @database_sync_to_async
-  def get_answers(self):
+  async def get_answers(self):
     return {}, 'foo'
   @database_sync_to_async
-  def update_state(self, max_question, judgement):
+  def update_state(self, max_question, judgement, get_score_key=None):
     return {}, True
+  async def save_answer_records(self):
+    pass
+  async def next_version(self):
+    return 1
+  async def get_snapshot(self):
+    return {'version': 1, 'players': self.players, 'scores': {}}
 
 class AuthWebsocketCommunicator(WebsocketCommunicator):
   async def __new__(cls, *args, **kwargs):
@@ -224,6 +239,35 @@ class Common:
 
     return player_ids
 
+@pytest.mark.quiz
+@pytest.mark.consumer
+@pytest.mark.parametrize([
+  'use_db_executor',
+  'use_async_orm',
+], [
+  (True, True),
+  (True, False),
+  (False, True),
+  (False, False),
+], ids=[
+  'executor-and-async-orm',
+  'only-executor',
+  'only-async-orm',
+  'neither',
+])
+def test_use_async_orm(settings, use_db_executor, use_async_orm):
+  settings.QUIZ_DB_EXECUTOR = use_db_executor
+  settings.QUIZ_USE_ASYNC_ORM = use_async_orm
+
+  assert consumers.use_async_orm() == use_async_orm
+
+@pytest.mark.quiz
+@pytest.mark.consumer
+def test_default_database_access(settings):
+  del settings.QUIZ_USE_ASYNC_ORM
+
+  assert not consumers.use_async_orm()
+
 @pytest.mark.quiz
 @pytest.mark.consumer
 @pytest.mark.django_db
@@ -347,6 +391,276 @@ class TestQuizConsumer(Common):
     assert 'Join creator2 to test-consumer-room' == join_msg_member['message']
     assert 'Leave guest-owner from test-consumer-room' == leave_msg_member['message']
 
+  @pytest.mark.asyncio
+  async def test_coalesce_presence_messages(self, aget_guest, get_room_instances):
+    owner = await aget_guest()
+    _, creators, guests, room = await get_room_instances(owner)
+    comm_owner = await self.aget_communicator(room, owner)
+    comm_members = [await self.aget_communicator(room, user) for user in [creators[0], creators[2], guests[0]]]
+    _ = await comm_owner.connect()
+    _ = await comm_owner.receive_json_from()
+    # Connect and disconnect within the debounce window
+    for comm in comm_members:
+      _ = await comm.connect()
+    await comm_members[2].disconnect()
+    join_msg = await comm_owner.receive_json_from()
+    is_nothing = await comm_owner.receive_nothing(timeout=settings.QUIZ_PRESENCE_DEBOUNCE_TIME + 0.1)
+    member_msg = await comm_members[0].receive_json_from()
+    await comm_owner.disconnect()
+
+    for comm in comm_members[:2]:
+      await comm.disconnect()
+
+    assert join_msg['message'] == 'Join creator0, creator2, guest0 to test-consumer-room / Leave guest0 from test-consumer-room'
+    assert len(join_msg['players']) == 3
+    assert join_msg['players'][f'user{creators[0].pk}']
+    assert join_msg['players'][f'user{creators[2].pk}']
+    assert not join_msg['players'][f'user{guests[0].pk}']
+    assert join_msg['version'] == 2
+    assert is_nothing
+    assert member_msg == join_msg
+
+  @pytest.mark.asyncio
+  async def test_get_snapshot(self, aget_guest, get_room_instances):
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    comm_owner = await self.aget_communicator(room, owner)
+    _ = await comm_owner.connect()
+    join_msg = await comm_owner.receive_json_from()
+    await comm_owner.send_json_to({'command': 'getSnapshot'})
+    snapshot_msg = await comm_owner.receive_json_from()
+    await comm_owner.disconnect()
+
+    assert join_msg['players'] == {f'user{owner.pk}': True}
+    assert join_msg['version'] == 1
+    assert snapshot_msg['type'] == 'snapshot'
+    assert snapshot_msg['version'] == 1
+    assert snapshot_msg['players'][f'user{owner.pk}']
+    assert all([key in snapshot_msg['players'].keys() for key in await self.aget_player_ids(room)])
+    assert isinstance(snapshot_msg['scores'], dict)
+
+  @pytest.mark.asyncio
+  async def test_resume(self, aget_guest, get_room_instances):
+    @database_sync_to_async
+    def aget_question(room):
+      return models.Quiz.objects.get(pk=room.score.sequence['3']).question
+
+    owner = await aget_guest()
+    _, _, guests, room = await get_room_instances(owner)
+    question = await aget_question(room)
+    comm_guest = await self.aget_communicator(room, guests[0])
+    _ = await comm_guest.connect()
+    _ = await comm_guest.receive_json_from()
+    comm_owner = await self.aget_communicator(room, owner)
+    _ = await comm_owner.connect()
+    _ = await comm_owner.receive_json_from()
+    await comm_owner.send_json_to({'command': 'getSnapshot'})
+    snapshot_msg = await comm_owner.receive_json_from()
+    await comm_owner.disconnect()
+    # Reconnect with the token
+    comm_owner = await self.aget_communicator(room, owner)
+    _ = await comm_owner.connect()
+    _ = await comm_owner.receive_json_from()
+    await comm_owner.send_json_to({'command': 'resume', 'data': snapshot_msg['resumeToken']})
+    resume_msg = await comm_owner.receive_json_from()
+    await comm_owner.disconnect()
+    await comm_guest.disconnect()
+
+    assert resume_msg['type'] == 'resume'
+    assert resume_msg['index'] == 3
+    assert resume_msg['phase'] == 'ANSWERING'
+    assert resume_msg['question'] == question
+    assert resume_msg['players'][f'user{owner.pk}']
+    assert resume_msg['players'][f'user{guests[0].pk}']
+    assert isinstance(resume_msg['scores'], dict)
+    assert resume_msg['version'] >= snapshot_msg['version']
+    assert resume_msg['resumeToken']
+
+  @pytest.mark.parametrize([
+    'token_type',
+  ], [
+    ('invalid', ),
+    ('other-user', ),
+    ('empty', ),
+  ], ids=[
+    'invalid-token',
+    'token-of-other-user',
+    'empty-token',
+  ])
+  @pytest.mark.asyncio
+  async def test_resume_with_invalid_token(self, aget_guest, get_room_instances, token_type):
+    owner = await aget_guest()
+    _, _, guests, room = await get_room_instances(owner)
+    comm_owner = await self.aget_communicator(room, owner)
+    _ = await comm_owner.connect()
+    _ = await comm_owner.receive_json_from()
+    consumer = consumers.QuizConsumer()
+    consumer.group_name = f'quiz-{room.pk}'
+    patterns = {
+      'invalid': 'invalid-token',
+      'other-user': consumer.create_resume_token(guests[0]),
+      'empty': None,
+    }
+    await comm_owner.send_json_to({'command': 'resume', 'data': patterns[token_type]})
+    message = await comm_owner.receive_json_from()
+    await comm_owner.disconnect()
+
+    assert message['type'] == 'snapshot'
+    assert message['resumeToken']
+
+  @pytest.mark.asyncio
+  async def test_spectator_stream(self, mocker, settings, aget_guest, get_room_instances):
+    from channels.routing import URLRouter
+    from quiz.routing import websocket_urlpatterns
+
+    @database_sync_to_async
+    def aget_expected(room):
+      quiz = models.Quiz.objects.get(pk=room.score.sequence['3'])
+      names = [str(user) for user in room.members.all()] + [str(room.owner)]
+
+      return quiz, names
+
+    settings.QUIZ_PRESENCE_DEBOUNCE_TIME = 0
+    settings.QUIZ_SPECTATOR_INTERVAL = 0
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    quiz, names = await aget_expected(room)
+    comm_owner = await self.aget_communicator(room, owner)
+    _ = await comm_owner.connect()
+    _ = await comm_owner.receive_json_from()
+    # Wait for the snapshot to be published
+    await asyncio.sleep(0.2)
+    mocked_manager = mocker.patch('quiz.consumers.models.QuizRoom.objects')
+    comm_spectator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'ws/quizroom/{room.pk}/spectate/{room.get_spectator_token()}')
+    connected, _ = await comm_spectator.connect()
+    snapshot_msg = await comm_spectator.receive_json_from()
+    has_no_query = not mocked_manager.method_calls
+    mocker.stop(mocked_manager)
+    num_spectators = await consumers.g_quizstates.backend.get_num_spectators(f'quiz-{room.pk}')
+    # Commands from the spectator are ignored
+    await comm_spectator.send_json_to({'command': 'resetQuiz'})
+    is_ignored = await comm_spectator.receive_nothing()
+    await comm_owner.send_json_to({'command': 'getSnapshot'})
+    owner_msg = await comm_owner.receive_json_from()
+    await comm_spectator.disconnect()
+    await comm_owner.disconnect()
+    rest = await consumers.g_quizstates.backend.get_num_spectators(f'quiz-{room.pk}')
+
+    assert connected
+    assert (num_spectators, rest) == (1, 0)
+    assert has_no_query
+    assert is_ignored
+    assert snapshot_msg['type'] == 'spectatorSnapshot'
+    assert snapshot_msg['question'] == quiz.question
+    assert snapshot_msg['phase'] == str(models.QuizStatusType.ANSWERING.label)
+    assert snapshot_msg['index'] == 3
+    assert 'answer' not in snapshot_msg.keys()
+    assert sorted([item['name'] for item in snapshot_msg['leaderboard']]) == sorted(names)
+    assert sorted(owner_msg['players'].keys()) == sorted(await self.aget_player_ids(room) + [f'user{owner.pk}'])
+
+  @pytest.mark.parametrize([
+    'token_type',
+  ], [
+    ('invalid', ),
+    ('other-room', ),
+  ], ids=[
+    'invalid-token',
+    'token-of-other-room',
+  ])
+  @pytest.mark.asyncio
+  async def test_spectator_with_invalid_token(self, aget_guest, get_room_instances, token_type):
+    from channels.routing import URLRouter
+    from quiz.routing import websocket_urlpatterns
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    _, _, _, other = await get_room_instances(owner)
+    patterns = {
+      'invalid': 'invalid-token',
+      'other-room': other.get_spectator_token(),
+    }
+    communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'ws/quizroom/{room.pk}/spectate/{patterns[token_type]}')
+    connected, _ = await communicator.connect()
+    await communicator.disconnect()
+
+    assert not connected
+
+  @pytest.mark.benchmark
+  @pytest.mark.asyncio
+  async def test_benchmark_concurrent_rooms(self, settings, aget_guest, get_room_instances):
+    num_rooms = 5
+    num_rounds = 5
+    settings.QUIZ_PRESENCE_DEBOUNCE_TIME = 0
+    owners = [await aget_guest() for _ in range(num_rooms)]
+    rooms = [(await get_room_instances(owner))[-1] for owner in owners]
+
+    async def join(room, owner):
+      communicator = await self.aget_communicator(room, owner)
+      start = time.perf_counter()
+      _ = await communicator.connect()
+      _ = await communicator.receive_json_from()
+      elapsed_time = time.perf_counter() - start
+      await communicator.disconnect()
+
+      return elapsed_time
+
+    async def measure():
+      elapsed_times = []
+
+      for _ in range(num_rounds):
+        elapsed_times += await asyncio.gather(*[join(room, owner) for room, owner in zip(rooms, owners)])
+
+      return sorted(elapsed_times)[len(elapsed_times) // 2], max(elapsed_times)
+
+    results = {}
+    patterns = [
+      ('database_sync_to_async', False, False),
+      ('async ORM', False, True),
+      ('dedicated executor', True, False),
+    ]
+
+    for label, use_db_executor, use_async_orm in patterns:
+      settings.QUIZ_DB_EXECUTOR = use_db_executor
+      settings.QUIZ_USE_ASYNC_ORM = use_async_orm
+      results[label] = await measure()
+      median, maximum = results[label]
+      print(f'[benchmark] join {num_rooms} rooms concurrently ({label}): median {median * 1000:.3f} ms, max {maximum * 1000:.3f} ms')
+
+    assert all([median < 1 for median, _ in results.values()])
+
+  @pytest.mark.benchmark
+  @pytest.mark.parametrize([
+    'use_db_executor',
+  ], [
+    (True, ),
+    (False, ),
+  ], ids=[
+    'dedicated-executor',
+    'thread-sensitive-executor',
+  ])
+  @pytest.mark.asyncio
+  async def test_benchmark_query_with_slow_view(self, settings, aget_guest, get_room_instances, use_db_executor):
+    from asgiref.sync import sync_to_async
+    settings.QUIZ_DB_EXECUTOR = use_db_executor
+    blocking_time = 0.5
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    consumer = consumers.QuizConsumer()
+    _ = await consumer.get_room(room.pk)
+    # Emulate the slow HTTP view which occupies the thread-sensitive executor
+    slow_view = asyncio.create_task(sync_to_async(time.sleep, thread_sensitive=True)(blocking_time))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    _ = await consumer.get_room(room.pk)
+    elapsed_time = time.perf_counter() - start
+    await slow_view
+    label = 'dedicated executor' if use_db_executor else 'thread-sensitive executor'
+    print(f'[benchmark] query during the slow view ({label}): {elapsed_time * 1000:.3f} ms')
+
+    if use_db_executor:
+      assert elapsed_time < blocking_time / 2
+    else:
+      assert elapsed_time >= blocking_time / 2
+
   @pytest.mark.asyncio
   async def test_check_post_accept_and_post_disconnect(self, monkeypatch, aget_guest, get_room_instances):
     # Define test code
@@ -357,12 +671,12 @@ class TestQuizConsumer(Common):
       return accepted_states.get(name)
     def set_callback(name, instance):
       accepted_states[name] = instance
-    def del_callback(name):
+    def release_callback(name):
       disconnected_states[name] = accepted_states[name]
 
     monkeypatch.setattr('quiz.consumers.g_quizstates.get_state', get_callback)
     monkeypatch.setattr('quiz.consumers.g_quizstates.set_state', set_callback)
-    monkeypatch.setattr('quiz.consumers.g_quizstates.del_state', del_callback)
+    monkeypatch.setattr('quiz.consumers.g_quizstates.release', release_callback)
     owner = await aget_guest()
     _, _, _, room = await get_room_instances(owner)
     communicator = await self.aget_communicator(room, owner)
@@ -378,6 +692,196 @@ class TestQuizConsumer(Common):
     assert isinstance(disconnected_states[key], consumers.QuizState)
     assert id(accepted_states[key]) == id(disconnected_states[key])
 
+  @pytest.mark.parametrize([
+    'user_type',
+    'expected',
+  ], [
+    ('owner', {'is_owner': True, 'is_assigned': True, 'max_question': 4, 'answer_time_limit': 0, 'judgement_type': 1}),
+    ('member', {'is_owner': False, 'is_assigned': True, 'max_question': 4, 'answer_time_limit': 0, 'judgement_type': 1}),
+    ('non-member', {'is_owner': False, 'is_assigned': False, 'max_question': 4, 'answer_time_limit': 0, 'judgement_type': 1}),
+  ], ids=lambda xs: str(xs))
+  @pytest.mark.parametrize([
+    'use_db_executor',
+    'use_async_orm',
+  ], [
+    (True, False),
+    (False, True),
+    (False, False),
+  ], ids=[
+    'dedicated-executor',
+    'async-orm',
+    'compatibility-mode',
+  ])
+  @pytest.mark.asyncio
+  async def test_get_capabilities(self, settings, aget_guest, get_room_instances, user_type, expected, use_db_executor, use_async_orm):
+    settings.QUIZ_DB_EXECUTOR = use_db_executor
+    settings.QUIZ_USE_ASYNC_ORM = use_async_orm
+    owner = await aget_guest()
+    _, creators, _, room = await get_room_instances(owner)
+    users = {'owner': owner, 'member': creators[2], 'non-member': creators[1]}
+    consumer = consumers.QuizConsumer()
+    consumer.room = room
+    # Call target method
+    capabilities = await consumer.get_capabilities(users[user_type])
+    consumer.capabilities = capabilities
+
+    assert capabilities == expected
+    assert consumer.is_owner() == expected['is_owner']
+    assert consumer.get_max_question() == expected['max_question']
+    assert not consumer.is_auto_judge()
+
+  @pytest.mark.asyncio
+  async def test_room_updated(self, aget_guest, get_room_instances):
+    @database_sync_to_async
+    def aupdate_room(room, user):
+      room.members.remove(user)
+      room.max_question = 2
+      room.save()
+      room.reset()
+      consumers.notify_room_updated(room.pk)
+
+    owner = await aget_guest()
+    _, creators, _, room = await get_room_instances(owner)
+    owner_socket = await self.aget_communicator(room, owner)
+    member_socket = await self.aget_communicator(room, creators[2])
+    key = f'quiz-{room.pk}'
+    _ = await owner_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.receive_json_from()
+    # Update room and notify it
+    await aupdate_room(room, creators[2])
+    closed_event = await member_socket.receive_output()
+    await owner_socket.receive_nothing()
+    target = consumers.g_quizstates.get_state(key)
+    fields = await target.backend.get_fields(key, 'status', 'index')
+    await owner_socket.disconnect()
+    await member_socket.disconnect()
+
+    assert closed_event['type'] == 'websocket.close'
+    assert fields == {'status': models.QuizStatusType.START.value, 'index': 1}
+    assert len(target.questions) == 2
+
+  @pytest.mark.asyncio
+  async def test_room_updated_while_idle(self, aget_guest, get_room_instances):
+    @database_sync_to_async
+    def aupdate_room(room):
+      room.reset()
+      consumers.notify_room_updated(room.pk)
+
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    key = f'quiz-{room.pk}'
+    communicator = await self.aget_communicator(room, owner)
+    _ = await communicator.connect()
+    _ = await communicator.receive_json_from()
+    await communicator.disconnect()
+    # Update room while nobody joins it
+    await aupdate_room(room)
+    exists = await consumers.g_quizstates.backend.exists(key)
+    communicator = await self.aget_communicator(room, owner)
+    _ = await communicator.connect()
+    _ = await communicator.receive_json_from()
+    fields = await consumers.g_quizstates.backend.get_fields(key, 'status', 'index')
+    await communicator.disconnect()
+
+    assert not exists
+    assert fields == {'status': models.QuizStatusType.START.value, 'index': 1}
+
+  @pytest.mark.asyncio
+  async def test_flush_score_when_last_player_leaves(self, aget_guest, get_room_instances):
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    communicator = await self.aget_communicator(room, owner)
+    key = f'quiz-{room.pk}'
+    _ = await communicator.connect()
+    _ = await communicator.receive_json_from()
+    target = consumers.g_quizstates.get_state(key)
+    await target.backend.update_fields(key, status=models.QuizStatusType.JUDGING, index=2)
+    await communicator.disconnect()
+    score = await self.aget_score(room)
+
+    assert await self.aget_score_status(score) == models.QuizStatusType.JUDGING.value
+    assert await self.aget_score_index(score) == 2
+    assert consumers.g_quizstates.get_state(key) is target
+    assert key in consumers.g_quizstates.released_at.keys()
+
+  @pytest.mark.asyncio
+  async def test_reuse_state_after_reconnection(self, mocker, aget_guest, get_room_instances):
+    from quiz.metrics import QuizMetrics
+    metrics = QuizMetrics()
+    mocker.patch('quiz.consumers.g_metrics', metrics)
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    key = f'quiz-{room.pk}'
+    communicator = await self.aget_communicator(room, owner)
+    _ = await communicator.connect()
+    _ = await communicator.receive_json_from()
+    target = consumers.g_quizstates.get_state(key)
+    await communicator.disconnect()
+    # Reconnect within the grace period
+    spy_score = mocker.spy(consumers.QuizConsumer, 'get_score')
+    communicator = await self.aget_communicator(room, owner)
+    _ = await communicator.connect()
+    _ = await communicator.receive_json_from()
+    is_same = consumers.g_quizstates.get_state(key) is target
+    is_active = key not in consumers.g_quizstates.released_at.keys()
+    await communicator.disconnect()
+
+    assert is_same
+    assert is_active
+    assert spy_score.call_count == 0
+    assert metrics.state_cache_hits.get() == 1
+    assert metrics.state_cache_misses.get() == 1
+
+  @pytest.mark.asyncio
+  async def test_evict_state_after_grace_period(self, mocker, aget_guest, get_room_instances):
+    from quiz.metrics import QuizMetrics
+    metrics = QuizMetrics()
+    mocker.patch('quiz.consumers.g_metrics', metrics)
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    key = f'quiz-{room.pk}'
+    communicator = await self.aget_communicator(room, owner)
+    _ = await communicator.connect()
+    _ = await communicator.receive_json_from()
+    await communicator.disconnect()
+    ttl = consumers.g_quizstates.get_ttl()
+    # Call target method
+    await consumers.g_quizstates.sweep(now=time.monotonic() + ttl - 1)
+    is_kept = consumers.g_quizstates.get_state(key) is not None
+    await consumers.g_quizstates.sweep(now=time.monotonic() + ttl)
+
+    assert is_kept
+    assert consumers.g_quizstates.get_state(key) is None
+    assert not await consumers.g_quizstates.backend.exists(key)
+    assert metrics.state_cache_evictions.get(reason='expired') >= 1
+
+  @pytest.mark.asyncio
+  async def test_disconnect_after_stale_eviction(self, aget_guest, get_room_instances):
+    owner = await aget_guest()
+    _, creators, _, room = await get_room_instances(owner)
+    key = f'quiz-{room.pk}'
+    comm_owner = await self.aget_communicator(room, owner)
+    _ = await comm_owner.connect()
+    _ = await comm_owner.receive_json_from()
+    comm_member = await self.aget_communicator(room, creators[2])
+    _ = await comm_member.connect()
+    _ = await comm_member.receive_json_from()
+    # The cached state is evicted while the players are connected
+    await consumers.g_quizstates.evict(key, 'stale')
+    is_evicted = consumers.g_quizstates.get_state(key) is None
+    await comm_member.disconnect()
+    players = await consumers.g_quizstates.backend.get_players(key)
+    await comm_owner.disconnect()
+    rest = await consumers.g_quizstates.backend.get_players(key)
+
+    assert is_evicted
+    assert players[f'user{creators[2].pk}'] is False
+    assert players[f'user{owner.pk}'] is True
+    assert not any(rest.values())
+
   @pytest.mark.asyncio
   async def test_send_group_message_exception(self, mock_logger_and_now_method, aget_guest, get_room_instances):
     logger, mocker = mock_logger_and_now_method
@@ -385,10 +889,11 @@ class TestQuizConsumer(Common):
     _, _, _, room = await get_room_instances(user)
     communicator = await self.aget_communicator(room, user)
     err_msg = f'[quiz-{room.pk}]Send group message: Invalid'
-    mocker.patch('quiz.consumers.QuizConsumer.send_json', side_effect=Exception('Invalid'))
+    mocker.patch('quiz.consumers.QuizConsumer.send', side_effect=Exception('Invalid'))
     # Call connect and disconnect method
     _ = await communicator.connect()
-    is_no_data = await communicator.receive_nothing()
+    # Wait for the debounce window of the join message
+    is_no_data = await communicator.receive_nothing(timeout=settings.QUIZ_PRESENCE_DEBOUNCE_TIME + 0.5)
     await communicator.disconnect()
     message = logger.return_value.message
 
@@ -410,6 +915,47 @@ class TestQuizConsumer(Common):
 
     assert err_msg in message
 
+  @pytest.mark.asyncio
+  async def test_command_metrics(self, mocker, aget_guest, get_room_instances):
+    from quiz.metrics import QuizMetrics
+    metrics = QuizMetrics()
+    mocker.patch('quiz.consumers.g_metrics', metrics)
+    user = await aget_guest()
+    _, _, _, room = await get_room_instances(user)
+    communicator = await self.aget_communicator(room, user)
+    name = f'quiz-{room.pk}'
+    # Send messages
+    _ = await communicator.connect()
+    _ = await communicator.receive_json_from()
+    connections = metrics.active_connections.get()
+    await communicator.send_json_to({'command': 'getSnapshot'})
+    _ = await communicator.receive_json_from()
+    await communicator.send_json_to({'command': 'hoge'})
+    _ = await communicator.receive_nothing()
+    commands = metrics.commands.get(command='getSnapshot', room=name)
+    errors = metrics.errors.get(command='unknown', room=name)
+    latency = metrics.latency.get_count(command='getSnapshot', room=name)
+    group_send = metrics.group_send_latency.get_count(msg_type='system')
+    await communicator.disconnect()
+
+    assert connections == 1
+    assert commands == 1
+    assert errors == 1
+    assert latency == 1
+    assert group_send == 1
+    assert metrics.active_connections.get() == 0
+    assert metrics.commands.get(command='getSnapshot', room=name) == 1
+    # The series of the room are removed when the state is evicted
+    await consumers.g_quizstates.evict(name, 'expired')
+
+    assert metrics.commands.get(command='getSnapshot', room=name) == 0
+    assert metrics.state_cache_evictions.get(reason='expired') == 1
+
+  def test_command_table(self):
+    consumer = consumers.QuizConsumer()
+
+    assert all([callable(getattr(consumer, name)) for name in consumers.QuizConsumer.command_table.values()])
+
   @pytest_asyncio.fixture(params=['is-owner', 'is-not-owner'])
   async def common_process(self, aget_guest, get_room_instances, request):
     is_owner = ('is-owner' == request.param)
@@ -511,7 +1057,7 @@ class TestQuizConsumer(Common):
     player_ids = await self.aget_player_ids(room)
 
     class DummyQStat(DummyBaseQuizState):
-      def update_member_status(self, pk):
+      async def update_member_status(self, pk):
         return is_completed
 
     def get_callback(name):
@@ -588,11 +1134,11 @@ class TestQuizConsumer(Common):
     player_ids = await self.aget_player_ids(room)
 
     class DummyQStat(DummyBaseQuizState):
-      @database_sync_to_async
-      def can_answer(self):
+      async def update_answer(self, pk, data):
+        if can_answer:
+          self.answers = {pk: data}
+
         return can_answer
-      def update_answer(self, pk, data):
-        self.answers = {pk: data}
     # Define test instance
     instance = DummyQStat(player_ids)
     # Define callbacks
@@ -627,46 +1173,308 @@ class TestQuizConsumer(Common):
     assert callback(instance.answers.values())
 
   @pytest.mark.asyncio
-  async def test_stop_answer_method(self, monkeypatch, common_process):
-    is_owner, owner_socket, member_socket, room = common_process
+  async def test_answer_quiz_closes_answering_phase(self, monkeypatch, aget_guest, get_room_instances):
+    owner = await aget_guest()
+    _, creators, _, room = await get_room_instances(owner)
     player_ids = await self.aget_player_ids(room)
 
-    def get_callback(name):
-      return DummyBaseQuizState(player_ids)
-    def del_callback(name):
-      pass
-
-    # Define test code
-    monkeypatch.setattr('quiz.consumers.g_quizstates.get_state', get_callback)
-    monkeypatch.setattr('quiz.consumers.g_quizstates.del_state', del_callback)
-    data = {'command': 'stopAnswer'}
-    # Call stop_answer method
-    if is_owner:
-      await owner_socket.send_json_to(data)
-      owner_msg = await owner_socket.receive_json_from()
-      member_msg = await member_socket.receive_json_from()
-      pairs = {
-        'type': 'stoppedAnswering',
-        'message': 'Responses have ended. No more responses will be accepted.',
-      }
-      callback = lambda msg: all([msg[key] == val for key, val in pairs.items()])
-    else:
-      await member_socket.send_json_to(data)
-      owner_msg = await owner_socket.receive_nothing()
-      member_msg = await member_socket.receive_nothing()
-      callback = lambda msg: msg
+    class DummyQStat(DummyBaseQuizState):
+      async def update_answer(self, pk, data):
+        return True
+      async def has_all_answers(self):
+        return True
+    instance = DummyQStat(player_ids)
+    owner_socket = await self.aget_communicator(room, owner)
+    member_socket = await self.aget_communicator(room, creators[2])
+    _ = await owner_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.receive_json_from()
+    monkeypatch.setattr('quiz.consumers.g_quizstates.get_state', lambda name: instance)
+    monkeypatch.setattr('quiz.consumers.g_quizstates.del_state', lambda name: None)
+    # Send answer
+    await member_socket.send_json_to({'command': 'answerQuiz', 'data': 'member-foobar'})
+    owner_msg = await owner_socket.receive_json_from()
+    member_msg = await member_socket.receive_json_from()
+    await owner_socket.disconnect()
+    await member_socket.disconnect()
 
-    assert callback(owner_msg)
-    assert callback(member_msg)
+    assert owner_msg['type'] == 'stoppedAnswering'
+    assert member_msg['type'] == 'stoppedAnswering'
 
+  @pytest.mark.parametrize([
+    'answer_time_limit',
+    'is_closed',
+  ], [
+    (1, True),
+    (0, False),
+  ], ids=[
+    'time-limit-is-set',
+    'no-time-limit',
+  ])
   @pytest.mark.asyncio
-  async def test_get_answers_method(self, monkeypatch, common_process):
-    is_owner, owner_socket, member_socket, room = common_process
-    player_ids = await self.aget_player_ids(room)
+  async def test_answer_deadline(self, aget_guest, get_room_instances, answer_time_limit, is_closed):
+    @database_sync_to_async
+    def aset_time_limit(room):
+      room.answer_time_limit = answer_time_limit
+      room.save()
 
-    class DummyQStat(DummyBaseQuizState):
-      @database_sync_to_async
-      def get_answers(self):
+    owner = await aget_guest()
+    _, creators, _, room = await get_room_instances(owner)
+    await aset_time_limit(room)
+    key = f'quiz-{room.pk}'
+    owner_socket = await self.aget_communicator(room, owner)
+    member_socket = await self.aget_communicator(room, creators[2])
+    _ = await owner_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.receive_json_from()
+    # Start answering phase
+    await owner_socket.send_json_to({'command': 'startAnswer'})
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.receive_json_from()
+    # Wait for the deadline
+    if is_closed:
+      owner_msg = await owner_socket.receive_json_from(timeout=answer_time_limit + 1)
+      member_msg = await member_socket.receive_json_from(timeout=answer_time_limit + 1)
+      callback = lambda msg: msg['type'] == 'stoppedAnswering'
+    else:
+      owner_msg = await owner_socket.receive_nothing(timeout=1.5)
+      member_msg = await member_socket.receive_nothing()
+      callback = lambda msg: msg
+    target = consumers.g_quizstates.get_state(key)
+    fields = await target.backend.get_fields(key, 'status')
+    await owner_socket.disconnect()
+    await member_socket.disconnect()
+    exact_status = models.QuizStatusType.RECEIVED_ANSWERS if is_closed else models.QuizStatusType.ANSWERING
+
+    assert callback(owner_msg)
+    assert callback(member_msg)
+    assert fields['status'] == exact_status.value
+
+  @pytest.mark.asyncio
+  async def test_stop_answer_after_deadline(self, aget_guest, get_room_instances):
+    @database_sync_to_async
+    def aset_time_limit(room):
+      room.answer_time_limit = 1
+      room.save()
+
+    owner = await aget_guest()
+    _, creators, _, room = await get_room_instances(owner)
+    await aset_time_limit(room)
+    owner_socket = await self.aget_communicator(room, owner)
+    member_socket = await self.aget_communicator(room, creators[2])
+    _ = await owner_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.receive_json_from()
+    await owner_socket.send_json_to({'command': 'startAnswer'})
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.receive_json_from()
+    # The phase is closed by the deadline
+    owner_msg = await owner_socket.receive_json_from(timeout=2)
+    _ = await member_socket.receive_json_from(timeout=2)
+    # The manual stop after the deadline is ignored
+    await owner_socket.send_json_to({'command': 'stopAnswer'})
+    is_nothing = await owner_socket.receive_nothing()
+    is_member_nothing = await member_socket.receive_nothing()
+    await owner_socket.disconnect()
+    await member_socket.disconnect()
+
+    assert owner_msg['type'] == 'stoppedAnswering'
+    assert is_nothing
+    assert is_member_nothing
+
+  @pytest.mark.parametrize([
+    'is_armed',
+  ], [
+    (True, ),
+    (False, ),
+  ], ids=[
+    'timer-is-running',
+    'no-timer',
+  ])
+  @pytest.mark.asyncio
+  async def test_hand_over_answer_timer_at_disconnect(self, mocker, is_armed):
+    instance = consumers.QuizConsumer()
+    instance.scope = {'user': factories.UserFactory.build(pk=1)}
+    instance.group_name = 'quiz-test'
+    instance.channel_name = 'channel-test'
+    instance.channel_layer = mocker.AsyncMock()
+    mocker.patch.object(instance, 'close', new_callable=mocker.AsyncMock)
+    mocker.patch.object(instance, 'post_disconnect', new_callable=mocker.AsyncMock)
+    timer = asyncio.create_task(asyncio.sleep(10)) if is_armed else None
+    instance.answer_timer = timer
+    await instance.disconnect(1000)
+    await asyncio.sleep(0)
+    calls = instance.channel_layer.group_send.await_args_list
+
+    assert instance.answer_timer is None
+    assert timer is None or timer.cancelled()
+    assert calls == ([mocker.call('quiz-test', {'type': 'rearm_answer_timer'})] if is_armed else [])
+
+  @pytest.mark.asyncio
+  async def test_answer_deadline_after_owner_leaves(self, aget_guest, get_room_instances):
+    @database_sync_to_async
+    def aset_time_limit(room):
+      room.answer_time_limit = 1
+      room.save()
+
+    owner = await aget_guest()
+    _, creators, _, room = await get_room_instances(owner)
+    await aset_time_limit(room)
+    key = f'quiz-{room.pk}'
+    owner_socket = await self.aget_communicator(room, owner)
+    member_socket = await self.aget_communicator(room, creators[2])
+    _ = await owner_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.receive_json_from()
+    await owner_socket.send_json_to({'command': 'startAnswer'})
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.receive_json_from()
+    # The owner leaves the room before the deadline
+    await owner_socket.disconnect()
+    messages = [await member_socket.receive_json_from(timeout=2) for _ in range(2)]
+    fields = await consumers.g_quizstates.backend.get_fields(key, 'status')
+    await member_socket.disconnect()
+
+    assert sorted([message['type'] for message in messages]) == ['stoppedAnswering', 'system']
+    assert fields['status'] == models.QuizStatusType.RECEIVED_ANSWERS.value
+
+  @pytest.mark.asyncio
+  async def test_answer_deadline_after_reconnection(self, aget_guest, get_room_instances):
+    @database_sync_to_async
+    def aset_time_limit(room):
+      room.answer_time_limit = 1
+      room.save()
+
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    await aset_time_limit(room)
+    owner_socket = await self.aget_communicator(room, owner)
+    _ = await owner_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    await owner_socket.send_json_to({'command': 'startAnswer'})
+    _ = await owner_socket.receive_json_from()
+    # Nobody stays in the room, but the deadline is kept in the shared state
+    await owner_socket.disconnect()
+    owner_socket = await self.aget_communicator(room, owner)
+    _ = await owner_socket.connect()
+    messages = [await owner_socket.receive_json_from(timeout=2) for _ in range(2)]
+    await owner_socket.disconnect()
+
+    assert sorted([message['type'] for message in messages]) == ['stoppedAnswering', 'system']
+
+  @pytest.mark.parametrize([
+    'judgement_type',
+    'expected_points',
+  ], [
+    (models.JudgementType.AUTO, 1),
+    (models.JudgementType.TIME_WEIGHTED, 10),
+  ], ids=[
+    'auto',
+    'time-weighted',
+  ])
+  @pytest.mark.asyncio
+  async def test_auto_judge(self, settings, aget_guest, get_room_instances, judgement_type, expected_points):
+    @database_sync_to_async
+    def aset_judgement_type(room):
+      room.judgement_type = judgement_type
+      room.save()
+
+    settings.QUIZ_TIME_WEIGHTED_MAX_POINTS = 10
+    settings.QUIZ_TIME_WEIGHTED_REFERENCE_TIME = 30
+    owner = await aget_guest()
+    _, creators, _, room = await get_room_instances(owner)
+    await aset_judgement_type(room)
+    key = f'quiz-{room.pk}'
+    member = creators[2]
+    owner_socket = await self.aget_communicator(room, owner)
+    member_socket = await self.aget_communicator(room, member)
+    _ = await owner_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.connect()
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.receive_json_from()
+    target = consumers.g_quizstates.get_state(key)
+    _, _, correct_answer, _ = await target._get_quiz_data(3)
+    # Start answering phase and send the correct answer
+    await owner_socket.send_json_to({'command': 'startAnswer'})
+    _ = await owner_socket.receive_json_from()
+    _ = await member_socket.receive_json_from()
+    await member_socket.send_json_to({'command': 'answerQuiz', 'data': correct_answer.upper()})
+    await owner_socket.send_json_to({'command': 'stopAnswer'})
+    owner_msgs = [await owner_socket.receive_json_from() for _ in range(3)]
+    member_msgs = [await member_socket.receive_json_from() for _ in range(3)]
+    # The answers are judged only once
+    await owner_socket.send_json_to({'command': 'stopAnswer'})
+    await owner_socket.send_json_to({'command': 'sendResult', 'data': {str(owner.pk): 1}})
+    is_nothing = await owner_socket.receive_nothing()
+    fields = await target.backend.get_fields(key, 'status', 'index')
+    score = await self.aget_score(room)
+    detail = await self.aget_score_detail(score)
+    await owner_socket.disconnect()
+    await member_socket.disconnect()
+
+    for msgs in [owner_msgs, member_msgs]:
+      stopped_msg, answers_msg, result_msg = msgs
+      assert stopped_msg['type'] == 'stoppedAnswering'
+      assert answers_msg['type'] == 'sentAnswers'
+      assert answers_msg['correctAnswer'] == correct_answer
+      assert answers_msg['data'][f'user{member.pk}']['answer'] == correct_answer.upper()
+      assert result_msg['type'] == 'shareResult'
+      assert result_msg['data'][str(member.pk)] == expected_points
+      assert str(owner.pk) not in result_msg['data'].keys()
+      assert not result_msg['isEnded']
+    assert is_nothing
+    assert fields == {'status': models.QuizStatusType.WAITING.value, 'index': 4}
+    assert int(detail[str(member.pk)]) == expected_points
+
+  @pytest.mark.asyncio
+  async def test_stop_answer_method(self, monkeypatch, common_process):
+    is_owner, owner_socket, member_socket, room = common_process
+    player_ids = await self.aget_player_ids(room)
+
+    def get_callback(name):
+      return DummyBaseQuizState(player_ids)
+    def del_callback(name):
+      pass
+
+    # Define test code
+    monkeypatch.setattr('quiz.consumers.g_quizstates.get_state', get_callback)
+    monkeypatch.setattr('quiz.consumers.g_quizstates.del_state', del_callback)
+    data = {'command': 'stopAnswer'}
+    # Call stop_answer method
+    if is_owner:
+      await owner_socket.send_json_to(data)
+      owner_msg = await owner_socket.receive_json_from()
+      member_msg = await member_socket.receive_json_from()
+      pairs = {
+        'type': 'stoppedAnswering',
+        'message': 'Responses have ended. No more responses will be accepted.',
+      }
+      callback = lambda msg: all([msg[key] == val for key, val in pairs.items()])
+    else:
+      await member_socket.send_json_to(data)
+      owner_msg = await owner_socket.receive_nothing()
+      member_msg = await member_socket.receive_nothing()
+      callback = lambda msg: msg
+
+    assert callback(owner_msg)
+    assert callback(member_msg)
+
+  @pytest.mark.asyncio
+  async def test_get_answers_method(self, monkeypatch, common_process):
+    is_owner, owner_socket, member_socket, room = common_process
+    player_ids = await self.aget_player_ids(room)
+
+    class DummyQStat(DummyBaseQuizState):
+      async def get_answers(self):
         answers = {
           'owner': 'foo-bar-owner',
           'member': 'hogehoge-member',
@@ -724,7 +1532,7 @@ class TestQuizConsumer(Common):
 
     class DummyQStat(DummyBaseQuizState):
       @database_sync_to_async
-      def update_state(self, max_question, judgement):
+      def update_state(self, max_question, judgement, get_score_key=None):
         if is_ended:
           self.score.index = 5
           self.score.status = models.QuizStatusType.END
@@ -735,7 +1543,7 @@ class TestQuizConsumer(Common):
 
     def get_callback(name):
       instance = DummyQStat(player_ids)
-      instance.update_score(room.score)
+      instance.score = room.score
 
       return instance
 
@@ -745,7 +1553,7 @@ class TestQuizConsumer(Common):
     # Define test code
     monkeypatch.setattr('quiz.consumers.g_quizstates.get_state', get_callback)
     monkeypatch.setattr('quiz.consumers.g_quizstates.del_state', del_callback)
-    data = {'command': 'sendResult', 'data': {}}
+    data = {'command': 'sendResult', 'data': {'owner': 1, 'member': 2}}
     # Call send_result method
     if is_owner:
       await owner_socket.send_json_to(data)
@@ -768,6 +1576,7 @@ class TestQuizConsumer(Common):
           msg['data']['member'] == 2,
           msg['isEnded'] == is_ended,
           msg['message'] == message,
+          msg['version'] == 1,
         ])
 
         return ret
@@ -790,70 +1599,209 @@ class TestQuizConsumer(Common):
 @pytest.mark.consumer
 @pytest.mark.django_db
 class TestQuizState(Common):
+  @pytest_asyncio.fixture
+  async def get_instance(self):
+    from quiz.backends import InMemoryStateBackend
+    backend = InMemoryStateBackend()
+    instance = consumers.QuizState('quiz-test', backend)
+    await backend.create_room('quiz-test', ['foo', 'bar'], {'status': models.QuizStatusType.START, 'index': 1})
+
+    return instance
+
   @pytest.mark.asyncio
-  async def test_update_score(self, aget_guest, get_room_instances):
-    from copy import deepcopy
+  async def test_setup(self, aget_guest, get_room_instances):
+    from quiz.backends import InMemoryStateBackend
     owner = await aget_guest()
     _, _, _, room = await get_room_instances(owner)
     player_ids = await self.aget_player_ids(room)
-    instance = consumers.QuizState(player_ids)
-    default_score = deepcopy(instance.score)
+    backend = InMemoryStateBackend()
+    instance = consumers.QuizState('quiz-test', backend)
+    score = await self.aget_score(room)
     # Call target method
-    instance.update_score(await self.aget_score(room))
-    updated_score = deepcopy(instance.score)
+    await instance.setup(player_ids, score)
+    fields = await backend.get_fields('quiz-test')
+    players = await backend.get_players('quiz-test')
+    _sequence = await self.aget_score_sequence(score)
+
+    assert instance.score is score
+    assert len(instance.questions) == len(_sequence)
+    assert [item[0] for item in instance.questions] == [_sequence[str(idx + 1)] for idx in range(len(_sequence))]
+    assert fields['questions'] == instance.questions
+    assert await instance.exists()
+    assert fields['index'] == 3
+    assert fields['status'] == models.QuizStatusType.ANSWERING.value
+    assert fields['version'] == 0
+    assert fields['detail'] == score.detail
+    assert all([players[key] is False for key in player_ids])
+
+  @pytest.mark.asyncio
+  async def test_setup_with_existing_room(self, mocker, aget_guest, get_room_instances, get_instance):
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    player_ids = await self.aget_player_ids(room)
     score = await self.aget_score(room)
+    instance = get_instance
+    await instance.backend.update_fields(instance.name, questions=[['abc', 'hoge', 'foo']])
+    mocked_manager = mocker.patch('quiz.consumers.models.Quiz.objects')
+    # Call target method
+    await instance.setup(player_ids, score)
+    fields = await instance.backend.get_fields(instance.name)
 
-    assert default_score is None
-    assert await self.aget_score_index(score) == 3
-    assert await self.aget_score_status(score) == models.QuizStatusType.ANSWERING.value
-    assert instance.quiz is None
+    assert not mocked_manager.method_calls
+    assert instance.questions is None
+    assert fields['questions'] == [['abc', 'hoge', 'foo']]
+    assert fields['index'] == 1
+
+  @pytest.mark.asyncio
+  async def test_preload_questions(self, mocker, aget_guest, get_room_instances, get_instance):
+    @database_sync_to_async
+    def adelete_quiz(pk):
+      models.Quiz.objects.filter(pk=pk).delete()
+
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    instance = get_instance
+    instance.score = await self.aget_score(room)
+    _sequence = await self.aget_score_sequence(instance.score)
+    await adelete_quiz(_sequence['2'])
+    expected = []
+
+    for idx in range(1, len(_sequence) + 1):
+      if idx == 2:
+        # The deleted quiz keeps its position
+        expected += [[None, '', '', []]]
+        continue
+      quiz = await database_sync_to_async(models.Quiz.objects.get)(pk=_sequence[str(idx)])
+      expected += [[str(quiz.pk), quiz.question, quiz.answer, quiz.normalized_answers]]
+    # Call target method
+    spy = mocker.spy(models.Quiz.objects, 'filter')
+    questions = await instance._preload_questions()
+
+    assert questions == expected
+    assert spy.call_count == 1
+
+  @pytest.mark.asyncio
+  async def test_play_with_deleted_quiz(self, aget_guest, get_room_instances, get_instance):
+    @database_sync_to_async
+    def adelete_quiz(pk):
+      models.Quiz.objects.filter(pk=pk).delete()
+
+    @database_sync_to_async
+    def aget_quiz_ids(room):
+      return list(room.answer_records.all().values_list('quiz_id', flat=True))
+
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    instance = get_instance
+    instance.score = await self.aget_score(room)
+    _sequence = await self.aget_score_sequence(instance.score)
+    max_question = len(_sequence)
+    await adelete_quiz(_sequence['2'])
+    questions = await instance._preload_questions()
+    await instance.backend.update_fields(instance.name, index=2, run=str(instance.score.run), questions=questions)
+    # The deleted quiz is notified instead of the question
+    sentence, index = await instance.get_quiz(max_question)
+    _, correct_answer = await instance.get_answers()
+    await instance.backend.reset_answers(instance.name, {str(owner.pk): {'answer': 'foo', 'time': 1.0}})
+    _, is_ended = await instance.update_state(max_question, {str(owner.pk): 0})
+    await instance.save_answer_records()
+    records = await aget_quiz_ids(room)
+    # The last quiz is asked and the game is ended
+    await instance.backend.update_fields(instance.name, index=max_question)
+    last_sentence, last_index = await instance.get_quiz(max_question)
+    _, last_answer = await instance.get_answers()
+    await instance.backend.reset_answers(instance.name, {str(owner.pk): {'answer': last_answer, 'time': 1.0}})
+    _, is_last_ended = await instance.update_state(max_question, {str(owner.pk): 1})
+    await instance.save_answer_records()
+    fields = await instance.backend.get_fields(instance.name, 'status')
+    last_records = await aget_quiz_ids(room)
+
+    assert (index, correct_answer, is_ended) == (2, '', False)
+    assert sentence == 'This quiz has been deleted.'
+    assert records == [None]
+    assert last_index == max_question
+    assert last_sentence == questions[max_question - 1][1]
+    assert is_last_ended
+    assert fields['status'] == models.QuizStatusType.END.value
+    assert set(last_records) == {None, uuid.UUID(_sequence[str(max_question)])}
+
+  @pytest.mark.asyncio
+  async def test_clear(self, get_instance):
+    instance = get_instance
+    await instance.clear()
+
+    assert not await instance.exists()
+
+  @pytest.mark.asyncio
+  async def test_update_score(self, aget_guest, get_room_instances, get_instance):
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    instance = get_instance
+    instance.questions = [['abc', 'hoge', 'foo']]
+    await instance.backend.add_answer(instance.name, 'foo', None)
+    # Call target method
+    await instance.update_score(await self.aget_score(room))
+    fields = await instance.backend.get_fields(instance.name)
+    answers = await instance.backend.get_answers(instance.name)
+
+    assert await self.aget_score_index(instance.score) == 3
+    assert fields['index'] == 3
+    assert fields['status'] == models.QuizStatusType.ANSWERING.value
+    assert fields['detail'] == instance.score.detail
+    assert fields['questions'] == instance.questions
+    assert len(instance.questions) == len(await self.aget_score_sequence(instance.score))
+    assert len(answers) == 0
 
   @pytest.mark.parametrize([
     'inputs',
     'expected',
   ], [
-    ({}, {'hoge': False, 'foo': False}),
-    ({'hoge': True}, {'hoge': True, 'foo': False}),
-    ({'foo': True}, {'hoge': False, 'foo': True}),
-    ({'hoge': True, 'foo': True}, {'hoge': True, 'foo': True}),
+    ({}, {'foo': False, 'bar': False}),
+    ({'foo': True}, {'foo': True, 'bar': False}),
+    ({'bar': True}, {'foo': False, 'bar': True}),
+    ({'foo': True, 'bar': True}, {'foo': True, 'bar': True}),
   ], ids=[
     'update-nothing',
-    'update-hoge',
     'update-foo',
+    'update-bar',
     'update-both',
   ])
-  def test_get_players(self, inputs, expected):
-    instance = consumers.QuizState(['hoge', 'foo'])
+  @pytest.mark.asyncio
+  async def test_get_players(self, get_instance, inputs, expected):
+    instance = get_instance
     # Update status
     for key, val in inputs.items():
-      instance.players[key] = val
+      await instance.backend.update_player(instance.name, key, val)
     # Call target method
-    players = instance.get_players()
+    players = await instance.get_players()
 
     assert len(players) == len(expected)
     assert all([players[key] == val for key, val in expected.items()])
 
   @pytest.mark.parametrize([
-    'do_delete',  # Define whether 'foo' key is deleted or not
-    'inputs',     # Define whether 'foo' key exists or not
+    'do_delete',  # Define whether 'bar' key is deleted or not
+    'inputs',     # Define whether 'bar' key exists or not
     'expected',
   ], [
-    (True,  {'hoge':  True, 'foo':  True}, {'hoge':  True, 'foo': False}),
-    (True,  {'hoge': False, 'foo': False}, {'hoge': False, 'foo': False}),
-    (False, {'hoge':  True, 'foo': False}, {'hoge':  True, 'foo':  True}),
-    (False, {'hoge': False, 'foo':  True}, {'hoge': False, 'foo':  True}),
+    (True,  {'foo':  True, 'bar':  True}, {'foo':  True, 'bar': False}),
+    (True,  {'foo': False, 'bar': False}, {'foo': False, 'bar': False}),
+    (False, {'foo':  True, 'bar': False}, {'foo':  True, 'bar':  True}),
+    (False, {'foo': False, 'bar':  True}, {'foo': False, 'bar':  True}),
   ], ids=[
     'deleted-pattern',
     'no-existing-pattern',
     'override-pattern',
     'insert-pattern',
   ])
-  def test_update_player(self, do_delete, inputs, expected):
-    instance = consumers.QuizState(['hoge', 'foo'])
-    instance.players = inputs
+  @pytest.mark.asyncio
+  async def test_update_player(self, get_instance, do_delete, inputs, expected):
+    instance = get_instance
+
+    for key, val in inputs.items():
+      await instance.backend.update_player(instance.name, key, val)
     # Call target method
-    instance.update_player('foo', do_delete=do_delete)
-    output = dict(instance.players)
+    await instance.update_player('bar', do_delete=do_delete)
+    output = await instance.get_players()
 
     assert len(output) == len(expected)
     assert all([output[key] == val for key, val in expected.items()])
@@ -862,19 +1810,22 @@ class TestQuizState(Common):
     'inputs',
     'expected',
   ], [
-    ({'hoge': True, 'foo': True}, True),
-    ({'hoge': True, 'foo': False}, True),
-    ({'hoge': False, 'foo': False}, False),
+    ({'foo': True, 'bar': True}, True),
+    ({'foo': True, 'bar': False}, True),
+    ({'foo': False, 'bar': False}, False),
   ], ids=[
     'both-players-exist',
-    'only-hoge-player-exists',
+    'only-foo-player-exists',
     'no-player-exists',
   ])
-  def test_has_player(self, inputs, expected):
-    instance = consumers.QuizState(['hoge', 'foo'])
-    instance.players = inputs
+  @pytest.mark.asyncio
+  async def test_has_player(self, get_instance, inputs, expected):
+    instance = get_instance
+
+    for key, val in inputs.items():
+      await instance.backend.update_player(instance.name, key, val)
     # Call target method
-    output = instance.has_player()
+    output = await instance.has_player()
 
     assert output == expected
 
@@ -889,7 +1840,9 @@ class TestQuizState(Common):
     'index-is-less-than-max-question',
   ])
   @pytest.mark.asyncio
-  async def test_get_quiz(self, aget_guest, get_room_instances, max_question, exact_idx):
+  async def test_get_quiz(self, mocker, aget_guest, get_room_instances, max_question, exact_idx):
+    from quiz.backends import InMemoryStateBackend
+
     @database_sync_to_async
     def aget_question(quiz):
       return quiz.question
@@ -897,66 +1850,257 @@ class TestQuizState(Common):
     owner = await aget_guest()
     _, _, _, room = await get_room_instances(owner)
     player_ids = await self.aget_player_ids(room)
-    instance = consumers.QuizState(player_ids)
-    instance.score = await self.aget_score(room)
-    # Call target method
-    sentence, index = await instance.get_quiz(max_question)
+    instance = consumers.QuizState('quiz-test', InMemoryStateBackend())
+    await instance.setup(player_ids, await self.aget_score(room))
+    await instance.backend.add_answer(instance.name, player_ids[0], None)
     _sequence = await self.aget_score_sequence(instance.score)
     pk = _sequence[str(exact_idx)]
     exact_quiz = await database_sync_to_async(models.Quiz.objects.get)(pk=pk)
     expected_sentence = await aget_question(exact_quiz)
+    mocked_manager = mocker.patch('quiz.consumers.models.Quiz.objects')
+    # Call target method
+    sentence, index = await instance.get_quiz(max_question)
+    mocker.stopall()
     score = await self.aget_score(room)
+    fields = await instance.backend.get_fields(instance.name)
+    answers = await instance.backend.get_answers(instance.name)
 
+    assert not mocked_manager.method_calls
     assert sentence == expected_sentence
     assert index == exact_idx
-    assert await self.aget_score_status(score) == models.QuizStatusType.SENT_QUESTION.value
-    assert await self.aget_score_index(score) == exact_idx
-    assert str(instance.quiz.pk) == pk
-    assert len(instance.answers) == 0
+    assert await self.aget_score_status(score) == models.QuizStatusType.ANSWERING.value
+    assert await self.aget_score_index(score) == 3
+    assert fields['status'] == models.QuizStatusType.SENT_QUESTION.value
+    assert fields['index'] == exact_idx
+    assert len(answers) == 0
+
+  @pytest.mark.parametrize([
+    'operation',
+  ], [
+    ('edit', ),
+    ('delete', ),
+  ], ids=lambda xs: str(xs))
+  @pytest.mark.asyncio
+  async def test_get_quiz_after_modifying_quiz(self, aget_guest, get_room_instances, operation):
+    from quiz.backends import InMemoryStateBackend
+
+    @database_sync_to_async
+    def amodify_quiz(pk):
+      queryset = models.Quiz.objects.filter(pk=pk)
+
+      if operation == 'edit':
+        queryset.update(question='edited-question', answer='edited-answer')
+      else:
+        queryset.delete()
+
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    player_ids = await self.aget_player_ids(room)
+    backend = InMemoryStateBackend()
+    instance = consumers.QuizState('quiz-test', backend)
+    await instance.setup(player_ids, await self.aget_score(room))
+    expected_pk, expected_question, expected_answer, _ = instance.questions[0]
+    await amodify_quiz(expected_pk)
+    # Another worker loads questions from the shared state
+    other = consumers.QuizState('quiz-test', backend)
+    await other.setup(player_ids, await self.aget_score(room))
+    await backend.update_fields('quiz-test', index=1)
+    sentence, index = await other.get_quiz(5)
+    _, correct_answer = await other.get_answers()
+
+    assert index == 1
+    assert sentence == expected_question
+    assert correct_answer == expected_answer
+
+  @pytest.mark.parametrize([
+    'detail',
+    'expected_detail',
+  ], [
+    (None, {}),
+    ({'foo': 1, 'bar': 2}, {'foo': 1, 'bar': 2}),
+  ], ids=[
+    'without-detail',
+    'with-detail',
+  ])
+  @pytest.mark.asyncio
+  async def test_flush_score(self, aget_guest, get_room_instances, get_instance, detail, expected_detail):
+    @database_sync_to_async
+    def aset_detail(score):
+      score.detail = {}
+      score.save()
+
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    instance = get_instance
+    instance.score = await self.aget_score(room)
+    await aset_detail(instance.score)
+    instance.flushed_at = 0
+    await instance.backend.update_fields(instance.name, status=models.QuizStatusType.JUDGING, index=2)
+    # Call target method
+    await instance.flush_score(detail=detail)
+    score = await self.aget_score(room)
+
+    assert await self.aget_score_status(score) == models.QuizStatusType.JUDGING.value
+    assert await self.aget_score_index(score) == 2
+    assert await self.aget_score_detail(score) == expected_detail
+    assert instance.flushed_at > 0
+
+  @pytest.mark.parametrize([
+    'flush_interval',
+    'expected',
+  ], [
+    (0, True),
+    (60, False),
+  ], ids=[
+    'interval-has-passed',
+    'interval-has-not-passed',
+  ])
+  @pytest.mark.asyncio
+  async def test_flush_score_if_needed(self, aget_guest, get_room_instances, flush_interval, expected):
+    from quiz.backends import InMemoryStateBackend
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    player_ids = await self.aget_player_ids(room)
+    instance = consumers.QuizState('quiz-test', InMemoryStateBackend(), flush_interval=flush_interval)
+    await instance.setup(player_ids, await self.aget_score(room))
+    # Call target method
+    await instance.received_all_answers_phase()
+    score = await self.aget_score(room)
+    status = await self.aget_score_status(score)
+
+    assert (status == models.QuizStatusType.RECEIVED_ANSWERS.value) == expected
+
+  def test_default_flush_interval(self, settings):
+    settings.QUIZ_SCORE_FLUSH_INTERVAL = 12
+    instance = consumers.QuizState('quiz-test', None)
+
+    assert instance.flush_interval == 12
 
   @pytest.mark.parametrize([
-    'members',
     'answered',
     'expected',
   ], [
-    (['foo', 'bar'], ['foo'], False),
-    (['foo', 'bar'], ['foo', 'bar'], True),
+    (['foo'], False),
+    (['foo', 'bar'], True),
   ], ids=[
     'is-not-completed',
     'is-completed',
   ])
-  def test_update_member_status(self, members, answered, expected):
-    instance = consumers.QuizState(['foo', 'bar'])
-    instance.answers = {}
-    instance.players = {key: True for key in members}
+  @pytest.mark.asyncio
+  async def test_update_member_status(self, get_instance, answered, expected):
+    instance = get_instance
 
     for pk in answered:
-      is_completed = instance.update_member_status(pk)
+      is_completed = await instance.update_member_status(pk)
+    answers = await instance.backend.get_answers(instance.name)
 
-    assert len(instance.answers) == len(answered)
+    assert len(answers) == len(answered)
     assert is_completed == expected
-    assert all([val is None for val in instance.answers.values()])
+    assert all([val is None for val in answers.values()])
 
   @pytest.mark.asyncio
-  async def test_answering_phase(self, mocker, aget_guest, get_room_instances):
+  async def test_answering_phase(self, mocker, aget_guest, get_room_instances, get_instance):
     dummy_time = datetime(2021,12,3,5,14,56)
-    _format = '%Y-%m-%d %H:%M:%S'
     mocker.patch('quiz.consumers.get_current_time', return_value=dummy_time)
     owner = await aget_guest()
     _, _, _, room = await get_room_instances(owner)
-    inputs = {'foo': None, 'bar': None}
-    instance = consumers.QuizState(['foo', 'bar'])
-    instance.players = dict(inputs)
+    instance = get_instance
     instance.score = await self.aget_score(room)
+    await instance.backend.add_answer(instance.name, 'foo', None)
     # Call target method
-    await instance.answering_phase()
-    score = await self.aget_score(room)
-    status = await self.aget_score_status(score)
+    started_at = await instance.answering_phase()
+    fields = await instance.backend.get_fields(instance.name)
+    answers = await instance.backend.get_answers(instance.name)
 
-    assert status == models.QuizStatusType.ANSWERING.value
-    assert instance.current_time.strftime(_format) == dummy_time.strftime(_format)
-    assert len(instance.answers) == len(inputs)
-    assert all([all([key in inputs.keys(), item['answer'] == '', item['time'] == 0]) for key, item in instance.answers.items()])
+    assert started_at == dummy_time.timestamp()
+    assert fields['status'] == models.QuizStatusType.ANSWERING.value
+    assert fields['current_time'] == dummy_time.timestamp()
+    assert fields['deadline_at'] == 0
+    assert len(answers) == 0
+
+  @pytest.mark.parametrize([
+    'time_limit',
+    'status',
+    'has_deadline',
+  ], [
+    (10, models.QuizStatusType.ANSWERING, True),
+    (0, models.QuizStatusType.ANSWERING, False),
+    (10, models.QuizStatusType.RECEIVED_ANSWERS, False),
+  ], ids=[
+    'answering-with-time-limit',
+    'answering-without-time-limit',
+    'closed-answering',
+  ])
+  @pytest.mark.asyncio
+  async def test_get_answer_deadline(self, mocker, aget_guest, get_room_instances, get_instance, time_limit, status, has_deadline):
+    dummy_time = datetime(2021,12,3,5,14,56)
+    mocker.patch('quiz.consumers.get_current_time', return_value=dummy_time)
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    instance = get_instance
+    instance.score = await self.aget_score(room)
+    started_at = await instance.answering_phase(time_limit)
+    await instance.backend.update_fields(instance.name, status=status)
+    deadline = await instance.get_answer_deadline()
+    expected = (started_at, started_at + time_limit) if has_deadline else None
+
+    assert deadline == expected
+
+  @pytest.mark.parametrize([
+    'players',
+    'answered',
+    'expected',
+  ], [
+    ({'foo': True, 'bar': True}, ['foo', 'bar'], True),
+    ({'foo': True, 'bar': True}, ['foo'], False),
+    ({'foo': True, 'bar': False}, ['foo'], True),
+    ({'foo': False, 'bar': False}, [], False),
+  ], ids=[
+    'all-players-answered',
+    'one-player-has-not-answered',
+    'absent-player-is-ignored',
+    'no-player-in-room',
+  ])
+  @pytest.mark.asyncio
+  async def test_has_all_answers(self, get_instance, players, answered, expected):
+    instance = get_instance
+
+    for key, val in players.items():
+      await instance.backend.update_player(instance.name, key, val)
+    for key in answered:
+      await instance.backend.add_answer(instance.name, key, {'answer': 'hoge', 'time': 1.0})
+    # Call target method
+    output = await instance.has_all_answers()
+
+    assert output == expected
+
+  @pytest.mark.parametrize([
+    'status',
+    'started_at',
+    'expected',
+  ], [
+    (models.QuizStatusType.ANSWERING, None, True),
+    (models.QuizStatusType.ANSWERING, 123.0, True),
+    (models.QuizStatusType.ANSWERING, 456.0, False),
+    (models.QuizStatusType.RECEIVED_ANSWERS, None, False),
+  ], ids=[
+    'close-without-start-time',
+    'close-with-same-start-time',
+    'another-answering-phase-has-started',
+    'phase-has-already-been-closed',
+  ])
+  @pytest.mark.asyncio
+  async def test_close_answering_phase(self, get_instance, status, started_at, expected):
+    instance = get_instance
+    await instance.backend.update_fields(instance.name, status=status, current_time=123.0)
+    # Call target method
+    is_closed = await instance.close_answering_phase(started_at)
+    second_call = await instance.close_answering_phase(started_at)
+    fields = await instance.backend.get_fields(instance.name, 'status')
+
+    assert is_closed == expected
+    assert not second_call
+    assert (fields['status'] == models.QuizStatusType.RECEIVED_ANSWERS.value) == (expected or status == models.QuizStatusType.RECEIVED_ANSWERS)
 
   @pytest.mark.parametrize([
     'status',
@@ -979,55 +2123,70 @@ class TestQuizState(Common):
     'end-phase',
   ])
   @pytest.mark.asyncio
-  async def test_can_answer(self, aget_guest, get_room_instances, status, is_valid):
-    @database_sync_to_async
-    def aset_score_status(score, status):
-      score.status = status
-      score.save()
-    # Define test code
-    owner = await aget_guest()
-    _, _, _, room = await get_room_instances(owner)
-    inputs = {'foo': None, 'bar': None}
-    instance = consumers.QuizState(['foo', 'bar'])
-    score = await self.aget_score(room)
-    await aset_score_status(score, status)
-    instance.score = await self.aget_score(room)
+  async def test_can_answer(self, get_instance, status, is_valid):
+    instance = get_instance
+    await instance.backend.update_fields(instance.name, status=status)
     # Call target method
     output = await instance.can_answer()
 
     assert output == is_valid
 
-  def test_update_answer(self, mocker):
-    _format = '%Y-%m-%d %H:%M:%S'
-    mocker.patch('quiz.consumers.get_current_time', side_effect=[datetime(2021,12,3,5,14,45), datetime(2021,12,3,5,14,53), datetime(2021,12,3,5,14,57)])
-    instance = consumers.QuizState(['foo', 'bar'])
-    instance.current_time = datetime(2021,12,3,5,14,50)
+  @pytest.mark.parametrize([
+    'status',
+    'expected',
+  ], [
+    (models.QuizStatusType.ANSWERING, True),
+    (models.QuizStatusType.RECEIVED_ANSWERS, False),
+  ], ids=[
+    'answering-phase',
+    'answers-are-closed',
+  ])
+  @pytest.mark.asyncio
+  async def test_update_answer(self, mocker, get_instance, status, expected):
+    mocker.patch('quiz.consumers.get_current_time', side_effect=[datetime(2021,12,3,5,14,53), datetime(2021,12,3,5,14,57)])
+    instance = get_instance
+    await instance.backend.update_fields(instance.name, status=status, current_time=datetime(2021,12,3,5,14,50).timestamp())
     # Call target method
-    instance.update_answer('foo', 'hoge')
-    instance.update_answer('bar', 'hogehoge')
-    foo_answer = instance.answers['foo']
-    bar_answer = instance.answers['bar']
-
-    assert foo_answer['answer'] == 'hoge'
-    assert bar_answer['answer'] == 'hogehoge'
-    assert int(foo_answer['time']) == 3
-    assert int(bar_answer['time']) == 7
+    foo_result = await instance.update_answer('foo', 'hoge')
+    bar_result = await instance.update_answer('bar', 'hogehoge')
+    answers = await instance.backend.get_answers(instance.name)
+
+    assert foo_result == expected
+    assert bar_result == expected
+
+    if expected:
+      assert answers['foo']['answer'] == 'hoge'
+      assert answers['bar']['answer'] == 'hogehoge'
+      assert int(answers['foo']['time']) == 3
+      assert int(answers['bar']['time']) == 7
+    else:
+      assert len(answers) == 0
 
   @pytest.mark.asyncio
-  async def test_received_all_answers_phase(self, aget_guest, get_room_instances):
+  async def test_received_all_answers_phase(self, aget_guest, get_room_instances, get_instance):
     owner = await aget_guest()
     _, _, _, room = await get_room_instances(owner)
-    player_ids = await self.aget_player_ids(room)
-    instance = consumers.QuizState(player_ids)
+    instance = get_instance
     instance.score = await self.aget_score(room)
     # Call target method
     await instance.received_all_answers_phase()
     score = await self.aget_score(room)
+    fields = await instance.backend.get_fields(instance.name)
 
-    assert await self.aget_score_status(score) == models.QuizStatusType.RECEIVED_ANSWERS.value
+    assert await self.aget_score_status(score) == models.QuizStatusType.ANSWERING.value
+    assert fields['status'] == models.QuizStatusType.RECEIVED_ANSWERS.value
 
+  @pytest.mark.parametrize([
+    'has_cache',
+  ], [
+    (True, ),
+    (False, ),
+  ], ids=[
+    'quiz-is-cached',
+    'quiz-is-loaded-from-shared-state',
+  ])
   @pytest.mark.asyncio
-  async def test_get_answers(self, aget_guest, get_room_instances):
+  async def test_get_answers(self, mocker, aget_guest, get_room_instances, get_instance, has_cache):
     @database_sync_to_async
     def _aget_answer(quiz):
       return quiz.answer
@@ -1044,21 +2203,72 @@ class TestQuizState(Common):
         'time': 5.0,
       }
     }
-    instance = consumers.QuizState(['foo', 'bar'])
-    instance.answers = dict(inputs)
+    instance = get_instance
+    await instance.backend.reset_answers(instance.name, inputs)
+    await instance.backend.update_player(instance.name, 'hoge', False)
     instance.score = await self.aget_score(room)
     _sequence = await self.aget_score_sequence(instance.score)
-    instance.quiz = await database_sync_to_async(models.Quiz.objects.get)(pk=_sequence['1'])
+    quiz = await database_sync_to_async(models.Quiz.objects.get)(pk=_sequence['1'])
+    questions = [[str(quiz.pk), 'question', await _aget_answer(quiz), []]]
+    await instance.backend.update_fields(instance.name, index=1, questions=questions)
+    instance.questions = questions if has_cache else None
+    mocked_manager = mocker.patch('quiz.consumers.models.Quiz.objects')
     # Call target method
     player_answers, correct_answer = await instance.get_answers()
+    mocker.stopall()
     score = await self.aget_score(room)
     foo_answer = player_answers['foo']
     bar_answer = player_answers['bar']
 
-    assert await self.aget_score_status(score) == models.QuizStatusType.JUDGING.value
+    assert not mocked_manager.method_calls
+    assert await self.aget_score_status(score) == models.QuizStatusType.ANSWERING.value
     assert all([foo_answer['answer'] == 'hoge123', abs(foo_answer['time'] - 3) < 1e-5])
     assert all([bar_answer['answer'] == 'hogehoge-321', abs(bar_answer['time'] - 5) < 1e-5])
-    assert correct_answer == await _aget_answer(instance.quiz)
+    assert player_answers['hoge'] == {'answer': '', 'time': 0}
+    assert correct_answer == await _aget_answer(quiz)
+
+  @pytest.mark.parametrize([
+    'status',
+    'kwargs',
+    'expected',
+  ], [
+    (models.QuizStatusType.RECEIVED_ANSWERS, {}, {'foo': 1, 'bar': 0, 'hoge': 0}),
+    (models.QuizStatusType.RECEIVED_ANSWERS, {'max_points': 10, 'reference_time': 10}, {'foo': 7, 'bar': 0, 'hoge': 0}),
+    (models.QuizStatusType.ANSWERING, {}, None),
+    (models.QuizStatusType.JUDGING, {}, None),
+  ], ids=[
+    'fixed-points',
+    'time-weighted-points',
+    'answering-phase-is-not-closed',
+    'answers-have-already-been-judged',
+  ])
+  @pytest.mark.asyncio
+  async def test_judge_answers(self, mocker, get_instance, status, kwargs, expected):
+    instance = get_instance
+    inputs = {
+      'foo': {'answer': 'ＦＯＯ ', 'time': 3.0},
+      'bar': {'answer': 'bar', 'time': 1.0},
+    }
+    await instance.backend.reset_answers(instance.name, inputs)
+    await instance.backend.update_player(instance.name, 'hoge', True)
+    await instance.backend.update_fields(instance.name, status=status, index=1, questions=[['abc', 'question', 'Foo', ['foo']]])
+    instance.score = models.Score(index=1)
+    mocked_manager = mocker.patch('quiz.consumers.models.Quiz.objects')
+    # Call target method
+    output = await instance.judge_answers(**kwargs)
+    fields = await instance.backend.get_fields(instance.name, 'status')
+    exact_status = models.QuizStatusType.JUDGING if expected is not None else status
+
+    assert not mocked_manager.method_calls
+    assert fields['status'] == exact_status.value
+
+    if expected is None:
+      assert output is None
+    else:
+      player_answers, correct_answer, judgement = output
+      assert player_answers['hoge'] == {'answer': '', 'time': 0}
+      assert correct_answer == 'Foo'
+      assert judgement == expected
 
   @pytest.fixture(params=['first-question', 'second-question', 'last-question'])
   def get_quiz_status_patterns(self, request):
@@ -1104,7 +2314,7 @@ class TestQuizState(Common):
     return data, judgement, expected, max_question
 
   @pytest.mark.asyncio
-  async def test_update_state(self, aget_guest, get_room_instances, get_quiz_status_patterns):
+  async def test_update_state(self, aget_guest, get_room_instances, get_quiz_status_patterns, get_instance):
     @database_sync_to_async
     def aset_score(score, data):
       score.index = data['index']
@@ -1115,28 +2325,415 @@ class TestQuizState(Common):
     _, _, _, room = await get_room_instances(owner)
     data, judgement, expected, max_question = get_quiz_status_patterns
     await aset_score(await self.aget_score(room), data)
-    instance = consumers.QuizState(['foo', 'bar'])
+    instance = get_instance
+    await instance.backend.update_fields(instance.name, index=data['index'])
     instance.score = await self.aget_score(room)
-    instance.quiz = 3
     # Call target method
     detail, is_ended = await instance.update_state(max_question, judgement)
     score = await self.aget_score(room)
     db_detail = await self.aget_score_detail(score)
+    fields = await instance.backend.get_fields(instance.name)
 
     assert is_ended == expected['is_ended']
-    assert instance.quiz is None
     assert all([detail[key] == val for key, val in expected['output'].items()])
     assert all([str(db_detail[key]) == str(val) for key, val in expected['output'].items()])
     assert await self.aget_score_status(score) == expected['status']
     assert await self.aget_score_index(score) == expected['index']
+    assert fields['status'] == expected['status']
+    assert fields['index'] == expected['index']
+    assert all([fields['detail'][key] == val for key, val in expected['output'].items()])
+
+  @pytest.mark.asyncio
+  async def test_update_state_with_shared_detail(self, aget_guest, get_room_instances, get_instance):
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    instance = get_instance
+    instance.score = await self.aget_score(room)
+    # The detail updated by the other worker is stored in the backend
+    await instance.backend.update_fields(instance.name, index=1, detail={'foo': 5, 'bar': 1})
+    # Call target method
+    detail, _ = await instance.update_state(10, {'foo': 1, 'bar': 0})
+    fields = await instance.backend.get_fields(instance.name)
+
+    assert detail == {'foo': 6, 'bar': 1}
+    assert fields['detail'] == {'foo': 6, 'bar': 1}
+
+  @pytest.mark.asyncio
+  async def test_update_state_saves_answer_records(self, mocker, aget_guest, get_room_instances, get_instance):
+    @database_sync_to_async
+    def aget_records(room):
+      records = room.answer_records.all().order_by('answer').values('run', 'index', 'quiz_id', 'player_id', 'answer', 'elapsed_time', 'points')
+
+      return list(records)
+
+    owner = await aget_guest()
+    _, _, guests, room = await get_room_instances(owner)
+    instance = get_instance
+    instance.score = await self.aget_score(room)
+    questions = await instance._preload_questions()
+    await instance.backend.update_fields(instance.name, index=2, run=str(instance.score.run), questions=questions)
+    await instance.backend.reset_answers(instance.name, {
+      f'user{owner.pk}': {'answer': 'foo', 'time': 1.5},
+      f'user{guests[0].pk}': {'answer': 'bar', 'time': 3.0},
+      f'user{guests[1].pk}': None,
+    })
+    judgement = {str(owner.pk): 2, str(guests[0].pk): 0}
+    # Call target method
+    spy = mocker.spy(models.AnswerRecord.objects, 'bulk_create')
+    await instance.update_state(4, judgement, get_score_key=lambda key: key.removeprefix('user'))
+    pending = spy.call_count
+    await instance.save_answer_records()
+    records = await aget_records(room)
+
+    assert pending == 0
+    assert spy.call_count == 1
+    assert instance.answer_records == []
+    assert records == [
+      {'run': instance.score.run, 'index': 2, 'quiz_id': uuid.UUID(questions[1][0]), 'player_id': guests[0].pk, 'answer': 'bar', 'elapsed_time': 3.0, 'points': 0},
+      {'run': instance.score.run, 'index': 2, 'quiz_id': uuid.UUID(questions[1][0]), 'player_id': owner.pk, 'answer': 'foo', 'elapsed_time': 1.5, 'points': 2},
+    ]
+
+  @pytest.mark.asyncio
+  async def test_update_state_without_answers(self, mocker, aget_guest, get_room_instances, get_instance):
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    instance = get_instance
+    instance.score = await self.aget_score(room)
+    # Call target method
+    spy = mocker.spy(models.AnswerRecord.objects, 'bulk_create')
+    await instance.update_state(4, {})
+    await instance.save_answer_records()
+
+    assert spy.call_count == 0
+
+  @pytest.mark.asyncio
+  async def test_update_state_after_deleting_references(self, aget_guest, get_room_instances, get_instance):
+    @database_sync_to_async
+    def adelete_references(quiz_id, player):
+      models.Quiz.objects.filter(pk=quiz_id).delete()
+      player.delete()
+
+    @database_sync_to_async
+    def aget_records(room):
+      return list(room.answer_records.all().values('quiz_id', 'player_id', 'answer'))
+
+    owner = await aget_guest()
+    _, _, guests, room = await get_room_instances(owner)
+    instance = get_instance
+    instance.score = await self.aget_score(room)
+    questions = await instance._preload_questions()
+    await instance.backend.update_fields(instance.name, index=2, run=str(instance.score.run), questions=questions, detail={'foo': 0, 'bar': 0, str(owner.pk): 0, str(guests[0].pk): 0})
+    await instance.backend.reset_answers(instance.name, {
+      f'user{owner.pk}': {'answer': 'foo', 'time': 1.5},
+      f'user{guests[0].pk}': {'answer': 'bar', 'time': 3.0},
+    })
+    await instance.backend.update_fields(instance.name, status=models.QuizStatusType.RECEIVED_ANSWERS)
+    _, _, judgement = await instance.judge_answers()
+    judgement = dict([(key.removeprefix('user'), val) for key, val in judgement.items()])
+    # The quiz and the player are deleted between the judgement and the update
+    await adelete_references(questions[1][0], guests[0])
+    detail, is_ended = await instance.update_state(4, judgement, get_score_key=lambda key: key.removeprefix('user'))
+    score = await self.aget_score(room)
+    fields = await instance.backend.get_fields(instance.name, 'status', 'index')
+    await instance.save_answer_records()
+    records = await aget_records(room)
+
+    assert not is_ended
+    assert fields == {'status': models.QuizStatusType.WAITING.value, 'index': 3}
+    assert await self.aget_score_status(score) == models.QuizStatusType.WAITING
+    assert await self.aget_score_index(score) == 3
+    assert await self.aget_score_detail(score) == detail
+    assert records == [{'quiz_id': None, 'player_id': owner.pk, 'answer': 'foo'}]
+
+  @pytest.mark.asyncio
+  async def test_next_version(self, get_instance):
+    instance = get_instance
+    versions = [await instance.next_version() for _ in range(3)]
+
+    assert versions == [1, 2, 3]
+
+  @pytest.mark.asyncio
+  async def test_get_snapshot(self, aget_guest, get_room_instances, get_instance):
+    owner = await aget_guest()
+    _, _, _, room = await get_room_instances(owner)
+    instance = get_instance
+    instance.score = await self.aget_score(room)
+    await instance.backend.update_fields(instance.name, detail={'foo': 2, 'bar': 3})
+    await instance.update_player('foo')
+    _ = await instance.next_version()
+    # Call target method
+    snapshot = await instance.get_snapshot()
+
+    assert snapshot['version'] == 1
+    assert snapshot['players'] == {'foo': True, 'bar': False}
+    assert snapshot['scores'] == {'foo': 2, 'bar': 3}
+
+  @pytest.mark.asyncio
+  async def test_get_resume_snapshot(self, get_instance):
+    instance = get_instance
+    await instance.backend.update_fields(
+      instance.name,
+      status=models.QuizStatusType.ANSWERING,
+      index=2,
+      version=4,
+      detail={'foo': 2, 'bar': 3},
+      questions=[['10', 'question1', 'answer1', []], ['11', 'question2', 'answer2', []]],
+    )
+    await instance.update_player('foo')
+    # Call target method
+    snapshot = await instance.get_resume_snapshot()
+
+    assert snapshot == {
+      'version': 4,
+      'index': 2,
+      'phase': 'ANSWERING',
+      'question': 'question2',
+      'players': {'foo': True, 'bar': False},
+      'scores': {'foo': 2, 'bar': 3},
+    }
+
+  @pytest.mark.parametrize([
+    'status',
+    'expected',
+  ], [
+    (models.QuizStatusType.START, ''),
+    (models.QuizStatusType.WAITING, ''),
+    (models.QuizStatusType.SENT_QUESTION, 'question2'),
+    (models.QuizStatusType.ANSWERING, 'question2'),
+    (models.QuizStatusType.RECEIVED_ANSWERS, 'question2'),
+    (models.QuizStatusType.JUDGING, 'question2'),
+    (models.QuizStatusType.END, ''),
+  ], ids=lambda val: str(val))
+  @pytest.mark.asyncio
+  async def test_get_spectator_snapshot(self, get_instance, status, expected):
+    instance = get_instance
+    await instance.backend.update_fields(
+      instance.name,
+      status=status,
+      index=2,
+      detail={'1': 2, '2': 5, '3': 2},
+      names={'1': 'hoge', '2': 'foo', '3': 'bar'},
+      questions=[['10', 'question1', 'answer1', []], ['11', 'question2', 'answer2', []]],
+    )
+    # Call target method
+    snapshot = await instance.get_spectator_snapshot()
+
+    assert snapshot['question'] == expected
+    assert snapshot['phase'] == str(status.label)
+    assert snapshot['index'] == 2
+    assert snapshot['leaderboard'] == [
+      {'name': 'foo', 'score': 5},
+      {'name': 'bar', 'score': 2},
+      {'name': 'hoge', 'score': 2},
+    ]
+    assert 'answer2' not in json.dumps(snapshot)
+
+@pytest.mark.quiz
+@pytest.mark.consumer
+class TestPresenceAggregator:
+  @pytest.fixture
+  def get_callback(self):
+    events = []
+
+    async def callback(joined, left):
+      events.append((joined, left))
+
+    return events, callback
+
+  def test_default_delay(self, settings):
+    settings.QUIZ_PRESENCE_DEBOUNCE_TIME = 0.15
+    aggregator = consumers.PresenceAggregator()
+
+    assert aggregator.get_delay() == 0.15
+    assert consumers.PresenceAggregator(delay=0.25).get_delay() == 0.25
+
+  @pytest.mark.asyncio
+  async def test_add_event(self, get_callback):
+    events, callback = get_callback
+    aggregator = consumers.PresenceAggregator(delay=0.05)
+    await aggregator.add_event('quiz-test', 'foo', True, callback)
+    await aggregator.add_event('quiz-test', 'bar', True, callback)
+    await aggregator.add_event('quiz-test', 'foo', False, callback)
+    await aggregator.add_event('quiz-other', 'hoge', True, callback)
+    is_pending = len(events) == 0
+    await asyncio.sleep(0.2)
+
+    assert is_pending
+    assert len(events) == 2
+    assert (['foo', 'bar'], ['foo']) in events
+    assert (['hoge'], []) in events
+    assert not aggregator.pending
+
+  @pytest.mark.asyncio
+  async def test_add_event_without_delay(self, get_callback):
+    events, callback = get_callback
+    aggregator = consumers.PresenceAggregator(delay=0)
+    await aggregator.add_event('quiz-test', 'foo', True, callback)
+
+    assert events == [(['foo'], [])]
+    assert not aggregator.pending
+
+  @pytest.mark.asyncio
+  async def test_discard(self, get_callback):
+    events, callback = get_callback
+    aggregator = consumers.PresenceAggregator(delay=0.05)
+    await aggregator.add_event('quiz-test', 'foo', True, callback)
+    aggregator.discard('quiz-test')
+    aggregator.discard('quiz-unknown')
+    await asyncio.sleep(0.1)
+
+    assert len(events) == 0
+    assert not aggregator.pending
+
+@pytest.mark.quiz
+@pytest.mark.consumer
+class TestSpectatorSnapshot:
+  @pytest.mark.parametrize([
+    'num_spectators',
+    'call_count',
+  ], [
+    (0, 0),
+    (2, 1),
+  ], ids=[
+    'without-spectators',
+    'with-spectators',
+  ])
+  @pytest.mark.asyncio
+  async def test_publish_spectator_snapshot(self, mocker, num_spectators, call_count):
+    from quiz.backends import InMemoryStateBackend
+    backend = InMemoryStateBackend()
+    target = consumers.QuizState('quiz-test', backend)
+    await backend.create_room(target.name, ['foo'], {'status': models.QuizStatusType.START, 'index': 1})
+    await backend.update_spectators(target.name, num_spectators)
+    instance = consumers.QuizConsumer()
+    instance.group_name = target.name
+    instance.channel_layer = mocker.AsyncMock()
+    spy = mocker.spy(target, 'get_spectator_snapshot')
+    await instance.publish_spectator_snapshot(target)
+
+    assert spy.call_count == call_count
+    assert instance.channel_layer.group_send.await_count == call_count
+    assert all([call.args[0] == 'quiz-test-spectators' for call in instance.channel_layer.group_send.await_args_list])
+
+@pytest.mark.quiz
+@pytest.mark.consumer
+class TestResumeToken:
+  @pytest.fixture
+  def get_consumer(self):
+    instance = consumers.QuizConsumer()
+    instance.group_name = 'quiz-test'
+
+    return instance
+
+  def test_valid_token(self, get_consumer):
+    user = factories.UserFactory.build(pk=1)
+    instance = get_consumer
+    token = instance.create_resume_token(user)
+
+    assert instance.is_valid_resume_token(token, user)
+
+  @pytest.mark.parametrize([
+    'group_name',
+    'pk',
+    'max_age',
+  ], [
+    ('quiz-other', 1, 60),
+    ('quiz-test', 2, 60),
+    ('quiz-test', 1, -1),
+  ], ids=[
+    'other-room',
+    'other-user',
+    'expired-token',
+  ])
+  def test_invalid_token(self, settings, get_consumer, group_name, pk, max_age):
+    settings.QUIZ_RESUME_TOKEN_MAX_AGE = max_age
+    user = factories.UserFactory.build(pk=1)
+    instance = get_consumer
+    token = instance.create_resume_token(user)
+    instance.group_name = group_name
+
+    assert not instance.is_valid_resume_token(token, factories.UserFactory.build(pk=pk))
+
+@pytest.mark.quiz
+@pytest.mark.consumer
+class TestSpectatorPublisher:
+  @pytest.fixture
+  def get_callback(self):
+    calls = []
+
+    def create_callback(name):
+      async def callback():
+        calls.append(name)
+
+      return callback
+
+    return calls, create_callback
+
+  def test_default_interval(self, settings):
+    settings.QUIZ_SPECTATOR_INTERVAL = 0.5
+    publisher = consumers.SpectatorPublisher()
+
+    assert publisher.get_interval() == 0.5
+    assert consumers.SpectatorPublisher(interval=2).get_interval() == 2
+
+  @pytest.mark.asyncio
+  async def test_publish(self, get_callback):
+    calls, create_callback = get_callback
+    publisher = consumers.SpectatorPublisher(interval=0.2)
+    await publisher.publish('quiz-test', create_callback('first'))
+    await asyncio.sleep(0.05)
+    first_calls = list(calls)
+    # Requests within the interval are merged
+    await publisher.publish('quiz-test', create_callback('second'))
+    await publisher.publish('quiz-test', create_callback('third'))
+    await asyncio.sleep(0.05)
+    throttled_calls = list(calls)
+    await asyncio.sleep(0.2)
+
+    assert first_calls == ['first']
+    assert throttled_calls == ['first']
+    assert calls == ['first', 'third']
+
+  @pytest.mark.asyncio
+  async def test_publish_each_room(self, get_callback):
+    calls, create_callback = get_callback
+    publisher = consumers.SpectatorPublisher(interval=1)
+    await publisher.publish('quiz-test', create_callback('hoge'))
+    await publisher.publish('quiz-other', create_callback('foo'))
+    await asyncio.sleep(0.05)
+
+    assert sorted(calls) == ['foo', 'hoge']
+
+  @pytest.mark.asyncio
+  async def test_discard(self, get_callback):
+    calls, create_callback = get_callback
+    publisher = consumers.SpectatorPublisher(interval=0.1)
+    await publisher.publish('quiz-test', create_callback('first'))
+    await asyncio.sleep(0.05)
+    await publisher.publish('quiz-test', create_callback('second'))
+    publisher.discard('quiz-test')
+    publisher.discard('quiz-unknown')
+    await asyncio.sleep(0.15)
+
+    assert calls == ['first']
+    assert not publisher.pending
 
 @pytest.mark.quiz
 @pytest.mark.consumer
 class TestConsumerState:
   def test_init(self):
+    from quiz.backends import RedisStateBackend
     instance = consumers.ConsumerState()
 
     assert len(instance.states) == 0
+    assert isinstance(instance.backend, RedisStateBackend)
+
+  def test_init_with_backend(self):
+    from quiz.backends import InMemoryStateBackend
+    backend = InMemoryStateBackend()
+    instance = consumers.ConsumerState(backend=backend)
+
+    assert instance.backend is backend
 
   def test_get_state(self):
     instance = consumers.ConsumerState()
@@ -1146,14 +2743,14 @@ class TestConsumerState:
 
   def test_get_state_with_data(self):
     instance = consumers.ConsumerState()
-    instance.states['hoge'] = consumers.QuizState(['x-user', 'y-user'])
+    instance.states['hoge'] = consumers.QuizState('hoge', instance.backend)
     output = instance.get_state('hoge')
 
     assert isinstance(output, consumers.QuizState)
 
   def test_set_state(self):
     instance = consumers.ConsumerState()
-    instance.set_state('hoge', consumers.QuizState(['x-user', 'y-user']))
+    instance.set_state('hoge', consumers.QuizState('hoge', instance.backend))
 
     assert isinstance(instance.states['hoge'], consumers.QuizState)
 
@@ -1169,8 +2766,259 @@ class TestConsumerState:
   ])
   def test_del_state(self, name, keys):
     instance = consumers.ConsumerState()
-    instance.states['hoge'] = consumers.QuizState(['x-user', 'y-user'])
+    instance.states['hoge'] = consumers.QuizState('hoge', instance.backend)
     instance.del_state(name)
 
     assert len(instance.states) == len(keys)
-    assert all(isinstance(instance.states[key], consumers.QuizState) for key in keys)
\ No newline at end of file
+
+  def test_default_periods(self, settings):
+    settings.QUIZ_ROOM_STATE_TTL = 15
+    settings.QUIZ_ROOM_STATE_MAX_IDLE = 120
+    instance = consumers.ConsumerState()
+    other = consumers.ConsumerState(ttl=3, max_idle=4)
+
+    assert instance.get_ttl() == 15
+    assert instance.get_max_idle() == 120
+    assert other.get_ttl() == 3
+    assert other.get_max_idle() == 4
+
+  @pytest_asyncio.fixture
+  async def get_instance(self, mocker):
+    from quiz.backends import InMemoryStateBackend
+    from quiz.metrics import QuizMetrics
+    metrics = QuizMetrics()
+    mocker.patch('quiz.consumers.g_metrics', metrics)
+    backend = InMemoryStateBackend()
+    instance = consumers.ConsumerState(backend=backend, ttl=10, max_idle=100)
+    await backend.create_room('quiz-test', ['foo', 'bar'], {'status': models.QuizStatusType.START, 'index': 1})
+    instance.set_state('quiz-test', consumers.QuizState('quiz-test', backend))
+
+    return instance, metrics
+
+  @pytest.mark.asyncio
+  async def test_acquire(self, get_instance):
+    instance, metrics = get_instance
+    hit = await instance.acquire('quiz-test')
+    miss = await instance.acquire('quiz-unknown')
+    await instance.backend.delete_room('quiz-test')
+    deleted = await instance.acquire('quiz-test')
+
+    assert isinstance(hit, consumers.QuizState)
+    assert miss is None
+    assert deleted is None
+    assert metrics.state_cache_hits.get() == 1
+    assert metrics.state_cache_misses.get() == 2
+
+  @pytest.mark.asyncio
+  async def test_release_and_acquire(self, get_instance):
+    instance, _ = get_instance
+    instance.release('quiz-test')
+    instance.release('quiz-unknown')
+    is_released = 'quiz-test' in instance.released_at.keys()
+    _ = await instance.acquire('quiz-test')
+
+    assert is_released
+    assert 'quiz-unknown' not in instance.released_at.keys()
+    assert 'quiz-test' not in instance.released_at.keys()
+
+  @pytest.mark.asyncio
+  async def test_get_eviction_targets(self, get_instance):
+    instance, _ = get_instance
+    instance.set_state('quiz-other', consumers.QuizState('quiz-other', instance.backend))
+    instance.release('quiz-test')
+    now = time.monotonic()
+
+    assert instance.get_eviction_targets(now=now) == []
+    assert instance.get_eviction_targets(now=now + 10) == [('quiz-test', 'expired')]
+    assert instance.get_eviction_targets(now=now + 100) == [('quiz-test', 'expired'), ('quiz-other', 'stale')]
+
+  @pytest.mark.parametrize([
+    'reason',
+    'is_entered',
+    'flush_count',
+    'exists',
+  ], [
+    ('expired', False, 0, False),
+    ('stale', False, 1, False),
+    ('stale', True, 1, True),
+  ], ids=[
+    'expired-room',
+    'stale-room-without-players',
+    'stale-room-with-players',
+  ])
+  @pytest.mark.asyncio
+  async def test_evict(self, mocker, get_instance, reason, is_entered, flush_count, exists):
+    instance, metrics = get_instance
+    target = instance.get_state('quiz-test')
+    mocked_flush = mocker.patch.object(target, 'flush_score')
+    await instance.backend.update_player('quiz-test', 'foo', is_entered)
+    # Call target method
+    await instance.evict('quiz-test', reason)
+    await instance.evict('quiz-unknown', reason)
+
+    assert instance.get_state('quiz-test') is None
+    assert mocked_flush.await_count == flush_count
+    assert await instance.backend.exists('quiz-test') == exists
+    assert metrics.state_cache_evictions.get(reason=reason) == 1
+
+  @pytest.mark.asyncio
+  async def test_sweep(self, mocker, get_instance):
+    instance, _ = get_instance
+    mocked_logger = mocker.patch.object(instance, 'logger')
+    mocker.patch.object(instance, 'evict', side_effect=[None, Exception('Failed')])
+    instance.set_state('quiz-other', consumers.QuizState('quiz-other', instance.backend))
+    instance.release('quiz-test')
+    # Call target method
+    count = await instance.sweep(now=time.monotonic() + 100)
+
+    assert count == 2
+    assert mocked_logger.error.call_args.args[0] == '[quiz-other]Eviction: Failed'
+
+  @pytest.mark.parametrize([
+    'is_entered',
+    'exists',
+  ], [
+    (False, False),
+    (True, True),
+  ], ids=[
+    'idle-room',
+    'active-room',
+  ])
+  @pytest.mark.asyncio
+  async def test_invalidate(self, get_instance, is_entered, exists):
+    instance, _ = get_instance
+    await instance.backend.update_player('quiz-test', 'foo', is_entered)
+    # Call target method
+    await instance.invalidate('quiz-test')
+
+    assert await instance.backend.exists('quiz-test') == exists
+    assert (instance.get_state('quiz-test') is not None) == exists
+
+  @pytest.mark.asyncio
+  async def test_start_sweeper(self, get_instance):
+    instance, _ = get_instance
+    instance.start_sweeper()
+    sweeper = instance.sweeper
+    instance.start_sweeper()
+    is_same = instance.sweeper is sweeper
+    sweeper.cancel()
+
+    assert is_same
+
+@pytest.mark.quiz
+@pytest.mark.consumer
+class TestGroupMessage:
+  @pytest.fixture
+  def get_consumer(self, mocker):
+    mocker.patch('quiz.consumers.convert_timezone', return_value='2024-07-03 12:51:43')
+    instance = consumers.QuizConsumer()
+    instance.group_name = 'quiz-test'
+    instance.channel_layer = mocker.MagicMock()
+    instance.channel_layer.group_send = mocker.AsyncMock()
+
+    return instance
+
+  @pytest.mark.asyncio
+  async def test_group_send_message(self, get_consumer):
+    instance = get_consumer
+    # Call target method
+    await instance.group_send_message({
+      'msg_type': 'shareResult',
+      'ids': ['data', 'message'],
+      'data': {'1': 2},
+      'message': 'hoge',
+      'version': 3,
+    })
+    group_name, event = instance.channel_layer.group_send.call_args.args
+
+    assert instance.channel_layer.group_send.await_count == 1
+    assert group_name == 'quiz-test'
+    assert event['type'] == 'send_group_message'
+    assert json.loads(event['text']) == {
+      'type': 'shareResult',
+      'datetime': '2024-07-03 12:51:43',
+      'data': {'1': 2},
+      'message': 'hoge',
+    }
+
+  @pytest.mark.asyncio
+  async def test_send_group_message(self, mocker, get_consumer):
+    instance = get_consumer
+    mocked_send = mocker.patch.object(instance, 'send')
+    mocked_encoder = mocker.patch.object(instance, 'encode_json')
+    # Call target method
+    await instance.send_group_message({'type': 'send_group_message', 'text': '{"type": "system"}'})
+
+    mocked_send.assert_called_once_with(text_data='{"type": "system"}')
+    assert not mocked_encoder.called
+
+@pytest.mark.quiz
+@pytest.mark.consumer
+@pytest.mark.benchmark
+@pytest.mark.parametrize([
+  'num_recipients',
+], [
+  (10, ),
+  (100, ),
+  (1000, ),
+], ids=[
+  '10-recipients',
+  '100-recipients',
+  '1000-recipients',
+])
+@pytest.mark.asyncio
+async def test_benchmark_group_message(mocker, num_recipients):
+  num_rounds = 10
+  instance = consumers.QuizConsumer()
+  instance.group_name = 'quiz-test'
+  instance.channel_layer = mocker.MagicMock()
+  frames = []
+
+  async def group_send(group_name, event):
+    frames.append(event)
+
+  async def send(text_data=None, bytes_data=None, close=False):
+    pass
+
+  instance.channel_layer.group_send = group_send
+  instance.send = send
+  event = {
+    'msg_type': 'shareResult',
+    'ids': ['data', 'isEnded', 'message', 'version'],
+    'data': dict([(str(idx), idx) for idx in range(num_recipients)]),
+    'isEnded': False,
+    'message': 'The score is updated. Please next quiz.',
+    'version': 1,
+  }
+  # Each recipient builds and serializes the same content
+  async def per_recipient():
+    for _ in range(num_recipients):
+      content = {
+        'type': event['msg_type'],
+        'datetime': instance.now(),
+      }
+      content.update(dict([(key, event[key]) for key in event['ids']]))
+      await send(text_data=json.dumps(content))
+  # The sender serializes the content once and each recipient forwards it
+  async def per_event():
+    frames.clear()
+    await instance.group_send_message(event)
+
+    for _ in range(num_recipients):
+      await instance.send_group_message(frames[0])
+
+  async def measure(callback):
+    elapsed_times = []
+
+    for _ in range(num_rounds):
+      start = time.process_time()
+      await callback()
+      elapsed_times.append(time.process_time() - start)
+
+    return sorted(elapsed_times)[num_rounds // 2]
+
+  legacy = await measure(per_recipient)
+  current = await measure(per_event)
+  print(f'[benchmark] group message to {num_recipients} recipients: per-recipient {legacy * 1000:.3f} ms, per-event {current * 1000:.3f} ms')
+
+  assert current < legacy
@@ -0,0 +1,151 @@
+import pytest
+import asyncio
+import threading
+import time
+from quiz import executors
+
+@pytest.mark.quiz
+@pytest.mark.parametrize([
+  'options',
+  'expected',
+], [
+  ({}, 4),
+  ({'pool': True}, 4),
+  ({'pool': {'min_size': 2}}, 2),
+  ({'pool': {'min_size': 2, 'max_size': 8}}, 8),
+], ids=[
+  'without-pool',
+  'default-pool',
+  'min-size',
+  'max-size',
+])
+def test_get_pool_size(mocker, settings, options, expected):
+  mocker.patch.dict(settings.DATABASES['default'], {'OPTIONS': options})
+
+  assert executors.get_pool_size() == expected
+
+@pytest.mark.quiz
+class TestDatabaseExecutor:
+  @pytest.fixture
+  def get_metrics(self, mocker):
+    from quiz.metrics import QuizMetrics
+    metrics = QuizMetrics()
+    mocker.patch('quiz.executors.g_metrics', metrics)
+
+    return metrics
+
+  def test_get_max_workers(self, mocker, settings):
+    settings.QUIZ_DB_EXECUTOR_WORKERS = None
+    mocker.patch.dict(settings.DATABASES['default'], {'OPTIONS': {'pool': {'max_size': 6}}})
+    default_workers = executors.DatabaseExecutor().get_max_workers()
+    settings.QUIZ_DB_EXECUTOR_WORKERS = 3
+    specified_workers = executors.DatabaseExecutor().get_max_workers()
+
+    assert default_workers == 6
+    assert specified_workers == 3
+    assert executors.DatabaseExecutor(max_workers=2).get_max_workers() == 2
+
+  @pytest.mark.asyncio
+  async def test_run(self, get_metrics):
+    metrics = get_metrics
+    instance = executors.DatabaseExecutor(max_workers=1)
+    output = await instance.run(lambda val, offset=0: (threading.current_thread().name, val + offset), 2, offset=3)
+    instance.shutdown()
+
+    assert output[0].startswith('quiz-db')
+    assert output[1] == 5
+    assert instance.queue_depth == 0
+    assert metrics.db_executor_queue_depth.get() == 0
+    assert metrics.db_executor_wait.get_count() == 1
+
+  @pytest.mark.asyncio
+  async def test_run_with_exception(self, get_metrics):
+    def callback():
+      raise ValueError('Invalid')
+
+    instance = executors.DatabaseExecutor(max_workers=1)
+
+    with pytest.raises(ValueError) as ex:
+      await instance.run(callback)
+    instance.shutdown()
+
+    assert 'Invalid' in str(ex.value)
+    assert instance.queue_depth == 0
+
+  @pytest.mark.asyncio
+  async def test_bounded_workers(self, get_metrics):
+    metrics = get_metrics
+    instance = executors.DatabaseExecutor(max_workers=2)
+    lock = threading.Lock()
+    status = {'running': 0, 'max_running': 0, 'max_depth': 0}
+
+    def callback():
+      with lock:
+        status['running'] += 1
+        status['max_running'] = max(status['max_running'], status['running'])
+        status['max_depth'] = max(status['max_depth'], metrics.db_executor_queue_depth.get())
+      time.sleep(0.05)
+
+      with lock:
+        status['running'] -= 1
+
+    await asyncio.gather(*[instance.run(callback) for _ in range(6)])
+    instance.shutdown()
+
+    assert status['max_running'] == 2
+    assert status['max_depth'] > 0
+    assert metrics.db_executor_queue_depth.get() == 0
+    assert metrics.db_executor_wait.get_count() == 6
+
+  @pytest.mark.asyncio
+  async def test_cancel_waiting_task(self, get_metrics):
+    metrics = get_metrics
+    instance = executors.DatabaseExecutor(max_workers=1)
+    event = threading.Event()
+    calls = []
+    running = asyncio.ensure_future(instance.run(event.wait, 1))
+    waiting = asyncio.ensure_future(instance.run(calls.append, 'called'))
+    await asyncio.sleep(0.05)
+    depth = metrics.db_executor_queue_depth.get()
+    # The task is cancelled before a worker picks it up
+    waiting.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+      await waiting
+    event.set()
+    await running
+    instance.shutdown()
+
+    assert depth == 1
+    assert calls == []
+    assert instance.queue_depth == 0
+    assert metrics.db_executor_queue_depth.get() == 0
+
+  def test_shutdown(self):
+    instance = executors.DatabaseExecutor(max_workers=1)
+    executor = instance.get_executor()
+    is_same = instance.get_executor() is executor
+    instance.shutdown()
+    instance.shutdown()
+
+    assert is_same
+    assert instance.executor is None
+
+@pytest.mark.quiz
+@pytest.mark.parametrize([
+  'use_db_executor',
+], [
+  (True, ),
+  (False, ),
+], ids=[
+  'dedicated-executor',
+  'thread-sensitive-executor',
+])
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_database_sync(settings, use_db_executor):
+  settings.QUIZ_DB_EXECUTOR = use_db_executor
+  callback = executors.database_sync(lambda: threading.current_thread().name)
+  name = await callback()
+
+  assert name.startswith('quiz-db') == use_db_executor
@@ -2,6 +2,7 @@ import pytest
 from django.core.exceptions import ValidationError, NON_FIELD_ERRORS
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.db.models import Q
 from django.db.utils import IntegrityError
 from app_tests import factories, g_compare_options
@@ -9,6 +10,7 @@ from account.models import RoleType, IndividualGroup
 from quiz import forms, models
 import json
 import tempfile
+import time
 
 UserModel = get_user_model()
 
@@ -503,6 +505,34 @@ class TestQuizSearchForm(Common):
     assert len(options) == len(exacts)
     assert g_compare_options(options, exacts)
 
+  @pytest.mark.parametrize('num_items', [2, 20], ids=['few-items', 'many-items'])
+  def test_number_of_queries_to_get_options(self, django_assert_num_queries, get_editors, num_items):
+    _, user = get_editors
+    genres = factories.GenreFactory.create_batch(num_items, is_enabled=True)
+    creators = factories.UserFactory.create_batch(num_items, is_active=True, role=RoleType.CREATOR)
+    for genre, creator in zip(genres, creators):
+      factories.QuizFactory(creator=creator, genre=genre)
+
+    # The genres and the creators are collected respectively when the form is created
+    with django_assert_num_queries(2):
+      form = forms.QuizSearchForm(user=user)
+    with django_assert_num_queries(0):
+      _ = form.get_genre_options
+      _ = form.get_creator_options
+
+  def test_use_cached_choices(self, django_assert_num_queries, get_search_choice_cache, get_editors):
+    _, user = get_editors
+    genre = factories.GenreFactory(is_enabled=True)
+    factories.QuizFactory(creator=user if user.is_creator() else factories.UserFactory(is_active=True, role=RoleType.CREATOR), genre=genre)
+    form = forms.QuizSearchForm(user=user)
+
+    with django_assert_num_queries(0):
+      cached_form = forms.QuizSearchForm(user=user)
+
+    assert cached_form.fields['genres'].choices == form.fields['genres'].choices
+    assert cached_form.get_genre_options == form.get_genre_options
+    assert cached_form.get_creator_options == form.get_creator_options
+
 # ==================
 # = QuizUploadForm =
 # ==================
@@ -615,13 +645,21 @@ class TestQuizUploadForm(Common):
     form = forms.QuizUploadForm(user=user, data=params, files=files)
     mocker.patch.object(form.validator, 'validate', return_value=None)
     mocker.patch.object(form.validator, 'get_record', return_value=records)
+    get_counts = lambda: (
+      [models.Genre.objects.get(pk=obj.pk).completed_quiz_count for obj in genres[:3]],
+      UserModel.objects.get(pk=creator.pk).completed_quiz_count,
+    )
+    before_genres, before_creator = get_counts()
     is_valid = form.is_valid()
     instances = form.register_quizzes()
     counts = models.Quiz.objects.filter(pk__in=self.pk_convertor(instances)).count()
+    after_genres, after_creator = get_counts()
 
     assert is_valid
     assert not form.has_error(NON_FIELD_ERRORS)
     assert counts == len(records)
+    assert [after - before for before, after in zip(before_genres, after_genres)] == [1, 1, 0]
+    assert after_creator - before_creator == 2
 
   def test_raise_exception_in_bulk_create(self, get_genres, mocker, get_editors, get_params_for_register_method):
     genre = get_genres[0]
@@ -796,6 +834,33 @@ class TestQuizForm(Common):
     assert form.is_valid() == is_valid
     assert err_msg in str(form.errors)
 
+  @pytest.mark.parametrize([
+    'alternative_answers',
+  ], [
+    ('',),
+    ('Foo\nbar',),
+  ], ids=[
+    'without-alternative-answers',
+    'with-alternative-answers',
+  ])
+  def test_save_alternative_answers(self, get_creator, get_each_types_of_genre, alternative_answers):
+    user = get_creator
+    valid_genres, _ = get_each_types_of_genre
+    params = {
+      'genre': str(valid_genres[0].pk),
+      'question': 'hoge',
+      'answer': 'ＦＯＯ',
+      'alternative_answers': alternative_answers,
+      'is_completed': True,
+    }
+    form = forms.QuizForm(user=user, data=params)
+    is_valid = form.is_valid()
+    instance = form.save()
+
+    assert is_valid
+    assert instance.alternative_answers == alternative_answers
+    assert instance.normalized_answers == (['foo', 'bar'] if alternative_answers else ['foo'])
+
   def test_check_user_role(self, get_users, get_each_types_of_genre):
     key, user = get_users
     valid_genres, _ = get_each_types_of_genre
@@ -849,10 +914,12 @@ class TestQuizRoomSearchForm(Common):
     ('hoge-room', 1),
     ('room', 2),
     ('no-room', 0),
+    ('HOGE-Room', 1),
   ], ids=[
     'only-one-room',
     'two-rooms',
     'no-rooms',
+    'ignore-case',
   ])
   def test_check_filtering(self, get_genres, name, count):
     user = factories.UserFactory(is_active=True, role=RoleType.GUEST)
@@ -895,6 +962,67 @@ class TestQuizRoomSearchForm(Common):
     assert queryset.count() == input_qs.count()
     assert all([val.pk == exact.pk for val, exact in zip(queryset, input_qs)])
 
+##
+# @brief Create the rooms whose names are random strings
+# @param num_rooms The number of rooms
+def create_named_rooms(num_rooms):
+  owner = factories.UserFactory(is_active=True, role=RoleType.GUEST)
+  # Insert rooms in the database directly because the factory is too slow for many records
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f'INSERT INTO {models.QuizRoom._meta.db_table} (id, owner_id, name, max_question, answer_time_limit, judgement_type, use_typewriter_effect, is_enabled, created_at) '
+      "SELECT gen_random_uuid(), %s, 'Room-' || md5(idx::text), 10, 0, %s, false, true, now() FROM generate_series(1, %s) AS idx",
+      [owner.pk, models.JudgementType.MANUAL, num_rooms],
+    )
+    cursor.execute(f'ANALYZE {models.QuizRoom._meta.db_table}')
+
+@pytest.fixture
+def get_many_named_rooms():
+  num_rooms = 100000
+  create_named_rooms(num_rooms)
+
+  return num_rooms
+
+@pytest.mark.quiz
+@pytest.mark.form
+@pytest.mark.django_db
+def test_plan_of_room_name_search(require_trigram_search):
+  create_named_rooms(200)
+  # Because the small table is scanned sequentially, the planner is forced to use the index as with the large table
+  with connection.cursor() as cursor:
+    cursor.execute('SET LOCAL enable_seqscan = off')
+  form = forms.QuizRoomSearchForm(data={'name': 'abc12'})
+  plan = form.filtering(models.QuizRoom.objects.all()).explain()
+
+  assert 'quiz_room_name_trgm_idx' in plan
+
+@pytest.mark.quiz
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_benchmark_room_name_search(require_trigram_search, get_many_named_rooms):
+  num_rooms = get_many_named_rooms
+  keyword = 'abc12'
+  methods = {
+    'sequential-scan': lambda: models.QuizRoom.objects.filter(name__icontains=keyword),
+    'trigram-index': lambda: forms.QuizRoomSearchForm(data={'name': keyword}).filtering(models.QuizRoom.objects.all()),
+  }
+  elapsed_times = {}
+  outputs = {}
+
+  for name, method in methods.items():
+    with connection.cursor() as cursor:
+      # Disable the index scan to measure the legacy sequential scan
+      cursor.execute(f"SET enable_bitmapscan = {'off' if name == 'sequential-scan' else 'on'}")
+    start = time.perf_counter()
+    outputs[name] = set(method().values_list('pk', flat=True))
+    elapsed_times[name] = time.perf_counter() - start
+  print(f'[benchmark] search room names of {num_rooms} rooms: ' + ', '.join([
+    f'{name} {elapsed_time * 1000:.3f} ms' for name, elapsed_time in elapsed_times.items()
+  ]))
+
+  assert outputs['trigram-index'] == outputs['sequential-scan']
+  assert elapsed_times['trigram-index'] < elapsed_times['sequential-scan']
+
 # ================
 # = QuizRoomForm =
 # ================
@@ -914,6 +1042,8 @@ class TestQuizRoomForm(Common):
     ('creator-is-empty', True),
     ('member-is-empty', True),
     ('adds-user-except-friends', True),
+    ('set-answer-time-limit', True),
+    ('set-judgement-type', True),
     # Invalid patterns
     ('name-is-too-long', False),
     ('both-genres-and-creators-are-empty', False),
@@ -921,6 +1051,8 @@ class TestQuizRoomForm(Common):
     ('includes-invalid-genre', False),
     ('includes-invalid-creator', False),
     ('set-invalid-max-question', False),
+    ('set-negative-answer-time-limit', False),
+    ('set-invalid-judgement-type', False),
   ], ids=lambda xs: str(xs).lower())
   def test_validate_inputs(self, mocker, get_each_types_of_genre, input_type, is_valid):
     _valid_genres, invalid_genre = get_each_types_of_genre
@@ -963,6 +1095,10 @@ class TestQuizRoomForm(Common):
       new_member = UserModel.objects.filter(pk__in=self.pk_convertor(list(members) + [other])).order_by('-pk')
       params['members'] = new_member
       mocker.patch('account.models.CustomUserManager.collect_valid_friends', return_value=new_member)
+    elif input_type == 'set-answer-time-limit':
+      params['answer_time_limit'] = 30
+    elif input_type == 'set-judgement-type':
+      params['judgement_type'] = models.JudgementType.TIME_WEIGHTED
     # Inalid patterns
     elif input_type == 'name-is-too-long':
       params['name'] = '1'*129
@@ -984,6 +1120,12 @@ class TestQuizRoomForm(Common):
     elif input_type == 'set-invalid-max-question':
       params['max_question'] = 256
       err_msg = 'The number of quizzes this system can set is 2, but the requested value is {}. Please check the condition.'.format(params['max_question'])
+    elif input_type == 'set-negative-answer-time-limit':
+      params['answer_time_limit'] = -1
+      err_msg = 'Ensure this value is greater than or equal to 0.'
+    elif input_type == 'set-invalid-judgement-type':
+      params['judgement_type'] = 4
+      err_msg = 'Select a valid choice. 4 is not one of the available choices.'
 
     # Define form instance
     form = forms.QuizRoomForm(user=owner, data=params)
@@ -991,6 +1133,45 @@ class TestQuizRoomForm(Common):
     assert form.is_valid() == is_valid
     assert err_msg in str(form.errors)
 
+    if is_valid:
+      assert form.cleaned_data['answer_time_limit'] == params.get('answer_time_limit', 0)
+      assert form.cleaned_data['judgement_type'] == params.get('judgement_type', models.JudgementType.MANUAL)
+
+  @pytest.mark.parametrize([
+    'cached_count',
+    'is_valid',
+    'num_calls',
+  ], [
+    (3, True, 0),
+    (1, False, 0),
+    (None, False, 1),
+  ], ids=[
+    'enough-quizzes-in-index',
+    'not-enough-quizzes-in-index',
+    'index-is-not-ready',
+  ])
+  def test_count_quizzes_with_index(self, mocker, get_each_types_of_genre, cached_count, is_valid, num_calls):
+    _valid_genres, _ = get_each_types_of_genre
+    genres = models.Genre.objects.filter(pk__in=self.pk_convertor(_valid_genres[:1]))
+    creator = factories.UserFactory(is_active=True, role=RoleType.CREATOR)
+    _ = factories.QuizFactory(creator=creator, genre=_valid_genres[0], is_completed=True)
+    mocker.patch('quiz.models.GenreQuerySet.collect_valid_genres', return_value=genres)
+    mock_count = mocker.patch('quiz.forms.g_quiz_index.count', return_value=cached_count)
+    spy = mocker.spy(models.Quiz.objects, 'collect_quizzes')
+    owner = factories.UserFactory(is_active=True, role=RoleType.GUEST)
+    params = {
+      'name': 'hoge',
+      'genres': genres,
+      'max_question': 3,
+      'use_typewriter_effect': False,
+      'is_enabled': False,
+    }
+    form = forms.QuizRoomForm(user=owner, data=params)
+
+    assert form.is_valid() == is_valid
+    assert mock_count.call_args.kwargs == {'creators': [], 'genres': [_valid_genres[0].pk]}
+    assert spy.call_count == num_calls
+
   @pytest.fixture(params=['none', 'default'])
   def get_instance_type(self, request):
     yield request.param
@@ -1034,6 +1215,24 @@ class TestQuizRoomForm(Common):
     assert len(options) == len(exacts)
     assert g_compare_options(options, exacts)
 
+  @pytest.mark.parametrize('num_items', [2, 20], ids=['few-items', 'many-items'])
+  def test_number_of_queries_to_get_options(self, django_assert_num_queries, num_items):
+    genres = factories.GenreFactory.create_batch(num_items, is_enabled=True)
+    creators = factories.UserFactory.create_batch(num_items, is_active=True, role=RoleType.CREATOR)
+    for genre, creator in zip(genres, creators):
+      factories.QuizFactory(creator=creator, genre=genre, is_completed=True)
+    owner = factories.UserFactory(is_active=True, friends=creators)
+    instance = factories.QuizRoomFactory(owner=owner, genres=genres[:1], creators=creators[:1], members=creators[:1], is_enabled=False)
+    form = forms.QuizRoomForm(user=owner, instance=instance)
+
+    # The primary keys of selected items and all items are collected respectively
+    with django_assert_num_queries(2):
+      _ = form.get_genre_options
+    with django_assert_num_queries(2):
+      _ = form.get_creator_options
+    with django_assert_num_queries(2):
+      _ = form.get_member_options
+
   def test_check_creator_options(self, mocker, get_instance_type):
     instance_type = get_instance_type
     owner = factories.UserFactory(is_active=True)
@@ -0,0 +1,180 @@
+import pytest
+import uuid
+from redis.exceptions import RedisError
+from app_tests import factories
+from quiz import models
+from quiz.indexes import QuizIndex, g_quiz_index
+
+@pytest.fixture
+def get_index(settings):
+  settings.QUIZ_INDEX = dict(settings.QUIZ_INDEX, prefix=f'quiz-index-test-{uuid.uuid4().hex[:8]}')
+
+  yield g_quiz_index
+
+  g_quiz_index.clear()
+
+@pytest.fixture
+def get_quizzes():
+  creators = factories.UserFactory.create_batch(2, is_active=True)
+  genres = factories.GenreFactory.create_batch(2, is_enabled=True)
+  quizzes = [
+    factories.QuizFactory(creator=creators[0], genre=genres[0], is_completed=True),  # 0
+    factories.QuizFactory(creator=creators[0], genre=genres[1], is_completed=True),  # 1
+    factories.QuizFactory(creator=creators[1], genre=genres[0], is_completed=True),  # 2
+    factories.QuizFactory(creator=creators[1], genre=genres[1], is_completed=False), # 3 Is not completed
+  ]
+
+  return creators, genres, quizzes
+
+@pytest.mark.quiz
+def test_default_config(settings):
+  settings.QUIZ_INDEX = {'hosts': ['redis://localhost:6379'], 'prefix': 'foo'}
+  index = QuizIndex()
+
+  assert index.get_config() == {'hosts': ['redis://localhost:6379'], 'prefix': 'foo'}
+  assert index.get_key('genre', 1) == 'foo:genre:1'
+
+@pytest.mark.quiz
+def test_custom_config():
+  index = QuizIndex(hosts=[('localhost', 6379)], prefix='bar')
+
+  assert index.get_config() == {'hosts': [('localhost', 6379)], 'prefix': 'bar'}
+
+@pytest.mark.quiz
+@pytest.mark.django_db
+class TestQuizIndex:
+  def test_not_ready(self, get_index, get_quizzes):
+    index = get_index
+    creators, _, quizzes = get_quizzes
+    index.update_quiz(quizzes[0].pk, quizzes[0].genre_id, quizzes[0].creator_id, True)
+
+    assert not index.is_ready()
+    assert index.collect(creators=[creators[0].pk]) is None
+    assert index.count() is None
+    assert not index.get_client().exists(index.get_key('all'))
+
+  def test_redis_error(self, mocker, get_index):
+    index = get_index
+    mocker.patch.object(index, 'get_client', side_effect=RedisError('error'))
+
+    is_ready = index.is_ready()
+    count = index.count()
+    mocker.stopall()
+
+    assert not is_ready
+    assert count is None
+
+  @pytest.mark.parametrize([
+    'use_creators',
+    'use_genres',
+    'is_and_op',
+    'expected',
+  ], [
+    (False, False, False, [0, 1, 2]),
+    (True, False, False, [0, 1]),
+    (False, True, False, [0, 2]),
+    (True, True, False, [0, 1, 2]),
+    (True, True, True, [0]),
+  ], ids=[
+    'no-conditions',
+    'only-creators',
+    'only-genres',
+    'or-operator',
+    'and-operator',
+  ])
+  def test_collect(self, get_index, get_quizzes, use_creators, use_genres, is_and_op, expected):
+    index = get_index
+    creators, genres, quizzes = get_quizzes
+    index.rebuild(models.Quiz.objects.filter(pk__in=[obj.pk for obj in quizzes], is_completed=True))
+    kwargs = {
+      'creators': [creators[0].pk] if use_creators else None,
+      'genres': [genres[0].pk] if use_genres else None,
+      'is_and_op': is_and_op,
+    }
+    ids = index.collect(**kwargs)
+    queryset = models.Quiz.objects.collect_quizzes(
+      queryset=models.Quiz.objects.filter(pk__in=[obj.pk for obj in quizzes], is_completed=True),
+      creators=[creators[0]] if use_creators else None,
+      genres=[genres[0]] if use_genres else None,
+      is_and_op=is_and_op,
+    )
+
+    assert index.is_ready()
+    assert ids == set([str(quizzes[idx].pk) for idx in expected])
+    assert ids == set([str(pk) for pk in queryset.values_list('pk', flat=True)])
+    assert index.count(**kwargs) == len(expected)
+    assert len(list(index.get_client().scan_iter(match=index.get_key('tmp', '*')))) == 0
+
+  @pytest.mark.parametrize('is_and_op', [False, True], ids=['or-operator', 'and-operator'])
+  def test_collect_with_empty_conditions(self, get_index, get_quizzes, is_and_op):
+    index = get_index
+    _, genres, quizzes = get_quizzes
+    index.rebuild(models.Quiz.objects.filter(pk__in=[obj.pk for obj in quizzes], is_completed=True))
+    ids = index.collect(creators=[], genres=[genres[0].pk], is_and_op=is_and_op)
+    expected = set() if is_and_op else set([str(quizzes[0].pk), str(quizzes[2].pk)])
+
+    assert ids == expected
+
+  def test_signals(self, django_capture_on_commit_callbacks, get_index, get_quizzes):
+    index = get_index
+    creators, genres, quizzes = get_quizzes
+    index.rebuild(models.Quiz.objects.filter(pk__in=[obj.pk for obj in quizzes], is_completed=True))
+    # Create a new quiz
+    with django_capture_on_commit_callbacks(execute=True):
+      quiz = factories.QuizFactory(creator=creators[1], genre=genres[1], is_completed=True)
+    assert index.collect(genres=[genres[1].pk]) == set([str(quizzes[1].pk), str(quiz.pk)])
+    # Change the genre
+    with django_capture_on_commit_callbacks(execute=True):
+      quiz.genre = genres[0]
+      quiz.save()
+    assert index.collect(genres=[genres[1].pk]) == set([str(quizzes[1].pk)])
+    assert str(quiz.pk) in index.collect(genres=[genres[0].pk])
+    # Change the creation status
+    with django_capture_on_commit_callbacks(execute=True):
+      quizzes[3].is_completed = True
+      quizzes[3].save()
+      quiz.is_completed = False
+      quiz.save()
+    assert index.collect(creators=[creators[1].pk]) == set([str(quizzes[2].pk), str(quizzes[3].pk)])
+    # Delete the quiz
+    with django_capture_on_commit_callbacks(execute=True):
+      quizzes[2].delete()
+    assert index.collect(creators=[creators[1].pk]) == set([str(quizzes[3].pk)])
+    assert index.check(models.Quiz.objects.filter(pk__in=[obj.pk for obj in quizzes + [quiz]], is_completed=True)) == {}
+
+  def test_rollback_is_not_reflected(self, django_capture_on_commit_callbacks, get_index, get_quizzes):
+    index = get_index
+    creators, genres, quizzes = get_quizzes
+    index.rebuild(models.Quiz.objects.filter(pk__in=[obj.pk for obj in quizzes], is_completed=True))
+
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+      factories.QuizFactory(creator=creators[0], genre=genres[0], is_completed=True)
+
+    assert len([callback for callback in callbacks if getattr(callback, 'func', None) == index.update_quiz]) == 1
+    assert index.count(creators=[creators[0].pk]) == 2
+
+  def test_check(self, get_index, get_quizzes):
+    index = get_index
+    _, genres, quizzes = get_quizzes
+    queryset = models.Quiz.objects.filter(pk__in=[obj.pk for obj in quizzes], is_completed=True)
+    index.rebuild(queryset)
+    client = index.get_client()
+    client.srem(index.get_key('genre', genres[0].pk), str(quizzes[0].pk))
+    client.sadd(index.get_key('genre', genres[1].pk), str(quizzes[3].pk))
+    errors = index.check(queryset)
+
+    assert errors == {
+      f'genre:{genres[0].pk}': (set([str(quizzes[0].pk)]), set()),
+      f'genre:{genres[1].pk}': (set(), set([str(quizzes[3].pk)])),
+    }
+
+  def test_reset_room_with_index(self, mocker, get_index, get_quizzes):
+    index = get_index
+    creators, genres, quizzes = get_quizzes
+    index.rebuild(models.Quiz.objects.filter(pk__in=[obj.pk for obj in quizzes], is_completed=True))
+    room = factories.QuizRoomFactory(creators=[creators[1]], genres=[genres[1]], max_question=5, is_enabled=True)
+    spy = mocker.spy(models.Quiz.objects, 'collect_quizzes')
+    room.reset()
+
+    assert spy.call_count == 0
+    assert set(room.score.sequence.values()) == set([str(quizzes[idx].pk) for idx in [1, 2]])
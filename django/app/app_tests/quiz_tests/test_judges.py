@@ -0,0 +1,127 @@
+import pytest
+import time
+from quiz import judges
+
+@pytest.mark.quiz
+class TestNormalizeAnswer:
+  @pytest.mark.parametrize([
+    'text',
+    'expected',
+  ], [
+    ('Tokyo', 'tokyo'),
+    ('ＴＯＫＹＯ１２３', 'tokyo123'),
+    ('ﾄｳｷｮｳ', 'とうきょう'),
+    ('トウキョウ', 'とうきょう'),
+    ('ヴァイオリン', 'ゔぁいおりん'),
+    (' New　York\n', 'newyork'),
+    ('STRASSE', 'strasse'),
+    ('Straße', 'strasse'),
+    ('', ''),
+    (None, ''),
+  ], ids=[
+    'ascii',
+    'full-width-alphanumerics',
+    'half-width-katakana',
+    'full-width-katakana',
+    'katakana-with-small-letter',
+    'includes-whitespaces',
+    'upper-case',
+    'case-folding',
+    'empty-string',
+    'none',
+  ])
+  def test_normalize_answer(self, text, expected):
+    assert judges.normalize_answer(text) == expected
+
+  @pytest.mark.parametrize([
+    'answer',
+    'alternative_answers',
+    'expected',
+  ], [
+    ('Apple', '', ['apple']),
+    ('Apple', 'りんご\nリンゴ\n\nＡＰＰＬＥ', ['apple', 'りんご']),
+    ('', 'ringo', ['ringo']),
+    ('', None, []),
+  ], ids=[
+    'only-answer',
+    'with-alternative-answers',
+    'answer-is-empty',
+    'no-answers',
+  ])
+  def test_collect_accepted_answers(self, answer, alternative_answers, expected):
+    assert judges.collect_accepted_answers(answer, alternative_answers) == expected
+
+@pytest.mark.quiz
+class TestAnswerJudge:
+  @pytest.mark.parametrize([
+    'kwargs',
+    'elapsed_time',
+    'expected',
+  ], [
+    ({}, 3, 1),
+    ({'max_points': 5}, 3, 5),
+    ({'max_points': 10, 'reference_time': 20}, 0, 10),
+    ({'max_points': 10, 'reference_time': 20}, 5, 8),
+    ({'max_points': 10, 'reference_time': 20}, 19.9, 1),
+    ({'max_points': 10, 'reference_time': 20}, 30, 1),
+    ({'max_points': 10, 'reference_time': 20}, -1, 10),
+  ], ids=[
+    'default',
+    'fixed-points',
+    'answered-immediately',
+    'answered-in-quarter',
+    'answered-at-deadline',
+    'answered-after-deadline',
+    'negative-elapsed-time',
+  ])
+  def test_get_points(self, kwargs, elapsed_time, expected):
+    judge = judges.AnswerJudge(['foo'], **kwargs)
+
+    assert judge.get_points(elapsed_time) == expected
+
+  def test_judge(self):
+    judge = judges.AnswerJudge(['とうきょう', 'tokyo'], max_points=10, reference_time=10)
+    answers = {
+      'user1': {'answer': 'トウキョウ', 'time': 1.0},
+      'user2': {'answer': 'ＴＯＫＹＯ', 'time': 5.0},
+      'user3': {'answer': 'Osaka', 'time': 2.0},
+      'user4': {'answer': '', 'time': 0},
+      'user5': {'answer': 'トウキョウ', 'time': 9.5},
+    }
+    judgement = judge.judge(answers)
+
+    assert judgement == {'user1': 9, 'user2': 5, 'user3': 0, 'user4': 0, 'user5': 1}
+
+  def test_judge_normalizes_same_answers_once(self, mocker):
+    judge = judges.AnswerJudge(['foo'])
+    answers = dict([(f'user{idx}', {'answer': 'FOO' if idx % 2 else 'bar', 'time': idx}) for idx in range(10)])
+    spy = mocker.spy(judges, 'normalize_answer')
+    judgement = judge.judge(answers)
+
+    assert spy.call_count == 2
+    assert sum(judgement.values()) == 5
+
+@pytest.mark.quiz
+@pytest.mark.benchmark
+def test_benchmark_judge_1000_answers():
+  num_answers = 1000
+  num_rounds = 20
+  accepted_answers = judges.collect_accepted_answers('トウキョウ', 'Tokyo\nTOKYO-TO')
+  answers = dict([
+    (f'user{idx}', {'answer': ['とうきょう', 'ＴＯＫＹＯ', f'Osaka{idx}', 'ﾄｳｷｮｳ'][idx % 4], 'time': idx * 0.01})
+    for idx in range(num_answers)
+  ])
+  judge = judges.AnswerJudge(accepted_answers, max_points=10, reference_time=30)
+  # Measure the elapsed time of each round
+  elapsed_times = []
+
+  for _ in range(num_rounds):
+    start = time.perf_counter()
+    judgement = judge.judge(answers)
+    elapsed_times.append(time.perf_counter() - start)
+  median = sorted(elapsed_times)[num_rounds // 2]
+  print(f'[benchmark] judge {num_answers} answers: median {median * 1000:.3f} ms, max {max(elapsed_times) * 1000:.3f} ms')
+
+  assert len(judgement) == num_answers
+  assert len([val for val in judgement.values() if val > 0]) == num_answers * 3 // 4
+  assert median < 0.05
@@ -0,0 +1,104 @@
+import pytest
+from quiz import metrics
+
+@pytest.mark.quiz
+class TestMetric:
+  def test_counter(self):
+    counter = metrics.Counter('foo_total', 'Foo counter.', ('command', ))
+    counter.inc(command='hoge')
+    counter.inc(2, command='hoge')
+    counter.inc(command='bar')
+
+    assert counter.get(command='hoge') == 3
+    assert counter.get(command='bar') == 1
+    assert counter.get(command='unknown') == 0
+    assert counter.render() == [
+      '# HELP foo_total Foo counter.',
+      '# TYPE foo_total counter',
+      'foo_total{command="hoge"} 3',
+      'foo_total{command="bar"} 1',
+    ]
+
+  def test_gauge(self):
+    gauge = metrics.Gauge('foo', 'Foo gauge.')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    assert gauge.get() == 1
+    assert gauge.render()[-1] == 'foo 1'
+
+  def test_gauge_with_function(self):
+    gauge = metrics.Gauge('foo', 'Foo gauge.')
+    gauge.set_function(lambda: 5)
+
+    assert gauge.render()[-1] == 'foo 5'
+
+  def test_histogram(self):
+    histogram = metrics.Histogram('foo_seconds', 'Foo histogram.', ('command', ), buckets=(0.1, 1))
+    histogram.observe(0.05, command='hoge')
+    histogram.observe(0.1, command='hoge')
+    histogram.observe(0.5, command='hoge')
+    histogram.observe(3, command='hoge')
+
+    assert histogram.get_count(command='hoge') == 4
+    assert histogram.get_count(command='bar') == 0
+    assert histogram.render()[2:] == [
+      'foo_seconds_bucket{command="hoge",le="0.1"} 2',
+      'foo_seconds_bucket{command="hoge",le="1"} 3',
+      'foo_seconds_bucket{command="hoge",le="+Inf"} 4',
+      'foo_seconds_sum{command="hoge"} 3.65',
+      'foo_seconds_count{command="hoge"} 4',
+    ]
+
+  def test_default_buckets(self, settings):
+    settings.QUIZ_METRICS_BUCKETS = (0.5, 0.1)
+    histogram = metrics.Histogram('foo_seconds', 'Foo histogram.')
+
+    assert histogram.buckets == (0.1, 0.5, float('inf'))
+
+  def test_escape_label_value(self):
+    counter = metrics.Counter('foo_total', 'Foo counter.', ('room', ))
+    counter.inc(room='a"b\\c\nd')
+
+    assert counter.render()[-1] == 'foo_total{room="a\\"b\\\\c\\nd"} 1'
+
+  def test_remove(self):
+    counter = metrics.Counter('foo_total', 'Foo counter.', ('command', 'room'))
+    counter.inc(command='hoge', room='quiz-1')
+    counter.inc(command='bar', room='quiz-1')
+    counter.inc(command='hoge', room='quiz-2')
+    counter.remove('room', 'quiz-1')
+
+    assert list(counter.values.keys()) == [('hoge', 'quiz-2')]
+
+@pytest.mark.quiz
+class TestQuizMetrics:
+  def test_record_command(self):
+    instance = metrics.QuizMetrics()
+    instance.record_command('getNextQuiz', 'quiz-1', 0.01)
+    instance.record_command('getNextQuiz', 'quiz-1', 0.02, is_failed=True)
+
+    assert instance.commands.get(command='getNextQuiz', room='quiz-1') == 2
+    assert instance.errors.get(command='getNextQuiz', room='quiz-1') == 1
+    assert instance.latency.get_count(command='getNextQuiz', room='quiz-1') == 2
+
+  def test_remove_room(self):
+    instance = metrics.QuizMetrics()
+    instance.record_command('getNextQuiz', 'quiz-1', 0.01, is_failed=True)
+    instance.record_command('getNextQuiz', 'quiz-2', 0.01)
+    instance.remove_room('quiz-1')
+
+    assert instance.commands.get(command='getNextQuiz', room='quiz-1') == 0
+    assert instance.errors.get(command='getNextQuiz', room='quiz-1') == 0
+    assert instance.latency.get_count(command='getNextQuiz', room='quiz-1') == 0
+    assert instance.commands.get(command='getNextQuiz', room='quiz-2') == 1
+
+  def test_render(self):
+    instance = metrics.QuizMetrics()
+    instance.active_connections.inc()
+    content = instance.render()
+
+    assert content.endswith('\n')
+    assert all([f'# TYPE {metric.name} {metric.metric_type}' in content for metric in instance.get_metrics()])
+    assert 'quiz_active_connections 1' in content
@@ -1,6 +1,8 @@
 import pytest
+from asgiref.sync import async_to_sync
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.db.utils import IntegrityError, DataError
 from app_tests import (
   factories,
@@ -9,6 +11,10 @@ from app_tests import (
 )
 from account.models import RoleType
 from quiz import models
+from utils.models import get_current_time
+from datetime import timedelta
+import re
+import time
 
 UserModel = get_user_model()
 
@@ -294,11 +300,33 @@ class TestQuiz(Common):
     assert instance.genre.pk == genre.pk
     assert instance.question == exact_question
     assert instance.answer == exact_answer
+    assert instance.normalized_answers == ([exact_answer] if exact_answer else [])
     assert instance.is_completed == is_completed
     assert str(instance) == str_val
     assert instance.get_short_question() == short_question
     assert instance.get_short_answer() == short_answer
 
+  @pytest.mark.parametrize([
+    'update_fields',
+    'expected',
+  ], [
+    (None, ['ばなな', 'banana']),
+    (['answer', 'alternative_answers'], ['ばなな', 'banana']),
+    (['question'], ['りんご']),
+  ], ids=[
+    'save-all-fields',
+    'save-answers',
+    'save-other-fields',
+  ])
+  def test_update_normalized_answers(self, get_genres, get_creator, update_fields, expected):
+    instance = models.Quiz.objects.create(creator=get_creator, genre=get_genres[0], answer='リンゴ')
+    instance.answer = 'バナナ'
+    instance.alternative_answers = 'ＢＡＮＡＮＡ\n\nバナナ'
+    instance.save(update_fields=update_fields)
+    instance = models.Quiz.objects.get(pk=instance.pk)
+
+    assert instance.normalized_answers == expected
+
   @pytest.mark.parametrize([
     'kwargs',
     'expected',
@@ -539,6 +567,7 @@ class TestQuiz(Common):
     assert instance.genre.pk == _genre.pk
     assert instance.question == 'hogehoge-quiz'
     assert instance.answer == 'fugafuga-answer'
+    assert instance.normalized_answers == ['fugafuga-answer']
     assert instance.is_completed
 
   def test_check_get_response_kwargs_method(self, get_quizzes_info):
@@ -588,6 +617,71 @@ class TestQuiz(Common):
     assert len(estimated) == len(expected)
     assert all([all([val[key] == exact[key] for key in keys]) for val, exact in zip(estimated, expected)])
 
+  def test_update_completed_quiz_counts(self):
+    creators = factories.UserFactory.create_batch(2, is_active=True, role=RoleType.CREATOR)
+    genres = factories.GenreFactory.create_batch(2, is_enabled=True)
+    get_counts = lambda: (
+      [models.Genre.objects.get(pk=obj.pk).completed_quiz_count for obj in genres],
+      [UserModel.objects.get(pk=obj.pk).completed_quiz_count for obj in creators],
+    )
+    # Create quizzes
+    quiz = factories.QuizFactory(creator=creators[0], genre=genres[0], is_completed=True)
+    factories.QuizFactory(creator=creators[1], genre=genres[0], is_completed=False)
+    assert get_counts() == ([1, 0], [1, 0])
+    # Update the other fields
+    quiz.question = 'updated'
+    quiz.save(update_fields=['question'])
+    assert get_counts() == ([1, 0], [1, 0])
+    # Change the genre and the creator
+    instance = models.Quiz.objects.get(pk=quiz.pk)
+    instance.genre = genres[1]
+    instance.creator = creators[1]
+    instance.save()
+    assert get_counts() == ([0, 1], [0, 1])
+    # Change the creation status
+    instance.is_completed = False
+    instance.save(update_fields=['is_completed'])
+    assert get_counts() == ([0, 0], [0, 0])
+    instance.is_completed = True
+    instance.save()
+    assert get_counts() == ([0, 1], [0, 1])
+    # Delete the quiz
+    instance.delete()
+    assert get_counts() == ([0, 0], [0, 0])
+
+  def test_update_completed_quiz_counts_without_loaded_fields(self):
+    creator = factories.UserFactory(is_active=True, role=RoleType.CREATOR)
+    genre = factories.GenreFactory(is_enabled=True)
+    quiz = factories.QuizFactory(creator=creator, genre=genre, is_completed=True)
+    instance = models.Quiz.objects.only('pk', 'question').get(pk=quiz.pk)
+    instance.question = 'updated'
+    instance.save()
+    genre.refresh_from_db()
+
+    assert genre.completed_quiz_count == 1
+
+  def test_cascade_deletion_of_genre(self):
+    creator = factories.UserFactory(is_active=True, role=RoleType.CREATOR)
+    genre = factories.GenreFactory(is_enabled=True)
+    factories.QuizFactory.create_batch(3, creator=creator, genre=genre, is_completed=True)
+    genre.delete()
+    creator.refresh_from_db()
+
+    assert creator.completed_quiz_count == 0
+
+  def test_update_completed_quiz_counts_in_bulk(self, django_assert_num_queries):
+    creators = factories.UserFactory.create_batch(2, is_active=True, role=RoleType.CREATOR)
+    genre = factories.GenreFactory(is_enabled=True)
+    memberships = [(genre.pk, creators[0].pk), (genre.pk, creators[1].pk), (genre.pk, creators[1].pk)]
+
+    # One query is issued for each genre and each creator except the ones whose deltas are cancelled
+    with django_assert_num_queries(2):
+      models.Quiz.update_completed_quiz_counts(added=memberships, removed=[(genre.pk, creators[0].pk)])
+    genre.refresh_from_db()
+
+    assert genre.completed_quiz_count == 2
+    assert [UserModel.objects.get(pk=obj.pk).completed_quiz_count for obj in creators] == [0, 2]
+
 # ============
 # = QuizRoom =
 # ============
@@ -603,6 +697,48 @@ class TestQuizRoom(Common):
     assert isinstance(room, models.QuizRoom)
     assert str(room) == str_val
 
+  @pytest.mark.parametrize([
+    'judgement_type',
+    'expected',
+  ], [
+    (models.JudgementType.MANUAL, False),
+    (models.JudgementType.AUTO, True),
+    (models.JudgementType.TIME_WEIGHTED, True),
+  ], ids=[
+    'manual',
+    'auto',
+    'time-weighted',
+  ])
+  def test_is_auto_judge(self, judgement_type, expected):
+    room = factories.QuizRoomFactory.build(judgement_type=judgement_type)
+
+    assert room.is_auto_judge() == expected
+
+  def test_spectator_token(self):
+    room = factories.QuizRoomFactory.build()
+    other = factories.QuizRoomFactory.build()
+    token = room.get_spectator_token()
+
+    assert models.QuizRoom.get_pk_from_spectator_token(token) == str(room.pk)
+    assert models.QuizRoom.get_pk_from_spectator_token(token) != str(other.pk)
+
+  @pytest.mark.parametrize([
+    'token',
+    'max_age',
+  ], [
+    ('invalid-token', 60),
+    (None, -1),
+  ], ids=[
+    'invalid-token',
+    'expired-token',
+  ])
+  def test_invalid_spectator_token(self, settings, token, max_age):
+    settings.QUIZ_SPECTATOR_TOKEN_MAX_AGE = max_age
+    room = factories.QuizRoomFactory.build()
+    token = token or room.get_spectator_token()
+
+    assert models.QuizRoom.get_pk_from_spectator_token(token) is None
+
   def test_check_validation(self):
     with pytest.raises(DataError):
       instance = factories.QuizRoomFactory.build(name='1'*129)
@@ -640,6 +776,59 @@ class TestQuizRoom(Common):
     assert len(ids) == len(can_use_rooms)
     assert all([pk in exacts for pk in ids])
 
+  def test_for_listing(self, django_assert_num_queries):
+    owner = factories.UserFactory(is_active=True)
+    creators = [
+      factories.UserFactory(is_active=True, role=RoleType.CREATOR, screen_name='creator-b'),
+      factories.UserFactory(is_active=True, role=RoleType.CREATOR, screen_name='creator-a'),
+      factories.UserFactory(is_active=True, role=RoleType.CREATOR, screen_name=''),
+    ]
+    genres = [factories.GenreFactory(name='listing-genre-b'), factories.GenreFactory(name='listing-genre-a')]
+    members = factories.UserFactory.create_batch(3, is_active=True)
+    rooms = [
+      factories.QuizRoomFactory(owner=owner, genres=genres, creators=creators, members=members),
+      factories.QuizRoomFactory(owner=owner, genres=genres[:1], creators=[], members=members[:1]),
+      factories.QuizRoomFactory(owner=owner, genres=[], creators=creators[:1], members=[]),
+    ]
+
+    # Because the names are joined by the database, the genres and the creators are not prefetched
+    with django_assert_num_queries(1):
+      instances = list(models.QuizRoom.objects.filter(pk__in=self.pk_convertor(rooms)).for_listing())
+      owners = [str(instance.owner) for instance in instances]
+      names = [(instance.num_members, instance.get_genres(), instance.get_creators()) for instance in instances]
+
+    assert len(instances) == len(rooms)
+    assert all([name == str(owner) for name in owners])
+    assert names == [
+      (instance.members.count(), models.QuizRoom.objects.get(pk=instance.pk).get_genres(), models.QuizRoom.objects.get(pk=instance.pk).get_creators())
+      for instance in instances
+    ]
+    assert models.QuizRoom.objects.for_listing().get(pk=rooms[0].pk).creator_names == f'{creators[2].email},creator-a,creator-b'
+
+  def test_for_listing_without_string_agg(self, mocker, django_assert_num_queries):
+    owner = factories.UserFactory(is_active=True)
+    creators = [
+      factories.UserFactory(is_active=True, role=RoleType.CREATOR, screen_name='creator-b'),
+      factories.UserFactory(is_active=True, role=RoleType.CREATOR, screen_name=''),
+    ]
+    genres = [factories.GenreFactory(name='listing-genre-b'), factories.GenreFactory(name='listing-genre-a')]
+    members = factories.UserFactory.create_batch(2, is_active=True)
+    rooms = [
+      factories.QuizRoomFactory(owner=owner, genres=genres, creators=creators, members=members),
+      factories.QuizRoomFactory(owner=owner, genres=[], creators=[], members=[]),
+    ]
+    mocker.patch.object(models.QuizRoomQuerySet, 'can_use_string_agg', return_value=False)
+    # The genres and the creators are prefetched instead of being joined by the database
+    with django_assert_num_queries(3):
+      instances = list(models.QuizRoom.objects.filter(pk__in=self.pk_convertor(rooms)).order_by('created_at').for_listing())
+      names = [(instance.num_members, instance.get_genres(), instance.get_creators()) for instance in instances]
+
+    assert not hasattr(instances[0], 'genre_names')
+    assert names == [
+      (2, 'listing-genre-a,listing-genre-b', f'{creators[1].email},creator-b'),
+      (0, '-', '-'),
+    ]
+
   def test_check_is_assigned_method(self, get_several_users):
     key, user = get_several_users
     owner = factories.UserFactory(is_active=True)
@@ -648,6 +837,17 @@ class TestQuizRoom(Common):
 
     assert is_player == instance.is_assigned(user)
 
+  def test_check_ais_assigned_method(self, get_several_users):
+    key, user = get_several_users
+    owner = factories.UserFactory(is_active=True, role=RoleType.GUEST)
+    is_player = key in ['normal-creator', 'normal-guest', 'not-active']
+    instance = factories.QuizRoomFactory(owner=owner, members=[user.pk], is_enabled=True)
+    other = factories.QuizRoomFactory(owner=owner, is_enabled=True)
+
+    assert is_player == async_to_sync(instance.ais_assigned)(user)
+    assert not async_to_sync(other.ais_assigned)(user)
+    assert async_to_sync(other.ais_assigned)(owner)
+
   @pytest.mark.parametrize([
     'is_enabled',
     'role',
@@ -690,6 +890,7 @@ class TestQuizRoom(Common):
     room.score.sequence = {}
     room.score.detail = {}
     room.score.save()
+    old_run = room.score.run
     # Call target method
     room.reset()
     _expected_vals = {
@@ -718,6 +919,7 @@ class TestQuizRoom(Common):
     assert room.score.status == expected['status']
     assert all([pk in expected['seq'] for pk in room.score.sequence.values()])
     assert all([pk in expected['detail'] for pk in room.score.detail.keys()])
+    assert (room.score.run != old_run) == is_enabled
 
   @pytest.mark.parametrize([
     'is_enabled',
@@ -898,6 +1100,83 @@ class TestQuizRoom(Common):
     except Exception as ex:
       pytest.fail(f'Unexpected Error: {ex}')
 
+##
+# @brief Create the rooms and members for the query of relevant rooms
+# @param num_rooms The number of rooms
+# @return users Guest users who join 15 percent of the rooms
+def create_relevant_rooms(num_rooms):
+  users = factories.UserFactory.create_batch(20, is_active=True, role=RoleType.GUEST)
+  # Insert rooms and members in the database directly because the factories are too slow for many records
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f'INSERT INTO {models.QuizRoom._meta.db_table} (id, owner_id, name, max_question, answer_time_limit, judgement_type, use_typewriter_effect, is_enabled, created_at) '
+      "SELECT gen_random_uuid(), (%s::uuid[])[idx %% 20 + 1], 'bench-room-' || idx, 10, 0, %s, false, idx %% 2 = 0, now() FROM generate_series(1, %s) AS idx",
+      [[user.pk for user in users], models.JudgementType.MANUAL, num_rooms],
+    )
+    # Each room has three members so that each user belongs to 15 percent of the rooms
+    cursor.execute(
+      f'INSERT INTO {models.QuizRoom.members.through._meta.db_table} (quizroom_id, user_id) '
+      f"SELECT room.id, (%s::uuid[])[(split_part(room.name, '-', 3)::integer + offsets.val) %% 20 + 1] FROM {models.QuizRoom._meta.db_table} AS room "
+      "CROSS JOIN unnest(ARRAY[1, 7, 13]) AS offsets(val) WHERE room.name LIKE 'bench-room-%%'",
+      [[user.pk for user in users]],
+    )
+    cursor.execute(f'ANALYZE {models.QuizRoom._meta.db_table}')
+    cursor.execute(f'ANALYZE {models.QuizRoom.members.through._meta.db_table}')
+
+  return users
+
+@pytest.fixture
+def get_many_rooms():
+  num_rooms = 100000
+  users = create_relevant_rooms(num_rooms)
+
+  return users[0], num_rooms
+
+@pytest.mark.quiz
+@pytest.mark.model
+@pytest.mark.django_db
+def test_plan_of_collect_relevant_rooms():
+  user = create_relevant_rooms(200)[0]
+  # Because the small tables are scanned sequentially, the planner is forced to use the indexes as with the large tables
+  with connection.cursor() as cursor:
+    cursor.execute('SET LOCAL enable_seqscan = off')
+  plan = models.QuizRoom.objects.collect_relevant_rooms(user).explain()
+  through_table = models.QuizRoom.members.through._meta.db_table
+
+  # Neither the join with members nor `DISTINCT` is executed
+  assert 'Unique' not in plan
+  assert 'Aggregate' not in plan
+  assert 'Join' not in plan
+  # The members of the user are looked up only once by the index
+  assert 'SubPlan' in plan
+  assert len(re.findall(rf'Scan on {through_table}\b', plan)) == 1
+  assert 'Index Cond: (user_id = ' in plan
+
+@pytest.mark.quiz
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_benchmark_collect_relevant_rooms(get_many_rooms):
+  user, num_rooms = get_many_rooms
+  methods = {
+    'join-distinct': lambda: (user.quiz_rooms.all() | user.assigned_rooms.all().exclude(is_enabled=False)).order_by('pk').distinct().order_by('name', '-created_at'),
+    'exists': lambda: models.QuizRoom.objects.collect_relevant_rooms(user),
+  }
+  elapsed_times = {}
+  outputs = {}
+
+  for name, method in methods.items():
+    start = time.perf_counter()
+    queryset = method()
+    # Emulate the paginated list page
+    outputs[name] = (queryset.count(), [room.pk for room in queryset[:15]])
+    elapsed_times[name] = time.perf_counter() - start
+  print(f'[benchmark] collect relevant rooms of {num_rooms} rooms: ' + ', '.join([
+    f'{name} {elapsed_time * 1000:.3f} ms' for name, elapsed_time in elapsed_times.items()
+  ]))
+
+  assert outputs['exists'] == outputs['join-distinct']
+  assert elapsed_times['exists'] < elapsed_times['join-distinct']
+
 # =========
 # = Score =
 # =========
@@ -936,4 +1215,42 @@ class TestScore:
   def test_check_label(self, status, expected):
     instance = factories.ScoreFactory(status=status)
 
-    assert instance.get_status_label() == expected
\ No newline at end of file
+    assert instance.get_status_label() == expected
+
+# ================
+# = AnswerRecord =
+# ================
+@pytest.mark.quiz
+@pytest.mark.model
+@pytest.mark.django_db
+class TestAnswerRecord:
+  def test_check_instance_type(self):
+    player = factories.UserFactory(screen_name='bar')
+    room = factories.QuizRoomFactory(name='foo')
+    record = models.AnswerRecord(room=room, run=room.score.run, index=2, player=player, answer='baz', elapsed_time=1.5, points=3)
+    record.save()
+
+    assert isinstance(record, models.AnswerRecord)
+    assert str(record) == 'foo#2(bar)'
+    assert record.quiz is None
+
+  def test_check_ordering(self):
+    player = factories.UserFactory()
+    room = factories.QuizRoomFactory()
+    models.AnswerRecord.objects.bulk_create([
+      models.AnswerRecord(room=room, run=room.score.run, index=idx, player=player, created_at=get_current_time() + timedelta(seconds=idx))
+      for idx in range(1, 4)
+    ])
+    indices = list(room.answer_records.values_list('index', flat=True))
+
+    assert indices == [3, 2, 1]
+
+  def test_keep_record_after_deleting_quiz(self):
+    player = factories.UserFactory()
+    quiz = factories.QuizFactory()
+    room = factories.QuizRoomFactory()
+    record = models.AnswerRecord.objects.create(room=room, run=room.score.run, index=1, quiz=quiz, player=player)
+    quiz.delete()
+    record.refresh_from_db()
+
+    assert record.quiz is None
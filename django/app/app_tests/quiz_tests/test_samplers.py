@@ -0,0 +1,211 @@
+import pytest
+import random
+import time
+from collections import Counter
+from django.db import connection
+from app_tests import factories
+from quiz import models, samplers
+
+@pytest.mark.quiz
+class TestReservoirSample:
+  @pytest.mark.parametrize([
+    'num_items',
+    'k',
+    'expected',
+  ], [
+    (10, 3, 3),
+    (3, 3, 3),
+    (2, 3, 2),
+    (0, 3, 0),
+    (10, 0, 0),
+  ], ids=[
+    'more-items',
+    'same-items',
+    'less-items',
+    'no-items',
+    'no-samples',
+  ])
+  def test_sample_size(self, num_items, k, expected):
+    items = list(range(num_items))
+    output = samplers.reservoir_sample(iter(items), k)
+
+    assert len(output) == expected
+    assert len(set(output)) == expected
+    assert all([item in items for item in output])
+
+  def test_reproducible_with_rng(self):
+    output = samplers.reservoir_sample(range(1000), 10, rng=random.Random(3))
+    expected = samplers.reservoir_sample(range(1000), 10, rng=random.Random(3))
+
+    assert output == expected
+
+  def test_uniformity(self):
+    rng = random.Random(17)
+    num_items = 20
+    num_trials = 20000
+    counter = Counter()
+
+    for _ in range(num_trials):
+      counter.update(samplers.reservoir_sample(range(num_items), 5, rng=rng))
+    expected = num_trials * 5 / num_items
+
+    assert len(counter) == num_items
+    assert all([abs(count - expected) < expected * 0.1 for count in counter.values()])
+
+  def test_order_is_shuffled(self):
+    rng = random.Random(5)
+    outputs = set([tuple(samplers.reservoir_sample(range(3), 3, rng=rng)) for _ in range(100)])
+
+    assert len(outputs) == 6
+
+@pytest.mark.quiz
+@pytest.mark.django_db
+class TestQuizSampler:
+  @pytest.fixture
+  def get_queryset(self):
+    genre = factories.GenreFactory(is_enabled=True)
+    quizzes = factories.QuizFactory.create_batch(20, genre=genre, is_completed=True)
+    factories.QuizFactory.create_batch(5, genre=genre, is_completed=False)
+    queryset = models.Quiz.objects.collect_quizzes(genres=[genre])
+
+    return queryset, [quiz.pk for quiz in quizzes]
+
+  def test_default_settings(self, settings):
+    settings.QUIZ_SAMPLING_TABLESAMPLE_THRESHOLD = 123
+    settings.QUIZ_SAMPLING_OVERSAMPLING = 4
+    sampler = samplers.QuizSampler()
+
+    assert sampler.get_threshold() == 123
+    assert sampler.get_oversampling() == 4
+
+  def test_custom_settings(self):
+    sampler = samplers.QuizSampler(threshold=5, oversampling=2)
+
+    assert sampler.get_threshold() == 5
+    assert sampler.get_oversampling() == 2
+
+  @pytest.mark.parametrize([
+    'k',
+    'expected',
+  ], [
+    (5, 5),
+    (20, 20),
+    (30, 20),
+    (0, 0),
+  ], ids=[
+    'less-than-candidates',
+    'same-as-candidates',
+    'more-than-candidates',
+    'no-samples',
+  ])
+  def test_sample(self, mocker, get_queryset, k, expected):
+    queryset, pks = get_queryset
+    sampler = samplers.QuizSampler(threshold=1000)
+    # The estimation depends on the statistics left by the other tests
+    mocker.patch.object(sampler, 'estimate_num_records', return_value=len(pks))
+    spy = mocker.spy(sampler, '_sample_by_tablesample')
+    output = sampler.sample(queryset, k)
+
+    assert len(output) == expected
+    assert len(set(output)) == expected
+    assert all([pk in pks for pk in output])
+    assert spy.call_count == 0
+
+  def test_sample_without_sorting(self, settings, django_assert_num_queries, get_queryset):
+    settings.QUIZ_SAMPLING_TABLESAMPLE_THRESHOLD = None
+    queryset, _ = get_queryset
+    sampler = samplers.QuizSampler()
+
+    with django_assert_num_queries(1) as captured:
+      sampler.sample(queryset, 5)
+    sql = captured.captured_queries[0]['sql'].upper()
+
+    assert 'ORDER BY' not in sql
+    assert 'RANDOM()' not in sql
+
+  def test_estimate_num_records(self, get_queryset):
+    queryset, _ = get_queryset
+    sampler = samplers.QuizSampler()
+
+    with connection.cursor() as cursor:
+      cursor.execute(f'ANALYZE {models.Quiz._meta.db_table}')
+
+    assert sampler.estimate_num_records(queryset) == models.Quiz.objects.count()
+
+  def test_sample_by_tablesample(self, mocker, get_queryset):
+    queryset, pks = get_queryset
+    sampler = samplers.QuizSampler(threshold=10, oversampling=4, rng=random.Random(0))
+    mocker.patch.object(sampler, 'estimate_num_records', return_value=1000000)
+    spy = mocker.spy(sampler, '_sample_all')
+    output = sampler.sample(queryset, 5)
+    sql = str(spy.call_args_list[0].args[0].query).upper()
+
+    assert len(output) == 5
+    assert all([pk in pks for pk in output])
+    assert 'TABLESAMPLE SYSTEM (0.002)' in sql
+
+  def test_widen_sampling_rate(self, mocker, get_queryset):
+    queryset, _ = get_queryset
+    sampler = samplers.QuizSampler(oversampling=10)
+    mocker.patch.object(sampler, '_sample_all', return_value=[])
+    output = sampler._sample_by_tablesample(queryset.values_list('pk', flat=True), 5, 100000)
+    percents = [call.args[0].query.where.children[-1].rhs.params[0] for call in sampler._sample_all.call_args_list]
+
+    assert output == []
+    assert percents == pytest.approx([0.05, 0.5, 5.0, 50.0])
+
+  def test_fallback_if_tablesample_is_not_enough(self, mocker, get_queryset):
+    queryset, pks = get_queryset
+    sampler = samplers.QuizSampler(threshold=10)
+    mocker.patch.object(sampler, '_sample_by_tablesample', return_value=[])
+    output = sampler.sample(queryset, 5)
+
+    assert len(output) == 5
+    assert all([pk in pks for pk in output])
+
+  def test_no_tablesample_for_other_vendors(self, mocker, get_queryset):
+    queryset, _ = get_queryset
+    sampler = samplers.QuizSampler(threshold=10)
+    mocker.patch.object(sampler, 'can_use_tablesample', return_value=False)
+    spy = mocker.spy(sampler, '_sample_by_tablesample')
+    output = sampler.sample(queryset, 5)
+
+    assert len(output) == 5
+    assert spy.call_count == 0
+
+@pytest.mark.quiz
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('num_quizzes', [10000, 100000, 1000000], ids=['10k', '100k', '1M'])
+def test_benchmark_sampling(num_quizzes):
+  max_question = 20
+  creator = factories.UserFactory(is_active=True)
+  genre = factories.GenreFactory(is_enabled=True)
+  # Insert quizzes in the database directly because the factories are too slow for millions of records
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f'INSERT INTO {models.Quiz._meta.db_table} (id, creator_id, genre_id, question, answer, alternative_answers, normalized_answers, is_completed) '
+      "SELECT gen_random_uuid(), %s, %s, 'question' || idx, 'answer' || idx, '', '[]'::jsonb, true FROM generate_series(1, %s) AS idx",
+      [creator.pk, genre.pk, num_quizzes],
+    )
+    cursor.execute(f'ANALYZE {models.Quiz._meta.db_table}')
+  queryset = models.Quiz.objects.collect_quizzes(creators=[creator], genres=[genre])
+  sampler = samplers.QuizSampler(threshold=1)
+  methods = {
+    'order-by-random': lambda: list(queryset.order_by('?').values_list('pk', flat=True))[:max_question],
+    'reservoir': lambda: sampler._sample_all(sampler._get_candidates(queryset), max_question),
+    'tablesample': lambda: sampler.sample(queryset, max_question),
+  }
+  elapsed_times = {}
+
+  for name, method in methods.items():
+    start = time.perf_counter()
+    pks = method()
+    elapsed_times[name] = time.perf_counter() - start
+
+    assert len(set(pks)) == max_question
+  print(f'[benchmark] sample {max_question} of {num_quizzes} quizzes: ' + ', '.join([
+    f'{name} {elapsed_time * 1000:.3f} ms' for name, elapsed_time in elapsed_times.items()
+  ]))
+
+  assert elapsed_times['tablesample'] < elapsed_times['order-by-random']
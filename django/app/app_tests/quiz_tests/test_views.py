@@ -2,7 +2,9 @@ import pytest
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from app_tests import (
   status,
@@ -12,6 +14,7 @@ from app_tests import (
 )
 from account.models import RoleType
 from quiz import views, models
+from utils.search import g_trigram_search
 import json
 import tempfile
 import uuid
@@ -559,6 +562,35 @@ class TestQuizRoomView(Common):
 
     assert queryset.count() == expected_count
 
+  @pytest.mark.parametrize('role', [RoleType.MANAGER, RoleType.GUEST], ids=['manager', 'guest'])
+  @pytest.mark.parametrize('use_string_agg', [True, False], ids=['string-agg', 'prefetch'])
+  def test_number_of_queries_in_listpage(self, mocker, client, get_genres, role, use_string_agg):
+    mocker.patch.object(models.QuizRoomQuerySet, 'can_use_string_agg', return_value=use_string_agg)
+    user = factories.UserFactory(is_active=True, role=role)
+    genres = get_genres
+    others = factories.UserFactory.create_batch(3, is_active=True, role=RoleType.CREATOR)
+    client.force_login(user)
+    # Because the availability of the trigram search is checked only once, it is checked in advance
+    g_trigram_search.is_available()
+
+    def get_num_queries(num_rooms):
+      prefix = f'listing-{uuid.uuid4().hex[:8]}'
+      rooms = [
+        factories.QuizRoomFactory(owner=others[0], name=f'{prefix}-{idx}', genres=genres[:2], creators=others, members=[user, others[1]], is_enabled=True)
+        for idx in range(num_rooms)
+      ]
+      # Only the created rooms are shown by the filtering
+      with CaptureQueriesContext(connection) as captured:
+        response = client.get(self.list_view_url, {'name': prefix})
+      models.QuizRoom.objects.filter(pk__in=self.pk_convertor(rooms)).delete()
+
+      assert response.status_code == status.HTTP_200_OK
+      assert len(response.context['rooms']) == num_rooms
+
+      return len(captured.captured_queries)
+
+    assert get_num_queries(1) == get_num_queries(15)
+
   @pytest.mark.parametrize([
     'name',
     'is_player',
@@ -723,7 +755,8 @@ class TestQuizRoomView(Common):
 
     assert response.status_code == exact_types[key]
 
-  def test_post_access_to_updatepage(self, get_users, get_querysets, client):
+  def test_post_access_to_updatepage(self, mocker, get_users, get_querysets, client):
+    mocked_notify = mocker.patch('quiz.views.consumers.notify_room_updated')
     _, user = get_users
     owner = user if user.is_player() else factories.UserFactory(is_active=True, role=RoleType.CREATOR)
     genres, creators, members = get_querysets
@@ -772,6 +805,7 @@ class TestQuizRoomView(Common):
     assert instance.max_question == params['max_question']
     assert instance.use_typewriter_effect == params['use_typewriter_effect']
     assert instance.is_enabled == params['is_enabled']
+    mocked_notify.assert_called_once_with(original.pk)
 
   @pytest.mark.parametrize([
     'data_type',
@@ -974,6 +1008,80 @@ class TestQuizRoomView(Common):
     context = view.get_context_data()
 
     assert view.crumbles[-1].title == 'hoge-room'
+    assert context['spectator_url'].endswith(reverse('quiz:spectate_room', kwargs={'pk': instance.pk, 'token': instance.get_spectator_token()}))
+
+  def test_get_object_in_detailpage(self, get_querysets, rf, django_assert_num_queries):
+    genres, creators, members = get_querysets
+    instance = factories.QuizRoomFactory(
+      owner=factories.UserFactory(is_active=True, role=RoleType.GUEST),
+      genres=list(genres),
+      creators=list(creators),
+      members=list(members),
+      is_enabled=True,
+    )
+    instance.reset()
+    request = rf.get(self.detail_view_url(instance.pk))
+    request.user = members[0]
+    view = views.EnterQuizRoom()
+    view.setup(request, pk=instance.pk)
+    # Call test method
+    room = view.get_object()
+
+    with django_assert_num_queries(0):
+      assert view.get_object() is room
+      assert room.owner.pk == instance.owner.pk
+      assert room.score.pk == instance.score.pk
+      assert len(room.members.all()) == len(members)
+
+  def test_context_of_member_in_detailpage(self, get_querysets, rf):
+    genres, creators, members = get_querysets
+    instance = factories.QuizRoomFactory(
+      owner=factories.UserFactory(is_active=True, role=RoleType.GUEST),
+      genres=list(genres),
+      creators=list(creators),
+      members=list(members),
+      is_enabled=True,
+    )
+    request = rf.get(self.detail_view_url(instance.pk))
+    request.user = members[0]
+    view = views.EnterQuizRoom()
+    # Setup view instance
+    view.setup(request)
+    view.object = instance
+    # Call test method
+    context = view.get_context_data()
+
+    assert 'spectator_url' not in context.keys()
+
+  @pytest.mark.parametrize([
+    'token_type',
+    'expected',
+  ], [
+    ('valid', status.HTTP_200_OK),
+    ('invalid', status.HTTP_403_FORBIDDEN),
+    ('other-room', status.HTTP_403_FORBIDDEN),
+  ], ids=[
+    'valid-token',
+    'invalid-token',
+    'token-of-other-room',
+  ])
+  def test_get_access_to_spectatorpage(self, get_querysets, client, token_type, expected):
+    genres, creators, members = get_querysets
+    owner = factories.UserFactory(is_active=True, role=RoleType.GUEST)
+    instance, other = [
+      factories.QuizRoomFactory(owner=owner, genres=list(genres), creators=list(creators), members=list(members), is_enabled=True)
+      for _ in range(2)
+    ]
+    instance.reset()
+    patterns = {
+      'valid': instance.get_spectator_token(),
+      'invalid': 'invalid-token',
+      'other-room': other.get_spectator_token(),
+    }
+    url = reverse('quiz:spectate_room', kwargs={'pk': instance.pk, 'token': patterns[token_type]})
+    response = client.get(url)
+
+    assert response.status_code == expected
 
 # ===================
 # = UploadGenreView =
@@ -1500,4 +1608,69 @@ class TestQuizAjaxResponse(Common):
         status_code = status.HTTP_403_FORBIDDEN
     response = client.post(self.ajax_url)
 
-    assert response.status_code == status_code
\ No newline at end of file
+    assert response.status_code == status_code
+# ====================
+# = QuizMetricsPage =
+# ====================
+@pytest.mark.quiz
+@pytest.mark.view
+@pytest.mark.django_db
+class TestQuizMetricsPage(Common):
+  metrics_url = reverse('metrics')
+
+  def test_check_get_access(self, get_users, client):
+    exact_types = {
+      'superuser': status.HTTP_200_OK,
+      'manager': status.HTTP_200_OK,
+      'creator': status.HTTP_403_FORBIDDEN,
+      'guest': status.HTTP_403_FORBIDDEN,
+    }
+    key, user = get_users
+    client.force_login(user)
+    response = client.get(self.metrics_url)
+
+    assert response.status_code == exact_types[key]
+
+  @pytest.mark.parametrize([
+    'token',
+    'headers',
+    'status_code',
+  ], [
+    ('metrics-token', {'Authorization': 'Bearer metrics-token'}, status.HTTP_200_OK),
+    ('metrics-token', {'Authorization': 'bearer metrics-token'}, status.HTTP_200_OK),
+    ('metrics-token', {'Authorization': 'Bearer invalid-token'}, status.HTTP_403_FORBIDDEN),
+    ('metrics-token', {'Authorization': 'Basic metrics-token'}, status.HTTP_403_FORBIDDEN),
+    ('metrics-token', {}, status.HTTP_403_FORBIDDEN),
+    ('', {'Authorization': 'Bearer '}, status.HTTP_403_FORBIDDEN),
+  ], ids=[
+    'valid-token',
+    'case-insensitive-scheme',
+    'invalid-token',
+    'invalid-scheme',
+    'without-token',
+    'token-is-not-set',
+  ])
+  def test_access_without_login(self, settings, client, token, headers, status_code):
+    settings.QUIZ_METRICS_TOKEN = token
+    response = client.get(self.metrics_url, headers=headers)
+
+    assert response.status_code == status_code
+
+  def test_spoofed_forwarded_address(self, settings, client):
+    settings.QUIZ_METRICS_TOKEN = 'metrics-token'
+    response = client.get(self.metrics_url, REMOTE_ADDR='127.0.0.1', headers={'X-Forwarded-For': '127.0.0.1'})
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+  def test_valid_get_request(self, mocker, client):
+    from quiz.metrics import QuizMetrics
+    metrics = QuizMetrics()
+    metrics.record_command('getNextQuiz', 'quiz-1', 0.02)
+    mocker.patch('quiz.views.g_metrics', metrics)
+    client.force_login(factories.UserFactory(is_active=True, role=RoleType.MANAGER))
+    response = client.get(self.metrics_url)
+    content = response.content.decode()
+
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    assert '# TYPE quiz_commands_total counter' in content
+    assert 'quiz_commands_total{command="getNextQuiz",room="quiz-1"} 1' in content
@@ -1,5 +1,6 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.db.models import Count
 from django.utils import timezone as djangoTZ
 from dataclasses import dataclass
 from datetime import datetime, timezone
@@ -114,12 +115,16 @@ class DummyModel:
   ([DummyModel(pk='a3', data='v1'),DummyModel(pk='a4', data='v2')], {}, [('v1', 'a3', True), ('v2', 'a4', True)]),
   ([DummyModel(pk='a3', data='v1'),DummyModel(pk='a4', data='v2')], {'is_selected': False}, [('v1', 'a3', False), ('v2', 'a4', False)]),
   ([DummyModel(pk='b3', data='v3', code=143)], {'callback': lambda instance: instance.code}, [('v3(143)', 'b3', True)]),
+  ([DummyModel(pk='b3', data='v3'), DummyModel(pk='b4', data='v4')], {'suffixes': {'b3': 5}}, [('v3(5)', 'b3', True), ('v4(0)', 'b4', True)]),
+  ([DummyModel(pk='b3', data='v3', code=143)], {'callback': lambda instance: instance.code, 'suffixes': {'b3': 7}}, [('v3(7)', 'b3', True)]),
 ], ids=[
   'empty-list',
   'only-one-item',
   'many-items',
   'is-selected-true',
   'set-callback',
+  'set-suffixes',
+  'prioritize-suffixes',
 ])
 def test_creat_options_of_dual_listbox(items, kwargs, expected):
   instance = models.DualListbox()
@@ -225,6 +230,61 @@ def test_collect_options_of_items(selected_type, exact_type, exists_callback):
   assert isinstance(str_options, str)
   assert g_compare_options(options, expected)
 
+@pytest.mark.utils
+@pytest.mark.model
+@pytest.mark.django_db
+@pytest.mark.parametrize([
+  'num_users',
+  'has_selected_items',
+  'expected',
+], [
+  (3, False, 1),
+  (30, False, 1),
+  (3, True, 2),
+  (30, True, 2),
+], ids=[
+  'few-items-without-selection',
+  'many-items-without-selection',
+  'few-items-with-selection',
+  'many-items-with-selection',
+])
+def test_number_of_queries_to_collect_options(django_assert_num_queries, num_users, has_selected_items, expected):
+  users = factories.UserFactory.create_batch(num_users, is_active=True)
+  instance = models.DualListbox()
+  pks = [user.pk for user in users]
+  all_items = UserModel.objects.filter(pk__in=pks).annotate(num_friends=Count('friends'))
+  selected_items = UserModel.objects.filter(pk__in=pks[:2]) if has_selected_items else None
+
+  with django_assert_num_queries(expected):
+    str_options = instance.collect_options_of_items(all_items, selected_items, callback=lambda item: item.num_friends)
+  options = json.loads(str_options)
+
+  assert len(options) == num_users
+  assert all([option['text'].endswith('(0)') for option in options])
+  assert [option['selected'] for option in options] == [has_selected_items] * 2 + [False] * (num_users - 2)
+
+@pytest.mark.utils
+@pytest.mark.model
+@pytest.mark.django_db
+def test_collect_options_with_selected_items_outside_of_all_items(django_assert_num_queries):
+  users = factories.UserFactory.create_batch(3, is_active=True)
+  instance = models.DualListbox()
+  all_items = UserModel.objects.filter(pk__in=[users[0].pk, users[1].pk]).order_by('pk')
+  selected_items = UserModel.objects.filter(pk__in=[users[1].pk, users[2].pk]).order_by('pk')
+  suffixes = {users[0].pk: 3, users[2].pk: 4}
+
+  with django_assert_num_queries(3):
+    str_options = instance.collect_options_of_items(all_items, selected_items, suffixes=suffixes)
+  options = json.loads(str_options)
+  expected = [
+    {"text": f'{users[1]}(0)', "value": str(users[1].pk), "selected": True},
+    {"text": f'{users[2]}(4)', "value": str(users[2].pk), "selected": True},
+    {"text": f'{users[0]}(3)', "value": str(users[0].pk), "selected": False},
+  ]
+
+  assert g_compare_options(options, expected)
+  assert [option['selected'] for option in options] == [True, True, False]
+
 @pytest.mark.utils
 @pytest.mark.model
 @pytest.mark.parametrize([
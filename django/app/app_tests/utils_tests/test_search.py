@@ -0,0 +1,173 @@
+import pytest
+from django.contrib.admin.sites import AdminSite
+from django.contrib.admin.views.main import ORDER_VAR, SEARCH_VAR
+from django.db import connection, DatabaseError
+from django.db.models import FloatField, Value
+from django.urls import reverse_lazy
+from app_tests import factories, status
+from account.models import RoleType
+from quiz import models
+from utils.search import create_trigram_indexes, TrigramSearch, g_trigram_search
+
+@pytest.fixture
+def get_genres():
+  names = ['trigram-apple', 'trigram-pineapple-cake', 'trigram-banana', 'TRIGRAM-APPLE-PIE']
+  genres = [factories.GenreFactory(name=name) for name in names]
+
+  return genres
+
+@pytest.mark.utils
+@pytest.mark.model
+def test_default_config(settings):
+  settings.USE_TRIGRAM_SEARCH = False
+  instance = TrigramSearch()
+
+  assert not instance.is_enabled()
+
+@pytest.mark.utils
+@pytest.mark.model
+def test_custom_config(settings):
+  settings.USE_TRIGRAM_SEARCH = False
+  instance = TrigramSearch(enabled=True)
+
+  assert instance.is_enabled()
+
+@pytest.mark.utils
+@pytest.mark.model
+@pytest.mark.django_db
+def test_trigram_indexes_exist():
+  with connection.cursor() as cursor:
+    cursor.execute("SELECT indexname FROM pg_indexes WHERE indexname LIKE '%%_trgm_idx'")
+    names = set([row[0] for row in cursor.fetchall()])
+
+  expected = {'quiz_genre_name_trgm_idx', 'quiz_room_name_trgm_idx', 'account_user_screen_name_trgm_idx'}
+
+  # In the case of that the extension is not available, the migration skips creating the indexes
+  assert names == (expected if g_trigram_search.is_available() else set())
+
+@pytest.mark.utils
+@pytest.mark.model
+@pytest.mark.django_db
+class TestTrigramSearch:
+  def test_search_with_ranking(self, require_trigram_search, get_genres):
+    genres = get_genres
+    queryset = models.Genre.objects.filter(pk__in=[obj.pk for obj in genres])
+    output = list(TrigramSearch(enabled=True).search(queryset, 'name', 'trigram-apple'))
+
+    # The case is ignored and the exact match is ranked first
+    assert [obj.name for obj in output[:1]] == ['trigram-apple']
+    assert set([obj.pk for obj in output]) == set([genres[0].pk, genres[1].pk, genres[3].pk])
+    assert all([x_val.similarity >= y_val.similarity for x_val, y_val in zip(output[:-1], output[1:])])
+
+  @pytest.mark.parametrize('is_enabled', [True, False], ids=['enabled', 'disabled'])
+  def test_fallback(self, mocker, get_genres, is_enabled):
+    genres = get_genres
+    instance = TrigramSearch(enabled=is_enabled)
+    mocker.patch.object(instance, 'is_available', return_value=False)
+    queryset = models.Genre.objects.filter(pk__in=[obj.pk for obj in genres])
+    output = instance.search(queryset, 'name', 'apple')
+    sql = str(output.query).upper()
+
+    assert set([obj.pk for obj in output]) == set([genres[0].pk, genres[1].pk, genres[3].pk])
+    assert 'SIMILARITY' not in sql
+    assert output.query.order_by == ()
+
+  def test_empty_keyword(self, get_genres):
+    queryset = models.Genre.objects.filter(pk__in=[obj.pk for obj in get_genres])
+    output = TrigramSearch(enabled=True).search(queryset, 'name', '')
+
+    assert output is queryset
+
+  @pytest.mark.parametrize([
+    'ordering',
+    'expected',
+  ], [
+    (['-created_at'], ('-similarity', '-created_at')),
+    ([], ('-similarity', 'name', '-created_at')),
+  ], ids=[
+    'specific-ordering',
+    'default-ordering',
+  ])
+  def test_keep_original_ordering(self, mocker, get_genres, ordering, expected):
+    instance = TrigramSearch(enabled=True)
+    mocker.patch.object(instance, 'is_available', return_value=True)
+    queryset = models.Genre.objects.filter(pk__in=[obj.pk for obj in get_genres]).order_by(*ordering)
+    output = instance.search(queryset, 'name', 'apple')
+
+    assert 'similarity' in output.query.annotations
+    assert output.query.order_by == expected
+
+  def test_is_available_is_cached(self, django_assert_num_queries):
+    instance = TrigramSearch()
+
+    with django_assert_num_queries(1):
+      instance.is_available()
+      instance.is_available()
+    instance.clear()
+
+    assert instance.availabilities == {}
+
+@pytest.mark.utils
+@pytest.mark.model
+@pytest.mark.django_db
+def test_create_trigram_indexes_without_extension(mocker):
+  schema_editor = mocker.MagicMock()
+  schema_editor.connection = connection
+  schema_editor.execute.side_effect = DatabaseError('permission denied')
+  create_trigram_indexes(schema_editor, [('foo_idx', 'foo', 'name')])
+
+  assert schema_editor.execute.call_count == 1
+  assert 'CREATE EXTENSION' in schema_editor.execute.call_args.args[0]
+
+@pytest.mark.utils
+@pytest.mark.view
+@pytest.mark.django_db
+class TestTrigramSearchAdminMixin:
+  changelist_url = reverse_lazy('admin:quiz_genre_changelist')
+
+  @pytest.fixture
+  def get_admin_client(self, client):
+    user = factories.UserFactory(is_active=True, is_staff=True, is_superuser=True, role=RoleType.MANAGER)
+    client.force_login(user)
+
+    return client
+
+  @pytest.fixture
+  def mock_similarity(self, mocker):
+    # Emulate the trigram similarity so that the change list can be evaluated without `pg_trgm` extension
+    mocker.patch.object(g_trigram_search, 'is_available', return_value=True)
+    mocker.patch.object(
+      g_trigram_search,
+      'annotate',
+      side_effect=lambda queryset, field_name, keyword, alias: queryset.annotate(**{alias: Value(1.0, output_field=FloatField())}),
+    )
+
+  @pytest.mark.parametrize([
+    'params',
+    'expected',
+  ], [
+    ({SEARCH_VAR: 'apple'}, ['-trigram_similarity', 'name', '-created_at']),
+    ({SEARCH_VAR: 'apple', ORDER_VAR: '-1'}, ['-trigram_similarity', '-name']),
+    ({}, ['name', '-created_at']),
+  ], ids=[
+    'with-search-term',
+    'with-search-term-and-specific-order',
+    'without-search-term',
+  ])
+  def test_changelist_ordering(self, mock_similarity, get_admin_client, get_genres, params, expected):
+    client = get_admin_client
+    response = client.get(self.changelist_url, params)
+    changelist = response.context['cl']
+
+    assert response.status_code == status.HTTP_200_OK
+    assert list(changelist.queryset.query.order_by) == expected
+    assert changelist.result_count == (3 if params else models.Genre.objects.count())
+
+  def test_changelist_ranking(self, require_trigram_search, get_admin_client, get_genres):
+    client = get_admin_client
+    response = client.get(self.changelist_url, {SEARCH_VAR: 'trigram-apple'})
+    results = list(response.context['cl'].result_list)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert results[0].name == 'trigram-apple'
+    assert all([x_val.trigram_similarity >= y_val.trigram_similarity for x_val, y_val in zip(results[:-1], results[1:])])
@@ -178,6 +178,62 @@ CHANNEL_LAYERS = {
         },
     },
 }
+# Define state backend of quiz rooms shared by all ASGI workers
+QUIZ_STATE_BACKEND = {
+    'BACKEND': 'quiz.backends.RedisStateBackend',
+    'CONFIG': {
+        'hosts': CHANNEL_LAYERS['default']['CONFIG']['hosts'],
+        'prefix': 'quiz-state',
+        'expiry': 24 * 60 * 60,
+    },
+}
+# Define cached index of completed quizzes for each genre and creator
+QUIZ_INDEX = {
+    'hosts': CHANNEL_LAYERS['default']['CONFIG']['hosts'],
+    'prefix': 'quiz-index',
+}
+# Describes whether the partial match search results are ranked by trigram similarity (pg_trgm extension is required)
+USE_TRIGRAM_SEARCH = True
+# Define cached choices of the quiz search form (the timeout of 0 disables the cache)
+QUIZ_SEARCH_CHOICES = {
+    'alias': 'default',
+    'prefix': 'quiz-search-choices',
+    'timeout': 300,
+}
+# Maximum interval in seconds between two writes of the score record during a game
+QUIZ_SCORE_FLUSH_INTERVAL = 30
+# Points for the fastest correct answer and reference time in seconds used by the time-weighted judgement
+QUIZ_TIME_WEIGHTED_MAX_POINTS = 10
+QUIZ_TIME_WEIGHTED_REFERENCE_TIME = 30
+# Debounce window in seconds to coalesce join and leave messages of each quiz room
+QUIZ_PRESENCE_DEBOUNCE_TIME = 0.2
+# Use the native async ORM in the quiz consumer instead of database_sync (Default: False)
+# Note: Because the native async ORM runs in the thread shared with HTTP views, the queries with it do not use the dedicated executor.
+QUIZ_USE_ASYNC_ORM = False
+# Run the database access of database_sync in the dedicated thread pool instead of the thread shared with HTTP views (Default: True)
+QUIZ_DB_EXECUTOR = True
+# Number of worker threads of the dedicated executor (None: the maximum size of the connection pool)
+QUIZ_DB_EXECUTOR_WORKERS = None
+# Bearer token to access the metrics endpoint without login (Empty string: only the manager can access it)
+QUIZ_METRICS_TOKEN = os.getenv('DJANGO_METRICS_TOKEN', '')
+# Upper bounds of latency histogram buckets in seconds
+QUIZ_METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# Minimum interval in seconds between two snapshots for spectators of each quiz room
+QUIZ_SPECTATOR_INTERVAL = 1.0
+# Maximum age in seconds of the token to spectate the quiz room
+QUIZ_SPECTATOR_TOKEN_MAX_AGE = 24 * 60 * 60
+# Maximum age in seconds of the token to resume the connection of the quiz room
+QUIZ_RESUME_TOKEN_MAX_AGE = 10 * 60
+# Grace period in seconds to keep the state of the quiz room which nobody joins
+QUIZ_ROOM_STATE_TTL = 60
+# Maximum period in seconds to keep the state of the quiz room without any access
+QUIZ_ROOM_STATE_MAX_IDLE = 60 * 60
+# Interval in seconds of the sweeper which evicts the expired state of each quiz room
+QUIZ_ROOM_STATE_SWEEP_INTERVAL = 30
+# Estimated number of quizzes from which the sequence is sampled by TABLESAMPLE (None: never used)
+QUIZ_SAMPLING_TABLESAMPLE_THRESHOLD = 100000
+# Ratio of the expected number of quizzes picked by TABLESAMPLE to the number of questions
+QUIZ_SAMPLING_OVERSAMPLING = 10
 # Define session engine
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_COOKIE_AGE = 3 * 24 * 60 * 60
@@ -17,10 +17,12 @@ Including another URLconf
 from django.conf.urls.i18n import i18n_patterns
 from django.contrib import admin
 from django.urls import path, include
+from quiz.views import QuizMetricsPage
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('i18n/', include('django.conf.urls.i18n')),
+    path('metrics', QuizMetricsPage.as_view(), name='metrics'),
 ] + i18n_patterns(
     path('', include('utils.urls')),
     path('passkey/', include('passkey.urls')),
@@ -1,13 +1,15 @@
 from django.contrib import admin
-from .models import Genre, Quiz, QuizRoom, Score
+from utils.admin import TrigramSearchAdminMixin
+from .models import Genre, Quiz, QuizRoom, Score, AnswerRecord
 
 @admin.register(Genre)
-class GenreAdmin(admin.ModelAdmin):
+class GenreAdmin(TrigramSearchAdminMixin, admin.ModelAdmin):
   model = Genre
   fields = ('name', 'is_enabled')
   list_display = ('name', 'is_enabled')
   list_filter = ('name', 'is_enabled')
-  search_fields = ('name', 'is_enabled')
+  search_fields = ('name', )
+  trigram_search_field = 'name'
 
 @admin.register(Quiz)
 class QuizAdmin(admin.ModelAdmin):
@@ -18,12 +20,13 @@ class QuizAdmin(admin.ModelAdmin):
   search_fields = ('creator__email', 'creator__screen_name', 'genre__name', 'is_completed')
 
 @admin.register(QuizRoom)
-class QuizRoomAdmin(admin.ModelAdmin):
+class QuizRoomAdmin(TrigramSearchAdminMixin, admin.ModelAdmin):
   model = QuizRoom
   fields = ('owner', 'name', 'genres', 'creators', 'members', 'max_question', 'is_enabled')
   list_display = ('owner', 'name', 'is_enabled')
   list_filter = ('owner', 'name', 'is_enabled')
   search_fields = ('owner__email', 'owner__screen_name', 'name', 'is_enabled')
+  trigram_search_field = 'name'
 
 @admin.register(Score)
 class ScoreAdmin(admin.ModelAdmin):
@@ -31,4 +34,13 @@ class ScoreAdmin(admin.ModelAdmin):
   fields = ('room', 'status', 'index', 'sequence', 'detail')
   list_display = ('room', 'status', 'index')
   list_filter = ('room', 'status', 'index')
-  search_fields = ('room__name', 'status')
\ No newline at end of file
+  search_fields = ('room__name', 'status')
+
+@admin.register(AnswerRecord)
+class AnswerRecordAdmin(admin.ModelAdmin):
+  model = AnswerRecord
+  fields = ('room', 'run', 'index', 'quiz', 'player', 'answer', 'elapsed_time', 'points', 'created_at')
+  readonly_fields = ('run', )
+  list_display = ('room', 'index', 'player', 'points', 'created_at')
+  list_filter = ('room', 'player')
+  search_fields = ('room__name', 'player__email', 'player__screen_name', 'answer')
@@ -0,0 +1,461 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+from redis import asyncio as aioredis
+from weakref import WeakKeyDictionary
+import asyncio
+import json
+
+class BaseStateBackend:
+  ##
+  # @brief Constructor of BaseStateBackend
+  # @param kwargs Named arguments (Not used)
+  def __init__(self, **kwargs):
+    pass
+
+  ##
+  # @brief Create room state if it does not exist yet
+  # @param name Room name
+  # @param player_ids All player IDs
+  # @param fields Initial values of the shared fields (e.g., status, index)
+  # @return bool Judgement result
+  # @retval True  The room state is created by this call
+  # @retval False The room state has already existed
+  async def create_room(self, name, player_ids, fields):
+    raise NotImplementedError
+
+  ##
+  # @brief Check whether the room state exists or not
+  # @param name Room name
+  # @return bool Judgement result
+  async def exists(self, name):
+    raise NotImplementedError
+
+  ##
+  # @brief Delete room state
+  # @param name Room name
+  async def delete_room(self, name):
+    raise NotImplementedError
+
+  ##
+  # @brief Get player list
+  # @param name Room name
+  # @return players Dictionary of player's status
+  async def get_players(self, name):
+    raise NotImplementedError
+
+  ##
+  # @brief Update player's status
+  # @param name Room name
+  # @param pk Player's primary key
+  # @param is_entered Describes whether the player is in the room or not
+  async def update_player(self, name, pk, is_entered):
+    raise NotImplementedError
+
+  ##
+  # @brief Get all answers
+  # @param name Room name
+  # @return answers Dictionary of player's answer
+  async def get_answers(self, name):
+    raise NotImplementedError
+
+  ##
+  # @brief Replace all answers
+  # @param name Room name
+  # @param answers New answers
+  async def reset_answers(self, name, answers):
+    raise NotImplementedError
+
+  ##
+  # @brief Add player's answer
+  # @param name Room name
+  # @param pk Player's primary key
+  # @param value Player's answer
+  # @return num_answers The number of answers after updating
+  # @return num_players The number of players
+  async def add_answer(self, name, pk, value):
+    raise NotImplementedError
+
+  ##
+  # @brief Update player's answer only if the current status matches the expected one
+  # @param name Room name
+  # @param pk Player's primary key
+  # @param answer Player's answer
+  # @param timestamp Received time of the answer (UNIX time)
+  # @param status Expected status
+  # @return bool Judgement result
+  # @retval True  The answer is stored
+  # @retval False The answer is rejected
+  # @note The elapsed time is calculated from the `current_time` field in the same operation.
+  async def update_answer(self, name, pk, answer, timestamp, status):
+    raise NotImplementedError
+
+  ##
+  # @brief Get shared fields
+  # @param name Room name
+  # @param keys Target field names (If no key is given, all fields are returned)
+  # @return fields Dictionary of shared fields
+  async def get_fields(self, name, *keys):
+    raise NotImplementedError
+
+  ##
+  # @brief Update shared fields
+  # @param name Room name
+  # @param fields Target fields
+  async def update_fields(self, name, **fields):
+    raise NotImplementedError
+
+  ##
+  # @brief Update shared fields only if the current values match the expected ones
+  # @param name Room name
+  # @param expected Expected values of the shared fields
+  # @param fields Target fields
+  # @return bool Judgement result
+  # @retval True  The fields are updated by this call
+  # @retval False The fields are not updated because the current values are different
+  async def compare_and_update_fields(self, name, expected, **fields):
+    raise NotImplementedError
+
+  ##
+  # @brief Increment the integer value of the shared field atomically
+  # @param name Room name
+  # @param key Target field name
+  # @param amount Increment value (Default: 1)
+  # @return value The value after incrementing
+  # @note If the field does not exist, the value is regarded as 0.
+  async def increment_field(self, name, key, amount=1):
+    raise NotImplementedError
+
+  ##
+  # @brief Update the number of spectators atomically
+  # @param name Room name
+  # @param amount Increment value (negative value means decrement)
+  # @return count The number of spectators after updating
+  # @note The counter is kept even if the room state is deleted because the spectators stay connected across games.
+  async def update_spectators(self, name, amount):
+    raise NotImplementedError
+
+  ##
+  # @brief Get the number of spectators
+  # @param name Room name
+  # @return count The number of spectators
+  async def get_num_spectators(self, name):
+    raise NotImplementedError
+
+class InMemoryStateBackend(BaseStateBackend):
+  ##
+  # @brief Constructor of InMemoryStateBackend
+  # @param kwargs Named arguments
+  def __init__(self, **kwargs):
+    super().__init__(**kwargs)
+    self.rooms = {}
+    self.spectators = {}
+
+  ##
+  # @brief Get room data
+  # @param name Room name
+  # @return Dictionary which consists of players, answers, and fields
+  def _get_room(self, name):
+    return self.rooms.setdefault(name, {'players': {}, 'answers': {}, 'fields': {}})
+
+  async def create_room(self, name, player_ids, fields):
+    is_created = name not in self.rooms
+    room = self._get_room(name)
+
+    for key in player_ids:
+      room['players'].setdefault(key, False)
+    for key, val in fields.items():
+      room['fields'].setdefault(key, val)
+
+    return is_created
+
+  async def exists(self, name):
+    return name in self.rooms
+
+  async def delete_room(self, name):
+    if name in self.rooms.keys():
+      del self.rooms[name]
+
+  async def get_players(self, name):
+    return dict(self._get_room(name)['players'])
+
+  async def update_player(self, name, pk, is_entered):
+    self._get_room(name)['players'][pk] = is_entered
+
+  async def get_answers(self, name):
+    return dict(self._get_room(name)['answers'])
+
+  async def reset_answers(self, name, answers):
+    self._get_room(name)['answers'] = dict(answers)
+
+  async def add_answer(self, name, pk, value):
+    room = self._get_room(name)
+    room['answers'][pk] = value
+
+    return len(room['answers']), len(room['players'])
+
+  async def update_answer(self, name, pk, answer, timestamp, status):
+    room = self._get_room(name)
+    is_valid = room['fields'].get('status') == status
+
+    if is_valid:
+      room['answers'][pk] = {
+        'answer': answer,
+        'time': timestamp - room['fields'].get('current_time', 0),
+      }
+
+    return is_valid
+
+  async def get_fields(self, name, *keys):
+    fields = self._get_room(name)['fields']
+
+    if keys:
+      fields = dict([(key, fields[key]) for key in keys if key in fields.keys()])
+
+    return dict(fields)
+
+  async def update_fields(self, name, **fields):
+    self._get_room(name)['fields'].update(fields)
+
+  async def compare_and_update_fields(self, name, expected, **fields):
+    current = self._get_room(name)['fields']
+    is_valid = all([key in current.keys() and current[key] == val for key, val in expected.items()])
+
+    if is_valid:
+      current.update(fields)
+
+    return is_valid
+
+  async def increment_field(self, name, key, amount=1):
+    fields = self._get_room(name)['fields']
+    fields[key] = fields.get(key, 0) + amount
+
+    return fields[key]
+
+  async def update_spectators(self, name, amount):
+    count = max(self.spectators.get(name, 0) + amount, 0)
+
+    if count > 0:
+      self.spectators[name] = count
+    else:
+      self.spectators.pop(name, None)
+
+    return count
+
+  async def get_num_spectators(self, name):
+    return self.spectators.get(name, 0)
+
+class RedisStateBackend(BaseStateBackend):
+  ##
+  # @brief Lua script to store the answer only while the room is in the expected status
+  update_answer_script = '''
+    local fields = redis.call('HMGET', KEYS[1], 'status', 'current_time')
+    if fields[1] == ARGV[1] then
+      local elapsed_time = tonumber(ARGV[4]) - (tonumber(fields[2]) or 0)
+      redis.call('HSET', KEYS[2], ARGV[2], cjson.encode({answer = ARGV[3], time = elapsed_time}))
+      return 1
+    end
+    return 0
+  '''
+
+  ##
+  # @brief Lua script to update the fields only if the current values match the expected ones
+  compare_and_update_script = '''
+    local num_expected = tonumber(ARGV[1])
+    for idx = 1, num_expected do
+      if redis.call('HGET', KEYS[1], ARGV[2 * idx]) ~= ARGV[2 * idx + 1] then
+        return 0
+      end
+    end
+    for idx = 2 * num_expected + 2, #ARGV, 2 do
+      redis.call('HSET', KEYS[1], ARGV[idx], ARGV[idx + 1])
+    end
+    return 1
+  '''
+
+  ##
+  # @brief Lua script to update the number of spectators and to remove the counter if no spectator remains
+  update_spectators_script = '''
+    local count = redis.call('INCRBY', KEYS[1], ARGV[1])
+    if count <= 0 then
+      redis.call('DEL', KEYS[1])
+      return 0
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return count
+  '''
+
+  ##
+  # @brief Constructor of RedisStateBackend
+  # @param hosts Redis hosts which consist of either (host, port) tuple or URL string
+  # @param prefix Key prefix (Default: 'quiz-state')
+  # @param expiry Expiry time of each key in seconds (Default: 86400)
+  # @param kwargs Named arguments
+  def __init__(self, hosts=None, prefix='quiz-state', expiry=86400, **kwargs):
+    super().__init__(**kwargs)
+    host = (hosts or [('localhost', 6379)])[0]
+    self.client_kwargs = {'url': host} if isinstance(host, str) else {'host': host[0], 'port': host[1]}
+    self.prefix = prefix
+    self.expiry = expiry
+    self._clients = WeakKeyDictionary()
+
+  ##
+  # @brief Get redis client bound to the running event loop
+  # @return client Instance of redis.asyncio.Redis
+  def _get_client(self):
+    loop = asyncio.get_running_loop()
+    client = self._clients.get(loop)
+
+    if client is None:
+      kwargs = dict(self.client_kwargs)
+      url = kwargs.pop('url', None)
+      client = aioredis.Redis.from_url(url, decode_responses=True) if url else aioredis.Redis(decode_responses=True, **kwargs)
+      self._clients[loop] = client
+
+    return client
+
+  ##
+  # @brief Get redis keys of the room
+  # @param name Room name
+  # @return players_key, answers_key, fields_key
+  def _get_keys(self, name):
+    base = f'{self.prefix}:{name}'
+
+    return f'{base}:players', f'{base}:answers', f'{base}:fields'
+
+  async def create_room(self, name, player_ids, fields):
+    client = self._get_client()
+    players_key, answers_key, fields_key = self._get_keys(name)
+
+    async with client.pipeline(transaction=True) as pipe:
+      pipe.exists(fields_key)
+
+      for key in player_ids:
+        pipe.hsetnx(players_key, key, json.dumps(False))
+      for key, val in fields.items():
+        pipe.hsetnx(fields_key, key, json.dumps(val))
+      for key in (players_key, answers_key, fields_key):
+        pipe.expire(key, self.expiry)
+      results = await pipe.execute()
+
+    return not results[0]
+
+  async def exists(self, name):
+    _, _, fields_key = self._get_keys(name)
+    count = await self._get_client().exists(fields_key)
+
+    return count > 0
+
+  async def delete_room(self, name):
+    await self._get_client().delete(*self._get_keys(name))
+
+  async def get_players(self, name):
+    players_key, _, _ = self._get_keys(name)
+    players = await self._get_client().hgetall(players_key)
+
+    return {key: json.loads(val) for key, val in players.items()}
+
+  async def update_player(self, name, pk, is_entered):
+    players_key, _, _ = self._get_keys(name)
+    await self._get_client().hset(players_key, pk, json.dumps(is_entered))
+
+  async def get_answers(self, name):
+    _, answers_key, _ = self._get_keys(name)
+    answers = await self._get_client().hgetall(answers_key)
+
+    return {key: json.loads(val) for key, val in answers.items()}
+
+  async def reset_answers(self, name, answers):
+    client = self._get_client()
+    _, answers_key, _ = self._get_keys(name)
+
+    async with client.pipeline(transaction=True) as pipe:
+      pipe.delete(answers_key)
+
+      if answers:
+        pipe.hset(answers_key, mapping={key: json.dumps(val) for key, val in answers.items()})
+        pipe.expire(answers_key, self.expiry)
+      await pipe.execute()
+
+  async def add_answer(self, name, pk, value):
+    client = self._get_client()
+    players_key, answers_key, _ = self._get_keys(name)
+
+    async with client.pipeline(transaction=True) as pipe:
+      pipe.hset(answers_key, pk, json.dumps(value))
+      pipe.expire(answers_key, self.expiry)
+      pipe.hlen(answers_key)
+      pipe.hlen(players_key)
+      _, _, num_answers, num_players = await pipe.execute()
+
+    return num_answers, num_players
+
+  async def update_answer(self, name, pk, answer, timestamp, status):
+    _, answers_key, fields_key = self._get_keys(name)
+    result = await self._get_client().eval(
+      self.update_answer_script, 2, fields_key, answers_key,
+      json.dumps(status), pk, answer, timestamp,
+    )
+
+    return bool(result)
+
+  async def get_fields(self, name, *keys):
+    _, _, fields_key = self._get_keys(name)
+
+    if keys:
+      values = await self._get_client().hmget(fields_key, keys)
+      fields = dict([(key, val) for key, val in zip(keys, values) if val is not None])
+    else:
+      fields = await self._get_client().hgetall(fields_key)
+
+    return {key: json.loads(val) for key, val in fields.items()}
+
+  async def update_fields(self, name, **fields):
+    client = self._get_client()
+    _, _, fields_key = self._get_keys(name)
+
+    async with client.pipeline(transaction=True) as pipe:
+      pipe.hset(fields_key, mapping={key: json.dumps(val) for key, val in fields.items()})
+      pipe.expire(fields_key, self.expiry)
+      await pipe.execute()
+
+  async def compare_and_update_fields(self, name, expected, **fields):
+    _, _, fields_key = self._get_keys(name)
+    args = [len(expected)]
+
+    for key, val in list(expected.items()) + list(fields.items()):
+      args += [key, json.dumps(val)]
+    result = await self._get_client().eval(self.compare_and_update_script, 1, fields_key, *args)
+
+    return bool(result)
+
+  async def increment_field(self, name, key, amount=1):
+    _, _, fields_key = self._get_keys(name)
+    value = await self._get_client().hincrby(fields_key, key, amount)
+
+    return value
+
+  ##
+  # @brief Get redis key of the spectator counter
+  # @param name Room name
+  # @return key Redis key
+  def _get_spectators_key(self, name):
+    return f'{self.prefix}:{name}:spectators'
+
+  async def update_spectators(self, name, amount):
+    count = await self._get_client().eval(self.update_spectators_script, 1, self._get_spectators_key(name), amount, self.expiry)
+
+    return int(count)
+
+  async def get_num_spectators(self, name):
+    count = await self._get_client().get(self._get_spectators_key(name))
+
+    return max(int(count or 0), 0)
+
+##
+# @brief Create state backend based on `QUIZ_STATE_BACKEND` setting
+# @return Instance of the state backend
+def get_state_backend():
+  config = getattr(settings, 'QUIZ_STATE_BACKEND', {})
+  backend_class = import_string(config.get('BACKEND', 'quiz.backends.InMemoryStateBackend'))
+
+  return backend_class(**config.get('CONFIG', {}))
@@ -0,0 +1,140 @@
+from logging import getLogger
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import Count, Q
+from redis.exceptions import RedisError
+from .models import Genre
+import time
+
+UserModel = get_user_model()
+
+class SearchChoiceCache:
+  ##
+  # @brief Constructor of SearchChoiceCache
+  # @param alias Cache alias (Default: None)
+  # @param prefix Key prefix (Default: None)
+  # @param timeout Lifetime of each entry in seconds (Default: None)
+  # @note If the arguments are None, the values are given by `QUIZ_SEARCH_CHOICES` setting.
+  # @note The entries are shared by the users with manager role and are stored for each creator.
+  def __init__(self, alias=None, prefix=None, timeout=None):
+    self.alias = alias
+    self.prefix = prefix
+    self.timeout = timeout
+    self.logger = getLogger(__name__)
+
+  ##
+  # @brief Get configuration of the cache
+  # @return config Dictionary of `alias`, `prefix`, and `timeout`
+  # @note The `timeout` of 0 means that the cache is disabled and that of None means that the entries never expire.
+  def get_config(self):
+    config = getattr(settings, 'QUIZ_SEARCH_CHOICES', {})
+
+    return {
+      'alias': self.alias or config.get('alias', 'default'),
+      'prefix': self.prefix or config.get('prefix', 'quiz-search-choices'),
+      'timeout': self.timeout if self.timeout is not None else config.get('timeout', 300),
+    }
+
+  ##
+  # @brief Get cache instance
+  # @return Instance of django cache
+  def get_cache(self):
+    return caches[self.get_config()['alias']]
+
+  ##
+  # @brief Get cache key
+  # @param args Parts of the key
+  # @return key Cache key
+  def get_key(self, *args):
+    parts = [self.get_config()['prefix']] + [str(arg) for arg in args]
+
+    return ':'.join(parts)
+
+  ##
+  # @brief Get the current version of the entries
+  # @return version Current version
+  # @note The initial version is based on the current time so that the entries of the evicted version are never reused.
+  def get_version(self):
+    cache = self.get_cache()
+    key = self.get_key('version')
+    version = cache.get(key)
+
+    if version is None:
+      cache.add(key, time.time_ns(), timeout=None)
+      version = cache.get(key)
+
+    return version
+
+  ##
+  # @brief Invalidate all entries by updating the version
+  def invalidate(self):
+    cache = self.get_cache()
+    key = self.get_key('version')
+
+    try:
+      cache.incr(key)
+    except ValueError:
+      # In the case of that the version has not been stored yet
+      cache.add(key, time.time_ns(), timeout=None)
+    except RedisError as ex:
+      self.logger.error(f'[SearchChoiceCache]Failed to invalidate the choices: {ex}')
+
+  ##
+  # @brief Get the scope of the entry
+  # @param user Instance of UserModel
+  # @return scope Scope name
+  def get_scope(self, user):
+    return 'manager' if user.has_manager_role() else f'creator:{user.pk}'
+
+  ##
+  # @brief Collect the choices from the database
+  # @param user Instance of UserModel
+  # @return choices Dictionary of `genres` and `creators`
+  # @note Each item of `genres` consists of primary-key, name, and the number of quizzes.
+  # @note Each item of `creators` consists of primary-key, name, the number of quizzes, and code.
+  def build(self, user):
+    if user.has_manager_role():
+      num_quizzes = Count('quizzes')
+      creators = UserModel.objects.collect_creators()
+    else:
+      num_quizzes = Count('quizzes', filter=Q(quizzes__creator=user))
+      creators = UserModel.objects.filter(pk__in=[user.pk])
+    genres = Genre.objects.collect_active_genres().annotate(num_quizzes=num_quizzes)
+    creators = creators.annotate(num_quizzes=Count('quizzes'))
+    choices = {
+      'genres': [(str(instance.pk), str(instance), instance.num_quizzes) for instance in genres],
+      'creators': [(str(instance.pk), str(instance), instance.num_quizzes, instance.code) for instance in creators],
+    }
+
+    return choices
+
+  ##
+  # @brief Get the choices of the user
+  # @param user Instance of UserModel
+  # @return choices Dictionary of `genres` and `creators`
+  # @note If the cache is not available, the choices are collected from the database.
+  def get(self, user):
+    timeout = self.get_config()['timeout']
+
+    if timeout == 0:
+      return self.build(user)
+
+    try:
+      key = self.get_key(self.get_version(), self.get_scope(user))
+      choices = self.get_cache().get(key)
+    except RedisError as ex:
+      self.logger.warning(f'[SearchChoiceCache]Failed to read the choices: {ex}')
+      return self.build(user)
+
+    if choices is None:
+      choices = self.build(user)
+
+      try:
+        self.get_cache().set(key, choices, timeout=timeout)
+      except RedisError as ex:
+        self.logger.warning(f'[SearchChoiceCache]Failed to store the choices: {ex}')
+
+    return choices
+
+g_search_choice_cache = SearchChoiceCache()
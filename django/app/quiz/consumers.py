@@ -1,50 +1,296 @@
 from logging import getLogger
+from asgiref.sync import async_to_sync
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
-from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core import signing
+from django.db.utils import IntegrityError
 from django.utils.translation import gettext_lazy
 from utils.models import get_current_time, convert_timezone
 from . import models
+from .backends import get_state_backend
+from .executors import database_sync
+from .judges import AnswerJudge
+from .metrics import g_metrics
+from functools import partial
+import asyncio
+import time
 
 QuizStatusType = models.QuizStatusType
 
+##
+# @brief Check whether the native async ORM is used or not
+# @return bool Judgement result
+# @retval True  The database is accessed by the native async ORM
+# @retval False The database is accessed by `database_sync` (dedicated executor or compatibility mode)
+# @note This setting is independent of `QUIZ_DB_EXECUTOR` which decides where `database_sync` runs.
+def use_async_orm():
+  return getattr(settings, 'QUIZ_USE_ASYNC_ORM', False)
+
 class QuizState:
   ##
   # @brief Constructor of QuizState
-  # @param player_ids All player IDs
-  def __init__(self, player_ids):
+  # @param name Room state name
+  # @param backend Instance of state backend which stores players, answers, and shared fields
+  # @param flush_interval Maximum interval in seconds between two writes of the score record (Default: None)
+  # @note If `flush_interval` is None, the interval is given by `QUIZ_SCORE_FLUSH_INTERVAL` setting.
+  def __init__(self, name, backend, flush_interval=None):
+    self.name = name
+    self.backend = backend
     self.score = None
-    self.quiz = None
-    self.players = {key: False for key in player_ids}
-    self.answers = {}
-    self.current_time = get_current_time()
+    self.questions = None
+    self.flush_interval = flush_interval if flush_interval is not None else getattr(settings, 'QUIZ_SCORE_FLUSH_INTERVAL', 30)
+    self.flushed_at = time.monotonic()
+    self.answer_records = []
+    self.logger = getLogger(__name__)
+
+  ##
+  # @brief Register room state to the backend if it does not exist
+  # @param player_ids All player IDs
+  # @param score Instance of score
+  # @param names Dictionary of player's name whose key is the key of detail score (Default: None)
+  # @note The question sequence is loaded only if the room state does not exist in the backend yet.
+  async def setup(self, player_ids, score, names=None):
+    self.score = score
+    self.questions = None
+    self.flushed_at = time.monotonic()
+    fields = {
+      'status': score.status,
+      'index': score.index,
+      'current_time': 0,
+      'detail': score.detail,
+      'version': 0,
+      'names': names or {},
+      'run': str(score.run),
+    }
+
+    if not await self.exists():
+      self.questions = await self._preload_questions()
+      fields['questions'] = self.questions
+    await self.backend.create_room(self.name, player_ids, fields)
+
+  ##
+  # @brief Check whether the room state exists in the backend or not
+  # @return bool Judgement result
+  async def exists(self):
+    return await self.backend.exists(self.name)
+
+  ##
+  # @brief Delete the room state from the backend
+  async def clear(self):
+    await self.backend.delete_room(self.name)
 
   ##
   # @brief Update score
   # @param score Instance of score
-  def update_score(self, score):
+  async def update_score(self, score):
     self.score = score
-    self.quiz = None
+    self.questions = await self._preload_questions()
+    self.flushed_at = time.monotonic()
+    await self.backend.reset_answers(self.name, {})
+    await self.backend.update_fields(
+      self.name,
+      status=score.status,
+      index=score.index,
+      detail=score.detail,
+      questions=self.questions,
+      run=str(score.run),
+    )
+
+  ##
+  # @brief Get the next version of the room state
+  # @return version The incremented version
+  # @note The version increases monotonically so that clients can detect missing updates.
+  async def next_version(self):
+    return await self.backend.increment_field(self.name, 'version')
+
+  ##
+  # @brief Get the full snapshot of the room state
+  # @return snapshot Dictionary which consists of `version`, `players`, and `scores`
+  # @note The version is read first so that the snapshot is never older than its version.
+  async def get_snapshot(self):
+    fields = await self.backend.get_fields(self.name, 'version')
+    players = await self.get_players()
+    scores = await self.backend.get_fields(self.name, 'detail')
+    snapshot = {
+      'version': fields.get('version', 0),
+      'players': players,
+      'scores': scores.get('detail', self.score.detail),
+    }
+
+    return snapshot
+
+  ##
+  # @brief Get the question which is currently asked
+  # @param status Instance of QuizStatusType
+  # @param index Current quiz index
+  # @param questions Preloaded questions
+  # @return question Question sentence (empty string if no question is asked)
+  # @note The answer is never returned.
+  def _get_current_question(self, status, index, questions):
+    is_asked = status in [QuizStatusType.SENT_QUESTION, QuizStatusType.ANSWERING, QuizStatusType.RECEIVED_ANSWERS, QuizStatusType.JUDGING]
+    question = self._get_sentence(questions[index - 1]) if is_asked and 0 < index <= len(questions) else ''
+
+    return question
+
+  ##
+  # @brief Get the snapshot of the room state to resume the connection
+  # @return snapshot Dictionary which consists of `version`, `index`, `phase`, `question`, `players`, and `scores`
+  # @note The snapshot is built from the state backend only so that no query is issued.
+  async def get_resume_snapshot(self):
+    fields = await self.backend.get_fields(self.name, 'version', 'status', 'index', 'detail', 'questions')
+    players = await self.get_players()
+    status = QuizStatusType(fields.get('status', QuizStatusType.START))
+    index = fields.get('index', 1)
+    snapshot = {
+      'version': fields.get('version', 0),
+      'index': index,
+      'phase': status.name,
+      'question': self._get_current_question(status, index, fields.get('questions') or []),
+      'players': players,
+      'scores': fields.get('detail', {}),
+    }
+
+    return snapshot
+
+  ##
+  # @brief Get the snapshot of the room state for spectators
+  # @return snapshot Dictionary which consists of `question`, `phase`, `index`, and `leaderboard`
+  # @note The question is included only while it is asked, and the answer is never included.
+  async def get_spectator_snapshot(self):
+    fields = await self.backend.get_fields(self.name, 'status', 'index', 'detail', 'names', 'questions')
+    status = QuizStatusType(fields.get('status', QuizStatusType.START))
+    index = fields.get('index', 1)
+    names = fields.get('names') or {}
+    leaderboard = [
+      {'name': names.get(key, ''), 'score': int(val)}
+      for key, val in (fields.get('detail') or {}).items()
+    ]
+    snapshot = {
+      'question': self._get_current_question(status, index, fields.get('questions') or []),
+      'phase': str(status.label),
+      'index': index,
+      'leaderboard': sorted(leaderboard, key=lambda item: (-item['score'], item['name'])),
+    }
+
+    return snapshot
 
   ##
   # @brief Get player list
   #  @return players All player status
-  def get_players(self):
-    return self.players
+  async def get_players(self):
+    return await self.backend.get_players(self.name)
 
   ##
   # @brief Update player list
   # @param pk Player's primary key
   # @param do_delete Delete target player from player list if true (Default: False)
-  def update_player(self, pk, do_delete=False):
-    self.players[pk] = not do_delete
+  async def update_player(self, pk, do_delete=False):
+    await self.backend.update_player(self.name, pk, not do_delete)
 
   ##
   # @brief Check rest players
   # @return Judgement result
   # @retval True  Some players exist
   # @retval False There is no player in this room
-  def has_player(self):
-    return len([is_entered for is_entered in self.players.values() if is_entered]) > 0
+  async def has_player(self):
+    players = await self.get_players()
+
+    return len([is_entered for is_entered in players.values() if is_entered]) > 0
+
+  ##
+  # @brief Update score record with `update_fields`
+  # @param fields Target field names of score
+  async def _save_score(self, fields):
+    if use_async_orm():
+      await self.score.asave(update_fields=fields)
+    else:
+      await database_sync(self.score.save)(update_fields=fields)
+
+  ##
+  # @brief Write the current status and index of the room state back to the score record
+  # @param detail Updated detail score of each player (Default: None)
+  # @note The status and index are read from the backend so that any worker can flush the score record.
+  async def flush_score(self, detail=None):
+    fields = await self.backend.get_fields(self.name, 'status', 'index')
+    self.score.status = fields.get('status', self.score.status)
+    self.score.index = fields.get('index', self.score.index)
+    update_fields = ['status', 'index']
+
+    if detail is not None:
+      self.score.detail = detail
+      update_fields += ['detail']
+    await self._save_score(update_fields)
+    self.flushed_at = time.monotonic()
+
+  ##
+  # @brief Flush the score record if the flush interval has passed since the last write
+  # @return bool Judgement result
+  # @retval True  The score record is flushed
+  # @retval False The score record is not flushed
+  async def flush_score_if_needed(self):
+    is_expired = time.monotonic() - self.flushed_at >= self.flush_interval
+
+    if is_expired:
+      await self.flush_score()
+
+    return is_expired
+
+  ##
+  # @brief Load all questions and answers of the score's sequence with a single query
+  # @return questions List of [primary key, question, answer, normalized answers] ordered by the index of sequence
+  # @note The quizzes which have already been deleted are replaced with the placeholder so that each index keeps its position.
+  async def _preload_questions(self):
+    sequence = self.score.sequence
+    indices = sorted(sequence.keys(), key=lambda idx: int(idx))
+    queryset = models.Quiz.objects.filter(pk__in=sequence.values()).values_list('pk', 'question', 'answer', 'normalized_answers')
+
+    if use_async_orm():
+      records = [record async for record in queryset]
+    else:
+      records = await database_sync(list)(queryset)
+    table = dict([(str(pk), [str(pk), question, answer, normalized_answers]) for pk, question, answer, normalized_answers in records])
+    questions = [table.get(sequence[idx]) or self.create_missing_question() for idx in indices]
+
+    return questions
+
+  ##
+  # @brief Create the placeholder of the question which does not exist
+  # @return question List of [primary key, question, answer, normalized answers] whose primary key is None
+  @staticmethod
+  def create_missing_question():
+    return [None, '', '', []]
+
+  ##
+  # @brief Get the sentence of the question
+  # @param question Preloaded question
+  # @return sentence Question sentence
+  # @note The notice is returned instead of the sentence if the quiz has been deleted before the game.
+  def _get_sentence(self, question):
+    pk, sentence = question[0], question[1]
+
+    return sentence if pk is not None else str(gettext_lazy('This quiz has been deleted.'))
+
+  ##
+  # @brief Get preloaded questions
+  # @return questions List of [primary key, question, answer, normalized answers]
+  # @note The questions are regarded as a snapshot of the game so that editing or deleting quizzes has no effect on the current game.
+  async def _get_questions(self):
+    if self.questions is None:
+      fields = await self.backend.get_fields(self.name, 'questions')
+      self.questions = fields.get('questions') or []
+
+    return self.questions
+
+  ##
+  # @brief Get the quiz based on the index of sequence
+  # @param index The current index of quiz
+  # @return pk, question, answer, normalized answers
+  # @note If the index is out of the sequence, the placeholder is returned.
+  async def _get_quiz_data(self, index):
+    questions = await self._get_questions()
+
+    return questions[index - 1] if 0 < index <= len(questions) else self.create_missing_question()
 
   # ===================
   # = Playing process =
@@ -54,20 +300,17 @@ class QuizState:
   # @param max_question The number of maximum quizzes
   # @return sentence Quiz sentence
   # @return index The current index of quiz
-  @database_sync_to_async
-  def get_quiz(self, max_question):
-    index = self.score.index
-    self.answers = {}
+  async def get_quiz(self, max_question):
+    fields = await self.backend.get_fields(self.name, 'index')
+    index = fields.get('index', self.score.index)
+    await self.backend.reset_answers(self.name, {})
 
     if index > max_question:
       index = 1
-    pk = self.score.sequence.get(str(index))
-    self.quiz = models.Quiz.objects.get(pk=pk)
-    sentence = self.quiz.question
+    sentence = self._get_sentence(await self._get_quiz_data(index))
     # Update records
-    self.score.index = index
-    self.score.status = QuizStatusType.SENT_QUESTION
-    self.score.save()
+    await self.backend.update_fields(self.name, index=index, status=QuizStatusType.SENT_QUESTION)
+    await self.flush_score_if_needed()
 
     return sentence, index
 
@@ -75,29 +318,47 @@ class QuizState:
   # @brief Update player list of revceived quiz
   # @param pk The request user's primary key
   # @return is_completed Descrive whether the system sent quiz to all players or not
-  def update_member_status(self, pk):
-    self.answers[pk] = None
-    is_completed = len(self.answers) >= len(self.players)
+  async def update_member_status(self, pk):
+    num_answers, num_players = await self.backend.add_answer(self.name, pk, None)
+    is_completed = num_answers >= num_players
 
     return is_completed
 
   ##
   # @brief Change answering phase
-  @database_sync_to_async
-  def answering_phase(self):
-    self.answers = dict([(key, {'answer': '', 'time': 0}) for key in self.players.keys()])
-    self.score.status = QuizStatusType.ANSWERING
-    self.score.save()
-    self.current_time = get_current_time()
+  # @param time_limit Time limit in seconds (Default: 0)
+  # @return started_at Start time of the answering phase (UNIX time)
+  # @note Only submitted answers are stored in the backend so that the system can detect whether all players have answered.
+  # @note If `time_limit` is not positive, the answering phase has no deadline.
+  async def answering_phase(self, time_limit=0):
+    started_at = get_current_time().timestamp()
+    deadline_at = started_at + time_limit if time_limit > 0 else 0
+    await self.backend.reset_answers(self.name, {})
+    await self.backend.update_fields(self.name, status=QuizStatusType.ANSWERING, current_time=started_at, deadline_at=deadline_at)
+    await self.flush_score_if_needed()
+
+    return started_at
+
+  ##
+  # @brief Get the deadline of the current answering phase
+  # @return None if the answering phase is not open or has no deadline, otherwise the following tuple
+  #   - started_at Start time of the answering phase (UNIX time)
+  #   - deadline_at Deadline of the answering phase (UNIX time)
+  # @note The deadline is stored in the backend so that any worker can close the answering phase.
+  async def get_answer_deadline(self):
+    fields = await self.backend.get_fields(self.name, 'status', 'current_time', 'deadline_at')
+    is_open = fields.get('status') == QuizStatusType.ANSWERING and fields.get('deadline_at', 0) > 0
+
+    return (fields['current_time'], fields['deadline_at']) if is_open else None
 
   ##
   # @brief Check whether hte members can answer quiz or not
   # @return Judgement result
   # @retval True  The members can answer quiz
   # @retval False The members cannot answer quiz
-  @database_sync_to_async
-  def can_answer(self):
-    is_valid = self.score.status == QuizStatusType.ANSWERING
+  async def can_answer(self):
+    fields = await self.backend.get_fields(self.name, 'status')
+    is_valid = fields.get('status') == QuizStatusType.ANSWERING
 
     return is_valid
 
@@ -105,75 +366,253 @@ class QuizState:
   # @brief Change answering phase
   # @param pk The request user's primary key
   # @param answer The request user's answer
-  def update_answer(self, pk, answer):
-    elapsed_time = get_current_time() - self.current_time
-    self.answers[pk] = {
-      'answer': answer,
-      'time': elapsed_time.total_seconds(),
-    }
+  # @return bool Judgement result of whether the answer is stored or not
+  # @note The answer is stored only while the members can answer quiz.
+  async def update_answer(self, pk, answer):
+    timestamp = get_current_time().timestamp()
+
+    return await self.backend.update_answer(self.name, pk, answer, timestamp, QuizStatusType.ANSWERING)
+
+  ##
+  # @brief Check whether all players in the room have answered or not
+  # @return bool Judgement result
+  # @retval True  All players in the room have answered
+  # @retval False Some players have not answered yet
+  async def has_all_answers(self):
+    players = await self.get_players()
+    answers = await self.backend.get_answers(self.name)
+    entered_players = [key for key, is_entered in players.items() if is_entered]
+
+    return len(entered_players) > 0 and all([key in answers.keys() for key in entered_players])
 
   ##
   # @brief Change received all answers phase
-  @database_sync_to_async
-  def received_all_answers_phase(self):
-    self.score.status = QuizStatusType.RECEIVED_ANSWERS
-    self.score.save()
+  async def received_all_answers_phase(self):
+    await self.backend.update_fields(self.name, status=QuizStatusType.RECEIVED_ANSWERS)
+    await self.flush_score_if_needed()
+
+  ##
+  # @brief Close the answering phase only if it is still open
+  # @param started_at Start time of the target answering phase (Default: None)
+  # @return bool Judgement result
+  # @retval True  The answering phase is closed by this call
+  # @retval False The answering phase has already been closed or another phase has started
+  # @note Because the status is updated atomically, only one caller closes the phase even if several workers try it.
+  async def close_answering_phase(self, started_at=None):
+    expected = {'status': QuizStatusType.ANSWERING}
+
+    if started_at is not None:
+      expected['current_time'] = started_at
+    is_closed = await self.backend.compare_and_update_fields(self.name, expected, status=QuizStatusType.RECEIVED_ANSWERS)
+
+    if is_closed:
+      await self.flush_score_if_needed()
+
+    return is_closed
+
+  ##
+  # @brief Collect player's answers and the current quiz data
+  # @return player_answers The player's answers
+  # @return correct_answer The correct answer
+  # @return accepted_answers The normalized answers which are regarded as correct
+  async def _collect_answers(self):
+    players = await self.get_players()
+    player_answers = dict([(key, {'answer': '', 'time': 0}) for key in players.keys()])
+    answers = await self.backend.get_answers(self.name)
+    player_answers.update(dict([(key, val) for key, val in answers.items() if val is not None]))
+    fields = await self.backend.get_fields(self.name, 'index')
+    _, _, correct_answer, accepted_answers = await self._get_quiz_data(fields.get('index', self.score.index))
+
+    return player_answers, correct_answer, accepted_answers
 
   ##
   # @brief Collect correct answer and player's answers
   # @return player_answers The player's answers
   # @return correct_answer The correct answer
-  @database_sync_to_async
-  def get_answers(self):
-    self.score.status = QuizStatusType.JUDGING
-    self.score.save()
-    player_answers = dict(self.answers)
-    correct_answer = self.quiz.answer
+  async def get_answers(self):
+    await self.backend.update_fields(self.name, status=QuizStatusType.JUDGING)
+    await self.flush_score_if_needed()
+    player_answers, correct_answer, _ = await self._collect_answers()
 
     return player_answers, correct_answer
 
+  ##
+  # @brief Judge all player's answers in one batch
+  # @param max_points Points for the correct answer (Default: 1)
+  # @param reference_time Reference time in seconds to weight points (Default: 0)
+  # @return None if the answers have already been judged, otherwise the following tuple
+  #   - player_answers The player's answers
+  #   - correct_answer The correct answer
+  #   - judgement Points for each player
+  # @note Because the status is updated atomically, only one caller judges the answers even if several workers try it.
+  async def judge_answers(self, max_points=1, reference_time=0):
+    expected = {'status': QuizStatusType.RECEIVED_ANSWERS}
+    is_started = await self.backend.compare_and_update_fields(self.name, expected, status=QuizStatusType.JUDGING)
+
+    if not is_started:
+      return None
+    player_answers, correct_answer, accepted_answers = await self._collect_answers()
+    judge = AnswerJudge(accepted_answers, max_points=max_points, reference_time=reference_time)
+    judgement = judge.judge(player_answers)
+
+    return player_answers, correct_answer, judgement
+
+  ##
+  # @brief Create the answer records of the current round
+  # @param index The current index of quiz
+  # @param run Identifier of the current game
+  # @param judgement Judgement result for player's answer
+  # @param get_score_key Function to convert the key of answers into the key of detail score
+  # @return records List of AnswerRecord which are not saved yet
+  # @note Only the players who have submitted their answer are recorded.
+  async def _create_answer_records(self, index, run, judgement, get_score_key):
+    quiz_id, _, _, _ = await self._get_quiz_data(index)
+    answers = await self.backend.get_answers(self.name)
+    records = [
+      models.AnswerRecord(
+        room_id=self.score.room_id,
+        run=run,
+        index=index,
+        quiz_id=quiz_id,
+        player_id=get_score_key(key),
+        answer=value.get('answer', ''),
+        elapsed_time=value.get('time', 0),
+        points=int(judgement.get(get_score_key(key), 0)),
+      )
+      for key, value in answers.items() if value is not None
+    ]
+
+    return records
+
+  ##
+  # @brief Save the answer records with a single query
+  # @param records List of AnswerRecord
+  async def _save_answer_records(self, records):
+    if not records:
+      return
+
+    if use_async_orm():
+      await models.AnswerRecord.objects.abulk_create(records)
+    else:
+      await database_sync(models.AnswerRecord.objects.bulk_create)(records)
+
+  ##
+  # @brief Exclude the references which have been deleted during the game from the answer records
+  # @param records List of AnswerRecord which are not saved yet
+  # @return records List of AnswerRecord whose references exist
+  # @note The record of the deleted quiz is kept without the quiz, but the record of the deleted player is dropped.
+  async def _clean_answer_records(self, records):
+    quizzes = models.Quiz.objects.filter(pk__in=[record.quiz_id for record in records if record.quiz_id is not None]).values_list('pk', flat=True)
+    players = models.UserModel.objects.filter(pk__in=[record.player_id for record in records]).values_list('pk', flat=True)
+
+    if use_async_orm():
+      quiz_ids = [str(pk) async for pk in quizzes]
+      player_ids = [str(pk) async for pk in players]
+    else:
+      quiz_ids = [str(pk) for pk in await database_sync(list)(quizzes)]
+      player_ids = [str(pk) for pk in await database_sync(list)(players)]
+
+    for record in records:
+      if str(record.quiz_id) not in quiz_ids:
+        record.quiz_id = None
+    records = [record for record in records if str(record.player_id) in player_ids]
+
+    return records
+
+  ##
+  # @brief Append the answers of the last round to the answer log
+  # @note Because the answer log is not a part of the game, the failure of writing it is only logged.
+  # @note If the quiz or the player has been deleted during the game, the records are cleaned and saved again.
+  async def save_answer_records(self):
+    records, self.answer_records = self.answer_records, []
+
+    try:
+      await self._save_answer_records(records)
+    except IntegrityError:
+      try:
+        await self._save_answer_records(await self._clean_answer_records(records))
+      except IntegrityError as ex:
+        self.logger.error(f'[{self.name}]Save answer records: {ex}')
+
   ##
   # @brief Update scores for each player
   # @param max_question The number of maximum quizzes
   # @param judgement Judgement result for player's answer
+  # @param get_score_key Function to convert the key of answers into the key of detail score (Default: None)
   # @return detail The updated score of each player
   # @return is_enabled Judgement result of whether all quizzes have been asked or not.
-  @database_sync_to_async
-  def update_state(self, max_question, judgement):
-    index = self.score.index
-    detail = self.score.detail
+  # @note The detail score is read from the backend so that any worker can update it.
+  # @note The answers of the round are kept until `save_answer_records` is called so that the result is shared first.
+  async def update_state(self, max_question, judgement, get_score_key=None):
+    fields = await self.backend.get_fields(self.name, 'index', 'detail', 'run')
+    index = fields.get('index', self.score.index)
+    detail = dict(fields.get('detail', self.score.detail))
+    self.answer_records = await self._create_answer_records(
+      index,
+      fields.get('run', str(self.score.run)),
+      judgement,
+      get_score_key or (lambda key: key),
+    )
     # Update status
     for name, additional_count in judgement.items():
       value = detail[name]
       detail[name] = int(value) + additional_count
-    self.score.detail = dict(detail)
     # Update status if needed
     if index >= max_question:
-      self.score.status = QuizStatusType.END
+      status = QuizStatusType.END
       is_enabled = True
-      self.score.index = max_question + 1
+      index = max_question + 1
     else:
-      self.score.status = QuizStatusType.WAITING
+      status = QuizStatusType.WAITING
       is_enabled = False
-      self.score.index = index + 1
-    # Save record
-    self.score.save()
-    self.quiz = None
+      index = index + 1
+    # Save record because the end of each question is a checkpoint
+    await self.backend.update_fields(self.name, status=status, index=index, detail=detail)
+    await self.flush_score(detail=dict(detail))
 
     return detail, is_enabled
 
 class ConsumerState:
   ##
   # @brief Constructor of ConsumerState
-  def __init__(self):
+  # @param backend Instance of state backend (Default: None)
+  # @param ttl Grace period in seconds to keep the state of the room which nobody joins (Default: None)
+  # @param max_idle Maximum period in seconds to keep the state of the room without any access (Default: None)
+  # @note If `backend` is None, the backend is created based on `QUIZ_STATE_BACKEND` setting.
+  # @note If `ttl` or `max_idle` is None, the value is given by `QUIZ_ROOM_STATE_TTL` or `QUIZ_ROOM_STATE_MAX_IDLE` setting.
+  def __init__(self, backend=None, ttl=None, max_idle=None):
     self.states = {}
+    self.accessed_at = {}
+    self.released_at = {}
+    self.backend = backend if backend is not None else get_state_backend()
+    self.ttl = ttl
+    self.max_idle = max_idle
+    self.sweeper = None
+    self.logger = getLogger(__name__)
+
+  ##
+  # @brief Get grace period of the room which nobody joins
+  # @return ttl Grace period in seconds
+  def get_ttl(self):
+    return self.ttl if self.ttl is not None else getattr(settings, 'QUIZ_ROOM_STATE_TTL', 60)
+
+  ##
+  # @brief Get maximum period of the room without any access
+  # @return max_idle Period in seconds
+  def get_max_idle(self):
+    return self.max_idle if self.max_idle is not None else getattr(settings, 'QUIZ_ROOM_STATE_MAX_IDLE', 60 * 60)
 
   ##
   # @brief Get target state based on given name
   # @param name Target instance name
   # @return Instance of QuizState
   def get_state(self, name):
-    return self.states.get(name)
+    instance = self.states.get(name)
+
+    if instance is not None:
+      self.accessed_at[name] = time.monotonic()
+
+    return instance
 
   ##
   # @brief Set QuizState's instance based on given name
@@ -181,6 +620,8 @@ class ConsumerState:
   # @param instance Target QuizState's instance
   def set_state(self, name, instance):
     self.states[name] = instance
+    self.accessed_at[name] = time.monotonic()
+    self.released_at.pop(name, None)
 
   ##
   # @brief Delete QuizState's instance based on given name
@@ -188,19 +629,304 @@ class ConsumerState:
   def del_state(self, name):
     if name in self.states.keys():
       del self.states[name]
+    self.accessed_at.pop(name, None)
+    self.released_at.pop(name, None)
+
+  ##
+  # @brief Get the cached state for a new connection
+  # @param name Target instance name
+  # @return Instance of QuizState (None if the state has to be rebuilt)
+  # @note The result is recorded as the hit or miss of the cache.
+  async def acquire(self, name):
+    instance = self.get_state(name)
+
+    if instance is not None and await instance.exists():
+      self.released_at.pop(name, None)
+      g_metrics.state_cache_hits.inc()
+    else:
+      instance = None
+      g_metrics.state_cache_misses.inc()
+
+    return instance
+
+  ##
+  # @brief Mark the state as idle because nobody joins the room
+  # @param name Target instance name
+  # @note The state is kept during the grace period so that a reconnecting player can reuse it.
+  def release(self, name):
+    if name in self.states.keys():
+      self.released_at[name] = time.monotonic()
+
+  ##
+  # @brief Invalidate the state of the room which nobody joins
+  # @param name Target instance name
+  # @note The state shared with the other processes is also deleted so that the next connection rebuilds it.
+  async def invalidate(self, name):
+    players = await self.backend.get_players(name)
+
+    if not any(players.values()):
+      await self.backend.delete_room(name)
+      self.del_state(name)
+
+  ##
+  # @brief Collect the names of the states to be evicted
+  # @param now Current monotonic time (Default: None)
+  # @return List of pairs of the name and the reason (`expired` or `stale`)
+  def get_eviction_targets(self, now=None):
+    now = now if now is not None else time.monotonic()
+    ttl = self.get_ttl()
+    max_idle = self.get_max_idle()
+    expired = [(name, 'expired') for name, released_at in self.released_at.items() if now - released_at >= ttl]
+    stale = [
+      (name, 'stale') for name, accessed_at in self.accessed_at.items()
+      if name not in self.released_at.keys() and now - accessed_at >= max_idle
+    ]
+
+    return expired + stale
+
+  ##
+  # @brief Evict the state from the cache
+  # @param name Target instance name
+  # @param reason Reason of the eviction
+  # @note The shared state is deleted only if nobody uses it in any process.
+  async def evict(self, name, reason):
+    target = self.states.get(name)
+
+    if target is not None:
+      self.del_state(name)
+      g_presence.discard(name)
+      g_spectators.discard(name)
+      g_metrics.remove_room(name)
+      g_metrics.state_cache_evictions.inc(reason=reason)
+      # Because the score of the idle room is stored at release, only the stale state is stored
+      if reason == 'stale':
+        await target.flush_score()
+      if not await target.has_player():
+        await target.clear()
+
+  ##
+  # @brief Evict all expired and stale states
+  # @param now Current monotonic time (Default: None)
+  # @return The number of evicted states
+  async def sweep(self, now=None):
+    targets = self.get_eviction_targets(now=now)
+
+    for name, reason in targets:
+      try:
+        await self.evict(name, reason)
+      except Exception as ex:
+        self.logger.error(f'[{name}]Eviction: {ex}')
+
+    return len(targets)
+
+  ##
+  # @brief Start the background sweeper in the running event loop
+  # @note Nothing is done if the sweeper has already run in the event loop.
+  def start_sweeper(self):
+    loop = asyncio.get_running_loop()
+
+    if self.sweeper is None or self.sweeper.done() or self.sweeper.get_loop() is not loop:
+      self.sweeper = loop.create_task(self._sweep_periodically())
+
+  ##
+  # @brief Sweep the states periodically
+  # @note The interval is given by `QUIZ_ROOM_STATE_SWEEP_INTERVAL` setting.
+  async def _sweep_periodically(self):
+    while True:
+      await asyncio.sleep(getattr(settings, 'QUIZ_ROOM_STATE_SWEEP_INTERVAL', 30))
+      await self.sweep()
 
 g_quizstates = ConsumerState()
+g_metrics.active_rooms.set_function(lambda: len(g_quizstates.states))
+
+class PresenceAggregator:
+  ##
+  # @brief Constructor of PresenceAggregator
+  # @param delay Debounce window in seconds (Default: None)
+  # @note If `delay` is None, the window is given by `QUIZ_PRESENCE_DEBOUNCE_TIME` setting.
+  def __init__(self, delay=None):
+    self.delay = delay
+    self.pending = {}
+    self.logger = getLogger(__name__)
+
+  ##
+  # @brief Get debounce window
+  # @return delay Debounce window in seconds
+  def get_delay(self):
+    return self.delay if self.delay is not None else getattr(settings, 'QUIZ_PRESENCE_DEBOUNCE_TIME', 0.2)
+
+  ##
+  # @brief Add join or leave event of the room
+  # @param name Room state name
+  # @param item Data of the user who joins or leaves the room
+  # @param is_joined Describes whether the user joins the room or not
+  # @param callback Coroutine function called with the joined and left items when the window closes
+  # @note The events received within the window are emitted at once by the callback given last.
+  async def add_event(self, name, item, is_joined, callback):
+    events = self.pending.setdefault(name, {'joined': [], 'left': [], 'task': None})
+    events['joined' if is_joined else 'left'].append(item)
+    events['callback'] = callback
+    delay = self.get_delay()
+
+    if delay <= 0:
+      await self.flush(name)
+    elif events['task'] is None:
+      events['task'] = asyncio.create_task(self._flush_later(name, delay))
+
+  ##
+  # @brief Emit the events after the debounce window
+  # @param name Room state name
+  # @param delay Debounce window in seconds
+  async def _flush_later(self, name, delay):
+    try:
+      await asyncio.sleep(delay)
+      await self.flush(name)
+    except asyncio.CancelledError:
+      pass
+    except Exception as ex:
+      self.logger.error(f'[{name}]Presence: {ex}')
+
+  ##
+  # @brief Emit the pending events of the room
+  # @param name Room state name
+  async def flush(self, name):
+    events = self.pending.pop(name, None)
+
+    if events is not None:
+      await events['callback'](events['joined'], events['left'])
+
+  ##
+  # @brief Discard the pending events of the room without emitting them
+  # @param name Room state name
+  def discard(self, name):
+    events = self.pending.pop(name, None)
+
+    if events is not None and events['task'] is not None:
+      events['task'].cancel()
+
+g_presence = PresenceAggregator()
+
+class SpectatorPublisher:
+  ##
+  # @brief Constructor of SpectatorPublisher
+  # @param interval Minimum interval in seconds between two snapshots of each room (Default: None)
+  # @note If `interval` is None, the interval is given by `QUIZ_SPECTATOR_INTERVAL` setting.
+  def __init__(self, interval=None):
+    self.interval = interval
+    self.pending = {}
+    self.logger = getLogger(__name__)
+
+  ##
+  # @brief Get the minimum interval between two snapshots
+  # @return interval Interval in seconds
+  def get_interval(self):
+    return self.interval if self.interval is not None else getattr(settings, 'QUIZ_SPECTATOR_INTERVAL', 1.0)
+
+  ##
+  # @brief Request to publish the snapshot of the room
+  # @param name Room state name
+  # @param callback Coroutine function without arguments which publishes the snapshot
+  # @note The requests within the interval are merged into one snapshot published by the callback given last.
+  async def publish(self, name, callback):
+    entry = self.pending.setdefault(name, {'task': None, 'sent_at': None})
+    entry['callback'] = callback
+
+    if entry['task'] is None:
+      sent_at = entry['sent_at']
+      delay = 0 if sent_at is None else max(sent_at + self.get_interval() - time.monotonic(), 0)
+      entry['task'] = asyncio.create_task(self._publish_later(name, delay))
+
+  ##
+  # @brief Publish the snapshot after the delay
+  # @param name Room state name
+  # @param delay Delay in seconds
+  async def _publish_later(self, name, delay):
+    try:
+      await asyncio.sleep(delay)
+      entry = self.pending.get(name)
+
+      if entry is not None:
+        entry['task'] = None
+        entry['sent_at'] = time.monotonic()
+        await entry['callback']()
+    except asyncio.CancelledError:
+      pass
+    except Exception as ex:
+      self.logger.error(f'[{name}]Spectator: {ex}')
+
+  ##
+  # @brief Discard the pending snapshot of the room
+  # @param name Room state name
+  def discard(self, name):
+    entry = self.pending.pop(name, None)
+
+    if entry is not None and entry['task'] is not None:
+      entry['task'].cancel()
+
+g_spectators = SpectatorPublisher()
+
+##
+# @brief Get the group name of the spectators
+# @param name Room state name
+# @return Group name of the spectators
+def get_spectator_group_name(name):
+  return f'{name}-spectators'
+
+##
+# @brief Create the serialized snapshot message for spectators
+# @param target Instance of QuizState
+# @param datetime Current datetime string
+# @param encode_json Coroutine function to serialize the message
+# @return text_data Serialized message
+async def create_spectator_message(target, datetime, encode_json):
+  snapshot = await target.get_spectator_snapshot()
+  content = {
+    'type': 'spectatorSnapshot',
+    'datetime': datetime,
+  }
+  content.update(snapshot)
+  text_data = await encode_json(content)
+
+  return text_data
+
+##
+# @brief Notify all connections of the quiz room that the room has been updated
+# @param pk Primary key of the quiz room
+# @note Each connection refreshes its capabilities when it receives the event.
+def notify_room_updated(pk):
+  name = f'quiz-{pk}'
+  channel_layer = get_channel_layer()
+  async_to_sync(channel_layer.group_send)(name, {'type': 'room_updated'})
+  # Because the state of the idle room is kept, it is invalidated to reflect the updated room
+  async_to_sync(g_quizstates.invalidate)(name)
 
 # ================
 # = QuizConsumer =
 # ================
 class QuizConsumer(AsyncJsonWebsocketConsumer):
+  # Method name of each command
+  command_table = {
+    'resetQuiz': 'reset_quiz',
+    'getNextQuiz': 'get_next_quiz',
+    'receivedQuiz': 'received_quiz',
+    'startAnswer': 'start_answer',
+    'answerQuiz': 'answer_quiz',
+    'stopAnswer': 'stop_answer',
+    'getAnswers': 'get_answers',
+    'sendResult': 'send_result',
+    'getSnapshot': 'get_snapshot',
+    'resume': 'resume',
+  }
+
   ##
   # @brief Constructor of QuizConsumer
   # @param args Positional arguments
   # @param kwargs Named arguments
   def __init__(self, *args, **kwargs):
     self.room = None
+    self.capabilities = {}
+    self.answer_timer = None
+    self.is_accepted = False
     self.group_name = None
     self.prefix = 'quiz'
     self.logger = getLogger(__name__)
@@ -215,36 +941,121 @@ class QuizConsumer(AsyncJsonWebsocketConsumer):
     return f'user{user.pk}'
 
   ##
-  # @brief Check whether the request user is owner or not
+  # @brief Create the token to resume the connection
+  # @param user Request user
+  # @return token Signed token which includes the room and the request user
+  def create_resume_token(self, user):
+    return signing.dumps({'room': self.group_name, 'user': str(user.pk)}, salt='quiz.resume')
+
+  ##
+  # @brief Check whether the token to resume the connection is valid or not
+  # @param token Signed token
   # @param user Request user
+  # @return bool Judgement result
+  # @retval True  The token is issued for the room and the request user
+  # @retval False The token is invalid or expired
+  def is_valid_resume_token(self, token, user):
+    max_age = getattr(settings, 'QUIZ_RESUME_TOKEN_MAX_AGE', 10 * 60)
+
+    try:
+      payload = signing.loads(token, salt='quiz.resume', max_age=max_age)
+      is_valid = payload == {'room': self.group_name, 'user': str(user.pk)}
+    except (signing.BadSignature, TypeError):
+      is_valid = False
+
+    return is_valid
+
+  ##
+  # @brief Get the key of detail score from client key
+  # @param client_key Client key
+  # @return The key of detail score (i.e., primary key)
+  def get_score_key(self, client_key):
+    return client_key.removeprefix('user')
+
+  ##
+  # @brief Collect capabilities of the request user for this connection
+  # @param user Request user
+  # @return capabilities Dictionary which consists of `is_owner`, `is_assigned`, `max_question`, `answer_time_limit`, and `judgement_type`
+  async def get_capabilities(self, user):
+    if use_async_orm():
+      is_assigned = await self.room.ais_assigned(user)
+    else:
+      is_assigned = await database_sync(self.room.is_assigned)(user)
+    capabilities = {
+      'is_owner': self.room.is_owner(user),
+      'is_assigned': is_assigned,
+      'max_question': self.room.max_question,
+      'answer_time_limit': self.room.answer_time_limit,
+      'judgement_type': self.room.judgement_type,
+    }
+
+    return capabilities
+
+  ##
+  # @brief Check whether the request user is owner or not
   # @return bool Judmgement result
   # @retval True  The request user is owner
   # @retval False The request user is not owner
-  @database_sync_to_async
-  def is_owner(self, user):
-    return self.room.is_owner(user)
+  def is_owner(self):
+    return self.capabilities.get('is_owner', False)
+
+  ##
+  # @brief Check whether the answers are judged automatically or not
+  # @return bool Judgement result
+  # @retval True  The answers are judged by the system
+  # @retval False The answers are judged by the owner
+  def is_auto_judge(self):
+    return self.capabilities.get('judgement_type', models.JudgementType.MANUAL) != models.JudgementType.MANUAL
+
+  ##
+  # @brief Get the quiz room with its owner
+  # @param pk Primary key of the quiz room
+  # @return room The instance of QuizRoom
+  async def get_room(self, pk):
+    queryset = models.QuizRoom.objects.select_related('owner')
+
+    if use_async_orm():
+      room = await queryset.aget(pk=pk)
+    else:
+      room = await database_sync(queryset.get)(pk=pk)
+
+    return room
 
   ##
   # @brief Get room's score
   # @return The instance of room's score
-  @database_sync_to_async
-  def get_score(self):
-    return self.room.score
+  async def get_score(self):
+    if use_async_orm():
+      score = await models.Score.objects.aget(room=self.room)
+    else:
+      score = await database_sync(lambda: self.room.score)()
+
+    return score
 
   ##
-  # @brief Get room's score
+  # @brief Get the number of maximum quizzes
   # @return The number of maximum quizzes
-  @database_sync_to_async
   def get_max_question(self):
-    return self.room.max_question
+    return self.capabilities.get('max_question', 0)
+
+  ##
+  # @brief Get players who can access to this room
+  # @return players List of the members and the owner
+  async def get_room_players(self):
+    if use_async_orm():
+      members = [user async for user in self.room.members.all()]
+    else:
+      members = await database_sync(list)(self.room.members.all())
+    players = members + [self.room.owner]
+
+    return players
 
   ##
   # @brief Get player's IDs
   # @return player_ids Player's IDs who can access to this room
-  @database_sync_to_async
-  def get_player_ids(self):
-    members = self.room.members.all()
-    player_ids = list(map(lambda user: self.get_client_key(user), members)) + [self.get_client_key(self.room.owner)]
+  async def get_player_ids(self):
+    players = await self.get_room_players()
+    player_ids = list(map(lambda user: self.get_client_key(user), players))
 
     return player_ids
 
@@ -256,95 +1067,336 @@ class QuizConsumer(AsyncJsonWebsocketConsumer):
       user = self.scope['user']
       pk = self.scope['url_route']['kwargs']['pk']
       self.group_name = f'{self.prefix}-{pk}'
-      self.room = await database_sync_to_async(models.QuizRoom.objects.get)(pk=pk)
-      is_assigned = await database_sync_to_async(self.room.is_assigned)(user)
+      self.room = await self.get_room(pk)
+      self.capabilities = await self.get_capabilities(user)
       # In the case of that request user can access the room
-      if is_assigned:
+      if self.capabilities['is_assigned']:
         await self.accept()
+        self.is_accepted = True
+        g_metrics.active_connections.inc()
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.post_accept(user)
     except Exception as ex:
       self.logger.error(f'[{self.group_name}]Connect: {ex}')
 
   ##
-  # @brief Conduct post-accept process
-  # @param user Request user
-  async def post_accept(self, user):
-    target = g_quizstates.get_state(self.group_name)
+  # @brief Get the cached room state or build it if it does not exist
+  # @return target Instance of QuizState
+  async def prepare_state(self):
+    target = await g_quizstates.acquire(self.group_name)
 
     if target is None:
-      player_ids = await self.get_player_ids()
+      players = await self.get_room_players()
+      player_ids = [self.get_client_key(player) for player in players]
+      # The names are stored once so that the snapshot for spectators needs no query
+      names = dict([(self.get_score_key(self.get_client_key(player)), str(player)) for player in players])
       score = await self.get_score()
-      target = QuizState(player_ids)
-      target.update_score(score)
+      target = QuizState(self.group_name, g_quizstates.backend)
+      await target.setup(player_ids, score, names=names)
       # Update status
       g_quizstates.set_state(self.group_name, target)
+
+    return target
+
+  ##
+  # @brief Conduct post-accept process
+  # @param user Request user
+  async def post_accept(self, user):
+    target = await self.prepare_state()
+    g_quizstates.start_sweeper()
     # Add user data to player list
-    target.update_player(self.get_client_key(user))
-    # Get player list
-    players = target.get_players()
-    # Send system message
-    message = gettext_lazy('Join {name} to {room}').format(name=str(user), room=self.room.name)
-    await self.channel_layer.group_send(
-      self.group_name, {
-        'type': 'send_group_message',
-        'msg_type': 'system',
-        'ids': ['message', 'players'],
-        'message': message,
-        'players': players,
-      }
-    )
+    await target.update_player(self.get_client_key(user))
+    # Send system message with other join and leave events
+    await g_presence.add_event(self.group_name, (self.get_client_key(user), str(user)), True, partial(self.send_presence, target))
+    # Take over the deadline of the answering phase if it is open
+    await self.arm_answer_timer(target)
 
   ##
   # @brief Disconnection process
   # @param close_code status code as closing the connection
   async def disconnect(self, close_code):
     user = self.scope['user']
+    # Because the timer refers to this consumer, it is never kept after the connection is closed
+    is_armed = self.cancel_answer_timer()
     await self.channel_layer.group_discard(self.group_name, self.channel_name)
     await self.close()
+
+    if self.is_accepted:
+      self.is_accepted = False
+      g_metrics.active_connections.dec()
     await self.post_disconnect(user)
+    # The remaining consumers in the room take over the deadline
+    if is_armed:
+      await self.channel_layer.group_send(self.group_name, {'type': 'rearm_answer_timer'})
 
   ##
   # @brief Conduct post-disconnect process
   # @param user Request user
+  # @note Even if the cached state has been evicted by the sweeper, the player is marked as left in the shared state.
   async def post_disconnect(self, user):
+    target = g_quizstates.get_state(self.group_name)
+    is_cached = target is not None
+
+    if not is_cached:
+      target = QuizState(self.group_name, g_quizstates.backend)
+      # In the case of that the shared state has also been deleted
+      if not await target.exists():
+        return
     # Delete user data from player list
+    await target.update_player(self.get_client_key(user), do_delete=True)
+    # Send system message with other join and leave events
+    await g_presence.add_event(self.group_name, (self.get_client_key(user), str(user)), False, partial(self.send_presence, target))
+
+    if not await target.has_player():
+      # Because nobody receives the message, the pending events are discarded
+      g_presence.discard(self.group_name)
+      g_spectators.discard(self.group_name)
+      # Because the score of the stale state is stored at eviction, only the cached state is stored
+      if is_cached:
+        await target.flush_score()
+        # The state is kept during the grace period and evicted by the sweeper
+        g_quizstates.release(self.group_name)
+
+  ##
+  # @brief Send one system message which consists of join and leave events with the changed player status
+  # @param target Instance of QuizState
+  # @param joined Pairs of client key and name of the users who joined the room
+  # @param left Pairs of client key and name of the users who left the room
+  async def send_presence(self, target, joined, left):
+    messages = []
+
+    if joined:
+      messages += [gettext_lazy('Join {name} to {room}').format(name=', '.join([name for _, name in joined]), room=self.room.name)]
+    if left:
+      messages += [gettext_lazy('Leave {name} from {room}').format(name=', '.join([name for _, name in left]), room=self.room.name)]
+    # Get changed player status
+    players = await target.get_players()
+    keys = [key for key, _ in joined + left]
+    version = await target.next_version()
+    await self.group_send_message({
+      'msg_type': 'system',
+      'ids': ['message', 'players', 'version'],
+      'message': ' / '.join(messages),
+      'players': dict([(key, players[key]) for key in keys if key in players.keys()]),
+      'version': version,
+    })
+
+  ##
+  # @brief Send the full snapshot of the room state to this connection only
+  # @param target Instance of QuizState
+  async def send_snapshot(self, target):
+    snapshot = await target.get_snapshot()
+    await self.send_json(content={
+      'type': 'snapshot',
+      'datetime': self.now(),
+      'version': snapshot['version'],
+      'players': snapshot['players'],
+      'scores': snapshot['scores'],
+      'resumeToken': self.create_resume_token(self.scope['user']),
+    })
+
+  ##
+  # @brief Serialize group message once and send it to the group
+  # @param event Event data which consists of `msg_type`, `ids`, and the values specified by `ids`
+  # @note The datetime is stamped by the sender so that all recipients receive the same frame.
+  async def group_send_message(self, event):
+    content = {
+      'type': event['msg_type'],
+      'datetime': self.now(),
+    }
+    content.update(dict([(key, event[key]) for key in event['ids']]))
+    text_data = await self.encode_json(content)
+    start = time.perf_counter()
+    await self.channel_layer.group_send(
+      self.group_name, {
+        'type': 'send_group_message',
+        'text': text_data,
+      }
+    )
+    g_metrics.group_send_latency.observe(time.perf_counter() - start, msg_type=event['msg_type'])
+    # Spectators receive the throttled snapshot instead of each message
     target = g_quizstates.get_state(self.group_name)
 
     if target is not None:
-      target.update_player(self.get_client_key(user), do_delete=True)
-      # Send system message
-      message = gettext_lazy('Leave {name} from {room}').format(name=str(user), room=self.room.name)
-      # Get player list
-      players = target.get_players()
-      await self.channel_layer.group_send(
-        self.group_name, {
-          'type': 'send_group_message',
-          'msg_type': 'system',
-          'ids': ['message', 'players'],
-          'message': message,
-          'players': players,
-        }
-      )
+      await g_spectators.publish(self.group_name, partial(self.publish_spectator_snapshot, target))
 
-      if not target.has_player():
-        g_quizstates.del_state(self.group_name)
+  ##
+  # @brief Send the snapshot of the room state to the spectators
+  # @param target Instance of QuizState
+  # @note Nothing is done if no spectator is connected so that the players' rooms pay no cost for the stream.
+  async def publish_spectator_snapshot(self, target):
+    if await target.backend.get_num_spectators(target.name) <= 0:
+      return
+    text_data = await create_spectator_message(target, self.now(), self.encode_json)
+    await self.channel_layer.group_send(
+      get_spectator_group_name(self.group_name), {
+        'type': 'send_spectator_snapshot',
+        'text': text_data,
+      }
+    )
 
   ##
   # @brief Send group message
-  # @param event Event data
+  # @param event Event data which includes the serialized frame
+  # @note The serialized frame is forwarded as it is.
   async def send_group_message(self, event):
     try:
-      content = {
-        'type': event['msg_type'],
-        'datetime': self.now(),
-      }
-      content.update(dict([(key, event[key]) for key in event['ids']]))
-      # Send message
-      await self.send_json(content=content)
+      await self.send(text_data=event['text'])
     except Exception as ex:
       self.logger.error(f'[{self.group_name}]Send group message: {ex}')
 
+  ##
+  # @brief Send the message that the answering phase has ended
+  async def send_stopped_answering(self):
+    message = gettext_lazy('Responses have ended. No more responses will be accepted.')
+    await self.group_send_message({
+      'msg_type': 'stoppedAnswering',
+      'ids': ['message'],
+      'message': str(message),
+    })
+
+  ##
+  # @brief Close the answering phase if it is still open
+  # @param target Instance of QuizState
+  # @param started_at Start time of the target answering phase (Default: None)
+  async def close_answering(self, target, started_at=None):
+    is_closed = await target.close_answering_phase(started_at)
+
+    if is_closed:
+      await self.send_stopped_answering()
+
+      if self.is_auto_judge():
+        await self.auto_judge(target)
+
+  ##
+  # @brief Send all player's answers and the correct answer
+  # @param answers All player's answers
+  # @param correct_answer The correct answer
+  async def send_answers(self, answers, correct_answer):
+    message = gettext_lazy('All player’s answers are received.')
+    await self.group_send_message({
+      'msg_type': 'sentAnswers',
+      'ids': ['data', 'correctAnswer', 'message'],
+      'data': answers,
+      'correctAnswer': correct_answer,
+      'message': str(message),
+    })
+
+  ##
+  # @brief Update player's score and share the result
+  # @param target Instance of QuizState
+  # @param judgement Judgement result for each player
+  # @note Only the scores which have been changed are sent.
+  # @note The answer log is written after the result is shared so that it never blocks the game.
+  async def share_result(self, target, judgement):
+    max_question = self.get_max_question()
+    results, is_ended = await target.update_state(max_question, judgement, get_score_key=self.get_score_key)
+    changes = dict([(key, results[key]) for key, val in judgement.items() if val and key in results.keys()])
+    version = await target.next_version()
+    # Create response message
+    if is_ended:
+      message = gettext_lazy('All quizzes have been asked. Please press the reset button.')
+    else:
+      message = gettext_lazy('The score is updated. Please next quiz.')
+
+    await self.group_send_message({
+      'msg_type': 'shareResult',
+      'ids': ['data', 'isEnded', 'message', 'version'],
+      'data': changes,
+      'isEnded': is_ended,
+      'message': str(message),
+      'version': version,
+    })
+    await target.save_answer_records()
+
+  ##
+  # @brief Judge all player's answers automatically and share the result
+  # @param target Instance of QuizState
+  async def auto_judge(self, target):
+    kwargs = {}
+    # In the case of time-weighted judgement
+    if self.capabilities.get('judgement_type') == models.JudgementType.TIME_WEIGHTED:
+      kwargs = {
+        'max_points': getattr(settings, 'QUIZ_TIME_WEIGHTED_MAX_POINTS', 10),
+        'reference_time': self.capabilities.get('answer_time_limit') or getattr(settings, 'QUIZ_TIME_WEIGHTED_REFERENCE_TIME', 30),
+      }
+    output = await target.judge_answers(**kwargs)
+
+    if output is not None:
+      answers, correct_answer, judgement = output
+      await self.send_answers(answers, correct_answer)
+      await self.share_result(target, dict([(self.get_score_key(key), val) for key, val in judgement.items()]))
+
+  ##
+  # @brief Close the answering phase when the time limit expires
+  # @param target Instance of QuizState
+  # @param time_limit Time limit in seconds
+  # @param started_at Start time of the target answering phase
+  async def wait_answer_deadline(self, target, time_limit, started_at):
+    try:
+      await asyncio.sleep(time_limit)
+      await self.close_answering(target, started_at)
+    except asyncio.CancelledError:
+      pass
+    except Exception as ex:
+      self.logger.error(f'[{self.group_name}]Answer deadline: {ex}')
+
+  ##
+  # @brief Start the answer deadline timer based on the deadline stored in the backend
+  # @param target Instance of QuizState
+  # @note Because the answering phase is closed only once, any consumer in the room can start the timer.
+  async def arm_answer_timer(self, target):
+    deadline = await target.get_answer_deadline()
+    self.cancel_answer_timer()
+
+    if deadline is not None:
+      started_at, deadline_at = deadline
+      time_limit = max(deadline_at - get_current_time().timestamp(), 0)
+      self.answer_timer = asyncio.create_task(self.wait_answer_deadline(target, time_limit, started_at))
+
+  ##
+  # @brief Cancel the answer deadline timer if it exists
+  # @return bool Judgement result
+  # @retval True  The running timer is cancelled
+  # @retval False No timer is running
+  def cancel_answer_timer(self):
+    is_running = self.answer_timer is not None and not self.answer_timer.done()
+
+    if self.answer_timer is not None:
+      self.answer_timer.cancel()
+      self.answer_timer = None
+
+    return is_running
+
+  ##
+  # @brief Take over the answer deadline timer from the consumer which has been disconnected
+  # @param event Event data (Not used)
+  async def rearm_answer_timer(self, event):
+    try:
+      target = g_quizstates.get_state(self.group_name) or await self.prepare_state()
+      await self.arm_answer_timer(target)
+    except Exception as ex:
+      self.logger.error(f'[{self.group_name}]Rearm answer timer: {ex}')
+
+  ##
+  # @brief Refresh capabilities when the room has been updated
+  # @param event Event data (Not used)
+  async def room_updated(self, event):
+    try:
+      user = self.scope['user']
+      self.room = await self.get_room(self.room.pk)
+      self.capabilities = await self.get_capabilities(user)
+      target = g_quizstates.get_state(self.group_name)
+
+      if not self.capabilities['is_assigned']:
+        await self.close()
+      # Because the score is reset when the room is updated, the owner synchronizes the room state
+      elif self.is_owner() and target is not None:
+        score = await self.get_score()
+        await target.update_score(score)
+    except Exception as ex:
+      self.logger.error(f'[{self.group_name}]Room updated: {ex}')
+
   # ===============================
   # = Define each command process =
   # ===============================
@@ -354,23 +1406,20 @@ class QuizConsumer(AsyncJsonWebsocketConsumer):
   # @param target Instance of QuizState
   # @param data Dummy data (Not used)
   async def reset_quiz(self, user, target, data):
-    is_owner = await self.is_owner(user)
-
-    if is_owner:
-      await database_sync_to_async(self.room.reset)()
+    if self.is_owner():
+      await database_sync(self.room.reset)()
       score = await self.get_score()
       # Update score and register relevant instance
-      target.update_score(score)
+      await target.update_score(score)
+      version = await target.next_version()
       # Send message
       message = gettext_lazy('Status reset is completed')
-      await self.channel_layer.group_send(
-        self.group_name, {
-          'type': 'send_group_message',
-          'msg_type': 'resetCompleted',
-          'ids': ['message'],
-          'message': str(message),
-        }
-      )
+      await self.group_send_message({
+        'msg_type': 'resetCompleted',
+        'ids': ['message', 'version'],
+        'message': str(message),
+        'version': version,
+      })
 
   ##
   # @brief Reset current quiz status
@@ -378,23 +1427,18 @@ class QuizConsumer(AsyncJsonWebsocketConsumer):
   # @param target Instance of QuizState
   # @param data Dummy data (Not used)
   async def get_next_quiz(self, user, target, data):
-    is_owner = await self.is_owner(user)
-
-    if is_owner:
-      max_question = await self.get_max_question()
+    if self.is_owner():
+      max_question = self.get_max_question()
       quiz, index = await target.get_quiz(max_question)
       # Send
       message = gettext_lazy('The next quiz is received.')
-      await self.channel_layer.group_send(
-        self.group_name, {
-          'type': 'send_group_message',
-          'msg_type': 'sentNextQuiz',
-          'ids': ['data', 'index', 'message'],
-          'data': quiz,
-          'index': index,
-          'message': str(message),
-        }
-      )
+      await self.group_send_message({
+        'msg_type': 'sentNextQuiz',
+        'ids': ['data', 'index', 'message'],
+        'data': quiz,
+        'index': index,
+        'message': str(message),
+      })
 
   ##
   # @brief Received quiz
@@ -402,18 +1446,15 @@ class QuizConsumer(AsyncJsonWebsocketConsumer):
   # @param target Instance of QuizState
   # @param data Dummy data (Not used)
   async def received_quiz(self, user, target, data):
-    is_completed = target.update_member_status(self.get_client_key(user))
+    is_completed = await target.update_member_status(self.get_client_key(user))
 
     if is_completed:
       message = gettext_lazy('All players received the quiz.')
-      await self.channel_layer.group_send(
-        self.group_name, {
-          'type': 'send_group_message',
-          'msg_type': 'sentAllQuizzes',
-          'ids': ['message'],
-          'message': str(message),
-        }
-      )
+      await self.group_send_message({
+        'msg_type': 'sentAllQuizzes',
+        'ids': ['message'],
+        'message': str(message),
+      })
 
   ##
   # @brief Change state from the members cannot answer quiz to the members can do that.
@@ -421,17 +1462,14 @@ class QuizConsumer(AsyncJsonWebsocketConsumer):
   # @param target Instance of QuizState
   # @param data Dummy data (Not used)
   async def start_answer(self, user, target, data):
-    is_owner = await self.is_owner(user)
-
-    if is_owner:
-      await target.answering_phase()
-      await self.channel_layer.group_send(
-        self.group_name, {
-          'type': 'send_group_message',
-          'msg_type': 'startedAnswering',
-          'ids': [],
-        }
-      )
+    if self.is_owner():
+      await target.answering_phase(self.capabilities.get('answer_time_limit', 0))
+      await self.group_send_message({
+        'msg_type': 'startedAnswering',
+        'ids': [],
+      })
+      # Start the answer deadline timer in the worker which handles the owner's command
+      await self.arm_answer_timer(target)
 
   ##
   # @brief Collect player's answer and store memory
@@ -439,10 +1477,10 @@ class QuizConsumer(AsyncJsonWebsocketConsumer):
   # @param target Instance of QuizState
   # @param data User's answer
   async def answer_quiz(self, user, target, data):
-    can_answer = await target.can_answer()
-
-    if can_answer:
-      target.update_answer(self.get_client_key(user), data)
+    is_stored = await target.update_answer(self.get_client_key(user), data)
+    # Close the answering phase early if all players in the room have answered
+    if is_stored and await target.has_all_answers():
+      await self.close_answering(target)
 
   ##
   # @brief Change state from the members can answer quiz to the members cannot do that.
@@ -450,19 +1488,10 @@ class QuizConsumer(AsyncJsonWebsocketConsumer):
   # @param target Instance of QuizState
   # @param data Dummy data (Not used)
   async def stop_answer(self, user, target, data):
-    is_owner = await self.is_owner(user)
-
-    if is_owner:
-      await target.received_all_answers_phase()
-      message = gettext_lazy('Responses have ended. No more responses will be accepted.')
-      await self.channel_layer.group_send(
-        self.group_name, {
-          'type': 'send_group_message',
-          'msg_type': 'stoppedAnswering',
-          'ids': ['message'],
-          'message': str(message),
-        }
-      )
+    if self.is_owner():
+      self.cancel_answer_timer()
+      # The phase is closed only once so that the message is sent and the answers are judged exactly once
+      await self.close_answering(target)
 
   ##
   # @brief Collect all player's answer and send them to owner
@@ -470,21 +1499,9 @@ class QuizConsumer(AsyncJsonWebsocketConsumer):
   # @param target Instance of QuizState
   # @param data Dummy data (Not used)
   async def get_answers(self, user, target, data):
-    is_owner = await self.is_owner(user)
-
-    if is_owner:
+    if self.is_owner() and not self.is_auto_judge():
       answers, correct_answer = await target.get_answers()
-      message = gettext_lazy('All player’s answers are received.')
-      await self.channel_layer.group_send(
-        self.group_name, {
-          'type': 'send_group_message',
-          'msg_type': 'sentAnswers',
-          'ids': ['data', 'correctAnswer', 'message'],
-          'data': answers,
-          'correctAnswer': correct_answer,
-          'message': str(message),
-        }
-      )
+      await self.send_answers(answers, correct_answer)
 
   ##
   # @brief Update player's score
@@ -492,47 +1509,121 @@ class QuizConsumer(AsyncJsonWebsocketConsumer):
   # @param target Instance of QuizState
   # @param data Judgement result for each player
   async def send_result(self, user, target, data):
-    is_owner = await self.is_owner(user)
-
-    if is_owner:
-      max_question = await self.get_max_question()
-      results, is_ended = await target.update_state(max_question, data)
-      # Create response message
-      if is_ended:
-        message = gettext_lazy('All quizzes have been asked. Please press the reset button.')
-      else:
-        message = gettext_lazy('The score is updated. Please next quiz.')
-
-      await self.channel_layer.group_send(
-        self.group_name, {
-          'type': 'send_group_message',
-          'msg_type': 'shareResult',
-          'ids': ['data', 'isEnded', 'message'],
-          'data': results,
-          'isEnded': is_ended,
-          'message': str(message),
-        }
-      )
+    if self.is_owner() and not self.is_auto_judge():
+      await self.share_result(target, data)
+
+  ##
+  # @brief Send the full snapshot of the room state to the request user
+  # @param user Request user
+  # @param target Instance of QuizState
+  # @param data Dummy data (Not used)
+  # @note The client requests the snapshot when it connects or detects a gap of versions.
+  async def get_snapshot(self, user, target, data):
+    await self.send_snapshot(target)
+
+  ##
+  # @brief Resume the connection with the compact snapshot of the room state
+  # @param user Request user
+  # @param target Instance of QuizState
+  # @param data Token to resume the connection
+  # @note If the token is invalid or expired, the full snapshot is sent instead.
+  async def resume(self, user, target, data):
+    if self.is_valid_resume_token(data, user):
+      snapshot = await target.get_resume_snapshot()
+      content = {
+        'type': 'resume',
+        'datetime': self.now(),
+        'resumeToken': self.create_resume_token(user),
+      }
+      content.update(snapshot)
+      await self.send_json(content=content)
+    else:
+      await self.send_snapshot(target)
+    # Take over the deadline of the answering phase if it is open
+    await self.arm_answer_timer(target)
 
   ##
   # @brief Receive message from WebSocket
   # @param content Event data
+  # @note The latency and the result of each command are recorded to the metrics.
   async def receive_json(self, content):
+    command = content.get('command') if isinstance(content, dict) else None
+    label = command if command in self.command_table.keys() else 'unknown'
+    is_failed = False
+    start = time.perf_counter()
+
     try:
-      command = content['command']
       data = content.get('data', None)
-      target = g_quizstates.get_state(self.group_name)
-      func_table = {
-        'resetQuiz': self.reset_quiz,
-        'getNextQuiz': self.get_next_quiz,
-        'receivedQuiz': self.received_quiz,
-        'startAnswer': self.start_answer,
-        'answerQuiz': self.answer_quiz,
-        'stopAnswer': self.stop_answer,
-        'getAnswers': self.get_answers,
-        'sendResult': self.send_result,
-      }
+      # In the case of that the stale state has been evicted, it is rebuilt
+      target = g_quizstates.get_state(self.group_name) or await self.prepare_state()
+      callback = getattr(self, self.command_table[command])
       # execute command
-      await func_table[command](self.scope['user'], target, data)
+      await callback(self.scope['user'], target, data)
+    except Exception as ex:
+      is_failed = True
+      self.logger.error(f'[{self.group_name}] {ex}')
+    g_metrics.record_command(label, self.group_name, time.perf_counter() - start, is_failed=is_failed)
+
+class SpectatorConsumer(AsyncJsonWebsocketConsumer):
+  ##
+  # @brief Constructor of SpectatorConsumer
+  # @param args Positional arguments
+  # @param kwargs Named arguments
+  def __init__(self, *args, **kwargs):
+    self.name = None
+    self.group_name = None
+    self.is_counted = False
+    self.logger = getLogger(__name__)
+    self.now = lambda: convert_timezone(get_current_time(), is_string=True, strformat='Y-m-d H:i:s')
+    super().__init__(*args, **kwargs)
+
+  ##
+  # @brief Connection process
+  # @note The spectator is verified by the signed token so that no query is issued.
+  # @note The spectator is counted in the backend so that the snapshots are published only while someone is watching.
+  async def connect(self):
+    try:
+      kwargs = self.scope['url_route']['kwargs']
+      pk = str(kwargs['pk'])
+      # In the case of that the token is issued for this room
+      if models.QuizRoom.get_pk_from_spectator_token(kwargs['token']) == pk:
+        self.name = f'quiz-{pk}'
+        self.group_name = get_spectator_group_name(self.name)
+        await self.accept()
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await g_quizstates.backend.update_spectators(self.name, 1)
+        self.is_counted = True
+        # Send the latest snapshot if the room is active
+        if await g_quizstates.backend.exists(self.name):
+          target = QuizState(self.name, g_quizstates.backend)
+          await self.send(text_data=await create_spectator_message(target, self.now(), self.encode_json))
+      else:
+        await self.close()
+    except Exception as ex:
+      self.logger.error(f'[{self.group_name}]Spectator connect: {ex}')
+
+  ##
+  # @brief Disconnection process
+  # @param close_code status code as closing the connection
+  async def disconnect(self, close_code):
+    if self.is_counted:
+      self.is_counted = False
+      await g_quizstates.backend.update_spectators(self.name, -1)
+    if self.group_name is not None:
+      await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+  ##
+  # @brief Receive message from WebSocket
+  # @param content Received data
+  # @note Because the stream is read-only, all messages are ignored.
+  async def receive_json(self, content):
+    pass
+
+  ##
+  # @brief Send the snapshot of the room state
+  # @param event Event data which includes the serialized snapshot
+  async def send_spectator_snapshot(self, event):
+    try:
+      await self.send(text_data=event['text'])
     except Exception as ex:
-      self.logger.error(f'[{self.group_name}] {ex}')
\ No newline at end of file
+      self.logger.error(f'[{self.group_name}]Send spectator snapshot: {ex}')
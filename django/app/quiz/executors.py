@@ -0,0 +1,159 @@
+from channels.db import database_sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from .metrics import g_metrics
+from functools import partial, wraps
+import asyncio
+import threading
+import time
+
+##
+# @brief Get the maximum size of the connection pool
+# @param alias Database alias (Default: 'default')
+# @return size The maximum number of connections
+# @note If the pool size is not specified, the default size of psycopg_pool (i.e., 4) is returned.
+def get_pool_size(alias='default'):
+  options = settings.DATABASES[alias].get('OPTIONS', {})
+  pool = options.get('pool')
+  size = 4
+
+  if isinstance(pool, dict):
+    size = pool.get('max_size') or pool.get('min_size', size)
+
+  return size
+
+##
+# @brief Check whether the dedicated executor is used or not
+# @return bool Judgement result
+# @retval True  The database is accessed in the dedicated executor
+# @retval False The database is accessed in the thread-sensitive executor of asgiref
+def use_db_executor():
+  return getattr(settings, 'QUIZ_DB_EXECUTOR', True)
+
+class DatabaseExecutor:
+  ##
+  # @brief Constructor of DatabaseExecutor
+  # @param max_workers The number of worker threads (Default: None)
+  # @note If `max_workers` is None, the number is given by `QUIZ_DB_EXECUTOR_WORKERS` setting or the pool size.
+  def __init__(self, max_workers=None):
+    self.max_workers = max_workers
+    self.executor = None
+    self.queue_depth = 0
+    self.lock = threading.Lock()
+
+  ##
+  # @brief Get the number of worker threads
+  # @return max_workers The number of worker threads
+  def get_max_workers(self):
+    max_workers = self.max_workers or getattr(settings, 'QUIZ_DB_EXECUTOR_WORKERS', None)
+
+    return max_workers or get_pool_size()
+
+  ##
+  # @brief Get the thread pool which is created at the first call
+  # @return Instance of ThreadPoolExecutor
+  def get_executor(self):
+    with self.lock:
+      if self.executor is None:
+        self.executor = ThreadPoolExecutor(max_workers=self.get_max_workers(), thread_name_prefix='quiz-db')
+
+    return self.executor
+
+  ##
+  # @brief Shutdown the thread pool
+  # @param wait Describes whether this method waits for the running tasks or not (Default: True)
+  def shutdown(self, wait=True):
+    with self.lock:
+      executor, self.executor = self.executor, None
+
+    if executor is not None:
+      executor.shutdown(wait=wait)
+
+  ##
+  # @brief Register the waiting task
+  # @return ticket Dictionary which describes whether the task is still waiting or not
+  def _enter_queue(self):
+    with self.lock:
+      self.queue_depth += 1
+      g_metrics.db_executor_queue_depth.set(self.queue_depth)
+
+    return {'is_waiting': True}
+
+  ##
+  # @brief Unregister the waiting task
+  # @param ticket Dictionary given by `_enter_queue`
+  # @note The number is decreased only once for each ticket even if this method is called several times.
+  def _leave_queue(self, ticket):
+    with self.lock:
+      if ticket['is_waiting']:
+        ticket['is_waiting'] = False
+        self.queue_depth -= 1
+        g_metrics.db_executor_queue_depth.set(self.queue_depth)
+
+  ##
+  # @brief Execute the function in the worker thread
+  # @param ticket Dictionary given by `_enter_queue`
+  # @param submitted_at Time when the task was submitted
+  # @param func Synchronous function
+  # @param args Positional arguments
+  # @param kwargs Named arguments
+  # @return Result of the function
+  # @note As with `database_sync_to_async`, the stale connections are closed before and after the function.
+  def _execute(self, ticket, submitted_at, func, *args, **kwargs):
+    self._leave_queue(ticket)
+    g_metrics.db_executor_wait.observe(time.perf_counter() - submitted_at)
+    close_old_connections()
+
+    try:
+      result = func(*args, **kwargs)
+    finally:
+      close_old_connections()
+
+    return result
+
+  ##
+  # @brief Run the synchronous function in the dedicated thread pool
+  # @param func Synchronous function
+  # @param args Positional arguments
+  # @param kwargs Named arguments
+  # @return Result of the function
+  # @note Even if the caller is cancelled before a worker picks up the task, the task is removed from the queue depth.
+  async def run(self, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    executor = self.get_executor()
+    ticket = self._enter_queue()
+
+    try:
+      future = loop.run_in_executor(executor, partial(self._execute, ticket, time.perf_counter(), func, *args, **kwargs))
+      result = await future
+    finally:
+      self._leave_queue(ticket)
+
+    return result
+
+  ##
+  # @brief Wrap the synchronous function as the coroutine function which runs in the thread pool
+  # @param func Synchronous function
+  # @return Coroutine function
+  def wrap(self, func):
+    @wraps(func)
+    async def inner(*args, **kwargs):
+      return await self.run(func, *args, **kwargs)
+
+    return inner
+
+g_db_executor = DatabaseExecutor()
+
+##
+# @brief Wrap the synchronous function which accesses the database from the consumer
+# @param func Synchronous function
+# @return Coroutine function
+# @note If `QUIZ_DB_EXECUTOR` is False, `database_sync_to_async` of channels is used.
+def database_sync(func):
+  if use_db_executor():
+    wrapper = g_db_executor.wrap(func)
+  else:
+    wrapper = database_sync_to_async(func)
+
+  return wrapper
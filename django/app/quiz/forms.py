@@ -14,9 +14,12 @@ from utils.forms import (
   BaseFormWithCSS,
   ModelFormBasedOnUser,
 )
+from utils.search import g_trigram_search
 from utils.widgets import CustomRadioSelect
 from functools import partial
 from . import models, validators
+from .caches import g_search_choice_cache
+from .indexes import g_quiz_index
 
 UserModel = get_user_model()
 
@@ -169,6 +172,8 @@ class GenreUploadForm(forms.Form):
       # Store relevant items to database
       with transaction.atomic():
         instances = models.Genre.objects.bulk_create(enabled_items)
+        # Because `bulk_create` does not send `post_save` signal, the cached choices are invalidated explicitly
+        transaction.on_commit(g_search_choice_cache.invalidate)
     except IntegrityError as ex:
       error = forms.ValidationError(
         gettext_lazy('Include invalid records. Please check the detail: %(ex)s.'),
@@ -267,16 +272,16 @@ class QuizSearchForm(forms.Form):
   def __init__(self, user, *args, **kwargs):
     super().__init__(*args, **kwargs)
     self.user = user
+    # The choices are collected once and are shared with the options of dual listbox
+    self.search_choices = g_search_choice_cache.get(self.user)
     # Set genre's choices
     self.fields['genres'].choices = [
-      (str(instance.pk), f'{instance}({instance.quizzes.count()})')
-      for instance in models.Genre.objects.collect_active_genres()
+      (pk, f'{name}({count})') for pk, name, count in self.search_choices['genres']
     ]
     # Set creator's choices
     if self.user.has_manager_role():
       self.fields['creators'].choices = [
-        (str(instance.pk), f'{instance}({instance.quizzes.count()},{instance.code})')
-        for instance in UserModel.objects.collect_creators()
+        (pk, f'{name}({count},{code})') for pk, name, count, code in self.search_choices['creators']
       ]
     else:
       ##
@@ -309,33 +314,20 @@ class QuizSearchForm(forms.Form):
   # @return options JSON data of option element which consists of primary-key, label-name, and selected-or-not
   @property
   def get_genre_options(self):
-    all_genres = models.Genre.objects.collect_active_genres()
-
-    if self.user.has_manager_role():
-      callback = lambda item: item.quizzes.count()
-    else:
-      callback = lambda item: item.quizzes.filter(creator=self.user).count()
-    options = self.dual_listbox.collect_options_of_items(all_genres, callback=callback)
+    items = [(f'{name}({count})', pk, False) for pk, name, count in self.search_choices['genres']]
+    options = self.dual_listbox.convert2json(items)
 
     return options
 
   ##
   # @brief Get options of select element
   # @return options JSON data of option element which consists of primary-key, label-name, and selected-or-not
+  # @note In the case of that the request user is a quiz owner, the creator is always selected.
   @property
   def get_creator_options(self):
-    callback = lambda creator: f'{creator.quizzes.count()},{creator.code}'
-
-    if self.user.has_manager_role():
-      # In the case of that the request user has manager role (e.g., MANAGER or superuser)
-      all_creators = UserModel.objects.collect_creators()
-      selected_ones = None
-    else:
-      # In the case of that the request user is a quiz owner
-      all_creators = UserModel.objects.filter(pk__in=[self.user.pk])
-      selected_ones = all_creators
-    # Collect option data based on all creators and selected ones
-    options = self.dual_listbox.collect_options_of_items(all_creators, selected_ones, callback=callback)
+    is_selected = not self.user.has_manager_role()
+    items = [(f'{name}({count},{code})', pk, is_selected) for pk, name, count, code in self.search_choices['creators']]
+    options = self.dual_listbox.convert2json(items)
 
     return options
 
@@ -430,6 +422,11 @@ class QuizUploadForm(forms.Form):
       # Store relevant items to database
       with transaction.atomic():
         instances = models.Quiz.objects.bulk_create(enabled_items)
+        # Because `bulk_create` does not call `save` method, the counters are updated explicitly
+        models.Quiz.update_completed_quiz_counts(added=[obj.get_completed_membership() for obj in instances if obj.is_completed])
+        # Because `bulk_create` does not send `post_save` signal, the cached index is updated explicitly
+        transaction.on_commit(partial(g_quiz_index.update_quizzes, instances))
+        transaction.on_commit(g_search_choice_cache.invalidate)
     except IntegrityError as ex:
       error = forms.ValidationError(
         gettext_lazy('Include invalid records. Please check the detail: %(ex)s.'),
@@ -516,7 +513,7 @@ class QuizForm(ModelFormBasedOnUser):
 
   class Meta:
     model = models.Quiz
-    fields = ('genre', 'question', 'answer', 'is_completed')
+    fields = ('genre', 'question', 'answer', 'alternative_answers', 'is_completed')
     widgets = {
       'genre': forms.Select(attrs={
         'class': 'form-select',
@@ -534,6 +531,12 @@ class QuizForm(ModelFormBasedOnUser):
         'cols': '40',
         'style': 'resize: none;',
       }),
+      'alternative_answers': forms.Textarea(attrs={
+        'class': 'form-control',
+        'rows': '3',
+        'cols': '40',
+        'style': 'resize: none;',
+      }),
     }
 
   is_completed = forms.TypedChoiceField(
@@ -590,18 +593,18 @@ class QuizRoomSearchForm(forms.Form):
   def filtering(self, queryset):
     if self.is_valid():
       name = self.cleaned_data.get('name', '')
-      queryset = queryset.filter(name__contains=name)
+      queryset = g_trigram_search.search(queryset, 'name', name)
 
     return queryset
 
 class QuizRoomForm(ModelFormBasedOnUser):
   dual_listbox_template_name = 'renderer/custom_dual_listbox_preprocess.html'
   owner_name = 'owner'
-  field_order = ('name', 'genres', 'creators', 'groups', 'members', 'max_question', 'is_enabled')
+  field_order = ('name', 'genres', 'creators', 'groups', 'members', 'max_question', 'answer_time_limit', 'judgement_type', 'is_enabled')
 
   class Meta:
     model = models.QuizRoom
-    fields = ('name', 'genres', 'creators', 'members', 'max_question', 'use_typewriter_effect', 'is_enabled')
+    fields = ('name', 'genres', 'creators', 'members', 'max_question', 'answer_time_limit', 'judgement_type', 'use_typewriter_effect', 'is_enabled')
     widgets = {
       'name': forms.TextInput(attrs={
         'class': 'form-control',
@@ -630,6 +633,30 @@ class QuizRoomForm(ModelFormBasedOnUser):
       }),
     }
 
+  answer_time_limit = forms.IntegerField(
+    label=gettext_lazy('Answer time limit'),
+    min_value=0,
+    initial=0,
+    required=False,
+    widget=forms.NumberInput(attrs={
+      'class': 'form-control',
+    }),
+    help_text=gettext_lazy('Time limit in seconds to answer each question. If 0 is set, there is no time limit.'),
+  )
+
+  judgement_type = forms.TypedChoiceField(
+    label=gettext_lazy('Judgement type'),
+    coerce=int,
+    initial=models.JudgementType.MANUAL,
+    empty_value=models.JudgementType.MANUAL,
+    required=False,
+    choices=models.JudgementType.choices,
+    widget=forms.Select(attrs={
+      'class': 'form-select',
+    }),
+    help_text=gettext_lazy('Describes how the answers are judged. In the automatic judgement, the answers are judged as soon as the answering phase ends.'),
+  )
+
   use_typewriter_effect = forms.TypedChoiceField(
     label=gettext_lazy('Use typewriter effect/Bulk display'),
     coerce=bool_converter,
@@ -687,6 +714,14 @@ class QuizRoomForm(ModelFormBasedOnUser):
     self.fields['groups'].queryset = self.user.group_owners.all()
     self.dual_listbox = DualListbox()
 
+  ##
+  # @brief Check answer time limit
+  # @return time_limit Answer time limit (If no value is given, 0 is returned)
+  def clean_answer_time_limit(self):
+    time_limit = self.cleaned_data.get('answer_time_limit')
+
+    return time_limit or 0
+
   ##
   # @brief Check the relationship of relevant variables
   # @exception ValidationError Both `genres` and `creators` are not set.
@@ -703,8 +738,17 @@ class QuizRoomForm(ModelFormBasedOnUser):
         code='invalid_assignment',
       )
     # Check the number of quizzes this system can collect
-    all_relevant_quizzes = models.Quiz.objects.collect_quizzes(creators=creators, genres=genres)
-    max_count = all_relevant_quizzes.count()
+    if creators is not None:
+      creators = list(creators)
+    if genres is not None:
+      genres = list(genres)
+    max_count = g_quiz_index.count(
+      creators=[obj.pk for obj in creators] if creators is not None else None,
+      genres=[obj.pk for obj in genres] if genres is not None else None,
+    )
+    # In the case of that the cached index is not available
+    if max_count is None:
+      max_count = models.Quiz.objects.collect_quizzes(creators=creators, genres=genres).count()
     # In the case of that there are not enough quizzes.
     if max_count < max_question:
       raise forms.ValidationError(
@@ -720,7 +764,7 @@ class QuizRoomForm(ModelFormBasedOnUser):
   def get_genre_options(self):
     all_genres = self.fields['genres'].queryset
     selected_genres = self.instance.genres.all() if self.instance else None
-    callback = lambda genre: genre.quizzes.filter(is_completed=True).count()
+    callback = lambda genre: genre.completed_quiz_count
     options = self.dual_listbox.collect_options_of_items(all_genres, selected_genres, callback=callback)
 
     return options
@@ -732,7 +776,7 @@ class QuizRoomForm(ModelFormBasedOnUser):
   def get_creator_options(self):
     all_creators = self.fields['creators'].queryset
     selected_creators = self.instance.creators.all() if self.instance else None
-    callback = lambda creator: f'{creator.quizzes.filter(is_completed=True).count()},{creator.code}'
+    callback = lambda creator: f'{creator.completed_quiz_count},{creator.code}'
     options = self.dual_listbox.collect_options_of_items(all_creators, selected_creators, callback)
 
     return options
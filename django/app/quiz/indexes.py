@@ -0,0 +1,274 @@
+from logging import getLogger
+from django.conf import settings
+from redis import Redis
+from redis.exceptions import RedisError
+import threading
+import uuid
+
+class QuizIndex:
+  ##
+  # @brief Constructor of QuizIndex
+  # @param hosts Redis hosts which consist of either (host, port) tuple or URL string (Default: None)
+  # @param prefix Key prefix (Default: None)
+  # @note If `hosts` or `prefix` is None, the value is given by `QUIZ_INDEX` setting.
+  # @note The index consists of the sets of completed quiz IDs for each genre and each creator.
+  def __init__(self, hosts=None, prefix=None):
+    self.hosts = hosts
+    self.prefix = prefix
+    self.client = None
+    self.client_kwargs = None
+    self.lock = threading.Lock()
+    self.logger = getLogger(__name__)
+
+  ##
+  # @brief Get configuration of the index
+  # @return config Dictionary of `hosts` and `prefix`
+  def get_config(self):
+    config = getattr(settings, 'QUIZ_INDEX', {})
+
+    return {
+      'hosts': self.hosts or config.get('hosts') or [('localhost', 6379)],
+      'prefix': self.prefix or config.get('prefix', 'quiz-index'),
+    }
+
+  ##
+  # @brief Get redis client which is created at the first call
+  # @return client Instance of redis.Redis
+  def get_client(self):
+    host = self.get_config()['hosts'][0]
+    kwargs = {'url': host} if isinstance(host, str) else {'host': host[0], 'port': host[1]}
+
+    with self.lock:
+      if self.client is None or self.client_kwargs != kwargs:
+        url = kwargs.get('url')
+        self.client = Redis.from_url(url, decode_responses=True) if url else Redis(decode_responses=True, **kwargs)
+        self.client_kwargs = kwargs
+
+    return self.client
+
+  ##
+  # @brief Get redis key
+  # @param args Parts of the key
+  # @return key Redis key
+  def get_key(self, *args):
+    parts = [self.get_config()['prefix']] + [str(arg) for arg in args]
+
+    return ':'.join(parts)
+
+  ##
+  # @brief Check whether the index can be used to answer queries or not
+  # @return bool Judgement result
+  # @retval True  The index has been built and is maintained
+  # @retval False The index has not been built yet or redis is not available
+  def is_ready(self):
+    try:
+      is_ready = bool(self.get_client().exists(self.get_key('ready')))
+    except RedisError as ex:
+      self.logger.warning(f'[QuizIndex]Failed to check the index: {ex}')
+      is_ready = False
+
+    return is_ready
+
+  # ===========
+  # = Updates =
+  # ===========
+  ##
+  # @brief Add the quiz to the sets of its genre and its creator
+  # @param pipe Instance of pipeline
+  # @param pk The quiz's primary key
+  # @param genre_id The genre's primary key
+  # @param creator_id The creator's primary key
+  def _add(self, pipe, pk, genre_id, creator_id):
+    pipe.sadd(self.get_key('genre', genre_id), str(pk))
+    pipe.sadd(self.get_key('creator', creator_id), str(pk))
+    pipe.sadd(self.get_key('all'), str(pk))
+    pipe.hset(self.get_key('quiz', pk), mapping={'genre': str(genre_id), 'creator': str(creator_id)})
+
+  ##
+  # @brief Apply the change of the quiz to the index
+  # @param pk The quiz's primary key
+  # @param membership Dictionary of `genre` and `creator` (None if the quiz is not a member of the index)
+  # @note The previous membership is read in the same transaction so that the quiz moves between sets atomically.
+  # @note Nothing is done until the index is built by `rebuild`.
+  def _apply(self, pk, membership):
+    quiz_key = self.get_key('quiz', pk)
+    maintained_key = self.get_key('maintained')
+
+    def callback(pipe):
+      if not pipe.exists(maintained_key):
+        return
+      previous = pipe.hgetall(quiz_key)
+      pipe.multi()
+
+      if previous:
+        pipe.srem(self.get_key('genre', previous['genre']), str(pk))
+        pipe.srem(self.get_key('creator', previous['creator']), str(pk))
+        pipe.srem(self.get_key('all'), str(pk))
+        pipe.delete(quiz_key)
+      if membership is not None:
+        self._add(pipe, pk, membership['genre'], membership['creator'])
+
+    try:
+      self.get_client().transaction(callback, quiz_key, maintained_key)
+    except RedisError as ex:
+      self.logger.error(f'[QuizIndex]Failed to update quiz {pk}: {ex}')
+
+  ##
+  # @brief Update the index based on the quiz
+  # @param pk The quiz's primary key
+  # @param genre_id The genre's primary key
+  # @param creator_id The creator's primary key
+  # @param is_completed Describes whether the quiz is completed or not
+  def update_quiz(self, pk, genre_id, creator_id, is_completed):
+    membership = {'genre': genre_id, 'creator': creator_id} if is_completed else None
+    self._apply(pk, membership)
+
+  ##
+  # @brief Update the index based on the quizzes
+  # @param instances List of Quiz instances
+  # @note This method has to be called explicitly when the instances are stored by `bulk_create`.
+  def update_quizzes(self, instances):
+    for instance in instances:
+      self.update_quiz(instance.pk, instance.genre_id, instance.creator_id, instance.is_completed)
+
+  ##
+  # @brief Remove the quiz from the index
+  # @param pk The quiz's primary key
+  def remove_quiz(self, pk):
+    self._apply(pk, None)
+
+  # ===========
+  # = Queries =
+  # ===========
+  ##
+  # @brief Execute the set operation which is equivalent to `collect_quizzes`
+  # @param command Redis command to read the result set (`scard` or `smembers`)
+  # @param creators Primary keys of creators (Default: None)
+  # @param genres Primary keys of genres (Default: None)
+  # @param is_and_op As using the "AND" operator, it is `True` (Default: False)
+  # @return Result of the command (None if the index is not ready)
+  def _execute_query(self, command, creators=None, genres=None, is_and_op=False):
+    groups = [
+      [self.get_key(kind, pk) for pk in pks]
+      for kind, pks in (('creator', creators), ('genre', genres)) if pks is not None
+    ]
+    base = self.get_key('tmp', uuid.uuid4().hex)
+    tmp_keys = []
+
+    try:
+      with self.get_client().pipeline(transaction=True) as pipe:
+        pipe.exists(self.get_key('ready'))
+        # In the case of no conditions, all completed quizzes are target
+        if not groups:
+          target = self.get_key('all')
+        # In the case of the "AND" operator, the union of each group is intersected
+        elif is_and_op:
+          for idx, keys in enumerate(groups):
+            tmp_keys += [f'{base}:{idx}']
+            pipe.sunionstore(tmp_keys[-1], *(keys or [self.get_key('empty')]))
+          target = f'{base}:result'
+          tmp_keys += [target]
+          pipe.sinterstore(target, *tmp_keys[:-1])
+        # In the case of the "OR" operator, the union of all keys is target
+        else:
+          keys = sum(groups, [])
+          target = f'{base}:result'
+          tmp_keys += [target]
+          pipe.sunionstore(target, *(keys or [self.get_key('empty')]))
+        getattr(pipe, command)(target)
+
+        if tmp_keys:
+          pipe.delete(*tmp_keys)
+        results = pipe.execute()
+    except RedisError as ex:
+      self.logger.warning(f'[QuizIndex]Failed to query the index: {ex}')
+      return None
+
+    is_ready = results[0]
+    offset = -2 if tmp_keys else -1
+
+    return results[offset] if is_ready else None
+
+  ##
+  # @brief Collect completed quiz IDs which meet the conditions
+  # @param creators Primary keys of creators (Default: None)
+  # @param genres Primary keys of genres (Default: None)
+  # @param is_and_op As using the "AND" operator, it is `True` (Default: False)
+  # @return ids Set of quiz IDs as string (None if the index is not ready)
+  def collect(self, creators=None, genres=None, is_and_op=False):
+    return self._execute_query('smembers', creators=creators, genres=genres, is_and_op=is_and_op)
+
+  ##
+  # @brief Count completed quizzes which meet the conditions
+  # @param creators Primary keys of creators (Default: None)
+  # @param genres Primary keys of genres (Default: None)
+  # @param is_and_op As using the "AND" operator, it is `True` (Default: False)
+  # @return count The number of quizzes (None if the index is not ready)
+  def count(self, creators=None, genres=None, is_and_op=False):
+    return self._execute_query('scard', creators=creators, genres=genres, is_and_op=is_and_op)
+
+  # =======================
+  # = Rebuild and checks =
+  # =======================
+  ##
+  # @brief Delete all keys of the index
+  def clear(self):
+    client = self.get_client()
+    keys = list(client.scan_iter(match=self.get_key('*'), count=1000))
+
+    for idx in range(0, len(keys), 1000):
+      client.delete(*keys[idx:idx + 1000])
+
+  ##
+  # @brief Build the index from the database
+  # @param queryset Queryset of completed quizzes
+  # @param batch_size The number of quizzes registered at once (Default: 1000)
+  # @return count The number of registered quizzes
+  # @note The incremental updates are enabled before the scan so that the changes during the rebuild are not lost.
+  def rebuild(self, queryset, batch_size=1000):
+    client = self.get_client()
+    self.clear()
+    client.set(self.get_key('maintained'), 1)
+    count = 0
+
+    with client.pipeline(transaction=False) as pipe:
+      for pk, genre_id, creator_id in queryset.values_list('pk', 'genre_id', 'creator_id').iterator(chunk_size=batch_size):
+        self._add(pipe, pk, genre_id, creator_id)
+        count += 1
+
+        if count % batch_size == 0:
+          pipe.execute()
+      pipe.execute()
+    client.set(self.get_key('ready'), 1)
+
+    return count
+
+  ##
+  # @brief Compare the index with the database
+  # @param queryset Queryset of completed quizzes
+  # @return errors Dictionary whose key is the set name and value is the tuple of missing IDs and unexpected IDs
+  def check(self, queryset):
+    client = self.get_client()
+    expected = {}
+
+    for pk, genre_id, creator_id in queryset.values_list('pk', 'genre_id', 'creator_id').iterator():
+      for name in (f'genre:{genre_id}', f'creator:{creator_id}', 'all'):
+        expected.setdefault(name, set()).add(str(pk))
+    names = set(expected.keys())
+    offset = len(self.get_key(''))
+
+    for pattern in ('genre:*', 'creator:*', 'all'):
+      names |= set([key[offset:] for key in client.scan_iter(match=self.get_key(pattern), count=1000)])
+    errors = {}
+
+    for name in sorted(names):
+      actual = client.smembers(self.get_key(name))
+      missing = expected.get(name, set()) - actual
+      unexpected = actual - expected.get(name, set())
+
+      if missing or unexpected:
+        errors[name] = (missing, unexpected)
+
+    return errors
+
+g_quiz_index = QuizIndex()
@@ -0,0 +1,77 @@
+import math
+import unicodedata
+
+##
+# @brief Translation table to fold katakana into hiragana
+_KANA_TABLE = dict([(code, code - 0x60) for code in range(ord('ァ'), ord('ヶ') + 1)])
+
+##
+# @brief Normalize the answer to compare it with other answers
+# @param text Input text
+# @return normalized_text Normalized text
+# @note The following steps are applied in this order.
+#   1. Unicode NFKC normalization (Full-width alphanumerics and half-width katakana are folded.)
+#   2. Kana folding (Katakana is converted to hiragana.)
+#   3. Whitespace folding (All whitespaces are removed.)
+#   4. Case folding
+def normalize_answer(text):
+  normalized_text = unicodedata.normalize('NFKC', text or '')
+  normalized_text = normalized_text.translate(_KANA_TABLE)
+  normalized_text = ''.join(normalized_text.split())
+
+  return normalized_text.casefold()
+
+##
+# @brief Collect accepted answers in the normalized form
+# @param answer The correct answer
+# @param alternative_answers Alternative answers separated by newlines (Default: '')
+# @return accepted_answers List of normalized answers without duplicates and empty ones
+def collect_accepted_answers(answer, alternative_answers=''):
+  candidates = [answer] + (alternative_answers or '').splitlines()
+  normalized_answers = [normalize_answer(candidate) for candidate in candidates]
+  accepted_answers = list(dict.fromkeys([val for val in normalized_answers if val]))
+
+  return accepted_answers
+
+class AnswerJudge:
+  ##
+  # @brief Constructor of AnswerJudge
+  # @param accepted_answers Normalized answers which are regarded as correct
+  # @param max_points Points for the correct answer (Default: 1)
+  # @param reference_time Reference time in seconds to weight points (Default: 0)
+  # @note If `reference_time` is greater than 0, the points decrease linearly from `max_points` to 1 within the reference time.
+  def __init__(self, accepted_answers, max_points=1, reference_time=0):
+    self.accepted_answers = frozenset(accepted_answers)
+    self.max_points = max(int(max_points), 1)
+    self.reference_time = max(reference_time, 0)
+
+  ##
+  # @brief Get points of the correct answer
+  # @param elapsed_time Elapsed time in seconds to answer
+  # @return points Points based on the elapsed time
+  def get_points(self, elapsed_time):
+    if self.reference_time > 0:
+      rate = 1 - min(max(elapsed_time, 0), self.reference_time) / self.reference_time
+      points = max(math.ceil(self.max_points * rate), 1)
+    else:
+      points = self.max_points
+
+    return points
+
+  ##
+  # @brief Judge all answers of the round in one batch
+  # @param answers Dictionary of player's answer which consists of `answer` and `time`
+  # @return judgement Dictionary of points for each player
+  # @note The same raw answers are normalized only once.
+  def judge(self, answers):
+    results = {}
+    judgement = {}
+
+    for key, data in answers.items():
+      raw_answer = data.get('answer', '')
+
+      if raw_answer not in results.keys():
+        results[raw_answer] = normalize_answer(raw_answer) in self.accepted_answers
+      judgement[key] = self.get_points(data.get('time', 0)) if results[raw_answer] else 0
+
+    return judgement
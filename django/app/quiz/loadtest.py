@@ -0,0 +1,299 @@
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test.utils import override_settings
+from account.models import RoleType
+from . import models, routing
+from .backends import InMemoryStateBackend
+from .caches import g_search_choice_cache
+from .consumers import g_quizstates
+from .indexes import g_quiz_index
+import asyncio
+import math
+import time
+import tracemalloc
+import uuid
+
+UserModel = get_user_model()
+
+##
+# @brief Get the percentile of values based on the nearest-rank method
+# @param values Target values
+# @param percent Percentile (0 < percent <= 100)
+# @return The percentile of values (0 if values are empty)
+def get_percentile(values, percent):
+  if not values:
+    return 0
+
+  data = sorted(values)
+  rank = max(math.ceil(len(data) * percent / 100), 1)
+
+  return data[rank - 1]
+
+class LatencyRecorder:
+  ##
+  # @brief Constructor of LatencyRecorder
+  def __init__(self):
+    self.latencies = {}
+    self.num_messages = 0
+
+  ##
+  # @brief Record the latency of the command
+  # @param command Command name
+  # @param elapsed_time Elapsed time in seconds
+  def record(self, command, elapsed_time):
+    self.latencies.setdefault(command, []).append(elapsed_time)
+
+  ##
+  # @brief Summarize the latencies of each command
+  # @return summary Dictionary of `count`, `p50`, `p95`, and `p99` for each command
+  def summarize(self):
+    summary = dict([
+      (command, {
+        'count': len(values),
+        'p50': get_percentile(values, 50),
+        'p95': get_percentile(values, 95),
+        'p99': get_percentile(values, 99),
+      })
+      for command, values in self.latencies.items()
+    ])
+
+    return summary
+
+class SimulatedPlayer:
+  ##
+  # @brief Constructor of SimulatedPlayer
+  # @param application ASGI application of websocket
+  # @param room Instance of QuizRoom
+  # @param user Instance of User model
+  # @param recorder Instance of LatencyRecorder
+  # @param timeout Timeout in seconds to wait for each message
+  # @note The user is set to the scope directly instead of the session authentication.
+  def __init__(self, application, room, user, recorder, timeout):
+    self.communicator = WebsocketCommunicator(application, f'ws/quizroom/{room.pk}')
+    self.communicator.scope['user'] = user
+    self.pk = str(user.pk)
+    self.recorder = recorder
+    self.timeout = timeout
+
+  ##
+  # @brief Connect to the consumer
+  # @exception ConnectionError The connection is rejected by the consumer
+  async def connect(self):
+    is_connected, _ = await self.communicator.connect(timeout=self.timeout)
+
+    if not is_connected:
+      raise ConnectionError(f'Failed to connect user {self.pk}')
+
+  ##
+  # @brief Disconnect from the consumer
+  # @note The error of disconnection is ignored so that the original error of the scenario is not hidden.
+  async def disconnect(self):
+    try:
+      await self.communicator.disconnect(timeout=self.timeout)
+    except Exception:
+      pass
+
+  ##
+  # @brief Send the command to the consumer
+  # @param command Command name
+  # @param data Data of the command (Default: None)
+  async def send(self, command, data=None):
+    await self.communicator.send_json_to({'command': command, 'data': data})
+
+  ##
+  # @brief Wait for the message of the specific type
+  # @param msg_type Target message type
+  # @return message Received message
+  # @note The other messages are counted and discarded.
+  async def wait_for(self, msg_type):
+    while True:
+      message = await self.communicator.receive_json_from(timeout=self.timeout)
+      self.recorder.num_messages += 1
+
+      if message['type'] == msg_type:
+        break
+
+    return message
+
+class RoomScenario:
+  ##
+  # @brief Constructor of RoomScenario
+  # @param owner Instance of SimulatedPlayer for the owner
+  # @param members List of SimulatedPlayer for the members
+  # @param recorder Instance of LatencyRecorder
+  def __init__(self, owner, members, recorder):
+    self.owner = owner
+    self.players = [owner] + list(members)
+    self.recorder = recorder
+
+  ##
+  # @brief Send the command and wait for the messages of all players
+  # @param command Command name
+  # @param msg_type Message type which all players receive
+  # @param senders Players who send the command (Default: None, i.e., the owner)
+  # @param data Callback to create data of the command from the player (Default: None)
+  # @note The latency is measured from the first send to the owner's receipt of the message.
+  async def _execute(self, command, msg_type, senders=None, data=None):
+    senders = senders or [self.owner]
+    start = time.perf_counter()
+
+    for player in senders:
+      await player.send(command, data(player) if data is not None else None)
+    await self.owner.wait_for(msg_type)
+    self.recorder.record(command, time.perf_counter() - start)
+    await asyncio.gather(*[player.wait_for(msg_type) for player in self.players if player is not self.owner])
+
+  ##
+  # @brief Drive the full loop of the game
+  # @param num_rounds The number of rounds
+  async def run(self, num_rounds):
+    await self._execute('resetQuiz', 'resetCompleted')
+
+    for _ in range(num_rounds):
+      await self._execute('getNextQuiz', 'sentNextQuiz')
+      await self._execute('receivedQuiz', 'sentAllQuizzes', senders=self.players)
+      await self._execute('startAnswer', 'startedAnswering')
+      await self._execute('answerQuiz', 'stoppedAnswering', senders=self.players, data=lambda player: f'answer-{player.pk}')
+      # Only the owner receives the answers
+      start = time.perf_counter()
+      await self.owner.send('getAnswers')
+      await self.owner.wait_for('sentAnswers')
+      self.recorder.record('getAnswers', time.perf_counter() - start)
+      await self._execute('sendResult', 'shareResult', data=lambda _: dict([(player.pk, 1) for player in self.players]))
+
+class LoadTestRunner:
+  ##
+  # @brief Constructor of LoadTestRunner
+  # @param num_rooms The number of rooms
+  # @param num_players The number of players in each room including the owner
+  # @param num_rounds The number of rounds in each room
+  # @param use_redis Describes whether the configured channel layer and state backend are used or not (Default: False)
+  # @param timeout Timeout in seconds to wait for each message (Default: 10)
+  # @note If `use_redis` is False, the in-memory channel layer and state backend are used.
+  def __init__(self, num_rooms, num_players, num_rounds, use_redis=False, timeout=10):
+    self.num_rooms = max(int(num_rooms), 1)
+    self.num_players = max(int(num_players), 1)
+    self.num_rounds = max(int(num_rounds), 1)
+    self.use_redis = use_redis
+    self.timeout = timeout
+    self.prefix = f'loadtest-{uuid.uuid4().hex[:8]}'
+    self.rooms = []
+
+  ##
+  # @brief Create users, quizzes and rooms for the load test
+  # @note The quizzes are registered to the cached index directly because each room samples its sequence in this method.
+  def setup(self):
+    genre = models.Genre.objects.create(name=self.prefix, is_enabled=True)
+
+    for room_idx in range(self.num_rooms):
+      users = [
+        UserModel.objects.create_user(
+          email=f'{self.prefix}-{room_idx}-{idx}@example.com',
+          screen_name=f'{self.prefix}-{room_idx}-{idx}',
+          role=RoleType.CREATOR if idx == 0 else RoleType.GUEST,
+          is_active=True,
+        )
+        for idx in range(self.num_players)
+      ]
+      owner, members = users[0], users[1:]
+      quizzes = models.Quiz.objects.bulk_create([
+        models.Quiz(creator=owner, genre=genre, question=f'question{idx}', answer=f'answer{idx}', is_completed=True)
+        for idx in range(self.num_rounds)
+      ])
+      models.Quiz.update_completed_quiz_counts(added=[quiz.get_completed_membership() for quiz in quizzes])
+      # Because `bulk_create` does not send `post_save` signal, the cached index is updated before the sequence is sampled
+      g_quiz_index.update_quizzes(quizzes)
+      room = models.QuizRoom.objects.create(
+        owner=owner,
+        name=f'{self.prefix}-{room_idx}',
+        max_question=self.num_rounds,
+        is_enabled=True,
+      )
+      room.genres.add(genre)
+      room.creators.add(owner)
+      room.members.add(*members)
+      models.Score.objects.get_or_create(room=room)
+      room.reset()
+      self.rooms += [(room, owner, members)]
+    transaction.on_commit(g_search_choice_cache.invalidate)
+
+  ##
+  # @brief Delete all data created by `setup`
+  def cleanup(self):
+    UserModel.objects.filter(email__startswith=f'{self.prefix}-').delete()
+    models.Genre.objects.filter(name=self.prefix).delete()
+    self.rooms = []
+
+  ##
+  # @brief Run the scenario of all rooms concurrently
+  # @return report Dictionary of `commands`, `messages_per_second`, `memory_per_connection`, and so on
+  async def arun(self):
+    application = URLRouter(routing.websocket_urlpatterns)
+    recorder = LatencyRecorder()
+    scenarios = []
+    is_tracing = tracemalloc.is_tracing()
+
+    if not is_tracing:
+      tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    try:
+      # Connect all players
+      for room, owner, members in self.rooms:
+        players = [SimulatedPlayer(application, room, user, recorder, self.timeout) for user in [owner] + list(members)]
+
+        for player in players:
+          await player.connect()
+        scenarios += [RoomScenario(players[0], players[1:], recorder)]
+      after, _ = tracemalloc.get_traced_memory()
+      num_connections = sum([len(scenario.players) for scenario in scenarios])
+      # Because tracing memory slows down the scenario, it is stopped before the measurement of latencies
+      if not is_tracing:
+        tracemalloc.stop()
+      # Drive all rooms concurrently
+      start = time.perf_counter()
+      await asyncio.gather(*[scenario.run(self.num_rounds) for scenario in scenarios])
+      elapsed_time = time.perf_counter() - start
+    finally:
+      for scenario in scenarios:
+        for player in scenario.players:
+          await player.disconnect()
+
+      if not is_tracing and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    report = {
+      'rooms': self.num_rooms,
+      'players': self.num_players,
+      'rounds': self.num_rounds,
+      'connections': num_connections,
+      'elapsed_time': elapsed_time,
+      'messages': recorder.num_messages,
+      'messages_per_second': recorder.num_messages / elapsed_time if elapsed_time > 0 else 0,
+      'memory_per_connection': (after - before) / num_connections,
+      'commands': recorder.summarize(),
+    }
+
+    return report
+
+  ##
+  # @brief Run the load test with the selected channel layer and state backend
+  # @return report Result of `arun`
+  async def execute(self):
+    if self.use_redis:
+      report = await self.arun()
+    else:
+      backend = g_quizstates.backend
+      g_quizstates.backend = InMemoryStateBackend()
+
+      try:
+        with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}):
+          report = await self.arun()
+      finally:
+        g_quizstates.backend = backend
+        # Because the states refer to the in-memory backend, they are dropped from the cache
+        for room, _, _ in self.rooms:
+          g_quizstates.del_state(f'quiz-{room.pk}')
+
+    return report
@@ -0,0 +1,60 @@
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from quiz.loadtest import LoadTestRunner
+
+class Command(BaseCommand):
+  help = 'Run the load test of quiz rooms against QuizConsumer'
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      '--rooms', dest='rooms', type=int, default=10,
+      help='Specifies the number of rooms.',
+    )
+    parser.add_argument(
+      '--players', dest='players', type=int, default=5,
+      help='Specifies the number of players in each room including the owner.',
+    )
+    parser.add_argument(
+      '--rounds', dest='rounds', type=int, default=3,
+      help='Specifies the number of rounds in each room.',
+    )
+    parser.add_argument(
+      '--layer', dest='layer', choices=['memory', 'redis'], default='memory',
+      help='Specifies the channel layer and state backend (memory: in-memory, redis: configured settings).',
+    )
+    parser.add_argument(
+      '--timeout', dest='timeout', type=float, default=10,
+      help='Specifies the timeout in seconds to wait for each message.',
+    )
+
+  def handle(self, *args, **options):
+    if min(options['rooms'], options['players'], options['rounds']) < 1:
+      raise CommandError('--rooms, --players and --rounds must be positive integers')
+
+    runner = LoadTestRunner(
+      options['rooms'],
+      options['players'],
+      options['rounds'],
+      use_redis=(options['layer'] == 'redis'),
+      timeout=options['timeout'],
+    )
+    runner.setup()
+
+    try:
+      report = async_to_sync(runner.execute)()
+    finally:
+      runner.cleanup()
+    # Output report
+    self.stdout.write(
+      f"rooms: {report['rooms']}, players: {report['players']}, rounds: {report['rounds']}, connections: {report['connections']}"
+    )
+    self.stdout.write(
+      f"elapsed time: {report['elapsed_time']:.3f} s, messages: {report['messages']}, messages/s: {report['messages_per_second']:.1f}"
+    )
+    self.stdout.write(f"memory/connection: {report['memory_per_connection'] / 1024:.1f} KiB")
+    self.stdout.write(f"{'command':<14}{'count':>8}{'p50 [ms]':>12}{'p95 [ms]':>12}{'p99 [ms]':>12}")
+
+    for command, summary in report['commands'].items():
+      self.stdout.write(
+        f"{command:<14}{summary['count']:>8}{summary['p50'] * 1000:>12.3f}{summary['p95'] * 1000:>12.3f}{summary['p99'] * 1000:>12.3f}"
+      )
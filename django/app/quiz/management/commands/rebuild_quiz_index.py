@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from quiz.indexes import g_quiz_index
+from quiz.models import Quiz
+
+class Command(BaseCommand):
+  help = 'Rebuild the cached index of completed quizzes for each genre and creator'
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      '--check', dest='check', action='store_true',
+      help='Only checks the consistency between the index and the database.',
+    )
+    parser.add_argument(
+      '--batch-size', dest='batch_size', type=int, default=1000,
+      help='Specifies the number of quizzes registered at once.',
+    )
+
+  def handle(self, *args, **options):
+    if options['batch_size'] < 1:
+      raise CommandError('--batch-size must be a positive integer')
+
+    queryset = Quiz.objects.filter(is_completed=True)
+
+    if not options['check']:
+      count = g_quiz_index.rebuild(queryset, batch_size=options['batch_size'])
+      self.stdout.write(f'Registered {count} quizzes')
+    errors = g_quiz_index.check(queryset)
+    # Output report
+    for name, (missing, unexpected) in errors.items():
+      self.stdout.write(f'{name}: missing {len(missing)}, unexpected {len(unexpected)}')
+
+    if errors:
+      raise CommandError(f'The index is inconsistent with the database ({len(errors)} sets)')
+    self.stdout.write('The index is consistent with the database')
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from quiz.models import Genre, Quiz
+
+UserModel = get_user_model()
+
+class Command(BaseCommand):
+  help = 'Reconcile the completed quiz counters of genres and creators with the stored quizzes'
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      '--check', dest='check', action='store_true',
+      help='Only checks the consistency between the counters and the database.',
+    )
+
+  def handle(self, *args, **options):
+    targets = [(Genre, 'genre'), (UserModel, 'creator')]
+    num_errors = 0
+
+    with transaction.atomic():
+      for model, field_name in targets:
+        expression = Quiz.get_completed_quiz_count_expression(field_name)
+        queryset = model.objects.annotate(actual_count=expression) \
+                                .exclude(completed_quiz_count=models.F('actual_count')) \
+                                .order_by('pk').values_list('pk', 'completed_quiz_count', 'actual_count')
+        records = list(queryset.select_for_update(of=('self',)))
+        # Output report
+        for pk, stored, actual in records:
+          self.stdout.write(f'{field_name}:{pk}: stored {stored}, actual {actual}')
+
+        if records and not options['check']:
+          model.objects.filter(pk__in=[pk for pk, _, _ in records]).update(completed_quiz_count=expression)
+        num_errors += len(records)
+
+    if options['check'] and num_errors > 0:
+      raise CommandError(f'The counters are inconsistent with the database ({num_errors} records)')
+    if num_errors > 0:
+      self.stdout.write(f'Fixed {num_errors} counters')
+    else:
+      self.stdout.write('The counters are consistent with the database')
@@ -0,0 +1,265 @@
+from bisect import bisect_left
+from django.conf import settings
+import threading
+
+##
+# @brief Escape label value based on Prometheus text format
+# @param value Label value
+# @return Escaped value
+def _escape(value):
+  return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+##
+# @brief Format labels based on Prometheus text format
+# @param names Label names
+# @param values Label values
+# @return Formatted labels (e.g., `{command="resetQuiz",room="quiz-1"}`)
+def _format_labels(names, values):
+  labels = ','.join([f'{name}="{_escape(value)}"' for name, value in zip(names, values)])
+
+  return f'{{{labels}}}' if labels else ''
+
+##
+# @brief Format sample value based on Prometheus text format
+# @param value Sample value
+# @return Formatted value
+def _format_value(value):
+  if value == float('inf'):
+    return '+Inf'
+
+  return repr(float(value)) if isinstance(value, float) else str(value)
+
+class BaseMetric:
+  metric_type = None
+
+  ##
+  # @brief Constructor of BaseMetric
+  # @param name Metric name
+  # @param documentation Help text of the metric
+  # @param labelnames Label names of the metric (Default: ())
+  def __init__(self, name, documentation, labelnames=()):
+    self.name = name
+    self.documentation = documentation
+    self.labelnames = tuple(labelnames)
+    self.lock = threading.Lock()
+    self.values = {}
+
+  ##
+  # @brief Get label values in the order of label names
+  # @param labels Named label values
+  # @return Tuple of label values
+  def _get_key(self, labels):
+    return tuple([str(labels.get(name, '')) for name in self.labelnames])
+
+  ##
+  # @brief Remove the series whose label matches the given value
+  # @param name Label name
+  # @param value Label value
+  def remove(self, name, value):
+    index = self.labelnames.index(name)
+
+    with self.lock:
+      for key in [key for key in self.values.keys() if key[index] == str(value)]:
+        del self.values[key]
+
+  ##
+  # @brief Remove all series
+  def clear(self):
+    with self.lock:
+      self.values.clear()
+
+  ##
+  # @brief Collect samples of the metric
+  # @return List of (suffix, label names, label values, value)
+  def collect(self):
+    with self.lock:
+      samples = [('', self.labelnames, key, value) for key, value in self.values.items()]
+
+    return samples
+
+  ##
+  # @brief Render the metric based on Prometheus text format
+  # @return Lines of the metric
+  def render(self):
+    lines = [
+      f'# HELP {self.name} {self.documentation}',
+      f'# TYPE {self.name} {self.metric_type}',
+    ]
+    lines += [
+      f'{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}'
+      for suffix, names, values, value in self.collect()
+    ]
+
+    return lines
+
+class Counter(BaseMetric):
+  metric_type = 'counter'
+
+  ##
+  # @brief Increment the counter
+  # @param amount Increment value (Default: 1)
+  # @param labels Named label values
+  def inc(self, amount=1, **labels):
+    key = self._get_key(labels)
+
+    with self.lock:
+      self.values[key] = self.values.get(key, 0) + amount
+
+  ##
+  # @brief Get the current value
+  # @param labels Named label values
+  # @return The current value
+  def get(self, **labels):
+    return self.values.get(self._get_key(labels), 0)
+
+class Gauge(Counter):
+  metric_type = 'gauge'
+
+  ##
+  # @brief Constructor of Gauge
+  # @param args Positional arguments
+  # @param kwargs Named arguments
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.callback = None
+
+  ##
+  # @brief Decrement the gauge
+  # @param amount Decrement value (Default: 1)
+  # @param labels Named label values
+  def dec(self, amount=1, **labels):
+    self.inc(-amount, **labels)
+
+  ##
+  # @brief Set the value of the gauge
+  # @param value New value
+  # @param labels Named label values
+  def set(self, value, **labels):
+    with self.lock:
+      self.values[self._get_key(labels)] = value
+
+  ##
+  # @brief Set the function which returns the current value when the gauge is collected
+  # @param callback Function without arguments
+  def set_function(self, callback):
+    self.callback = callback
+
+  def collect(self):
+    if self.callback is not None:
+      self.set(self.callback())
+
+    return super().collect()
+
+class Histogram(BaseMetric):
+  metric_type = 'histogram'
+
+  ##
+  # @brief Constructor of Histogram
+  # @param name Metric name
+  # @param documentation Help text of the metric
+  # @param labelnames Label names of the metric (Default: ())
+  # @param buckets Upper bounds of buckets in seconds (Default: None)
+  # @note If `buckets` is None, the buckets are based on `QUIZ_METRICS_BUCKETS` setting.
+  def __init__(self, name, documentation, labelnames=(), buckets=None):
+    super().__init__(name, documentation, labelnames=labelnames)
+
+    if buckets is None:
+      buckets = getattr(settings, 'QUIZ_METRICS_BUCKETS', (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+    self.buckets = tuple(sorted(buckets)) + (float('inf'), )
+
+  ##
+  # @brief Observe the value
+  # @param value Observed value
+  # @param labels Named label values
+  def observe(self, value, **labels):
+    key = self._get_key(labels)
+    index = bisect_left(self.buckets, value)
+
+    with self.lock:
+      counts, total = self.values.get(key, ([0] * len(self.buckets), 0))
+      counts[index] += 1
+      self.values[key] = (counts, total + value)
+
+  ##
+  # @brief Get the number of observations
+  # @param labels Named label values
+  # @return The number of observations
+  def get_count(self, **labels):
+    counts, _ = self.values.get(self._get_key(labels), ([0], 0))
+
+    return sum(counts)
+
+  def collect(self):
+    samples = []
+    names = self.labelnames + ('le', )
+
+    with self.lock:
+      for key, (counts, total) in self.values.items():
+        cumulative = 0
+
+        for bound, count in zip(self.buckets, counts):
+          cumulative += count
+          samples += [('_bucket', names, key + (_format_value(bound), ), cumulative)]
+        samples += [('_sum', self.labelnames, key, total), ('_count', self.labelnames, key, cumulative)]
+
+    return samples
+
+class QuizMetrics:
+  ##
+  # @brief Constructor of QuizMetrics
+  def __init__(self):
+    self.commands = Counter('quiz_commands_total', 'Total number of websocket commands.', ('command', 'room'))
+    self.errors = Counter('quiz_command_errors_total', 'Total number of websocket commands which failed.', ('command', 'room'))
+    self.latency = Histogram('quiz_command_duration_seconds', 'Latency of websocket commands in seconds.', ('command', 'room'))
+    self.group_send_latency = Histogram('quiz_group_send_duration_seconds', 'Latency of channel layer group send in seconds.', ('msg_type', ))
+    self.active_rooms = Gauge('quiz_active_rooms', 'Number of active quiz rooms in this process.')
+    self.active_connections = Gauge('quiz_active_connections', 'Number of active websocket connections in this process.')
+    self.state_cache_hits = Counter('quiz_state_cache_hits_total', 'Total number of connections which reused the cached room state.')
+    self.state_cache_misses = Counter('quiz_state_cache_misses_total', 'Total number of connections which rebuilt the room state.')
+    self.state_cache_evictions = Counter('quiz_state_cache_evictions_total', 'Total number of room states evicted from the cache.', ('reason', ))
+    self.db_executor_queue_depth = Gauge('quiz_db_executor_queue_depth', 'Number of database tasks waiting for a worker thread.')
+    self.db_executor_wait = Histogram('quiz_db_executor_wait_seconds', 'Waiting time of database tasks before a worker thread runs them in seconds.')
+
+  ##
+  # @brief Get all metrics
+  # @return List of metrics
+  def get_metrics(self):
+    return [
+      self.commands, self.errors, self.latency, self.group_send_latency, self.active_rooms, self.active_connections,
+      self.state_cache_hits, self.state_cache_misses, self.state_cache_evictions,
+      self.db_executor_queue_depth, self.db_executor_wait,
+    ]
+
+  ##
+  # @brief Record the result of the command
+  # @param command Command name
+  # @param room Room name
+  # @param elapsed_time Elapsed time in seconds
+  # @param is_failed Describes whether the command failed or not (Default: False)
+  def record_command(self, command, room, elapsed_time, is_failed=False):
+    self.commands.inc(command=command, room=room)
+    self.latency.observe(elapsed_time, command=command, room=room)
+
+    if is_failed:
+      self.errors.inc(command=command, room=room)
+
+  ##
+  # @brief Remove the series of the room
+  # @param room Room name
+  # @note This method is called when the room is closed so that the number of series does not grow.
+  def remove_room(self, room):
+    for metric in [self.commands, self.errors, self.latency]:
+      metric.remove('room', room)
+
+  ##
+  # @brief Render all metrics based on Prometheus text format
+  # @return Text of all metrics
+  def render(self):
+    lines = []
+
+    for metric in self.get_metrics():
+      lines += metric.render()
+
+    return '\n'.join(lines) + '\n'
+
+g_metrics = QuizMetrics()
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_quizroom_use_typewriter_effect'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizroom',
+            name='answer_time_limit',
+            field=models.PositiveIntegerField(default=0, help_text='Time limit in seconds to answer each question. If 0 is set, there is no time limit.', verbose_name='Answer time limit'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:51
+
+from django.db import migrations, models
+from quiz.judges import collect_accepted_answers
+
+
+def update_normalized_answers(apps, schema_editor):
+    Quiz = apps.get_model('quiz', 'Quiz')
+    instances = list(Quiz.objects.all().only('pk', 'answer', 'alternative_answers'))
+
+    for instance in instances:
+        instance.normalized_answers = collect_accepted_answers(instance.answer, instance.alternative_answers)
+    Quiz.objects.bulk_update(instances, ['normalized_answers'], batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_quizroom_answer_time_limit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='alternative_answers',
+            field=models.TextField(blank=True, help_text='Enter alternative answers which are also regarded as correct. Put each answer on a separate line.', verbose_name='Alternative answers'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='normalized_answers',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Normalized form of the answer and alternative answers used by the automatic judgement.', verbose_name='Normalized answers'),
+        ),
+        migrations.AddField(
+            model_name='quizroom',
+            name='judgement_type',
+            field=models.IntegerField(choices=[(1, 'Manual'), (2, 'Automatic'), (3, 'Automatic (time-weighted)')], default=1, help_text='Describes how the answers are judged. In the automatic judgement, the answers are judged as soon as the answering phase ends.', verbose_name='Judgement type'),
+        ),
+        migrations.RunPython(update_normalized_answers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:23
+
+import django.core.validators
+import django.db.models.deletion
+import utils.models
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def update_score_runs(apps, schema_editor):
+    Score = apps.get_model('quiz', 'Score')
+    instances = list(Score.objects.all().only('pk'))
+
+    for instance in instances:
+        instance.run = uuid.uuid4()
+    Score.objects.bulk_update(instances, ['run'], batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_quiz_alternative_answers_and_judgement_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='score',
+            name='run',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, help_text='Identifier of the current game, which is renewed whenever the room is reset.', verbose_name='Run'),
+        ),
+        migrations.CreateModel(
+            name='AnswerRecord',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('run', models.UUIDField(help_text='Identifier of the game in which the answer was submitted.', verbose_name='Run')),
+                ('index', models.PositiveIntegerField(help_text='The n-th question', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Index')),
+                ('answer', models.TextField(blank=True, verbose_name='Answer')),
+                ('elapsed_time', models.FloatField(default=0, help_text='Elapsed time in seconds from the start of the answering phase.', verbose_name='Elapsed time')),
+                ('points', models.IntegerField(default=0, verbose_name='Points')),
+                ('created_at', models.DateTimeField(default=utils.models.get_current_time, verbose_name='Created time')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_records', to=settings.AUTH_USER_MODEL, verbose_name='Player')),
+                ('quiz', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='answer_records', to='quiz.quiz', verbose_name='Quiz')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_records', to='quiz.quizroom', verbose_name='Room')),
+            ],
+            options={
+                'ordering': ('-created_at', 'index'),
+                'indexes': [models.Index(fields=['room', 'run', 'index'], name='quiz_answer_room_run_idx'), models.Index(fields=['room', '-created_at'], name='quiz_answer_room_created_idx'), models.Index(fields=['player', '-created_at'], name='quiz_answer_player_created_idx')],
+            },
+        ),
+        migrations.RunPython(update_score_runs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def update_completed_quiz_counts(apps, schema_editor):
+    Quiz = apps.get_model('quiz', 'Quiz')
+    Genre = apps.get_model('quiz', 'Genre')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    for model, field_name in ((Genre, 'genre'), (User, 'creator')):
+        queryset = Quiz.objects.filter(**{field_name: models.OuterRef('pk'), 'is_completed': True}) \
+                               .order_by().values(field_name).annotate(total=models.Count('pk')).values('total')
+        model.objects.update(completed_quiz_count=Coalesce(models.Subquery(queryset), 0))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_score_run_and_answer_record'),
+        ('account', '0005_user_completed_quiz_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genre',
+            name='completed_quiz_count',
+            field=models.IntegerField(default=0, editable=False, help_text='The number of completed quizzes of this genre.', verbose_name='Completed quiz count'),
+        ),
+        migrations.RunPython(update_completed_quiz_counts, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_genre_completed_quiz_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizroom',
+            index=models.Index(fields=['owner', 'name', '-created_at'], name='quiz_room_owner_name_idx'),
+        ),
+        # Because the through table of members is created automatically, the index is created directly
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS quiz_room_members_user_room_idx ON quiz_quizroom_members (user_id, quizroom_id)',
+            reverse_sql='DROP INDEX IF EXISTS quiz_room_members_user_room_idx',
+        ),
+    ]
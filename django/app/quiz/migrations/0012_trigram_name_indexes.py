@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:50
+
+from django.db import migrations
+from utils.search import create_trigram_indexes, drop_trigram_indexes
+
+TARGETS = [
+    ('quiz_genre_name_trgm_idx', 'quiz_genre', 'name'),
+    ('quiz_room_name_trgm_idx', 'quiz_quizroom', 'name'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    create_trigram_indexes(schema_editor, TARGETS)
+
+def drop_indexes(apps, schema_editor):
+    drop_trigram_indexes(schema_editor, TARGETS)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_quizroom_relevant_room_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, reverse_code=drop_indexes),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+from django.conf import settings
+from django.core import signing
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce, NullIf
+from django.contrib.postgres.aggregates import StringAgg
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
@@ -9,7 +13,12 @@ from utils.models import (
   BaseModel,
 )
 from . import validators
+from .judges import collect_accepted_answers
+from .indexes import g_quiz_index
+from .samplers import g_quiz_sampler
+from collections import Counter
 import urllib.parse
+import uuid
 
 UserModel = get_user_model()
 
@@ -23,9 +32,9 @@ class GenreQuerySet(models.QuerySet):
   ##
   # @brief Collect active genres
   # @return Queryset that `is_enabled` column is `True` and the number of `quizzes` is greater than 0
+  # @note The maintained counter is used instead of counting quizzes.
   def collect_valid_genres(self):
-    return self.annotate(quiz_counts=models.Count('quizzes', filter=models.Q(quizzes__is_completed=True))) \
-               .filter(quiz_counts__gt=0, is_enabled=True)
+    return self.filter(completed_quiz_count__gt=0, is_enabled=True)
 
 class Genre(BaseModel):
   class Meta:
@@ -42,6 +51,12 @@ class Genre(BaseModel):
     default=True,
     help_text=gettext_lazy('Describes whether this genre is enabled or not.'),
   )
+  completed_quiz_count = models.IntegerField(
+    gettext_lazy('Completed quiz count'),
+    default=0,
+    editable=False,
+    help_text=gettext_lazy('The number of completed quizzes of this genre.'),
+  )
   created_at = models.DateTimeField(
     gettext_lazy('Created time'),
     default=get_current_time,
@@ -224,6 +239,18 @@ class Quiz(BaseModel):
     blank=True,
     help_text=gettext_lazy('Enter the answer for the question.'),
   )
+  alternative_answers = models.TextField(
+    gettext_lazy('Alternative answers'),
+    blank=True,
+    help_text=gettext_lazy('Enter alternative answers which are also regarded as correct. Put each answer on a separate line.'),
+  )
+  normalized_answers = models.JSONField(
+    gettext_lazy('Normalized answers'),
+    blank=True,
+    default=list,
+    editable=False,
+    help_text=gettext_lazy('Normalized form of the answer and alternative answers used by the automatic judgement.'),
+  )
   is_completed = models.BooleanField(
     gettext_lazy('Creation status'),
     default=False,
@@ -238,6 +265,108 @@ class Quiz(BaseModel):
   def __str__(self):
     return f'{self.get_short_question()}({self.creator})'
 
+  ##
+  # @brief Create instance from the database record
+  # @param db Database alias
+  # @param field_names Loaded field names
+  # @param values Loaded values
+  # @return instance Instance of Quiz
+  # @note The stored membership of the completed quiz counters is kept to detect its change without any query.
+  @classmethod
+  def from_db(cls, db, field_names, values):
+    instance = super().from_db(db, field_names, values)
+
+    if {'genre_id', 'creator_id', 'is_completed'} <= set(field_names):
+      instance._stored_membership = instance.get_completed_membership()
+
+    return instance
+
+  ##
+  # @brief Save instance with the normalized answers
+  # @param args Positional arguments
+  # @param kwargs Named arguments
+  # @note The completed quiz counters of the genre and the creator are updated in the same transaction.
+  def save(self, *args, **kwargs):
+    self.update_normalized_answers()
+    update_fields = kwargs.get('update_fields')
+    # Save the normalized answers together when the answers are updated
+    if update_fields is not None and {'answer', 'alternative_answers'} & set(update_fields):
+      kwargs['update_fields'] = list(set(update_fields) | {'normalized_answers'})
+    previous = self.get_stored_membership()
+
+    with transaction.atomic(using=kwargs.get('using')):
+      super().save(*args, **kwargs)
+      # In the case of that the membership is not updated, the stored one is kept
+      if update_fields is None or {'genre', 'genre_id', 'creator', 'creator_id', 'is_completed'} & set(update_fields):
+        current = self.get_completed_membership()
+      else:
+        current = previous
+
+      if current != previous:
+        self.update_completed_quiz_counts(
+          added=[current] if current is not None else [],
+          removed=[previous] if previous is not None else [],
+        )
+    self._stored_membership = current
+
+  ##
+  # @brief Get the membership of the completed quiz counters
+  # @return membership Tuple of genre's and creator's primary keys (None if the quiz is not completed)
+  def get_completed_membership(self):
+    return (self.genre_id, self.creator_id) if self.is_completed else None
+
+  ##
+  # @brief Get the membership of the completed quiz counters which is stored in the database
+  # @return membership Tuple of genre's and creator's primary keys (None if the quiz is not stored or not completed)
+  # @note Only if the membership has not been loaded, the database is accessed.
+  def get_stored_membership(self):
+    if self._state.adding:
+      return None
+    if hasattr(self, '_stored_membership'):
+      return self._stored_membership
+
+    record = Quiz.objects.filter(pk=self.pk).values_list('genre_id', 'creator_id', 'is_completed').first()
+
+    return (record[0], record[1]) if record is not None and record[2] else None
+
+  ##
+  # @brief Update the completed quiz counters of genres and creators atomically
+  # @param cls This class object
+  # @param added List of memberships which are added (Default: None)
+  # @param removed List of memberships which are removed (Default: None)
+  # @note The rows are updated in the order of primary keys so that concurrent updates do not deadlock.
+  @classmethod
+  def update_completed_quiz_counts(cls, added=None, removed=None):
+    genres = Counter()
+    creators = Counter()
+
+    for (genre_id, creator_id), delta in [(item, 1) for item in added or []] + [(item, -1) for item in removed or []]:
+      genres[genre_id] += delta
+      creators[creator_id] += delta
+
+    for model, counter in ((Genre, genres), (UserModel, creators)):
+      for pk, delta in sorted(counter.items(), key=lambda item: str(item[0])):
+        if delta != 0:
+          model.objects.filter(pk=pk).update(completed_quiz_count=models.F('completed_quiz_count') + delta)
+
+  ##
+  # @brief Get the expression to count completed quizzes of each genre or creator
+  # @param cls This class object
+  # @param field_name Field name of the relationship (`genre` or `creator`)
+  # @return Expression of the number of completed quizzes
+  @classmethod
+  def get_completed_quiz_count_expression(cls, field_name):
+    queryset = cls.objects.filter(**{field_name: models.OuterRef('pk'), 'is_completed': True}) \
+                          .order_by().values(field_name).annotate(total=models.Count('pk')).values('total')
+
+    return Coalesce(models.Subquery(queryset), 0)
+
+  ##
+  # @brief Precompute the normalized form of the answer and alternative answers
+  # @note This method has to be called explicitly when the instance is stored by `bulk_create`.
+  def update_normalized_answers(self):
+    self.normalized_answers = collect_accepted_answers(self.answer, self.alternative_answers)
+
   ##
   # @brief Split string object
   # @param sentence Input text
@@ -345,6 +474,7 @@ class Quiz(BaseModel):
       'is_completed': bool_converter(row[4]),
     }
     instance = cls(**kwargs)
+    instance.update_normalized_answers()
 
     return instance
 
@@ -395,24 +525,90 @@ class Quiz(BaseModel):
 
     return quizzes
 
+class JudgementType(models.IntegerChoices):
+  # [format] name = value, label
+  MANUAL        = 1, gettext_lazy('Manual')
+  AUTO          = 2, gettext_lazy('Automatic')
+  TIME_WEIGHTED = 3, gettext_lazy('Automatic (time-weighted)')
+
 class QuizRoomQuerySet(models.QuerySet):
   ##
   # @brief Collect relevant quiz room
   # @return Queryset The queryset consists of room owner is user or user is included into assigned members
   # @pre The user's role is either `GUEST` or `CREATOR`
+  # @note The membership is checked by `EXISTS` so that neither the join with members nor `DISTINCT` is needed.
   def collect_relevant_rooms(self, user):
     if user.has_manager_role():
       queryset = self.select_related('owner').prefetch_related('genres', 'creators', 'members').all()
     else:
-      owner_rooms = user.quiz_rooms.all()
-      valid_assigned_rooms = user.assigned_rooms.all().exclude(is_enabled=False)
-      queryset = (owner_rooms | valid_assigned_rooms).order_by('pk').distinct().order_by('name', '-created_at')
+      field = self.model._meta.get_field('members')
+      is_member = models.Exists(field.remote_field.through.objects.filter(**{
+        field.m2m_field_name(): models.OuterRef('pk'),
+        field.m2m_reverse_field_name(): user.pk,
+      }))
+      queryset = self.filter(models.Q(owner=user) | models.Q(is_member, is_enabled=True))
+
+    return queryset
+
+  ##
+  # @brief Aggregate the values of the related records for each room
+  # @param field_name Name of many-to-many field
+  # @param aggregate Aggregate expression whose field names are relative to the related model
+  # @return Subquery of the aggregated value
+  def _aggregate_relation(self, field_name, aggregate):
+    field = self.model._meta.get_field(field_name)
+    through = field.remote_field.through
+
+    return models.Subquery(
+      through.objects.filter(**{field.m2m_field_name(): models.OuterRef('pk')})
+                     .order_by().values(field.m2m_field_name())
+                     .annotate(value=aggregate(field.m2m_reverse_field_name())).values('value')
+    )
+
+  ##
+  # @brief Check whether `StringAgg` can be used for the queryset or not
+  # @return bool Judgement result
+  def can_use_string_agg(self):
+    return connections[self.db].vendor == 'postgresql'
+
+  ##
+  # @brief Annotate the values shown in the room list
+  # @return Queryset The queryset which has `num_members`, `genre_names`, and `creator_names`
+  # @note Each value is aggregated by the subquery so that the relations are not joined with each other.
+  # @note Because `StringAgg` is provided only by PostgreSQL, the genres and the creators are prefetched for the other databases.
+  def for_listing(self):
+    queryset = self.select_related('owner').prefetch_related(None).annotate(
+      num_members=Coalesce(self._aggregate_relation('members', lambda name: models.Count('pk')), 0),
+    )
+
+    if self.can_use_string_agg():
+      get_creator_name = lambda name: Coalesce(NullIf(f'{name}__screen_name', models.Value('')), f'{name}__email')
+      queryset = queryset.annotate(
+        genre_names=Coalesce(
+          self._aggregate_relation('genres', lambda name: StringAgg(f'{name}__name', ',', order_by=f'{name}__name')),
+          models.Value('-'),
+          output_field=models.TextField(),
+        ),
+        creator_names=Coalesce(
+          self._aggregate_relation('creators', lambda name: StringAgg(get_creator_name(name), ',', order_by=f'{name}__screen_name')),
+          models.Value('-'),
+          output_field=models.TextField(),
+        ),
+      )
+    else:
+      queryset = queryset.prefetch_related(
+        models.Prefetch('genres', queryset=Genre.objects.order_by('name')),
+        models.Prefetch('creators', queryset=UserModel.objects.order_by('screen_name')),
+      )
 
     return queryset
 
 class QuizRoom(BaseModel):
   class Meta:
     ordering = ('name', '-created_at')
+    indexes = [
+      models.Index(fields=['owner', 'name', '-created_at'], name='quiz_room_owner_name_idx'),
+    ]
 
   owner = models.ForeignKey(
     UserModel,
@@ -451,6 +647,17 @@ class QuizRoom(BaseModel):
     validators=[MinValueValidator(1)],
     help_text=gettext_lazy('The maximum number of questions'),
   )
+  answer_time_limit = models.PositiveIntegerField(
+    gettext_lazy('Answer time limit'),
+    default=0,
+    help_text=gettext_lazy('Time limit in seconds to answer each question. If 0 is set, there is no time limit.'),
+  )
+  judgement_type = models.IntegerField(
+    gettext_lazy('Judgement type'),
+    choices=JudgementType.choices,
+    default=JudgementType.MANUAL,
+    help_text=gettext_lazy('Describes how the answers are judged. In the automatic judgement, the answers are judged as soon as the answering phase ends.'),
+  )
   use_typewriter_effect = models.BooleanField(
     gettext_lazy('Use typewriter effect'),
     default=False,
@@ -499,21 +706,71 @@ class QuizRoom(BaseModel):
       ])
     ])
 
+  ##
+  # @brief Check whether the request user can access to the quiz room or not in the asynchronous context
+  # @param user Requested user
+  # @return bool Judmgement result
+  # @retval True  The request user can access
+  # @retval False The request user cannot access
+  # @note The owner is compared by `owner_id` so that the related user is not fetched.
+  async def ais_assigned(self, user):
+    is_member = self.owner_id == user.pk or await self.members.filter(pk__in=[user.pk]).aexists()
+
+    return all([self.is_enabled, user.is_player(), is_member])
+
+  ##
+  # @brief Check whether the answers are judged automatically or not
+  # @return bool Judgement result
+  # @retval True  The answers are judged by the system
+  # @retval False The answers are judged by the owner
+  def is_auto_judge(self):
+    return self.judgement_type != JudgementType.MANUAL
+
+  ##
+  # @brief Get the token for the spectators of the quiz room
+  # @return token Signed token which includes the primary key of the quiz room
+  def get_spectator_token(self):
+    return signing.dumps(str(self.pk), salt='quiz.spectator')
+
+  ##
+  # @brief Get the primary key of the quiz room from the spectator token
+  # @param token Signed token
+  # @return pk Primary key of the quiz room (None if the token is invalid or expired)
+  # @note No query is issued so that spectators can be verified without the database.
+  @classmethod
+  def get_pk_from_spectator_token(cls, token):
+    max_age = getattr(settings, 'QUIZ_SPECTATOR_TOKEN_MAX_AGE', 24 * 60 * 60)
+
+    try:
+      pk = signing.loads(token, salt='quiz.spectator', max_age=max_age)
+    except signing.BadSignature:
+      pk = None
+
+    return pk
+
   ##
   # @brief Reset score
   def reset(self):
     if self.is_enabled:
-      quiz_ids = Quiz.objects.collect_quizzes(
-        creators=self.creators.all(),
-        genres=self.genres.all(),
-      ).order_by('?').values_list('pk', flat=True)
+      creators = list(self.creators.all())
+      genres = list(self.genres.all())
+      # Use the cached index if it is available
+      quiz_ids = g_quiz_index.collect(creators=[obj.pk for obj in creators], genres=[obj.pk for obj in genres])
+
+      if quiz_ids is not None:
+        quiz_ids = g_quiz_sampler.sample_ids(quiz_ids, self.max_question)
+      else:
+        # Only the primary keys of candidates are fetched instead of sorting all quizzes at random
+        queryset = Quiz.objects.collect_quizzes(creators=creators, genres=genres)
+        quiz_ids = g_quiz_sampler.sample(queryset, self.max_question)
       member_ids = self.members.all().order_by('pk').values_list('pk', flat=True)
       all_ids = list(member_ids) + [self.owner.pk]
-      enable_data_counts = min(self.max_question, len(quiz_ids))
       self.score.index = 1
       self.score.status = QuizStatusType.START
-      self.score.sequence = dict([(str(idx + 1), str(quiz_ids[idx])) for idx in range(enable_data_counts)])
+      self.score.sequence = dict([(str(idx + 1), str(pk)) for idx, pk in enumerate(quiz_ids)])
       self.score.detail = dict([(str(pk), '0') for pk in all_ids])
+      # Because the game restarts, the answer records are grouped by the new run
+      self.score.run = uuid.uuid4()
       self.score.save()
 
   ##
@@ -557,8 +814,15 @@ class QuizRoom(BaseModel):
   ##
   # @brief Get all genre names
   # @return output Joined genre names or hyphen
+  # @note If the names have been annotated or the genres have been prefetched by `for_listing`, no query is executed.
   def get_genres(self):
-    names = list(self.genres.all().order_by('name').values_list('name', flat=True))
+    if hasattr(self, 'genre_names'):
+      return self.genre_names
+    # In the case of that the genres have been prefetched by `for_listing`
+    if 'genres' in getattr(self, '_prefetched_objects_cache', {}):
+      names = [genre.name for genre in self.genres.all()]
+    else:
+      names = list(self.genres.all().order_by('name').values_list('name', flat=True))
     output = ','.join(names) if names else '-'
 
     return output
@@ -566,8 +830,15 @@ class QuizRoom(BaseModel):
   ##
   # @brief Get all creator names
   # @return output Joined creator names or hyphen
+  # @note If the names have been annotated or the creators have been prefetched by `for_listing`, no query is executed.
   def get_creators(self):
-    all_creators = self.creators.all().order_by('screen_name')
+    if hasattr(self, 'creator_names'):
+      return self.creator_names
+    # In the case of that the creators have been prefetched by `for_listing`
+    if 'creators' in getattr(self, '_prefetched_objects_cache', {}):
+      all_creators = self.creators.all()
+    else:
+      all_creators = self.creators.all().order_by('screen_name')
     names = [str(user) for user in all_creators]
     output = ','.join(names) if names else '-'
 
@@ -636,6 +907,12 @@ class Score(BaseModel):
     default=dict,
     help_text=gettext_lazy('Detail score of each member.'),
   )
+  run = models.UUIDField(
+    gettext_lazy('Run'),
+    default=uuid.uuid4,
+    editable=False,
+    help_text=gettext_lazy('Identifier of the current game, which is renewed whenever the room is reset.'),
+  )
 
   ##
   # @brief Get string object for the quiz room
@@ -649,4 +926,66 @@ class Score(BaseModel):
   # @brief Get status label
   # @return The label of QuizStatusType
   def get_status_label(self):
-    return QuizStatusType(self.status).label
\ No newline at end of file
+    return QuizStatusType(self.status).label
+
+class AnswerRecord(BaseModel):
+  class Meta:
+    ordering = ('-created_at', 'index')
+    indexes = [
+      models.Index(fields=['room', 'run', 'index'], name='quiz_answer_room_run_idx'),
+      models.Index(fields=['room', '-created_at'], name='quiz_answer_room_created_idx'),
+      models.Index(fields=['player', '-created_at'], name='quiz_answer_player_created_idx'),
+    ]
+
+  room = models.ForeignKey(
+    QuizRoom,
+    verbose_name=gettext_lazy('Room'),
+    on_delete=models.CASCADE,
+    related_name='answer_records',
+  )
+  run = models.UUIDField(
+    gettext_lazy('Run'),
+    help_text=gettext_lazy('Identifier of the game in which the answer was submitted.'),
+  )
+  index = models.PositiveIntegerField(
+    gettext_lazy('Index'),
+    validators=[MinValueValidator(1)],
+    help_text=gettext_lazy('The n-th question'),
+  )
+  quiz = models.ForeignKey(
+    Quiz,
+    verbose_name=gettext_lazy('Quiz'),
+    on_delete=models.SET_NULL,
+    null=True,
+    blank=True,
+    related_name='answer_records',
+  )
+  player = models.ForeignKey(
+    UserModel,
+    verbose_name=gettext_lazy('Player'),
+    on_delete=models.CASCADE,
+    related_name='answer_records',
+  )
+  answer = models.TextField(
+    gettext_lazy('Answer'),
+    blank=True,
+  )
+  elapsed_time = models.FloatField(
+    gettext_lazy('Elapsed time'),
+    default=0,
+    help_text=gettext_lazy('Elapsed time in seconds from the start of the answering phase.'),
+  )
+  points = models.IntegerField(
+    gettext_lazy('Points'),
+    default=0,
+  )
+  created_at = models.DateTimeField(
+    gettext_lazy('Created time'),
+    default=get_current_time,
+  )
+
+  ##
+  # @brief Get string object for the answer record
+  # @return The room name, the index, and the player's name
+  def __str__(self):
+    return f'{self.room.name}#{self.index}({self.player})'
@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
   path('ws/quizroom/<pk>', consumers.QuizConsumer.as_asgi()),
+  path('ws/quizroom/<pk>/spectate/<token>', consumers.SpectatorConsumer.as_asgi()),
 ]
\ No newline at end of file
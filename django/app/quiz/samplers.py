@@ -0,0 +1,174 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from itertools import islice
+import math
+import random
+
+##
+# @brief Get the random number in the open interval (0, 1)
+# @param rng Instance of random.Random
+# @return value Random number
+def _get_open_random(rng):
+  value = 0.0
+
+  while value == 0.0:
+    value = rng.random()
+
+  return value
+
+##
+# @brief Sample items from the iterable uniformly based on the reservoir sampling (Algorithm L)
+# @param iterable Target iterable
+# @param k The number of samples
+# @param rng Instance of random.Random (Default: None)
+# @return reservoir List of sampled items in random order
+# @note Only `k` items are kept in memory even if the iterable is very long.
+def reservoir_sample(iterable, k, rng=None):
+  rng = rng or random
+  iterator = iter(iterable)
+  reservoir = list(islice(iterator, max(k, 0)))
+  sentinel = object()
+
+  if k > 0 and len(reservoir) == k:
+    weight = math.exp(math.log(_get_open_random(rng)) / k)
+
+    while weight < 1.0:
+      # Skip the items which are not selected at once
+      skip = math.floor(math.log(_get_open_random(rng)) / math.log1p(-weight))
+      item = next(islice(iterator, skip, skip + 1), sentinel)
+
+      if item is sentinel:
+        break
+      reservoir[rng.randrange(k)] = item
+      weight *= math.exp(math.log(_get_open_random(rng)) / k)
+  rng.shuffle(reservoir)
+
+  return reservoir
+
+class QuizSampler:
+  ##
+  # @brief Constructor of QuizSampler
+  # @param threshold The number of records in the table from which `TABLESAMPLE` is used (Default: None)
+  # @param oversampling Ratio of the expected sample size of `TABLESAMPLE` to the requested size (Default: None)
+  # @param chunk_size The number of primary keys fetched at once (Default: 10000)
+  # @param rng Instance of random.Random (Default: None)
+  # @note If `threshold` or `oversampling` is None, the value is given by `QUIZ_SAMPLING_TABLESAMPLE_THRESHOLD` or `QUIZ_SAMPLING_OVERSAMPLING` setting.
+  def __init__(self, threshold=None, oversampling=None, chunk_size=10000, rng=None):
+    self.threshold = threshold
+    self.oversampling = oversampling
+    self.chunk_size = chunk_size
+    self.rng = rng or random.Random()
+
+  ##
+  # @brief Get the number of records in the table from which `TABLESAMPLE` is used
+  # @return threshold The number of records (`TABLESAMPLE` is never used if it is None)
+  def get_threshold(self):
+    if self.threshold is not None:
+      return self.threshold
+
+    return getattr(settings, 'QUIZ_SAMPLING_TABLESAMPLE_THRESHOLD', 100000)
+
+  ##
+  # @brief Get the ratio of the expected sample size of `TABLESAMPLE` to the requested size
+  # @return oversampling The ratio which is also used to widen the sampling rate
+  def get_oversampling(self):
+    if self.oversampling is not None:
+      return self.oversampling
+
+    return getattr(settings, 'QUIZ_SAMPLING_OVERSAMPLING', 10)
+
+  ##
+  # @brief Check whether `TABLESAMPLE` can be used for the queryset or not
+  # @param queryset Target queryset
+  # @return bool Judgement result
+  def can_use_tablesample(self, queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+  ##
+  # @brief Get the primary keys of candidates without sorting
+  # @param queryset Target queryset
+  # @return Queryset of primary keys
+  def _get_candidates(self, queryset):
+    return queryset.order_by().values_list('pk', flat=True)
+
+  ##
+  # @brief Sample the primary keys by scanning all candidates
+  # @param queryset Queryset of primary keys
+  # @param k The number of samples
+  # @return pks List of sampled primary keys
+  def _sample_all(self, queryset, k):
+    return reservoir_sample(queryset.iterator(chunk_size=self.chunk_size), k, rng=self.rng)
+
+  ##
+  # @brief Estimate the number of records in the table without scanning it
+  # @param queryset Target queryset
+  # @return num_records The estimated number of records (0 if the table has never been analyzed)
+  def estimate_num_records(self, queryset):
+    with connections[queryset.db].cursor() as cursor:
+      cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+      row = cursor.fetchone()
+
+    return max(int(row[0]), 0) if row else 0
+
+  ##
+  # @brief Sample the primary keys from the pages which are picked by `TABLESAMPLE SYSTEM`
+  # @param queryset Queryset of primary keys
+  # @param k The number of samples
+  # @param num_records The estimated number of records in the table
+  # @return pks List of sampled primary keys (empty list if the picked pages do not include enough candidates)
+  # @note The sampling rate is widened until the picked pages include enough candidates.
+  # @note Because the pages are picked at random, the candidates in the same page tend to be selected together.
+  def _sample_by_tablesample(self, queryset, k, num_records):
+    meta = queryset.model._meta
+    quote_name = connections[queryset.db].ops.quote_name
+    sql = f'SELECT {quote_name(meta.pk.column)} FROM {quote_name(meta.db_table)} TABLESAMPLE SYSTEM (%s) REPEATABLE (%s)'
+    oversampling = max(self.get_oversampling(), 2)
+    percent = 100.0 * k * oversampling / num_records
+    pks = []
+
+    while percent < 100.0:
+      seed = self.rng.randrange(2 ** 31)
+      pks = self._sample_all(queryset.filter(pk__in=RawSQL(sql, (percent, seed))), k)
+
+      if len(pks) == k:
+        break
+      pks = []
+      percent *= oversampling
+
+    return pks
+
+  ##
+  # @brief Sample the primary keys which have already been collected
+  # @param pks Iterable of primary keys
+  # @param k The number of samples
+  # @return pks List of sampled primary keys in random order
+  def sample_ids(self, pks, k):
+    return reservoir_sample(pks, k, rng=self.rng)
+
+  ##
+  # @brief Sample the primary keys of the queryset uniformly
+  # @param queryset Target queryset
+  # @param k The number of samples
+  # @return pks List of sampled primary keys in random order
+  # @note If the number of candidates is less than `k`, all primary keys are returned.
+  def sample(self, queryset, k):
+    candidates = self._get_candidates(queryset)
+    threshold = self.get_threshold()
+    pks = []
+
+    if k <= 0:
+      return pks
+
+    if threshold is not None and self.can_use_tablesample(candidates):
+      num_records = self.estimate_num_records(candidates)
+
+      if num_records >= threshold:
+        pks = self._sample_by_tablesample(candidates, k, num_records)
+    # In the case of the small table or shortage of the picked pages
+    if not pks:
+      pks = self._sample_all(candidates, k)
+
+    return pks
+
+g_quiz_sampler = QuizSampler()
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .caches import g_search_choice_cache
+from .indexes import g_quiz_index
+from .models import Genre, Quiz
+from functools import partial
+
+UserModel = get_user_model()
+
+##
+# @brief Update the cached quiz index after the quiz is stored
+# @param sender Quiz model
+# @param instance Instance of Quiz
+# @param kwargs Named arguments
+# @note The index is updated after the transaction is committed so that the rolled-back changes are not reflected.
+@receiver(post_save, sender=Quiz)
+def update_quiz_index(sender, instance, **kwargs):
+  transaction.on_commit(partial(g_quiz_index.update_quiz, instance.pk, instance.genre_id, instance.creator_id, instance.is_completed))
+
+##
+# @brief Remove the quiz from the cached quiz index after the quiz is deleted
+# @param sender Quiz model
+# @param instance Instance of Quiz
+# @param kwargs Named arguments
+@receiver(post_delete, sender=Quiz)
+def remove_quiz_index(sender, instance, **kwargs):
+  transaction.on_commit(partial(g_quiz_index.remove_quiz, instance.pk))
+
+##
+# @brief Decrease the completed quiz counters after the quiz is deleted
+# @param sender Quiz model
+# @param instance Instance of Quiz
+# @param kwargs Named arguments
+# @note Because the signal is sent for each quiz even if the genre or the creator is deleted, the counters are kept consistent.
+@receiver(post_delete, sender=Quiz)
+def decrease_completed_quiz_counts(sender, instance, **kwargs):
+  membership = getattr(instance, '_stored_membership', instance.get_completed_membership())
+
+  if membership is not None:
+    Quiz.update_completed_quiz_counts(removed=[membership])
+
+##
+# @brief Invalidate the cached choices of the quiz search form after the quiz or the genre is changed
+# @param sender Quiz or Genre model
+# @param kwargs Named arguments
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_search_choices(sender, **kwargs):
+  transaction.on_commit(g_search_choice_cache.invalidate)
+
+##
+# @brief Invalidate the cached choices of the quiz search form after the user who can be listed as a creator is changed
+# @param sender User model
+# @param update_fields Names of the updated fields (Default: None)
+# @param kwargs Named arguments
+# @note Because the last login time is stored at every login, the changes of the irrelevant fields are ignored.
+@receiver(post_save, sender=UserModel)
+@receiver(post_delete, sender=UserModel)
+def invalidate_search_choices_of_creators(sender, update_fields=None, **kwargs):
+  relevant_fields = {'email', 'screen_name', 'role', 'is_active', 'is_staff'}
+
+  if update_fields is None or relevant_fields & set(update_fields):
+    transaction.on_commit(g_search_choice_cache.invalidate)
@@ -19,6 +19,7 @@ urlpatterns = [
   path('update-room/<pk>', views.UpdateQuizRoomPage.as_view(), name='update_room'),
   path('delete-room/<pk>', views.DeleteQuizRoom.as_view(), name='delete_room'),
   path('playing-room/<pk>', views.EnterQuizRoom.as_view(), name='enter_room'),
+  path('spectate-room/<pk>/<token>', views.SpectateQuizRoom.as_view(), name='spectate_room'),
   # Download/Upload
   path('upload/genres', views.UploadGenrePage.as_view(), name='upload_genre'),
   path('download/genres', views.DownloadGenrePage.as_view(), name='download_genre'),
@@ -1,6 +1,6 @@
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.http import StreamingHttpResponse, JsonResponse
+from django.http import StreamingHttpResponse, JsonResponse, HttpResponse
 from django.utils.translation import gettext_lazy
 from django.urls import reverse, reverse_lazy
 from django.views.generic import (
@@ -23,7 +23,9 @@ from utils.views import (
   Index,
   DjangoBreadcrumbsMixin,
 )
-from . import models, forms
+from . import models, forms, consumers
+from .metrics import g_metrics
+import hmac
 
 # =========
 # = Genre =
@@ -169,7 +171,7 @@ class QuizRoomListPage(LoginRequiredMixin, ListView, DjangoBreadcrumbsMixin):
   # @brief Get queryset
   # @return queryset Fitered queryset
   def get_queryset(self):
-    rooms = self.model.objects.collect_relevant_rooms(self.request.user)
+    rooms = self.model.objects.collect_relevant_rooms(self.request.user).for_listing()
     # Filtering queryset
     params = self.request.GET.copy() or {}
     self.form = self.form_class(data=params)
@@ -221,6 +223,16 @@ class UpdateQuizRoomPage(BaseCreateUpdateView, CanUpdate, UpdateView, DjangoBrea
     url_keys=['pk'],
   )
 
+  ##
+  # @brief Notify open connections of the updated room
+  # @param form Instance of QuizRoomForm
+  # @return response Instance of HttpResponse
+  def form_valid(self, form):
+    response = super().form_valid(form)
+    consumers.notify_room_updated(self.object.pk)
+
+    return response
+
 class DeleteQuizRoom(CustomDeleteView):
   model = models.QuizRoom
   success_url = reverse_lazy('quiz:room_list')
@@ -228,9 +240,21 @@ class DeleteQuizRoom(CustomDeleteView):
 class EnterQuizRoom(LoginRequiredMixin, UserPassesTestMixin, DetailView, DjangoBreadcrumbsMixin):
   raise_exception = True
   model = models.QuizRoom
+  queryset = models.QuizRoom.objects.select_related('owner', 'score').prefetch_related('members')
   template_name = 'quiz/playing_room.html'
   context_object_name = 'room'
 
+  ##
+  # @brief Get target room
+  # @param queryset Target queryset (Default: None)
+  # @return instance Instance of QuizRoom
+  # @note The instance is cached so that `test_func` and `get` share the same query.
+  def get_object(self, queryset=None):
+    if getattr(self, 'object', None) is None:
+      self.object = super().get_object(queryset=queryset)
+
+    return self.object
+
   ##
   # @brief Check whether request user can access to target page or not
   # @return bool Judgement result
@@ -256,6 +280,37 @@ class EnterQuizRoom(LoginRequiredMixin, UserPassesTestMixin, DetailView, DjangoB
       parent_view_class=QuizRoomListPage,
       url_keys=['pk'],
     )
+    # Only the owner can share the link for spectators
+    if instance.is_owner(self.request.user):
+      context['spectator_url'] = self.request.build_absolute_uri(
+        reverse('quiz:spectate_room', kwargs={'pk': instance.pk, 'token': instance.get_spectator_token()})
+      )
+
+    return context
+
+class SpectateQuizRoom(UserPassesTestMixin, DetailView):
+  raise_exception = True
+  model = models.QuizRoom
+  template_name = 'quiz/spectating_room.html'
+  context_object_name = 'room'
+
+  ##
+  # @brief Check whether the token is issued for the target room or not
+  # @return bool Judgement result
+  # @retval True  The token is valid
+  # @retval False The token is invalid or expired
+  def test_func(self):
+    pk = models.QuizRoom.get_pk_from_spectator_token(self.kwargs['token'])
+
+    return pk == str(self.kwargs['pk'])
+
+  ##
+  # @brief Get context data
+  # @param kwargs Named arguments
+  # @return context context which is used in template file
+  def get_context_data(self, **kwargs):
+    context = super().get_context_data(**kwargs)
+    context['token'] = self.kwargs['token']
 
     return context
 
@@ -418,4 +473,45 @@ class QuizAjaxResponse(LoginRequiredMixin, HasCreatorRole, View):
     quizzes = models.Quiz.get_quizzes(request.user)
     response = JsonResponse({'quizzes': quizzes}, json_dumps_params={'ensure_ascii': False})
 
-    return response
\ No newline at end of file
+    return response
+
+# ===========
+# = Metrics =
+# ===========
+class QuizMetricsPage(UserPassesTestMixin, View):
+  raise_exception = True
+  http_method_names = ['get']
+
+  ##
+  # @brief Check whether request user can access to target page or not
+  # @return bool Judgement result
+  # @retval True  The request is sent by the manager or has the valid bearer token
+  # @retval False Otherwise
+  # @note The client address is not used because it can be spoofed by `X-Forwarded-For` header behind the reverse proxy.
+  def test_func(self):
+    user = self.request.user
+    is_allowed = (user.is_authenticated and user.has_manager_role()) or self.has_valid_token()
+
+    return is_allowed
+
+  ##
+  # @brief Check whether the request has the bearer token given by `QUIZ_METRICS_TOKEN` setting or not
+  # @return bool Judgement result
+  # @note If the token is not set, the access by the token is disabled.
+  def has_valid_token(self):
+    token = getattr(settings, 'QUIZ_METRICS_TOKEN', '')
+    scheme, _, credential = self.request.headers.get('Authorization', '').partition(' ')
+    is_valid = bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(credential.strip().encode(), token.encode())
+
+    return is_valid
+
+  ##
+  # @brief Process GET method to expose the metrics of this process
+  # @param request Instance of HttpRequest
+  # @param args Positional arguments
+  # @param kwargs Named arguments
+  # @return response Instance of HttpResponse based on Prometheus text format
+  def get(self, request, *args, **kwargs):
+    response = HttpResponse(g_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    return response
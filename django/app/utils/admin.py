@@ -1,3 +1,23 @@
-from django.contrib import admin
+from .search import g_trigram_search
 
-# Register your models here.
+class TrigramSearchAdminMixin:
+  # Name of the field used to rank the search results
+  trigram_search_field = None
+
+  ##
+  # @brief Annotate the trigram similarity of the search results
+  # @param request Instance of HttpRequest
+  # @param queryset Target queryset
+  # @param search_term Search term
+  # @return queryset Queryset of search results
+  # @return may_have_duplicates Describes whether the results may have duplicates or not
+  # @note The ordering is given here because the change list orders the queryset before the search results are annotated.
+  def get_search_results(self, request, queryset, search_term):
+    queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+
+    if self.trigram_search_field and search_term and g_trigram_search.can_rank(queryset):
+      ordering = queryset.query.order_by
+      queryset = g_trigram_search.annotate(queryset, self.trigram_search_field, search_term, alias='trigram_similarity')
+      queryset = queryset.order_by('-trigram_similarity', *ordering)
+
+    return queryset, may_have_duplicates
@@ -13,17 +13,31 @@ class DualListbox:
     self.user_cb = lambda instance: instance.code
     self.name_cb = lambda instance: instance.name
 
+  ##
+  # @brief Get formatter of the option's label
+  # @param callback callback with its instance as argument (default is None)
+  # @param suffixes Dictionary whose key is primary key and value is label suffix (default is None)
+  # @return _formatter Function with its instance as argument
+  # @note If both `callback` and `suffixes` are given, `suffixes` takes priority.
+  def get_formatter(self, callback=None, suffixes=None):
+    if suffixes is not None:
+      _formatter = lambda val: f'{val}({suffixes.get(val.pk, 0)})'
+    elif callable(callback):
+      _formatter = lambda val: f'{val}({callback(val)})'
+    else:
+      _formatter = lambda val: f'{val}'
+
+    return _formatter
+
   ##
   # @brief Create options of dual listbox
   # @param instances Instances which consist of either list or QuerySet
   # @param is_selected Flag of whether its element is selected or not (default is True)
   # @param callback callback with its instance as argument (default is None)
+  # @param suffixes Dictionary whose key is primary key and value is label suffix (default is None)
   # @return output List of tuples which consist of primary-key, label-name, and selected-or-not
-  def create_options(self, instances, is_selected=True, callback=None):
-    if callable(callback):
-      _formatter = lambda val: f'{val}({callback(val)})'
-    else:
-      _formatter = lambda val: f'{val}'
+  def create_options(self, instances, is_selected=True, callback=None, suffixes=None):
+    _formatter = self.get_formatter(callback=callback, suffixes=suffixes)
 
     return [(_formatter(instance), str(instance.pk), is_selected) for instance in instances]
 
@@ -48,15 +62,26 @@ class DualListbox:
   # @param all_items All items to separate selected one or noe
   # @param selected_items Selected items (default is None)
   # @param callback Callback function (default is None)
+  # @param suffixes Dictionary whose key is primary key and value is label suffix (default is None)
   # @return options JSON data converted from input data
-  def collect_options_of_items(self, all_items, selected_items=None, callback=None):
-    if selected_items is not None:
-      excluded_items = all_items.exclude(pk__in=list(selected_items.values_list('pk', flat=True)))
-      selected_options = self.create_options(selected_items, is_selected=True, callback=callback)
-      not_selected_options = self.create_options(excluded_items, is_selected=False, callback=callback)
-      options = self.convert2json(selected_options + not_selected_options)
-    else:
-      options = self.convert2json(self.create_options(all_items, is_selected=False, callback=callback))
+  # @note The callback must not access the database because it is called for each item.
+  #       Use the annotated queryset (e.g. `all_items.annotate(num=Count(...))` with `lambda item: item.num`) or `suffixes` instead.
+  # @note The selected items which are not included in `all_items` are fetched from `selected_items`.
+  def collect_options_of_items(self, all_items, selected_items=None, callback=None, suffixes=None):
+    _formatter = self.get_formatter(callback=callback, suffixes=suffixes)
+    selected_pks = list(selected_items.values_list('pk', flat=True)) if selected_items is not None else []
+    selected_set = set(selected_pks)
+    instances = {instance.pk: instance for instance in all_items}
+    rest_pks = [pk for pk in selected_pks if pk not in instances]
+
+    if rest_pks:
+      instances.update({instance.pk: instance for instance in selected_items.filter(pk__in=rest_pks)})
+    # Create options whose selected items are arranged in the first
+    selected_options = [(_formatter(instances[pk]), str(pk), True) for pk in selected_pks if pk in instances]
+    not_selected_options = [
+      (_formatter(instance), str(pk), False) for pk, instance in instances.items() if pk not in selected_set
+    ]
+    options = self.convert2json(selected_options + not_selected_options)
 
     return options
 
@@ -0,0 +1,125 @@
+from logging import getLogger
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections, transaction, DatabaseError
+import threading
+
+##
+# @brief Create the trigram indexes used by the partial match search
+# @param schema_editor Instance of schema editor given by `RunPython`
+# @param targets List of tuples which consist of index name, table name, and column name
+# @note If `pg_trgm` extension is not available, the indexes are not created and the search falls back to the sequential scan.
+def create_trigram_indexes(schema_editor, targets):
+  connection = schema_editor.connection
+  logger = getLogger(__name__)
+
+  if connection.vendor != 'postgresql':
+    return
+
+  try:
+    with transaction.atomic(using=connection.alias):
+      schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+  except DatabaseError as ex:
+    logger.warning(f'[TrigramSearch]pg_trgm extension is not available: {ex}')
+    return
+
+  quote_name = schema_editor.quote_name
+  # Because `icontains` is converted to `UPPER(column::text) LIKE UPPER(pattern)`, the same expression is indexed
+  for index_name, table_name, column_name in targets:
+    schema_editor.execute(
+      f'CREATE INDEX IF NOT EXISTS {quote_name(index_name)} ON {quote_name(table_name)} '
+      f'USING gin (UPPER({quote_name(column_name)}::text) gin_trgm_ops)'
+    )
+
+##
+# @brief Drop the trigram indexes
+# @param schema_editor Instance of schema editor given by `RunPython`
+# @param targets List of tuples which consist of index name, table name, and column name
+def drop_trigram_indexes(schema_editor, targets):
+  if schema_editor.connection.vendor != 'postgresql':
+    return
+
+  for index_name, _, _ in targets:
+    schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(index_name)}')
+
+class TrigramSearch:
+  ##
+  # @brief Constructor of TrigramSearch
+  # @param enabled Describes whether the ranking by trigram similarity is used or not (Default: None)
+  # @note If `enabled` is None, the value is given by `USE_TRIGRAM_SEARCH` setting.
+  def __init__(self, enabled=None):
+    self.enabled = enabled
+    self.availabilities = {}
+    self.lock = threading.Lock()
+
+  ##
+  # @brief Check whether the ranking by trigram similarity is enabled or not
+  # @return bool Judgement result
+  def is_enabled(self):
+    if self.enabled is not None:
+      return self.enabled
+
+    return getattr(settings, 'USE_TRIGRAM_SEARCH', True)
+
+  ##
+  # @brief Check whether `pg_trgm` extension is installed in the database or not
+  # @param using Database alias (Default: 'default')
+  # @return bool Judgement result
+  # @note The result is kept for each database alias because the extension is installed by the migration.
+  def is_available(self, using='default'):
+    with self.lock:
+      if using not in self.availabilities:
+        connection = connections[using]
+
+        if connection.vendor == 'postgresql':
+          with connection.cursor() as cursor:
+            cursor.execute("SELECT EXISTS(SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+            self.availabilities[using] = bool(cursor.fetchone()[0])
+        else:
+          self.availabilities[using] = False
+
+    return self.availabilities[using]
+
+  ##
+  # @brief Clear the cached availabilities
+  def clear(self):
+    with self.lock:
+      self.availabilities = {}
+
+  ##
+  # @brief Check whether the queryset can be ranked by trigram similarity or not
+  # @param queryset Target queryset
+  # @return bool Judgement result
+  def can_rank(self, queryset):
+    return self.is_enabled() and self.is_available(queryset.db)
+
+  ##
+  # @brief Annotate the trigram similarity between the field and the keyword
+  # @param queryset Target queryset
+  # @param field_name Name of the searched field
+  # @param keyword Search keyword
+  # @param alias Name of the annotation (Default: 'similarity')
+  # @return queryset Annotated queryset
+  def annotate(self, queryset, field_name, keyword, alias='similarity'):
+    return queryset.annotate(**{alias: TrigramSimilarity(field_name, keyword)})
+
+  ##
+  # @brief Search the records whose field includes the keyword
+  # @param queryset Target queryset
+  # @param field_name Name of the searched field
+  # @param keyword Search keyword
+  # @return queryset Filtered queryset
+  # @note The records are ordered by the trigram similarity and the original ordering if `pg_trgm` extension is available.
+  def search(self, queryset, field_name, keyword):
+    if not keyword:
+      return queryset
+
+    queryset = queryset.filter(**{f'{field_name}__icontains': keyword})
+
+    if self.can_rank(queryset):
+      ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+      queryset = self.annotate(queryset, field_name, keyword).order_by('-similarity', *ordering)
+
+    return queryset
+
+g_trigram_search = TrigramSearch()
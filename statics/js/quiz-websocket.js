@@ -30,20 +30,65 @@ const QuizRoom = {};
      * @param[in] callbacks: Instance of Callbacks class
     */
     QuizRoom.Init = (location, roomID, isOwner, callbacks) => {
-      // Create WebSocket
-      room_socket = createWebSocket(location, `ws/quizroom/${roomID}`);
+      // Version of the room state which has been applied to this client
+      let version = 0;
+      let isWaitingSnapshot = true;
+      // Token to resume the connection which is issued by the server
+      let resumeToken = null;
+      // The number of consecutive reconnection attempts
+      let retryCount = 0;
+      let isUnloading = false;
+      const maxRetries = 10;
+      // Check whether the delta can be applied to the current state or not
+      const isApplicable = (response) => {
+        let canApply = false;
+
+        if (response.version === undefined) {
+          canApply = true;
+        }
+        else if (!isWaitingSnapshot && response.version === version + 1) {
+          version = response.version;
+          canApply = true;
+        }
+        else if (!isWaitingSnapshot && response.version > version + 1) {
+          // Some deltas are missing, so the full snapshot is requested
+          isWaitingSnapshot = true;
+          sender('getSnapshot');
+        }
+
+        return canApply;
+      };
       // Define processes when the client received message
-      room_socket.onmessage = (event) => {
+      const onMessage = (event) => {
         const response = JSON.parse(event.data);
         const msgType = response.type;
+        const canApply = (msgType === 'snapshot' || msgType === 'resume') ? false : isApplicable(response);
         // Conduct process for each response from web-socket server
         switch (msgType) {
+          case 'snapshot':
+            resumeToken = response.resumeToken;
+            if (response.version >= version) {
+              version = response.version;
+              isWaitingSnapshot = false;
+              callbacks.applySnapshot(response.players, response.scores);
+            }
+            break;
+          case 'resume':
+            resumeToken = response.resumeToken;
+            version = response.version;
+            isWaitingSnapshot = false;
+            callbacks.resume(response.index, response.phase, response.question, response.players, response.scores);
+            break;
           case 'system':
             callbacks.chatLog(response.datetime, response.message);
-            callbacks.updatePlayerStatuses(response.players);
+            if (canApply) {
+              callbacks.updatePlayerStatuses(response.players);
+            }
             break;
           case 'resetCompleted':
-            callbacks.resetPlayerScore();
+            if (canApply) {
+              callbacks.resetPlayerScore();
+            }
             break;
           case 'sentNextQuiz':
             callbacks.setQuiz(response.data);
@@ -56,7 +101,7 @@ const QuizRoom = {};
             callbacks.stop(response.datetime, response.message);
             break;
           case 'shareResult':
-            callbacks.updateScoreTable(response.datetime, response.data);
+            callbacks.updateScoreTable(response.datetime, canApply ? response.data : {});
             break;
           default:
             break;
@@ -95,6 +140,35 @@ const QuizRoom = {};
           }
         }
       };
+      // Create WebSocket and reconnect with exponential backoff when the connection is dropped
+      const connect = () => {
+        room_socket = createWebSocket(location, `ws/quizroom/${roomID}`);
+        room_socket.onopen = () => {
+          retryCount = 0;
+          // Because the room state may be recreated by the server, the version is reset
+          version = 0;
+          isWaitingSnapshot = true;
+
+          if (resumeToken) {
+            sender('resume', resumeToken);
+          }
+          else {
+            sender('getSnapshot');
+          }
+        };
+        room_socket.onclose = () => {
+          if (!isUnloading && retryCount < maxRetries) {
+            const delay = Math.min(500 * (2 ** retryCount), 30000) * (0.5 + Math.random() / 2);
+            retryCount += 1;
+            window.setTimeout(connect, delay);
+          }
+        };
+        room_socket.onmessage = onMessage;
+      };
+      window.addEventListener('beforeunload', () => {
+        isUnloading = true;
+      });
+      connect();
     };
     //
     /**
@@ -147,6 +221,23 @@ const QuizRoom = {};
     QuizRoom.SendResult = (data) => {
       sender('sendResult', data);
     };
+    /**
+     * @brief Spectate the quiz room (read-only stream)
+     * @param[in] location: window.location
+     * @param[in] roomID:   roomID
+     * @param[in] token:    Signed token for spectators
+     * @param[in] callback: Function which receives the snapshot of the room
+    */
+    QuizRoom.Spectate = (location, roomID, token, callback) => {
+      const socket = createWebSocket(location, `ws/quizroom/${roomID}/spectate/${token}`);
+      socket.onmessage = (event) => {
+        const response = JSON.parse(event.data);
+
+        if (response.type === 'spectatorSnapshot') {
+          callback(response);
+        }
+      };
+    };
   })();
 
   Object.freeze(QuizRoom);